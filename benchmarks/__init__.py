@@ -0,0 +1,5 @@
+"""
+Benchmarks for the Natural Language Automation System.
+
+Run from the repository root, e.g. `python -m benchmarks.bench_fast_path`.
+"""
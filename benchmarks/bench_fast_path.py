@@ -0,0 +1,48 @@
+# bench_fast_path.py
+
+"""
+Measures the throughput of the rule-based fast path and the share of a
+command corpus it handles without calling the model.
+
+Usage:
+    python -m benchmarks.bench_fast_path [--corpus benchmarks/commands.txt] [--repeat 2000]
+"""
+
+import argparse
+import os
+import time
+
+from src.nlu.fast_path import match_command
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "commands.txt")
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="File with one command per line")
+    parser.add_argument("--repeat", type=int, default=2000, help="Passes over the corpus")
+    args = parser.parse_args()
+
+    commands = load_corpus(args.corpus)
+    handled = [command for command in commands if match_command(command) is not None]
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for command in commands:
+            match_command(command)
+    elapsed = time.perf_counter() - start
+    total = args.repeat * len(commands)
+
+    print(f"Commands in corpus:   {len(commands)}")
+    print(f"Handled by fast path: {len(handled)} ({100 * len(handled) / len(commands):.1f}%)")
+    print(f"Throughput:           {total / elapsed:,.0f} commands/s")
+    print(f"Mean latency:         {1e6 * elapsed / total:.2f} us/command")
+
+
+if __name__ == "__main__":
+    main()
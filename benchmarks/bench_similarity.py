@@ -0,0 +1,120 @@
+# bench_similarity.py
+
+"""
+Measures near-duplicate plan lookup latency and hit rate of the similarity
+index with a large number of stored commands.
+
+Usage:
+    python -m benchmarks.bench_similarity [--entries 100000] [--queries 2000]
+
+Stored commands and their plans are generated from templates with a fixed
+seed; queries are paraphrases of stored commands with a different search
+text, plus unrelated commands that must not match.
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from src.nlu.similarity_index import SimilarityIndex
+
+APPLICATIONS = ["Chrome", "Firefox", "Safari", "Edge", "Notepad", "Terminal", "Slack", "Spotify", "Mail", "Finder"]
+WORDS = (
+    "penguins otters weather news recipes flights hotels football music jazz python numpy tutorials "
+    "maps trains museums concerts laptops phones cameras gardening painting chess history science"
+).split()
+SYLLABLES = "ka lo mi ne ru sa te vo pi da ren tor mal bel sin gro fen lux dar quin".split()
+
+
+def vocabulary(size, rng):
+    """Common words plus pronounceable made-up words, for a realistic spread of n-grams."""
+    words = set(WORDS)
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+STORED = [
+    "open {app} and search {query}",
+    "search {query} in {app}",
+    "open {app} and type {query}",
+    "launch {app} then look up {query}",
+]
+PARAPHRASES = [
+    "search for {query} in {app}",
+    "open {app} and search for {query}",
+    "in {app} search {query}",
+    "open {app} and look up {query}",
+]
+UNRELATED = ["take a screenshot", "shut down the computer", "send an email to bob about the meeting", "empty the trash"]
+
+
+def plan_for(app, query):
+    return [
+        {"action_type": "open_application", "parameters": {"application_name": app}},
+        {"action_type": "click", "parameters": {"target": "address bar"}},
+        {"action_type": "type_text", "parameters": {"text": query}},
+        {"action_type": "press_key", "parameters": {"key": "enter"}},
+    ]
+
+
+def random_query(rng, words):
+    return " ".join(rng.sample(words, rng.randint(1, 3)))
+
+
+def build_index(entries, rng, words):
+    index = SimilarityIndex(path=None)
+    start = time.perf_counter()
+    for _ in range(entries):
+        app, query = rng.choice(APPLICATIONS), random_query(rng, words)
+        index.add(rng.choice(STORED).format(app=app, query=query), plan_for(app, query))
+    return index, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--vocabulary", type=int, default=5000, help="Distinct words in search texts")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = vocabulary(args.vocabulary, rng)
+    index, build_time = build_index(args.entries, rng, words)
+
+    queries = []
+    for _ in range(args.queries):
+        if rng.random() < 0.9:
+            app, query = rng.choice(APPLICATIONS), random_query(rng, words)
+            queries.append((rng.choice(PARAPHRASES).format(app=app, query=query), query))
+        else:
+            queries.append((rng.choice(UNRELATED), None))
+
+    latencies, hits, wrong = [], 0, 0
+    for command, query in queries:
+        start = time.perf_counter()
+        actions = index.lookup(command)
+        latencies.append(time.perf_counter() - start)
+        if actions is None:
+            continue
+        if query is not None and actions[2]["parameters"]["text"] == query:
+            hits += 1
+        else:
+            wrong += 1
+
+    latencies = np.array(latencies) * 1000
+    expected = sum(1 for _, query in queries if query is not None)
+    print(f"Stored commands:  {len(index):,} (built in {build_time:.1f}s)")
+    print(f"Queries:          {len(queries):,}")
+    print(f"Reused plans:     {hits} of {expected} paraphrases ({100 * hits / max(1, expected):.1f}%)")
+    print(f"Wrong reuses:     {wrong}")
+    print(
+        f"Lookup latency:   p50 {np.percentile(latencies, 50):.3f}ms  "
+        f"p95 {np.percentile(latencies, 95):.3f}ms  p99 {np.percentile(latencies, 99):.3f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# bench_vision.py
+
+"""
+Compares target lookup strategies on screenshots: a full resolution scan (what
+pyautogui.locateCenterOnScreen does), the coarse-to-fine pyramid search and
+the region-of-interest lookup around the last known location. With --workers,
+the pyramid search is also run split into bands across a vision worker pool.
+
+Usage:
+    python -m benchmarks.bench_vision [--screens DIR --template PNG] [--repeat 5] [--workers N]
+
+Without --screens, synthetic 5K screenshots are generated with a fixed seed.
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from src.executor.vision import FramePyramid, TemplateMatcher, to_gray
+from src.executor.vision_pool import VisionPool
+
+
+def synthetic_screens(count=4, width=5120, height=2880, seed=0):
+    """
+    Draws UI-like screenshots (panels, buttons and text-like strokes) with an
+    "address bar" at a different position on each one.
+
+    Returns:
+        tuple: (list of grayscale screens, template, list of true (x, y) positions)
+    """
+    rng = np.random.default_rng(seed)
+    template = np.full((72, 900), 235, dtype=np.uint8)
+    cv2.rectangle(template, (0, 0), (899, 71), 120, 3)
+    for x in range(40, 860, 26):
+        cv2.line(template, (x, 26), (x + int(rng.integers(8, 20)), 46), 40, 3)
+    cv2.circle(template, (30, 36), 14, 90, -1)
+
+    screens, positions = [], []
+    for _ in range(count):
+        screen = np.full((height, width), 250, dtype=np.uint8)
+        for _ in range(400):
+            x, y = int(rng.integers(0, width - 200)), int(rng.integers(0, height - 60))
+            w, h = int(rng.integers(40, 600)), int(rng.integers(20, 300))
+            cv2.rectangle(screen, (x, y), (x + w, y + h), int(rng.integers(60, 240)), int(rng.choice([-1, 2])))
+        for _ in range(3000):
+            x, y = int(rng.integers(0, width - 20)), int(rng.integers(0, height - 10))
+            cv2.line(screen, (x, y), (x + int(rng.integers(4, 16)), y), int(rng.integers(0, 120)), 2)
+        x, y = int(rng.integers(0, width - 900)), int(rng.integers(0, height - 72))
+        screen[y : y + 72, x : x + 900] = template
+        screens.append(screen)
+        positions.append((x, y))
+    return screens, template, positions
+
+
+def load_screens(directory, template_path):
+    paths = sorted(glob.glob(os.path.join(directory, "*.png")))
+    screens = [to_gray(cv2.imread(path, cv2.IMREAD_GRAYSCALE)) for path in paths]
+    template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
+    return screens, template, [None] * len(screens)
+
+
+def timed(func, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--screens", help="Directory of recorded PNG screenshots")
+    parser.add_argument("--template", help="Template PNG to look for on the recorded screenshots")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, help="Also time a vision worker pool with this many processes")
+    args = parser.parse_args()
+
+    if args.screens:
+        screens, template, positions = load_screens(args.screens, args.template)
+    else:
+        screens, template, positions = synthetic_screens()
+
+    pool = None
+    if args.workers:
+        pool = VisionPool(workers=args.workers, target_image_map={})
+        pool.add_template("target", template)
+
+    rows = []
+    for index, (screen, position) in enumerate(zip(screens, positions)):
+        full_time, result = timed(
+            lambda: cv2.minMaxLoc(cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)), args.repeat
+        )
+        full_location = result[3]
+
+        matcher = TemplateMatcher(target_image_map={})
+        matcher.add_template("target", template)
+
+        def cold():
+            matcher.last_locations.clear()
+            return matcher.locate("target", FramePyramid(screen))
+
+        pyramid_time, match = timed(cold, args.repeat)
+        roi_time, roi_match = timed(lambda: matcher.locate("target", FramePyramid(screen)), args.repeat)
+        found = match[:2] if match else None
+        correct = found == (position or full_location) and roi_match is not None and roi_match[:2] == found
+
+        pool_time = float("nan")
+        if pool is not None:
+
+            def pooled():
+                pool.last_locations.clear()
+                return pool.locate("target", FramePyramid(screen))
+
+            pool.locate("target", screen)  # Start the workers
+            pool_time, pool_match = timed(pooled, args.repeat)
+            correct = correct and pool_match is not None and pool_match[:2] == found
+        rows.append((index, screen.shape, full_time, pyramid_time, roi_time, pool_time, correct))
+    if pool is not None:
+        pool.close()
+
+    print(f"{'screen':>6} {'size':>11} {'full scan':>10} {'pyramid':>10} {'roi hint':>10} {'pool':>10} {'ok':>4}")
+    for index, shape, full_time, pyramid_time, roi_time, pool_time, correct in rows:
+        size = f"{shape[1]}x{shape[0]}"
+        print(
+            f"{index:>6} {size:>11} {1000 * full_time:>8.1f}ms {1000 * pyramid_time:>8.1f}ms "
+            f"{1000 * roi_time:>8.1f}ms {1000 * pool_time:>8.1f}ms {'yes' if correct else 'NO':>4}"
+        )
+    full = sum(row[2] for row in rows) / len(rows)
+    pyramid = sum(row[3] for row in rows) / len(rows)
+    roi = sum(row[4] for row in rows) / len(rows)
+    print(f"Speed-up over full scan: pyramid {full / pyramid:.1f}x, roi hint {full / roi:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
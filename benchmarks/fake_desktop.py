@@ -0,0 +1,167 @@
+# fake_desktop.py
+
+"""
+Recording stand-ins for pyautogui, pyperclip and the process launcher, so the
+executor can run without a display and without starting applications.
+
+install() must be called before any src.executor module is imported:
+
+    desktop = install(screen)
+    from src.executor.action_mapper import execute_action
+    ...
+    desktop.calls  # [("moveTo", ...), ("click", ...), ...]
+"""
+
+import subprocess
+import sys
+import threading
+import time
+import types
+from collections import namedtuple
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+Size = namedtuple("Size", "width height")
+Point = namedtuple("Point", "x y")
+
+
+class FakeDesktop:
+    """
+    Records input events and serves screenshots from an array.
+
+    Args:
+        screen (ndarray, optional): The grayscale or RGB screen contents.
+        pause (float): Seconds each input call takes, like pyautogui.PAUSE
+            (0.1 by default in pyautogui).
+        screenshot_seconds (float): Seconds each screenshot takes.
+        real_waits (bool): Whether "wait" actions actually sleep; by default they
+            are only recorded.
+    """
+
+    def __init__(
+        self,
+        screen: Optional[np.ndarray] = None,
+        pause: float = 0.0,
+        screenshot_seconds: float = 0.0,
+        real_waits: bool = False,
+    ):
+        self.screen = screen if screen is not None else np.zeros((1080, 1920), dtype=np.uint8)
+        self.pause = pause
+        self.screenshot_seconds = screenshot_seconds
+        self.real_waits = real_waits
+        self.calls: List[Tuple[str, Any]] = []
+        self.clipboard = ""
+        self.position = Point(0, 0)
+        self._lock = threading.Lock()
+
+    def _record(self, name: str, *args) -> None:
+        with self._lock:
+            self.calls.append((name, args))
+        if self.pause:
+            time.sleep(self.pause)
+
+    def count(self, name: str) -> int:
+        """Returns how often an input call was made."""
+        return sum(1 for call, _ in self.calls if call == name)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+
+    # --- pyautogui ---
+    def size(self) -> Size:
+        return Size(self.screen.shape[1], self.screen.shape[0])
+
+    def screenshot(self) -> np.ndarray:
+        if self.screenshot_seconds:
+            time.sleep(self.screenshot_seconds)
+        return self.screen.copy()
+
+    def moveTo(self, x=None, y=None, *args, **kwargs) -> None:
+        if y is None and isinstance(x, (tuple, list)):
+            x, y = x
+        self.position = Point(x, y)
+        self._record("moveTo", x, y)
+
+    def click(self, *args, **kwargs) -> None:
+        self._record("click", *args)
+
+    def write(self, text, interval=0.0) -> None:
+        self._record("write", text)
+        if interval:
+            time.sleep(interval * len(text))
+
+    def press(self, key, presses=1, *args, **kwargs) -> None:
+        for _ in range(presses):
+            self._record("press", key)
+
+    def hotkey(self, *keys, **kwargs) -> None:
+        self._record("hotkey", *keys)
+
+    def sleep(self, seconds) -> None:
+        self._record("sleep", seconds)
+        if self.real_waits:
+            time.sleep(seconds)
+
+    # --- pyperclip ---
+    def copy(self, text) -> None:
+        self.clipboard = text
+
+    def paste(self) -> str:
+        return self.clipboard
+
+    # --- subprocess ---
+    def popen(self, args, *rest, **kwargs):
+        self._record("launch", args)
+        return types.SimpleNamespace(pid=0, returncode=0, poll=lambda: 0, wait=lambda *a, **k: 0)
+
+    def run(self, args, *rest, **kwargs):
+        # Every launched process counts as running (pgrep/tasklist)
+        return subprocess.CompletedProcess(args, 0, stdout="", stderr="")
+
+
+def _module(name: str, **attributes) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+def install(screen: Optional[np.ndarray] = None, **kwargs) -> FakeDesktop:
+    """
+    Installs a FakeDesktop as the pyautogui and pyperclip modules, and as the
+    process launcher and the wait clock of the executor's pyautogui backend.
+
+    Returns:
+        FakeDesktop: The desktop that records the calls.
+    """
+    desktop = FakeDesktop(screen, **kwargs)
+    sys.modules["pyautogui"] = _module(
+        "pyautogui",
+        FAILSAFE=False,
+        PAUSE=0.0,
+        size=desktop.size,
+        screenshot=desktop.screenshot,
+        moveTo=desktop.moveTo,
+        click=desktop.click,
+        write=desktop.write,
+        typewrite=desktop.write,
+        press=desktop.press,
+        hotkey=desktop.hotkey,
+    )
+
+    class PyperclipException(RuntimeError):
+        pass
+
+    sys.modules["pyperclip"] = _module(
+        "pyperclip", copy=desktop.copy, paste=desktop.paste, PyperclipException=PyperclipException
+    )
+
+    from src.executor import backends
+
+    backends.subprocess = _module("subprocess", Popen=desktop.popen, run=desktop.run)
+    backend = backends.PyAutoGUIBackend()
+    # Explicit waits (wait actions, clipboard restores) are recorded, not slept
+    backend.wait = desktop.sleep
+    backends.set_backend(backend)
+    return desktop
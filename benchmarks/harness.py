@@ -0,0 +1,320 @@
+# harness.py
+
+"""
+Benchmark harness: planning latency against a mock Llama API, executor
+throughput and locate time on a fake desktop, and end-to-end time per command,
+checked against a stored baseline.
+
+Usage:
+    python -m benchmarks.harness [--suites planning,executor,locate,e2e] [--screens DIR]
+        [--baseline benchmarks/baseline.json] [--tolerance 0.25] [--min-delta-ms 5]
+        [--save-baseline] [--output FILE]
+
+No model, display or applications are needed: the Llama API is replaced by
+benchmarks.mock_ollama, pyautogui by benchmarks.fake_desktop, and screenshots
+come from a recorded corpus (benchmarks.screens) or are generated. Plan caches
+and the similarity index are created in a temporary directory, so every run
+starts cold. Exits with status 1 if a metric regressed by more than the
+tolerance.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .mock_ollama import MockOllama
+from .screens import Corpus, load_corpus, synthetic_corpus
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_COMMANDS = os.path.join(BENCHMARK_DIR, "commands.txt")
+SUITES = ("planning", "executor", "locate", "e2e")
+
+# Metrics whose name ends like this improve upwards; all others are times or counts
+HIGHER_IS_BETTER = ("_per_second", "_rate")
+
+EXECUTOR_PLAN = [
+    {"action_type": "wait_for_target", "parameters": {"target": "address bar", "timeout": 1}},
+    {"action_type": "click", "parameters": {"target": "address bar"}},
+    {"action_type": "type_text", "parameters": {"text": "penguins"}},
+    {"action_type": "press_key", "parameters": {"key": "enter"}},
+]
+
+
+def percentiles(samples: List[float], prefix: str) -> Dict[str, float]:
+    """Summarizes latency samples (seconds) as p50/p95 metrics in milliseconds."""
+    if not samples:
+        return {}
+    milliseconds = np.array(samples) * 1000
+    return {
+        f"{prefix}_ms.p50": round(float(np.percentile(milliseconds, 50)), 3),
+        f"{prefix}_ms.p95": round(float(np.percentile(milliseconds, 95)), 3),
+    }
+
+
+def compare(
+    results: Dict[str, float], baseline: Dict[str, float], tolerance: float, min_delta_ms: float = 5.0
+) -> List[str]:
+    """
+    Compares metrics against a baseline.
+
+    Args:
+        results (dict): Metric name -> value of this run.
+        baseline (dict): Metric name -> reference value.
+        tolerance (float): Allowed relative change in the bad direction, e.g. 0.25.
+        min_delta_ms (float): Latencies may also grow by this many milliseconds,
+            so that timer noise on sub-millisecond metrics is not a regression.
+
+    Returns:
+        list: One message per regressed metric. Metrics missing from either side are ignored.
+    """
+    regressions = []
+    for metric, reference in sorted(baseline.items()):
+        value = results.get(metric)
+        if value is None:
+            continue
+        if metric.endswith(HIGHER_IS_BETTER):
+            regressed = value < reference * (1 - tolerance)
+        else:
+            allowed = reference * tolerance
+            if "_ms." in metric:
+                allowed = max(allowed, min_delta_ms)
+            regressed = value > reference + allowed
+        if regressed:
+            regressions.append(f"{metric}: {value:g} (baseline {reference:g})")
+    return regressions
+
+
+def load_commands(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def timed(func: Callable, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+# --- Suites ---
+def bench_planning(commands: List[str]) -> Dict[str, float]:
+    """Blocking and streamed planning through the model, without local shortcuts or caches."""
+    from src.nlu.interpreter import default_llm_plugin
+    from src.nlu.json_repair import get_parse_stats
+
+    get_parse_stats().reset()
+    blocking, first_action, streamed, failures = [], [], [], 0
+    for command in commands:
+        seconds, plan = timed(default_llm_plugin.plan_command, command)
+        blocking.append(seconds)
+        failures += not (plan and plan.get("actions"))
+
+        start = time.perf_counter()
+        first = None
+        for _ in default_llm_plugin.stream_plan_command(command):
+            if first is None:
+                first = time.perf_counter() - start
+        streamed.append(time.perf_counter() - start)
+        if first is None:
+            failures += 1
+        else:
+            first_action.append(first)
+
+    metrics = {"planning.failures": failures}
+    parse = get_parse_stats().summary()
+    metrics["planning.parse_success_rate"] = parse["success_rate"]
+    metrics["planning.parse_repairs"] = parse["repaired"]
+    metrics.update(percentiles(blocking, "planning.blocking"))
+    metrics.update(percentiles(first_action, "planning.first_action"))
+    metrics.update(percentiles(streamed, "planning.streamed"))
+    return metrics
+
+
+def bench_executor(desktop, corpus: Corpus, actions: int) -> Dict[str, float]:
+    """Runs a compiled plan repeatedly on the fake desktop."""
+    from src.executor.capture import get_capture
+    from src.executor.plan_compiler import compile_plan
+
+    plan = compile_plan((EXECUTOR_PLAN * (actions // len(EXECUTOR_PLAN) + 1))[:actions])
+    desktop.screen = corpus.screens[0]
+    get_capture().forget()
+    plan[0].run()  # Warm up: start vision workers and find the target once
+    desktop.reset()
+    durations, failures = [], 0
+    start = time.perf_counter()
+    for action in plan:
+        seconds, ok = timed(action.run)
+        durations.append(seconds)
+        failures += not ok
+    elapsed = time.perf_counter() - start
+
+    metrics = {
+        "executor.actions_per_second": round(len(plan) / elapsed, 1),
+        "executor.failures": failures,
+    }
+    metrics.update(percentiles(durations, "executor.action"))
+    return metrics
+
+
+def bench_locate(corpus: Corpus, repeat: int) -> Dict[str, float]:
+    """Cold (full search) and warm (around the last location) lookups on each screenshot."""
+    from src.executor.capture import ScreenCapture
+    from src.executor.environment import get_locator
+
+    locator = get_locator()
+    cold, warm, correct = [], [], 0
+    for screen, position in zip(corpus.screens, corpus.positions):
+        capture = ScreenCapture(grab=lambda: screen)
+        found = None
+        for _ in range(repeat):
+            locator.last_locations.clear()
+            capture.forget()
+            seconds, match = timed(capture.locate, corpus.target, locator)
+            cold.append(seconds)
+            capture.forget()
+            seconds, _ = timed(capture.locate, corpus.target, locator)
+            warm.append(seconds)
+            found = match[:2] if match else None
+        correct += found == position
+
+    metrics = {"locate.correct_rate": round(correct / len(corpus.screens), 3)}
+    metrics.update(percentiles(cold, "locate.cold"))
+    metrics.update(percentiles(warm, "locate.warm"))
+    return metrics
+
+
+def bench_e2e(desktop, corpus: Corpus, commands: List[str]) -> Dict[str, float]:
+    """Plans and executes commands through the session engine, as the --pipeline REPL does."""
+    from src.executor.capture import get_capture
+    from src.nlu.interpreter import remember_successful_plan
+    from src.session import SessionEngine
+
+    desktop.screen = corpus.screens[0]
+    get_capture().forget()
+
+    async def run():
+        engine = SessionEngine(learn=remember_successful_plan)
+        engine.start()
+        start = time.perf_counter()
+        futures = [engine.submit(command) for command in commands]
+        results = [await future for future in futures]
+        elapsed = time.perf_counter() - start
+        await engine.stop()
+        return results, elapsed
+
+    results, elapsed = asyncio.run(run())
+    metrics = {
+        "e2e.commands_per_second": round(len(results) / elapsed, 2),
+        "e2e.failures": sum(1 for result in results if not result.success),
+    }
+    metrics.update(percentiles([sum(result.timings.values()) for result in results], "e2e.command"))
+    return metrics
+
+
+def run_suites(args, corpus: Corpus) -> Dict[str, float]:
+    """Starts the mock API and the fake desktop, then runs the selected suites."""
+    from .fake_desktop import install
+
+    desktop = install(corpus.screens[0])
+
+    from src.executor import action_mapper  # noqa: F401 (registers the action plugins)
+    from src.executor.environment import get_locator
+    from src.nlu import transport
+
+    get_locator().add_template(corpus.target, corpus.template)
+
+    commands = load_commands(args.commands)
+    metrics: Dict[str, float] = {}
+    with MockOllama(args.latency, args.tokens_per_second, args.chunk_tokens) as mock:
+        transport._default_transport = transport.LLMTransport(url=mock.url, max_retries=0)
+        if "planning" in args.suites:
+            metrics.update(bench_planning(commands[: args.planning_commands]))
+        if "executor" in args.suites:
+            metrics.update(bench_executor(desktop, corpus, args.executor_actions))
+        if "locate" in args.suites:
+            metrics.update(bench_locate(corpus, args.repeat))
+        if "e2e" in args.suites:
+            metrics.update(bench_e2e(desktop, corpus, commands))
+        metrics["mock.requests"] = len(mock.requests)
+    return metrics
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Comma-separated subset of {', '.join(SUITES)}")
+    parser.add_argument("--commands", default=DEFAULT_COMMANDS, help="File with one command per line")
+    parser.add_argument("--planning-commands", type=int, default=10, help="Commands used for the planning suite")
+    parser.add_argument("--executor-actions", type=int, default=200, help="Actions run by the executor suite")
+    parser.add_argument("--screens", help="Recorded screenshot corpus (see benchmarks.screens)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock API seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0, help="Mock API generation speed")
+    parser.add_argument("--chunk-tokens", type=int, default=1, help="Tokens per streamed line")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument(
+        "--min-delta-ms", type=float, default=5.0, help="Latency growth always allowed, for timer noise"
+    )
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--output", help="Write the metrics of this run to a JSON file")
+    args = parser.parse_args(argv)
+    args.suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"Unknown suites: {', '.join(sorted(unknown))}")
+    args.commands = os.path.abspath(args.commands)
+    args.baseline = os.path.abspath(args.baseline)
+    args.output = os.path.abspath(args.output) if args.output else None
+
+    corpus = load_corpus(args.screens) if args.screens else synthetic_corpus()
+
+    # Caches, the similarity index and template paths are relative to the
+    # working directory, so run in an empty one
+    repository = os.path.dirname(BENCHMARK_DIR)
+    if repository not in sys.path:
+        sys.path.insert(0, repository)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            metrics = run_suites(args, corpus)
+        finally:
+            os.chdir(cwd)
+
+    width = max(len(metric) for metric in metrics)
+    for metric, value in sorted(metrics.items()):
+        print(f"{metric:<{width}}  {value:g}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(metrics, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(metrics, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(metrics, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f"\nRegressions beyond {args.tolerance:.0%} of the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\nNo regressions beyond {args.tolerance:.0%} of the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
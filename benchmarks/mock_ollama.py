@@ -0,0 +1,234 @@
+# mock_ollama.py
+
+"""
+Local stand-in for the Ollama /api/chat endpoint, so planning can be
+benchmarked and tested without a model.
+
+Usage:
+    python -m benchmarks.mock_ollama [--port 11434] [--latency 0.2] [--tokens-per-second 40]
+
+Each response waits `latency` seconds (time to first token), then produces
+tokens at `tokens_per_second`. Streaming requests receive one JSON line per
+chunk of `chunk_tokens` tokens as they are "generated", like Ollama does.
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+# Roughly how a Llama tokenizer splits JSON text: short word pieces,
+# punctuation and whitespace
+_TOKEN = re.compile(r"\s*(?:\w{1,4}|[^\w\s])")
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits text into token-sized pieces that join back to the original."""
+    tokens = _TOKEN.findall(text)
+    rest = len("".join(tokens))
+    if rest < len(text):
+        tokens.append(text[rest:])
+    return tokens
+
+
+def command_of(messages: List[Dict[str, Any]]) -> str:
+    """Returns the command a prompt asks about: the user message, or the task of a decomposition prompt."""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return message.get("content", "").strip()
+    content = messages[-1].get("content", "") if messages else ""
+    return content.rsplit("Task:", 1)[-1].strip()
+
+
+def generic_plan(command: str) -> List[Dict[str, Any]]:
+    """A plausible plan for any command: search for it in the browser."""
+    return [
+        {"action_type": "click", "parameters": {"target": "address bar"}},
+        {"action_type": "type_text", "parameters": {"text": command}},
+        {"action_type": "press_key", "parameters": {"key": "enter"}},
+    ]
+
+
+class PlanResponder:
+    """
+    Answers planning prompts with canned plans: the plan listed for the
+    command, or generic_plan(). Replies with a JSON object to interpretation
+    and fused planning prompts, and with a JSON array to decomposition prompts.
+
+    Args:
+        plans (dict, optional): Lower-cased command -> list of actions.
+    """
+
+    def __init__(self, plans: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        self.plans = {command.lower(): actions for command, actions in (plans or {}).items()}
+
+    def __call__(self, request: Dict[str, Any]) -> str:
+        messages = request.get("messages", [])
+        if not messages:
+            return ""  # A request that only loads the model
+        command = command_of(messages)
+        actions = self.plans.get(command.lower()) or generic_plan(command)
+        if "needs_decomposition" not in messages[0].get("content", ""):
+            return json.dumps(actions)
+        single = len(actions) == 1
+        plan = {
+            "intent": command,
+            "needs_decomposition": not single,
+            "action": actions[0] if single else None,
+            "actions": actions,
+        }
+        return json.dumps(plan)
+
+
+class MockOllama:
+    """
+    Threaded HTTP server answering /api/chat requests.
+
+    Args:
+        latency (float): Seconds before the first token.
+        tokens_per_second (float): Generation speed; 0 for instant responses.
+        chunk_tokens (int): Tokens per streamed line.
+        responder (callable, optional): Request body -> response text (defaults to PlanResponder()).
+        status (int): HTTP status to answer with, e.g. 503 to exercise retries.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        tokens_per_second: float = 0.0,
+        chunk_tokens: int = 1,
+        responder: Optional[Callable[[Dict[str, Any]], str]] = None,
+        status: int = 200,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.responder = responder or PlanResponder()
+        self.status = status
+        self.requests: List[Dict[str, Any]] = []
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/chat"
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client closed a kept-alive connection
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path != "/api/chat":
+                    self.send_error(404)
+                    return
+                request = json.loads(body or b"{}")
+                mock.requests.append(request)
+                if mock.status != 200:
+                    self._send_json(mock.status, {"error": "unavailable"})
+                    return
+                time.sleep(mock.latency)
+                tokens = tokenize(mock.responder(request))
+                model = request.get("model", "")
+                if request.get("stream", True):
+                    self._stream(model, tokens)
+                else:
+                    mock._pace(len(tokens))
+                    self._send_json(200, mock._chunk(model, "".join(tokens), True, len(tokens)))
+
+            def _send_json(self, status, data):
+                payload = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def _stream(self, model, tokens):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for start in range(0, len(tokens), mock.chunk_tokens):
+                        piece = tokens[start : start + mock.chunk_tokens]
+                        mock._pace(len(piece))
+                        line = mock._chunk(model, "".join(piece), False)
+                        self._write_chunk(json.dumps(line).encode() + b"\n")
+                    self._write_chunk(json.dumps(mock._chunk(model, "", True, len(tokens))).encode() + b"\n")
+                    self._write_chunk(b"")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client stopped reading
+
+        return Handler
+
+    def _pace(self, tokens: int) -> None:
+        if self.tokens_per_second > 0:
+            time.sleep(tokens / self.tokens_per_second)
+
+    @staticmethod
+    def _chunk(model: str, content: str, done: bool, eval_count: int = 0) -> Dict[str, Any]:
+        chunk = {"model": model, "message": {"role": "assistant", "content": content}, "done": done}
+        if done:
+            chunk["eval_count"] = eval_count
+        return chunk
+
+    def start(self) -> "MockOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockOllama":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--chunk-tokens", type=int, default=1, help="Tokens per streamed line")
+    args = parser.parse_args()
+
+    mock = MockOllama(args.latency, args.tokens_per_second, args.chunk_tokens, host=args.host, port=args.port)
+    print(f"Mock Llama API listening on {mock.url}")
+    try:
+        mock._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
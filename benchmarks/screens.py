@@ -0,0 +1,115 @@
+# screens.py
+
+"""
+Screenshot corpus for the vision benchmarks.
+
+A corpus is a directory of PNG screenshots with a manifest.json describing the
+target looked for and where it is on each screenshot:
+
+    {
+        "target": "address bar",
+        "template": "address_bar.png",
+        "screens": {"0001.png": [x, y], "0002.png": null}
+    }
+
+A null position means the target is not on that screenshot. Record a corpus
+from the real screen with:
+
+    python -m benchmarks.screens DIR --template images/address_bar.png [--count 20] [--interval 2]
+
+Without a corpus, synthetic UI-like screenshots are generated with a fixed seed.
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+MANIFEST = "manifest.json"
+
+
+class Corpus(NamedTuple):
+    target: str
+    template: np.ndarray
+    screens: List[np.ndarray]
+    positions: List[Optional[Tuple[int, int]]]
+
+
+def synthetic_corpus(count: int = 4, width: int = 2560, height: int = 1440, seed: int = 0) -> Corpus:
+    """Generates UI-like screenshots with the "address bar" at a different position on each."""
+    from .bench_vision import synthetic_screens
+
+    screens, template, positions = synthetic_screens(count, width, height, seed)
+    return Corpus("address bar", template, screens, positions)
+
+
+def load_corpus(directory: str) -> Corpus:
+    """Loads a recorded corpus (see the module docstring for the layout)."""
+    with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    def read(name):
+        image = cv2.imread(os.path.join(directory, name), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise FileNotFoundError(f"Could not read '{os.path.join(directory, name)}'")
+        return image
+
+    names = sorted(manifest["screens"])
+    positions = [tuple(manifest["screens"][name]) if manifest["screens"][name] else None for name in names]
+    return Corpus(manifest["target"], read(manifest["template"]), [read(name) for name in names], positions)
+
+
+def record_corpus(directory: str, template_path: str, target: str, count: int, interval: float) -> Corpus:
+    """
+    Takes screenshots of the real screen and writes them as a corpus. The
+    target's position on each one is found with a full-resolution scan, so
+    check the manifest before relying on it.
+    """
+    import pyautogui
+
+    from src.executor.vision import to_gray
+
+    os.makedirs(directory, exist_ok=True)
+    template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
+    if template is None:
+        raise FileNotFoundError(f"Could not read template image '{template_path}'")
+    template_name = os.path.basename(template_path)
+    cv2.imwrite(os.path.join(directory, template_name), template)
+
+    manifest = {"target": target, "template": template_name, "screens": {}}
+    screens, positions = [], []
+    for index in range(count):
+        screen = to_gray(pyautogui.screenshot())
+        _, score, _, location = cv2.minMaxLoc(cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED))
+        position = tuple(location) if score >= 0.9 else None
+        name = f"{index + 1:04d}.png"
+        cv2.imwrite(os.path.join(directory, name), screen)
+        manifest["screens"][name] = list(position) if position else None
+        screens.append(screen)
+        positions.append(position)
+        print(f"{name}: target {'at ' + str(position) if position else 'not found'}")
+        if index + 1 < count:
+            time.sleep(interval)
+
+    with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return Corpus(target, template, screens, positions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Records a screenshot corpus for the vision benchmarks")
+    parser.add_argument("directory")
+    parser.add_argument("--template", required=True, help="Template PNG of the target")
+    parser.add_argument("--target", default="address bar", help="Target description")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between screenshots")
+    args = parser.parse_args()
+    record_corpus(args.directory, args.template, args.target, args.count, args.interval)
+
+
+if __name__ == "__main__":
+    main()
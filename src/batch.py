@@ -0,0 +1,271 @@
+# batch.py
+
+"""
+Headless batch runner.
+
+Reads commands from a JSONL file (or stdin), plans them in parallel, executes
+them in order (or only plans them with --plan-only) and appends one JSON result
+per command to the output file. The output doubles as a checkpoint: running the
+same batch again skips the commands that already have a result.
+
+Usage:
+    python -m src.batch commands.jsonl -o results.jsonl [--plan-only | --dry-run] [--concurrency 4]
+    cat commands.txt | python -m src.batch - -o results.jsonl
+
+Input lines are either JSON objects with a "command" (and an optional "id"),
+JSON strings, or plain text commands. Commands without an id are identified by
+their line number.
+
+With --dry-run, the commands execute against one simulated desktop (see
+src/executor/backends.py), which catches plans that would fail on a real one,
+e.g. clicks on targets of windows that are not open yet.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set, TextIO, Tuple
+
+from src.config import LLAMA_MAX_IN_FLIGHT, SIMULATED_LAYOUT_PATH, SIMULATED_SCREEN_PATH
+from src.nlu.interpreter import forget_plan, remember_successful_plan
+from src.nlu.json_repair import get_parse_stats
+from src.session import CommandResult, SessionEngine, plan_and_compile
+from src.utils.logger import setup_logger
+
+BatchItem = Tuple[str, str]  # id, command
+
+
+def read_commands(lines: Iterable[str]) -> Iterator[BatchItem]:
+    """
+    Parses batch input lines into (id, command) pairs, skipping blank lines
+    and "#" comments.
+    """
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        item_id, command = str(number), line
+        if line[0] in "{\"":
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                data = line
+            if isinstance(data, dict):
+                command = data.get("command", "")
+                item_id = str(data.get("id", number))
+            elif isinstance(data, str):
+                command = data
+        if not isinstance(command, str) or not command.strip():
+            logging.warning("Skipping line %s: no command", number)
+            continue
+        yield item_id, command.strip()
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """
+    Returns the ids of the commands that already have a result in the output
+    file. A line truncated by a crash is ignored, so its command runs again.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(str(json.loads(line)["id"]))
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+    return done
+
+
+class ResultWriter:
+    """Appends results to the output as JSON lines, flushing each one to disk."""
+
+    def __init__(self, stream: TextIO, sync: bool = True):
+        self.stream = stream
+        self.sync = sync
+
+    def write(self, item_id: str, result: CommandResult) -> None:
+        record = {
+            "id": item_id,
+            "command": result.command,
+            "correlation_id": result.correlation_id,
+            "success": result.success,
+            "executed": result.executed,
+            "replans": result.replans,
+            "error": result.error,
+            "plan": result.plan,
+            "timings": {stage: round(seconds, 4) for stage, seconds in result.timings.items()},
+        }
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+        if self.sync and hasattr(self.stream, "fileno"):
+            try:
+                os.fsync(self.stream.fileno())
+            except (OSError, ValueError):
+                pass
+
+
+class BatchStats:
+    """Counts outcomes and stage times for the throughput report."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.completed = 0
+        self.succeeded = 0
+        self.skipped = 0
+        self.stage_totals: Dict[str, float] = {}
+
+    def record(self, result: CommandResult) -> None:
+        self.completed += 1
+        self.succeeded += bool(result.success)
+        for stage, seconds in result.timings.items():
+            self.stage_totals[stage] = self.stage_totals.get(stage, 0.0) + seconds
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "completed": self.completed,
+            "succeeded": self.succeeded,
+            "failed": self.completed - self.succeeded,
+            "skipped": self.skipped,
+            "elapsed_seconds": round(elapsed, 3),
+            "commands_per_minute": round(60 * self.completed / elapsed, 2) if elapsed else 0.0,
+            "mean_stage_seconds": {
+                stage: round(total / self.completed, 4) for stage, total in self.stage_totals.items()
+            }
+            if self.completed
+            else {},
+            "model_responses": get_parse_stats().summary(),
+        }
+
+
+async def run_batch(
+    items: Iterable[BatchItem],
+    writer: ResultWriter,
+    planner: Callable[[str], Any] = plan_and_compile,
+    plan_only: bool = False,
+    concurrency: int = LLAMA_MAX_IN_FLIGHT,
+    done: Optional[Set[str]] = None,
+    window: Optional[int] = None,
+    learn: Optional[Callable[[str, Any], None]] = None,
+    forget: Optional[Callable[[str], Any]] = None,
+) -> BatchStats:
+    """
+    Plans commands in parallel and executes them in order, writing a result
+    for each one as it completes.
+
+    Args:
+        items (Iterable): (id, command) pairs.
+        writer (ResultWriter): Destination of the results.
+        planner (callable): Turns a command into compiled actions.
+        plan_only (bool): Only plan the commands, do not execute them.
+        concurrency (int): Maximum number of commands planned at once.
+        done (set, optional): Ids to skip because they already have a result.
+        window (int, optional): Maximum number of commands planned ahead of
+            execution (defaults to four times the concurrency), which bounds memory use.
+        learn (callable, optional): Called with each successfully executed command and its plan.
+        forget (callable, optional): Called with each command whose plan failed or had to be replanned.
+
+    Returns:
+        BatchStats: Outcome counts and timings.
+    """
+    done = done or set()
+    window = window or 4 * concurrency
+    stats = BatchStats()
+    engine = SessionEngine(planner, max_concurrent_plans=concurrency, execute=not plan_only, learn=learn, forget=forget)
+    engine.start()
+    pending: deque = deque()
+    try:
+        for item_id, command in items:
+            if item_id in done:
+                stats.skipped += 1
+                continue
+            done.add(item_id)
+            while len(pending) >= window:
+                await pending.popleft()
+            future = engine.submit(command)
+            future.add_done_callback(lambda f, item_id=item_id: _write(f, item_id, writer, stats))
+            pending.append(future)
+        await engine.drain()
+    finally:
+        await engine.stop()
+    return stats
+
+
+def _write(future: "asyncio.Future", item_id: str, writer: ResultWriter, stats: BatchStats) -> None:
+    if future.cancelled():
+        return
+    result = future.result()
+    if result.error == "Cancelled.":
+        # Interrupted commands get no result so that they run again on resume
+        return
+    writer.write(item_id, result)
+    stats.record(result)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a batch of commands without the interactive REPL.")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL file of commands, or - for stdin")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file the results are appended to")
+    parser.add_argument("--plan-only", action="store_true", help="Plan the commands without executing them")
+    parser.add_argument("--dry-run", action="store_true", help="Execute the commands on a simulated desktop")
+    parser.add_argument("--layout", default=SIMULATED_LAYOUT_PATH, help="Layout JSON of the simulated desktop (with --dry-run)")
+    parser.add_argument("--screen", default=SIMULATED_SCREEN_PATH, help="Screenshot to find targets on (with --dry-run)")
+    parser.add_argument("--concurrency", type=int, default=LLAMA_MAX_IN_FLIGHT, help="Commands planned at once")
+    parser.add_argument("--overwrite", action="store_true", help="Ignore existing results instead of resuming")
+    args = parser.parse_args(argv)
+
+    setup_logger()
+    # Plans are validated against the registered action plugins, even in plan-only mode
+    import src.executor.action_mapper  # noqa: F401  Registers the default action plugin
+
+    if args.dry_run:
+        from src.executor.backends import SimulatedBackend, set_backend
+
+        set_backend(SimulatedBackend.from_files(args.layout, args.screen))
+
+    if args.overwrite and os.path.exists(args.output):
+        os.remove(args.output)
+    done = load_checkpoint(args.output)
+    if done:
+        print(f"Resuming: {len(done)} command(s) already have results in {args.output}", file=sys.stderr)
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    with open(args.output, "a", encoding="utf-8") as output:
+        if output.tell():
+            # Make sure a line truncated by a crash does not swallow the next result
+            with open(args.output, "rb") as existing:
+                existing.seek(-1, os.SEEK_END)
+                if existing.read(1) != b"\n":
+                    output.write("\n")
+        try:
+            stats = asyncio.run(
+                run_batch(
+                    read_commands(source),
+                    ResultWriter(output),
+                    plan_only=args.plan_only,
+                    concurrency=args.concurrency,
+                    done=done,
+                    learn=None if args.dry_run else remember_successful_plan,
+                    forget=None if args.dry_run else forget_plan,
+                )
+            )
+        except KeyboardInterrupt:
+            print("\nInterrupted. Run the same command again to resume.", file=sys.stderr)
+            return 130
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+    print(json.dumps(stats.summary(), indent=2), file=sys.stderr)
+    return 0 if stats.completed == stats.succeeded else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# client.py
+
+import argparse
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, urlencode
+
+from src.config import DAEMON_URL, DAEMON_CLIENT_TIMEOUT, DAEMON_MAX_WAIT, DAEMON_TOKEN_PATH, LLAMA_READ_TIMEOUT
+
+# Command states that will not change any more
+FINISHED = ("done", "failed", "cancelled")
+
+
+class DaemonError(Exception):
+    """Raised when the daemon cannot be reached or rejects a request."""
+
+
+def read_token(path: str = DAEMON_TOKEN_PATH) -> Optional[str]:
+    """Returns the daemon's API token, or None if the daemon has not created it yet."""
+    try:
+        with open(os.path.expanduser(path), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+class DaemonClient:
+    """
+    Talks to the automation daemon (src/daemon.py). Only uses the standard
+    library, so that clients start without importing pyautogui, cv2 or
+    requests.
+
+    Args:
+        url (str): Base URL of the daemon.
+        timeout (float): Seconds to wait for a response (planning waits for the model as well).
+        token (str, optional): API token. Defaults to the one in DAEMON_TOKEN_PATH.
+    """
+
+    def __init__(self, url: str = DAEMON_URL, timeout: float = DAEMON_CLIENT_TIMEOUT, token: Optional[str] = None):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.token = token
+
+    def _request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method)
+        request.add_header("Content-Type", "application/json")
+        # Read on every request, since the daemon may have been started after this client
+        token = self.token or read_token()
+        if token:
+            request.add_header("Authorization", f"Bearer {token}")
+        try:
+            with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+                return json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            raise DaemonError(f"{method} {path} failed ({e.code}): {message}") from e
+        except (urllib.error.URLError, OSError) as e:
+            raise DaemonError(f"Could not reach the daemon at {self.url}: {e}") from e
+
+    def available(self) -> bool:
+        """Returns True if the daemon is running."""
+        try:
+            self._request("GET", "/health", timeout=min(self.timeout, 1.0))
+            return True
+        except DaemonError:
+            return False
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health")
+
+    def plan(self, command: str, correlation_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Plans a command without running it.
+
+        Returns:
+            dict: The plan preview: "id", "interpretation", "actions" (as they
+            would run), "errors" and "optimization".
+        """
+        body = {"command": command}
+        if correlation_id:
+            body["id"] = correlation_id
+        return self._request("POST", "/plan", body, timeout=self.timeout + LLAMA_READ_TIMEOUT)
+
+    def submit(self, command: str, actions: Optional[List[Dict[str, Any]]] = None, correlation_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queues a command. The daemon plans it unless `actions` (e.g. an
+        approved preview) are given, and runs it after the commands queued before it.
+
+        Returns:
+            dict: The status of the command, with its "id".
+        """
+        body: Dict[str, Any] = {"command": command}
+        if actions is not None:
+            body["actions"] = actions
+        if correlation_id:
+            body["id"] = correlation_id
+        return self._request("POST", "/commands", body)
+
+    def status(self, job_id: str, wait: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Returns the status of a command: "state", "error", "actions" and
+        their "statuses". With `wait`, first waits up to that many seconds for
+        the command to finish.
+        """
+        path = f"/commands/{quote(job_id)}"
+        if wait:
+            wait = min(wait, DAEMON_MAX_WAIT)
+            return self._request("GET", f"{path}?wait={wait}", timeout=self.timeout + wait)
+        return self._request("GET", path)
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        """Cancels a command: skips the actions that have not started."""
+        return self._request("POST", f"/commands/{quote(job_id)}/cancel")
+
+    def logs(self, since: int = 0, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Returns the daemon's log lines after sequence number `since`
+        (optionally only those of one command) as "lines", and the
+        "sequence" to pass next time.
+        """
+        query = {"since": since}
+        if job_id:
+            query["id"] = job_id
+        return self._request("GET", "/logs?" + urlencode(query))
+
+
+def run_command(client: DaemonClient, command: str, poll: float = 1.0) -> Dict[str, Any]:
+    """
+    Runs a command on the daemon, printing its log lines as they arrive.
+
+    Returns:
+        dict: The final status of the command.
+    """
+    status = client.submit(command)
+    job_id, sequence = status["id"], 0
+    while True:
+        status = client.status(job_id, wait=poll)
+        logs = client.logs(sequence, job_id)
+        sequence = logs["sequence"]
+        for line in logs["lines"]:
+            print(line)
+        if status["state"] in FINISHED:
+            return status
+
+
+def refuse_local_command(command: str) -> bool:
+    """
+    Prints why a ':' command (macros, the plan cache) cannot be sent to the
+    daemon and returns True, so that it never reaches the model as a command.
+    """
+    if not command.startswith(":"):
+        return False
+    print(f"'{command.split()[0]}' only works in the REPL: python -m src.main --no-daemon")
+    return True
+
+
+def report(status: Dict[str, Any]) -> None:
+    if status["state"] == "done":
+        print("All actions executed.")
+    elif status["state"] == "cancelled":
+        print("Cancelled.")
+    else:
+        print(status.get("error") or "Failed to execute the command.")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Send commands to the automation daemon (python -m src.daemon)")
+    parser.add_argument("commands", nargs="*", help="Commands to run; without any, read them from the prompt")
+    parser.add_argument("--url", default=DAEMON_URL, help=f"Daemon URL (default: {DAEMON_URL})")
+    args = parser.parse_args(argv)
+    client = DaemonClient(args.url)
+    if not client.available():
+        print(f"The daemon is not running at {client.url}. Start it with: python -m src.daemon")
+        return 1
+
+    if args.commands:
+        failed = 0
+        for command in args.commands:
+            if refuse_local_command(command):
+                failed += 1
+                continue
+            status = run_command(client, command)
+            report(status)
+            failed += status["state"] != "done"
+        return 1 if failed else 0
+
+    print("Connected to the automation daemon. Type 'exit' to quit.\n")
+    while True:
+        try:
+            command = input("Enter a command: ")
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        if command.lower() in ["exit", "quit"]:
+            break
+        if not command.strip() or refuse_local_command(command):
+            continue
+        try:
+            report(run_command(client, command))
+        except DaemonError as e:
+            print(e)
+        except KeyboardInterrupt:
+            print("\nStopped waiting; the command keeps running in the daemon.")
+    print("Goodbye!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,2 +1,178 @@
 LLAMA_API_URL = "http://localhost:11434/api/chat"
 LLAMA_MODEL_NAME = "llama3:70b-instruct"
+# Stream decompositions so that execution starts before generation finishes
+LLAMA_STREAM = True
+# Interpret and decompose a command in a single model call
+LLAMA_FUSED_PLANNING = True
+# Constrain responses to a JSON schema built from the registered actions
+# (Ollama's "format" option; needs Ollama 0.5 or later)
+LLAMA_SCHEMA_FORMAT = True
+# How long Ollama keeps the model loaded after each request (Ollama duration)
+LLAMA_KEEP_ALIVE = "30m"
+
+# LLM transport settings (timeouts in seconds)
+LLAMA_CONNECT_TIMEOUT = 5.0
+LLAMA_READ_TIMEOUT = 120.0
+LLAMA_MAX_RETRIES = 2
+LLAMA_RETRY_BACKOFF = 0.5
+LLAMA_RETRY_BACKOFF_MAX = 8.0
+LLAMA_MAX_IN_FLIGHT = 4
+LLAMA_POOL_SIZE = 8
+
+# Handle simple one-step commands locally without calling the model
+FAST_PATH_ENABLED = True
+# Applications "open <name>" may open without the model, besides the known
+# aliases and (on macOS) the installed applications; other names go to the model
+FAST_PATH_APPLICATIONS = ()
+
+# Reuse the plans of similar, previously executed commands (paraphrases and
+# commands that only differ in a slot value such as the search text)
+SIMILARITY_ENABLED = True
+SIMILARITY_INDEX_PATH = "similarity_index.jsonl"
+# Minimum cosine similarity of the hashed character n-gram vectors. Candidate
+# plans are also checked word by word before reuse, so this can stay low.
+SIMILARITY_THRESHOLD = 0.4
+SIMILARITY_TOP_K = 5
+SIMILARITY_DIMENSIONS = 2 ** 20
+# Upper bound on the postings scanned per lookup
+SIMILARITY_CANDIDATE_BUDGET = 5000
+
+# Plan cache settings
+PLAN_CACHE_ENABLED = True
+PLAN_CACHE_PATH = "plan_cache.db"
+PLAN_CACHE_MAX_ENTRIES = 1000
+PLAN_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Screen recognition settings
+IMAGES_DIR = "images"
+# Map target descriptions to image file names in IMAGES_DIR
+TARGET_IMAGE_MAP = {
+    "address bar": "address_bar.png",
+    # Add more mappings as needed
+}
+MATCH_CONFIDENCE = 0.8
+# Number of halvings used for the coarse search
+MATCH_PYRAMID_LEVELS = 2
+# Template scale factors to try, e.g. (1.0, 0.5) for templates captured on a Retina display
+MATCH_TEMPLATE_SCALES = (1.0,)
+# Pixels searched around a target's last known location before a full search
+MATCH_ROI_MARGIN = 64
+# Run template matching in worker processes that keep the templates loaded.
+# A search is split into horizontal bands across the workers.
+VISION_POOL_ENABLED = True
+# Worker processes (None: one per CPU core)
+VISION_WORKERS = None
+# Bands are never smaller than this many pixels, as each one costs a task
+VISION_MIN_BAND_HEIGHT = 256
+
+# OCR settings: targets without a template image are located by their text.
+# The screen is read in overlapping tiles and only changed tiles are read again.
+OCR_ENABLED = True
+OCR_TILE_WIDTH = 640
+OCR_TILE_HEIGHT = 320
+OCR_TILE_OVERLAP = 32
+OCR_MIN_CONFIDENCE = 60
+# Minimum similarity (0-1) between the requested and the recognized text
+OCR_MIN_SIMILARITY = 0.8
+# Page segmentation mode 11 finds sparse text, as on a desktop
+OCR_TESSERACT_CONFIG = "--psm 11"
+
+# Screen capture settings: change detection works on square tiles of this many
+# pixels, and pixels differing by more than the threshold count as changed
+CAPTURE_TILE_SIZE = 64
+CAPTURE_DIFF_THRESHOLD = 8
+
+# Event-driven wait settings (seconds)
+WAIT_DEFAULT_TIMEOUT = 10.0
+WAIT_POLL_INTERVAL = 0.05
+WAIT_POLL_MAX_INTERVAL = 0.5
+
+# Executor backend: "pyautogui" drives the real mouse and keyboard,
+# "simulated" runs plans on an in-memory desktop (python -m src.main --dry-run)
+EXECUTOR_BACKEND = "pyautogui"
+# Declared layout (JSON) and recorded screenshot of the simulated desktop
+SIMULATED_LAYOUT_PATH = None
+SIMULATED_SCREEN_PATH = None
+SIMULATED_SCREEN_SIZE = (1920, 1080)
+
+# Text entry settings. Modes: "paste" (via the clipboard), "burst" (no delay
+# between keystrokes), "paced" (TEXT_ENTRY_INTERVAL between keystrokes) or
+# "adaptive" (paste long, multi-line or non-ASCII text, burst the rest)
+TEXT_ENTRY_MODE = "adaptive"
+# Per-application overrides, keyed by lowercase application name
+TEXT_ENTRY_APP_MODES = {
+    # "terminal": "paced",
+}
+TEXT_ENTRY_INTERVAL = 0.05
+TEXT_PASTE_MIN_LENGTH = 32
+TEXT_PASTE_RESTORE_DELAY = 0.1
+
+# Plan optimizer: rewrite rules applied to every plan before it runs. The
+# default rules are exact (the optimized plan does the same as the original);
+# "combo_keys_to_hotkey" and "skip_address_bar_click" are opt-in
+PLAN_OPTIMIZER_ENABLED = True
+PLAN_OPTIMIZER_RULES = ("merge_waits", "merge_type_text", "merge_key_presses")
+# Browsers that focus the address bar when opened (for "skip_address_bar_click")
+PLAN_OPTIMIZER_BROWSERS = ("safari", "google chrome", "chrome", "firefox", "arc", "microsoft edge", "brave browser")
+# Estimated seconds per action, for the optimizer's cost report
+PLAN_COST_ACTION_OVERHEAD = 0.1
+PLAN_COST_LOOKUP = 0.3
+PLAN_COST_OPEN_APPLICATION = 1.0
+PLAN_COST_CONDITION_WAIT = 1.0
+PLAN_COST_KEY_PRESS = 0.01
+
+# Recovery from failed actions: the actions that remain after a failure are
+# replanned (given the ones that succeeded) and execution resumes from there,
+# at most RECOVERY_MAX_REPLANS times per command. The screen and context at
+# each failure are saved to RECOVERY_SNAPSHOT_DIR when it is set.
+RECOVERY_ENABLED = True
+RECOVERY_MAX_REPLANS = 2
+RECOVERY_SNAPSHOT_DIR = None
+
+# Recorded macros (replayed without calling the model)
+MACROS_PATH = "macros.json"
+
+# Profiling (python -m src.main --profile): spans kept for the Chrome trace,
+# span attributes that get their own row in the summary table, and the
+# default trace file
+TRACE_MAX_EVENTS = 100_000
+TRACE_SUMMARY_ATTRIBUTES = ("action_type", "cache", "parse", "source")
+PROFILE_TRACE_PATH = "profile_trace.json"
+
+# Logging: records are written by a background thread; the log file is
+# rotated at LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT old files. LOG_JSON
+# writes JSON lines carrying the correlation ID of each command.
+LOG_FILE = "app.log"
+LOG_LEVEL = "DEBUG"
+LOG_CONSOLE_LEVEL = "INFO"
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_JSON = False
+
+# Streamlit GUI (streamlit run src/gui_stub.py): log lines kept in memory and
+# how often (seconds) the page refreshes progress while work is running
+GUI_LOG_LINES = 2000
+GUI_POLL_INTERVAL = 0.5
+# Use the automation daemon when it is running, instead of planning and
+# executing inside the Streamlit process
+GUI_USE_DAEMON = True
+
+# Automation daemon (python -m src.daemon): keeps the model, the plugins and
+# the templates warm and runs the commands of its clients one at a time.
+# It only listens on localhost.
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+DAEMON_URL = f"http://{DAEMON_HOST}:{DAEMON_PORT}"
+# Finished commands kept for status queries
+DAEMON_MAX_JOBS = 200
+# Seconds between warm-up requests that keep the model loaded while idle
+DAEMON_KEEP_WARM_INTERVAL = 600.0
+# Longest a status request waits for a command to finish (seconds)
+DAEMON_MAX_WAIT = 30.0
+DAEMON_CLIENT_TIMEOUT = 5.0
+# Every request must carry the token in this file, which the daemon creates
+# readable only by its owner, so that other local users cannot send commands
+DAEMON_TOKEN_PATH = "~/.nl_automation/daemon_token"
+# python -m src.main sends its commands to the daemon when it is running, so
+# that two processes never drive the keyboard and mouse at once
+CLI_USE_DAEMON = True
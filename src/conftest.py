@@ -0,0 +1,25 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_plan_stores(tmp_path, monkeypatch):
+    """
+    Points the plan cache and the similarity index at temporary files, so that
+    plans from the mock model never reach the stores real runs read from.
+    """
+    from src.nlu import interpreter
+    from src.nlu.plan_cache import PlanCache
+    from src.nlu.similarity_index import SimilarityIndex, SimilarityLLMPlugin
+
+    index = SimilarityIndex(str(tmp_path / "similarity_index.jsonl"))
+    monkeypatch.setattr(interpreter, "similarity_index", index)
+    for plugin in interpreter.plugin_registry.llm_plugins:
+        if isinstance(plugin, SimilarityLLMPlugin):
+            monkeypatch.setattr(plugin, "index", index)
+    cache = None
+    if interpreter.plugin_registry.plan_cache is not None:
+        cache = PlanCache(str(tmp_path / "plan_cache.db"))
+        monkeypatch.setattr(interpreter.plugin_registry, "plan_cache", cache)
+    yield
+    if cache is not None:
+        cache.close()
@@ -0,0 +1,475 @@
+# daemon.py
+
+import argparse
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+from src.config import (
+    DAEMON_HOST,
+    DAEMON_PORT,
+    DAEMON_MAX_JOBS,
+    DAEMON_KEEP_WARM_INTERVAL,
+    DAEMON_MAX_WAIT,
+    DAEMON_TOKEN_PATH,
+    LOG_JSON,
+)
+from src.client import read_token
+from src.executor.plan_compiler import PlanValidationError, compile_plan
+from src.gui_worker import CANCELLED, DONE, FAILED, PENDING, GuiWorker, PlanRun
+from src.nlu.interpreter import forget_plan, remember_successful_plan, warm_up_model
+from src.plugins import PluginRegistry, plugin_registry
+from src.session import preview_plan
+from src.utils.logger import correlation_scope, new_correlation_id, setup_logger
+
+
+class JobConflict(Exception):
+    """Raised when a command is submitted with the id of a command that has not finished."""
+
+
+def is_loopback(host: str) -> bool:
+    """Returns True if the address only accepts connections from this machine."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def load_token(path: str = DAEMON_TOKEN_PATH) -> str:
+    """Returns the API token, creating the token file (readable only by its owner) on first use."""
+    path = os.path.expanduser(path)
+    token = read_token(path)
+    if token:
+        os.chmod(path, 0o600)
+        return token
+    os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+    token = secrets.token_urlsafe(32)
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+        f.write(token)
+    return token
+
+
+class Job:
+    """
+    A command queued on the daemon. It is planned as soon as it arrives
+    (unless its actions were sent along) and runs once every command queued
+    before it has finished.
+    """
+
+    def __init__(self, job_id: str, command: str, planning: Optional[Future] = None, actions: Optional[List[Dict[str, Any]]] = None):
+        self.id = job_id
+        self.command = command
+        self.planning = planning
+        self.actions = actions
+        self.run: Optional[PlanRun] = None
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+        if self.run is not None:
+            self.run.cancel()
+
+    def finish(self, state: str, error: Optional[str] = None) -> None:
+        self.state = state
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The job's status as sent to clients."""
+        status: Dict[str, Any] = {"id": self.id, "command": self.command, "state": self.state, "error": self.error}
+        run = self.run
+        if run is not None:
+            status["actions"] = [action.to_dict() for action in run.actions]
+            status["statuses"] = list(run.statuses)
+            if not self.done:
+                status["state"] = run.state
+        return status
+
+
+class AutomationDaemon:
+    """
+    Keeps everything a command needs warm in one long-running process (the
+    imported executor, the registered plugins, the loaded templates and the
+    model on the Ollama side) and serves commands over a localhost HTTP API.
+    Commands from any number of clients are planned concurrently and executed
+    one at a time, in the order they arrived, since there is only one keyboard
+    and mouse.
+
+    Endpoints (JSON):
+        GET  /health                    Status and queue length.
+        POST /plan                      {"command"}: plan without running (a preview).
+        POST /commands                  {"command", "actions"?, "id"?}: queue a command,
+                                        or a plan (e.g. an approved preview).
+        GET  /commands/<id>?wait=S      Status of a command, waiting up to S seconds for it to finish.
+        POST /commands/<id>/cancel      Skip its remaining actions.
+        GET  /logs?since=N&id=<id>      Log lines after sequence number N.
+
+    Whoever can send it commands can type and click on this desktop, so the
+    daemon only listens on loopback addresses and every request must carry
+    the token from DAEMON_TOKEN_PATH. Requests from web pages are refused:
+    those with an Origin header or a Host other than a loopback address (DNS
+    rebinding), and POST bodies other than application/json, which browsers
+    only send cross-site after a preflight this server never answers.
+
+    Args:
+        host (str): Loopback address to listen on.
+        port (int): Port to listen on (0 picks a free one).
+        worker (GuiWorker, optional): Plans and executes commands. Defaults to a new GuiWorker.
+        registry (PluginRegistry): Registry used to compile plans.
+        learn (callable, optional): Called with the command and the actions that ran after it finished.
+        forget (callable, optional): Called with the command after its plan failed or needed a replan.
+        token (str, optional): API token. Defaults to the one in DAEMON_TOKEN_PATH, created if needed.
+    """
+
+    def __init__(
+        self,
+        host: str = DAEMON_HOST,
+        port: int = DAEMON_PORT,
+        worker: Optional[GuiWorker] = None,
+        registry: PluginRegistry = plugin_registry,
+        learn=remember_successful_plan,
+        forget=forget_plan,
+        token: Optional[str] = None,
+    ):
+        if not is_loopback(host):
+            raise ValueError(f"The daemon only listens on loopback addresses, not '{host}'")
+        self.token = token or load_token()
+        self.worker = worker or GuiWorker()
+        self.registry = registry
+        self.learn = learn
+        self.forget = forget
+        self.started = time.time()
+        self.model_loaded = False
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._stopping = threading.Event()
+        self._dispatcher = threading.Thread(target=self._dispatch, name="daemon-dispatcher", daemon=True)
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._serving: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def warm_up(self) -> None:
+        """
+        Pays the startup costs once: imports the executor (pyautogui, cv2),
+        registers the default action plugin, loads the templates (and starts
+        the vision workers) and loads the model. Then keeps the model loaded.
+        """
+        start = time.perf_counter()
+        import src.executor.action_mapper  # noqa: F401  Registers the default action plugin
+        from src.executor.environment import get_locator
+
+        get_locator()
+        logging.info("Executor ready in %.2fs", time.perf_counter() - start)
+        start = time.perf_counter()
+        self.model_loaded = warm_up_model()
+        if self.model_loaded:
+            logging.info("Model loaded in %.2fs", time.perf_counter() - start)
+        threading.Thread(target=self._keep_warm, name="daemon-keep-warm", daemon=True).start()
+
+    def _keep_warm(self) -> None:
+        # Every request resets Ollama's keep-alive timer; these cover idle periods
+        while not self._stopping.wait(DAEMON_KEEP_WARM_INTERVAL):
+            self.model_loaded = warm_up_model()
+
+    def start(self) -> "AutomationDaemon":
+        """Serves requests on a background thread."""
+        self._dispatcher.start()
+        self.worker.attach()
+        self._serving = threading.Thread(target=self._server.serve_forever, name="daemon-http", daemon=True)
+        self._serving.start()
+        logging.info("Automation daemon listening on %s", self.url)
+        return self
+
+    def serve_forever(self) -> None:
+        """Serves requests until interrupted."""
+        self.start()
+        try:
+            while self._serving.is_alive():
+                self._serving.join(1.0)
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        """Stops accepting requests, cancels the queued commands and stops the workers."""
+        self._stopping.set()
+        self._server.shutdown()
+        self._server.server_close()
+        with self._jobs_lock:
+            for job in self._jobs.values():
+                job.cancel()
+        self._queue.put(None)
+        self.worker.close()
+
+    # --- Commands ---
+
+    def preview(self, command: str, correlation_id: Optional[str] = None) -> Dict[str, Any]:
+        """Plans a command without running it. Returns the preview_plan result, minus the compiled plan."""
+        correlation_id = correlation_id or new_correlation_id()
+        plan = self.worker.plan(command, correlation_id).result()
+        with correlation_scope(correlation_id):
+            preview = preview_plan(plan, self.registry)
+        preview.pop("compiled")
+        preview["id"] = correlation_id
+        return preview
+
+    def submit(self, command: str, actions: Optional[List[Dict[str, Any]]] = None, correlation_id: Optional[str] = None) -> Job:
+        """
+        Queues a command (with its actions, if it was already planned) and returns its Job.
+        The id may be that of a preview being approved, or of a finished command.
+
+        Raises:
+            JobConflict: If a command with the same id has not finished yet.
+        """
+        job_id = correlation_id or new_correlation_id()
+        with self._jobs_lock:
+            previous = self._jobs.get(job_id)
+            if previous is not None and not previous.done:
+                raise JobConflict(f"command '{job_id}' has not finished")
+            planning = self.worker.plan(command, job_id) if actions is None else None
+            job = Job(job_id, command, planning, actions)
+            self._jobs.pop(job_id, None)  # A rerun goes to the back of the eviction order
+            self._jobs[job_id] = job
+            self._evict()
+        self._queue.put(job)
+        return job
+
+    def job(self, job_id: str) -> Optional[Job]:
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def pending(self) -> int:
+        with self._jobs_lock:
+            return sum(not job.done for job in self._jobs.values())
+
+    def _evict(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[: max(0, len(self._jobs) - DAEMON_MAX_JOBS)]:
+            del self._jobs[job_id]
+
+    def _dispatch(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with correlation_scope(job.id):
+                try:
+                    self._run_job(job)
+                except Exception as e:
+                    logging.exception("Command failed: %s", job.command)
+                    job.finish(FAILED, str(e))
+
+    def _run_job(self, job: Job) -> None:
+        if job.actions is not None:
+            try:
+                compiled = compile_plan(job.actions, self.registry)
+            except PlanValidationError as e:
+                job.finish(FAILED, f"Plan rejected before execution: {e}")
+                return
+        else:
+            preview = preview_plan(job.planning.result(), self.registry)
+            if preview["errors"]:
+                job.finish(FAILED, "; ".join(preview["errors"]))
+                return
+            compiled = preview["compiled"]
+        if job._cancelled.is_set():
+            job.finish(CANCELLED)
+            return
+        # The worker runs one plan at a time; waiting here keeps the commands in
+        # order. A plan the daemon made itself is replanned after a failure, like
+        # in the REPL; an approved plan is not, so nothing runs unapproved.
+        job.run = self.worker.execute(compiled, job.id, job.command if job.actions is None else None)
+        if job._cancelled.is_set():
+            job.run.cancel()
+        job.run.wait()
+        checkpoint = job.run.checkpoint
+        if job.command and checkpoint is not None:
+            if self.forget is not None and (checkpoint.replans or not (checkpoint.finished or checkpoint.cancelled)):
+                # The cached plan did not work as planned; plan the command afresh next time
+                self.forget(job.command)
+            if checkpoint.finished and self.learn is not None:
+                # Lets similar commands reuse the actions that worked without a model call
+                self.learn(job.command, checkpoint.completed)
+        job.finish(job.run.state, job.run.error)
+
+    # --- HTTP ---
+
+    def _handler(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logging.debug("%s %s", self.address_string(), format % args)
+
+            def _send(self, status: int, data: Dict[str, Any]) -> None:
+                payload = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if self.close_connection:
+                    self.send_header("Connection", "close")
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _refused(self, post: bool = False) -> bool:
+                """Answers and returns True unless the request comes from a local client with the token."""
+                status, error = 0, None
+                host = urlparse("//" + self.headers.get("Host", "")).hostname
+                if self.headers.get("Origin") is not None or not host or not is_loopback(host):
+                    status, error = 403, "requests from web pages are not accepted"
+                elif not hmac.compare_digest(
+                    self.headers.get("Authorization", "").encode("latin-1"), f"Bearer {daemon.token}".encode("latin-1")
+                ):
+                    status, error = 401, f"missing or wrong token (see {DAEMON_TOKEN_PATH})"
+                elif post and self.headers.get_content_type() != "application/json":
+                    status, error = 415, "the request body must be application/json"
+                if not status:
+                    return False
+                # The body is not read, so the connection cannot be reused
+                self.close_connection = True
+                self._send(status, {"error": error})
+                return True
+
+            def _body(self) -> Dict[str, Any]:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not isinstance(body, dict):
+                    raise ValueError("expected a JSON object")
+                return body
+
+            def do_GET(self):
+                if self._refused():
+                    return
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                parts = [unquote(part) for part in url.path.strip("/").split("/")]
+                if parts == ["health"]:
+                    self._send(
+                        200,
+                        {
+                            "status": "ok",
+                            "uptime": round(time.time() - daemon.started, 3),
+                            "pending": daemon.pending(),
+                            "model_loaded": daemon.model_loaded,
+                        },
+                    )
+                elif parts == ["logs"]:
+                    try:
+                        since = int(query.get("since", ["0"])[0])
+                    except ValueError:
+                        self._send(400, {"error": "'since' must be an integer"})
+                        return
+                    lines, sequence = daemon.worker.log.lines_since(since, query.get("id", [None])[0])
+                    self._send(200, {"lines": lines, "sequence": sequence})
+                elif len(parts) == 2 and parts[0] == "commands":
+                    job = daemon.job(parts[1])
+                    if job is None:
+                        self._send(404, {"error": f"unknown command '{parts[1]}'"})
+                        return
+                    try:
+                        wait = min(float(query.get("wait", ["0"])[0]), DAEMON_MAX_WAIT)
+                    except ValueError:
+                        self._send(400, {"error": "'wait' must be a number"})
+                        return
+                    if wait > 0:
+                        job.wait(wait)
+                    self._send(200, job.snapshot())
+                else:
+                    self._send(404, {"error": f"unknown path '{url.path}'"})
+
+            def do_POST(self):
+                if self._refused(post=True):
+                    return
+                path = urlparse(self.path).path
+                parts = [unquote(part) for part in path.strip("/").split("/")]
+                try:
+                    body = self._body()
+                except ValueError as e:
+                    self._send(400, {"error": f"invalid request body: {e}"})
+                    return
+                if parts in (["plan"], ["commands"]):
+                    command = body.get("command", "")
+                    actions = body.get("actions")
+                    # A command sent with its actions is only needed to learn the plan
+                    needs_command = actions is None or parts == ["plan"]
+                    if not isinstance(command, str) or (needs_command and not command.strip()):
+                        self._send(400, {"error": "'command' is required"})
+                    elif actions is not None and not isinstance(actions, list):
+                        self._send(400, {"error": "'actions' must be a list"})
+                    elif parts == ["plan"]:
+                        try:
+                            preview = daemon.preview(command, body.get("id"))
+                        except Exception as e:
+                            logging.exception("Planning failed: %s", command)
+                            self._send(500, {"error": f"Planning failed: {e}"})
+                            return
+                        self._send(200, preview)
+                    else:
+                        try:
+                            job = daemon.submit(command, actions, body.get("id"))
+                        except JobConflict as e:
+                            self._send(409, {"error": str(e)})
+                            return
+                        self._send(202, job.snapshot())
+                elif len(parts) == 3 and parts[0] == "commands" and parts[2] == "cancel":
+                    job = daemon.job(parts[1])
+                    if job is None:
+                        self._send(404, {"error": f"unknown command '{parts[1]}'"})
+                        return
+                    job.cancel()
+                    self._send(200, job.snapshot())
+                else:
+                    self._send(404, {"error": f"unknown path '{path}'"})
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Automation daemon: runs commands sent by python -m src.client and the GUI")
+    parser.add_argument("--host", default=DAEMON_HOST, help=f"Loopback address to listen on (default: {DAEMON_HOST})")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT, help=f"Port to listen on (default: {DAEMON_PORT})")
+    parser.add_argument("--log-json", action="store_true", default=LOG_JSON, help="Write the log file as JSON lines")
+    args = parser.parse_args()
+    if not is_loopback(args.host):
+        parser.error(f"--host must be a loopback address; the daemon drives this desktop (got '{args.host}')")
+    setup_logger(json_lines=args.log_json)
+    daemon = AutomationDaemon(args.host, args.port)
+    daemon.warm_up()
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        print("\nDaemon stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,73 +1,164 @@
 # action_mapper.py
 
-from src.plugins import ActionPlugin, plugin_registry
+from src.plugins import ActionPlugin, ParameterSpec, plugin_registry
 from .mouse_keyboard import (
     open_application,
     click_on_coordinates,
     type_text,
     press_key,
+    hotkey,
     wait_seconds,
 )
-from .environment import click_on_target  # Import from environment.py
+from .environment import (  # Import from environment.py
+    click_on_target,
+    wait_for_target,
+    wait_for_screen_stable,
+    wait_for_process,
+)
+from ..config import WAIT_DEFAULT_TIMEOUT
+from .capture import get_capture
 from ..utils.error_handler import handle_error
+from ..utils.tracing import span
 import logging
-import time
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List, Optional
+
+TEXT_ENTRY_MODES = ("paste", "burst", "paced", "adaptive")
 
 class DefaultActionPlugin(ActionPlugin):
+    PARAMETER_SCHEMAS: Dict[str, Dict[str, ParameterSpec]] = {
+        "open_application": {"application_name": ParameterSpec(str, required=True)},
+        "click": {"target": ParameterSpec(str, required=True)},
+        "type_text": {
+            "text": ParameterSpec(str, default=""),
+            "mode": ParameterSpec(str, choices=TEXT_ENTRY_MODES),
+        },
+        "press_key": {"key": ParameterSpec(str, default="enter"), "presses": ParameterSpec(int, default=1, minimum=1)},
+        # A key combination such as "command+l"
+        "hotkey": {"keys": ParameterSpec(str, required=True)},
+        "wait": {"duration": ParameterSpec(float, default=1, minimum=0)},
+        "wait_for_target": {
+            "target": ParameterSpec(str, required=True),
+            "timeout": ParameterSpec(float, default=WAIT_DEFAULT_TIMEOUT, minimum=0),
+        },
+        "wait_for_screen_stable": {"timeout": ParameterSpec(float, default=WAIT_DEFAULT_TIMEOUT, minimum=0)},
+        "wait_for_process": {
+            "process_name": ParameterSpec(str, required=True, aliases=("application_name",)),
+            "timeout": ParameterSpec(float, default=WAIT_DEFAULT_TIMEOUT, minimum=0),
+        },
+    }
+
+    def __init__(self):
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], bool]] = {
+            "open_application": self._open_application,
+            "click": self._click,
+            "type_text": self._type_text,
+            "press_key": self._press_key,
+            "hotkey": self._hotkey,
+            "wait": self._wait,
+            "wait_for_target": self._wait_for_target,
+            "wait_for_screen_stable": self._wait_for_screen_stable,
+            "wait_for_process": self._wait_for_process,
+        }
+
     def can_handle(self, action_type: str) -> bool:
-        return action_type in [
-            "open_application",
-            "click",
-            "type_text",
-            "press_key",
-            "wait",
-        ]
+        return action_type in self._handlers
+
+    def action_types(self) -> List[str]:
+        return list(self._handlers)
+
+    def parameter_schema(self, action_type: str) -> Optional[Dict[str, ParameterSpec]]:
+        return self.PARAMETER_SCHEMAS.get(action_type)
+
+    def get_handler(self, action_type: str) -> Callable[[Dict[str, Any]], bool]:
+        return self._handlers[action_type]
 
     def execute(self, action: Dict[str, Any]) -> bool:
         action_type = action.get("action_type")
         parameters = action.get("parameters", {})
+        handler = self._handlers.get(action_type)
+        if handler is None:
+            logging.error("Unknown action type: %s", action_type)
+            return False
         try:
-            if action_type == "open_application":
-                application_name = parameters.get("application_name")
-                if application_name:
-                    open_application(application_name)
-                    return True
-                else:
-                    logging.error("No application name provided for 'open_application'.")
-                    return False
-            elif action_type == "click":
-                target_description = parameters.get("target")
-                if target_description:
-                    success = click_on_target(target_description)
-                    return success
-                else:
-                    logging.error("No target description provided for 'click'.")
-                    return False
-            elif action_type == "type_text":
-                text = parameters.get("text", "")
-                type_text(text)
-                return True
-            elif action_type == "press_key":
-                key = parameters.get("key", "enter")
-                press_key(key)
-                return True
-            elif action_type == "wait":
-                duration = parameters.get("duration", 1)
-                wait_seconds(duration)
-                return True
-            else:
-                logging.error(f"Unknown action type: {action_type}")
-                return False
+            return handler(parameters)
         except Exception as e:
             handle_error(e)
             return False
 
+    def _open_application(self, parameters: Dict[str, Any]) -> bool:
+        application_name = parameters.get("application_name")
+        if application_name:
+            open_application(application_name)
+            return True
+        else:
+            logging.error("No application name provided for 'open_application'.")
+            return False
+
+    def _click(self, parameters: Dict[str, Any]) -> bool:
+        target_description = parameters.get("target")
+        if target_description:
+            success = click_on_target(target_description)
+            return success
+        else:
+            logging.error("No target description provided for 'click'.")
+            return False
+
+    def _type_text(self, parameters: Dict[str, Any]) -> bool:
+        text = parameters.get("text", "")
+        type_text(text, parameters.get("mode"))
+        return True
+
+    def _press_key(self, parameters: Dict[str, Any]) -> bool:
+        key = parameters.get("key", "enter")
+        press_key(key, parameters.get("presses", 1))
+        return True
+
+    def _hotkey(self, parameters: Dict[str, Any]) -> bool:
+        keys = [key.strip() for key in parameters.get("keys", "").split("+") if key.strip()]
+        if keys:
+            hotkey(keys)
+            return True
+        else:
+            logging.error("No keys provided for 'hotkey'.")
+            return False
+
+    def _wait(self, parameters: Dict[str, Any]) -> bool:
+        duration = parameters.get("duration", 1)
+        wait_seconds(duration)
+        return True
+
+    def _wait_for_target(self, parameters: Dict[str, Any]) -> bool:
+        target_description = parameters.get("target")
+        if target_description:
+            timeout = parameters.get("timeout", WAIT_DEFAULT_TIMEOUT)
+            return wait_for_target(target_description, timeout)
+        else:
+            logging.error("No target description provided for 'wait_for_target'.")
+            return False
+
+    def _wait_for_screen_stable(self, parameters: Dict[str, Any]) -> bool:
+        timeout = parameters.get("timeout", WAIT_DEFAULT_TIMEOUT)
+        return wait_for_screen_stable(timeout)
+
+    def _wait_for_process(self, parameters: Dict[str, Any]) -> bool:
+        process_name = parameters.get("process_name") or parameters.get("application_name")
+        if process_name:
+            timeout = parameters.get("timeout", WAIT_DEFAULT_TIMEOUT)
+            return wait_for_process(process_name, timeout)
+        else:
+            logging.error("No process name provided for 'wait_for_process'.")
+            return False
+
 # Register the default action plugin
 default_plugin = DefaultActionPlugin()
 plugin_registry.register_action_plugin(default_plugin)
 
 def execute_action(action: Dict[str, Any]) -> bool:
+    # Each action may change the screen, so lookups need a fresh frame
+    get_capture().begin_step()
     action_type = action.get("action_type")
     plugin = plugin_registry.get_action_plugin(action_type)
-    return plugin.execute(action)
+    with span("execute_action", action_type=action_type) as current:
+        success = plugin.execute(action)
+        current.set("success", success)
+        return success
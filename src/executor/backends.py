@@ -0,0 +1,524 @@
+# backends.py
+
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import (
+    EXECUTOR_BACKEND,
+    SIMULATED_LAYOUT_PATH,
+    SIMULATED_SCREEN_PATH,
+    SIMULATED_SCREEN_SIZE,
+    TEXT_PASTE_RESTORE_DELAY,
+)
+
+Rect = Tuple[int, int, int, int]  # x, y, width, height in screen coordinates
+
+_MODIFIERS = {"command", "cmd", "ctrl", "control"}
+
+
+class ExecutorBackend(ABC):
+    """
+    The device the executor drives: where input goes, where screenshots come
+    from, how applications are started and how time passes. Coordinates are
+    logical screen coordinates, as used by the mouse.
+    """
+
+    # Simulated backends run without a display, in simulated time
+    simulated = False
+
+    @abstractmethod
+    def size(self) -> Tuple[int, int]:
+        """Returns the width and height of the screen."""
+
+    @abstractmethod
+    def screenshot(self) -> np.ndarray:
+        """Returns the screen contents (RGB or grayscale)."""
+
+    @abstractmethod
+    def move_to(self, x: int, y: int) -> None:
+        pass
+
+    @abstractmethod
+    def click(self) -> None:
+        """Clicks at the mouse position."""
+
+    @abstractmethod
+    def write(self, text: str, interval: float = 0.0) -> None:
+        """Types the text, waiting `interval` seconds after each keystroke."""
+
+    @abstractmethod
+    def paste(self, text: str) -> None:
+        """Enters the text through the clipboard, leaving the clipboard as it was."""
+
+    @abstractmethod
+    def press(self, key: str, presses: int = 1) -> None:
+        pass
+
+    @abstractmethod
+    def hotkey(self, keys: List[str]) -> None:
+        """Presses a key combination, e.g. ["command", "l"]."""
+
+    @abstractmethod
+    def launch(self, application_name: str) -> None:
+        """Starts (or activates) an application."""
+
+    @abstractmethod
+    def is_process_running(self, process_name: str) -> bool:
+        pass
+
+    def wait(self, seconds: float) -> None:
+        """Waits for a "wait" action."""
+        self.sleep(seconds)
+
+    def monotonic(self) -> float:
+        """The clock that waits with a timeout are measured against."""
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        """Lets `seconds` pass on the backend's clock (between polls of a condition)."""
+        time.sleep(seconds)
+
+    def resolves(self, target_description: str) -> bool:
+        """
+        Whether the backend finds the target itself (find_target) instead of
+        screen recognition (templates or OCR) on its screenshots.
+        """
+        return False
+
+    def find_target(self, target_description: str) -> Optional[Tuple[int, int]]:
+        """Returns the center of a target the backend resolves, or None if it is not visible."""
+        return None
+
+
+class PyAutoGUIBackend(ExecutorBackend):
+    """
+    Drives the real mouse and keyboard through pyautogui and pyperclip. Both
+    are imported on first use, since pyautogui needs a display; plans can
+    be compiled, optimized and simulated without one.
+    """
+
+    def __init__(self):
+        self._pyautogui = None
+        self._pyperclip = None
+
+    @property
+    def pyautogui(self):
+        if self._pyautogui is None:
+            import pyautogui
+
+            self._pyautogui = pyautogui
+        return self._pyautogui
+
+    @property
+    def pyperclip(self):
+        if self._pyperclip is None:
+            import pyperclip
+
+            self._pyperclip = pyperclip
+        return self._pyperclip
+
+    def size(self) -> Tuple[int, int]:
+        size = self.pyautogui.size()
+        return size[0], size[1]
+
+    def screenshot(self) -> np.ndarray:
+        return self.pyautogui.screenshot()
+
+    def move_to(self, x: int, y: int) -> None:
+        self.pyautogui.moveTo(x, y)
+
+    def click(self) -> None:
+        self.pyautogui.click()
+
+    def write(self, text: str, interval: float = 0.0) -> None:
+        self.pyautogui.write(text, interval=interval)
+
+    def paste(self, text: str) -> None:
+        pyperclip = self.pyperclip
+        try:
+            previous = pyperclip.paste()
+        except pyperclip.PyperclipException:
+            previous = None
+        pyperclip.copy(text)
+        self.hotkey(["command" if sys.platform == "darwin" else "ctrl", "v"])
+        # The target application reads the clipboard asynchronously
+        self.wait(TEXT_PASTE_RESTORE_DELAY)
+        if previous is not None:
+            pyperclip.copy(previous)
+
+    def press(self, key: str, presses: int = 1) -> None:
+        self.pyautogui.press(key, presses=presses)
+
+    def hotkey(self, keys: List[str]) -> None:
+        self.pyautogui.hotkey(*keys)
+
+    def launch(self, application_name: str) -> None:
+        if sys.platform == "darwin":
+            # macOS command to open an application
+            subprocess.Popen(["open", "-a", application_name])
+        elif sys.platform == "win32":
+            # Windows command to open an application
+            os.startfile(application_name)
+        else:
+            # Linux command to open an application
+            subprocess.Popen([application_name])
+
+    def is_process_running(self, process_name: str) -> bool:
+        if sys.platform == "win32":
+            output = subprocess.run(
+                ["tasklist", "/FI", f"IMAGENAME eq {process_name}*"], capture_output=True, text=True
+            ).stdout
+            return process_name.lower() in output.lower()
+        # macOS and Linux
+        return subprocess.run(["pgrep", "-i", "-f", process_name], capture_output=True).returncode == 0
+
+
+class SimulatedWindow:
+    """An application window on the simulated desktop, with its targets and text fields."""
+
+    __slots__ = ("application", "ready_at", "targets", "focus", "buffers")
+
+    def __init__(self, application: str, ready_at: float, targets: Dict[str, Rect], focus: Optional[str]):
+        self.application = application
+        self.ready_at = ready_at
+        self.targets = targets
+        self.focus = focus
+        # Text typed into each target ("" for the window itself)
+        self.buffers: Dict[str, str] = {}
+
+
+class SimulatedBackend(ExecutorBackend):
+    """
+    An in-memory desktop for dry runs and offline plan validation: no display,
+    no real input and no real waiting. It models application windows (each
+    ready `launch_seconds` after it was opened), focus, click targets and the
+    text typed into each of them, on a clock that only moves when the plan
+    waits.
+
+    Targets are resolved against a declared layout. Without a layout, targets
+    are found on a recorded screen by the usual screen recognition. With
+    neither, every target is assumed to exist in the focused window, so that
+    plans can be checked for structure alone.
+
+    Layout (JSON):
+        {"size": [1920, 1080],
+         "applications": {"Google Chrome": {"aliases": ["chrome"], "launch_seconds": 1.0,
+                                            "focus": "address bar",
+                                            "targets": {"address bar": [100, 50, 800, 30]}}},
+         "targets": {"dock": [0, 1040, 1920, 40]}}
+
+    Args:
+        layout (dict, optional): The declared layout.
+        screen (ndarray, optional): A recorded screenshot.
+        size (tuple, optional): Screen width and height; defaults to the
+            layout's, the screen's or SIMULATED_SCREEN_SIZE.
+    """
+
+    simulated = True
+
+    def __init__(self, layout: Optional[Dict[str, Any]] = None, screen: Optional[np.ndarray] = None, size: Optional[Tuple[int, int]] = None):
+        self.layout = layout or {}
+        self.screen = screen
+        if size is None:
+            size = self.layout.get("size") or ((screen.shape[1], screen.shape[0]) if screen is not None else SIMULATED_SCREEN_SIZE)
+        self.width, self.height = int(size[0]), int(size[1])
+        self.permissive = layout is None and screen is None
+        self._applications: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        for name, spec in self.layout.get("applications", {}).items():
+            for alias in [name, *spec.get("aliases", ())]:
+                self._applications[alias.lower()] = (name, spec)
+        self._declared = {target.lower() for target in self.layout.get("targets", {})}
+        for _, spec in self._applications.values():
+            self._declared.update(target.lower() for target in spec.get("targets", {}))
+        self._lock = threading.RLock()
+        self.reset()
+
+    @classmethod
+    def from_files(cls, layout_path: Optional[str] = None, screen_path: Optional[str] = None) -> "SimulatedBackend":
+        """Creates a simulated desktop from a layout JSON file and/or a screenshot image."""
+        layout = screen = None
+        if layout_path:
+            with open(layout_path, "r", encoding="utf-8") as f:
+                layout = json.load(f)
+        if screen_path:
+            import cv2
+
+            screen = cv2.imread(screen_path, cv2.IMREAD_GRAYSCALE)
+            if screen is None:
+                raise ValueError(f"Could not read screenshot '{screen_path}'")
+        return cls(layout, screen)
+
+    def reset(self) -> None:
+        """Closes every window and restarts the clock."""
+        with self._lock:
+            self.clock = 0.0
+            # Bottom to top; the last window has the focus
+            self.windows: List[SimulatedWindow] = []
+            self.desktop_targets: Dict[str, Rect] = {
+                target.lower(): tuple(rect) for target, rect in self.layout.get("targets", {}).items()
+            }
+            self.position = (0, 0)
+            self.clipboard = ""
+            self.events: List[Tuple[float, str, Any]] = []
+            self.warnings: List[str] = []
+            self._select_all = False
+
+    # --- State ---
+
+    def _event(self, name: str, detail: Any) -> None:
+        self.events.append((round(self.clock, 3), name, detail))
+
+    def _warn(self, message: str) -> None:
+        self.warnings.append(message)
+        logging.warning("Simulation: %s", message)
+
+    def _ready(self, window: SimulatedWindow) -> bool:
+        return self.clock >= window.ready_at
+
+    @property
+    def focused(self) -> Optional[SimulatedWindow]:
+        """The window with the focus, if it has finished opening."""
+        for window in reversed(self.windows):
+            if self._ready(window):
+                return window
+        return None
+
+    def text(self, target: Optional[str] = None, application: Optional[str] = None) -> str:
+        """Returns the text typed into a target (or the window itself) of an application (default: the focused one)."""
+        with self._lock:
+            window = self._window(application) if application else self.focused
+            return window.buffers.get((target or "").lower(), "") if window else ""
+
+    def state(self) -> Dict[str, Any]:
+        """A summary of the simulated desktop, e.g. to report after a dry run."""
+        with self._lock:
+            focused = self.focused
+            return {
+                "clock": round(self.clock, 3),
+                "focused": focused.application if focused else None,
+                "windows": [
+                    {"application": window.application, "focus": window.focus, "text": dict(window.buffers)}
+                    for window in self.windows
+                ],
+                "clipboard": self.clipboard,
+                "warnings": list(self.warnings),
+            }
+
+    def _window(self, application: str) -> Optional[SimulatedWindow]:
+        name = self._applications.get(application.lower(), (application, None))[0].lower()
+        for window in self.windows:
+            if window.application.lower() == name:
+                return window
+        return None
+
+    def _synthetic_target(self, target: str, window: Optional[SimulatedWindow]) -> Rect:
+        # Without a layout, targets get distinct places in a grid, so that
+        # clicks still move the focus between them
+        targets = window.targets if window is not None else self.desktop_targets
+        slot = len(targets)
+        rect = (40 + (slot % 8) * 220, 120 + (slot // 8 % 16) * 60, 200, 40)
+        targets[target] = rect
+        return rect
+
+    # --- Screen ---
+
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+    def screenshot(self) -> np.ndarray:
+        if self.screen is not None:
+            return self.screen
+        return np.zeros((self.height, self.width), dtype=np.uint8)
+
+    def resolves(self, target_description: str) -> bool:
+        # A recorded screen covers the targets the layout does not declare
+        return self.screen is None or target_description.strip().lower() in self._declared
+
+    def find_target(self, target_description: str) -> Optional[Tuple[int, int]]:
+        key = target_description.strip().lower()
+        with self._lock:
+            rect = None
+            for window in reversed(self.windows):
+                if self._ready(window) and key in window.targets:
+                    rect = window.targets[key]
+                    break
+            else:
+                rect = self.desktop_targets.get(key)
+            if rect is None and self.permissive:
+                rect = self._synthetic_target(key, self.focused)
+            if rect is None:
+                return None
+            x, y, width, height = rect
+            return x + width // 2, y + height // 2
+
+    def wait_until_stable(self, timeout: float) -> bool:
+        """The screen is stable once every opened window has finished opening."""
+        with self._lock:
+            settled = max([window.ready_at for window in self.windows], default=self.clock)
+            if settled - self.clock > timeout:
+                self.clock += timeout
+                return False
+            self.clock = max(self.clock, settled)
+            return True
+
+    # --- Input ---
+
+    def move_to(self, x: int, y: int) -> None:
+        with self._lock:
+            self.position = (int(x), int(y))
+
+    def click(self) -> None:
+        with self._lock:
+            x, y = self.position
+            for window in reversed(self.windows):
+                if not self._ready(window):
+                    continue
+                for target, (left, top, width, height) in window.targets.items():
+                    if left <= x < left + width and top <= y < top + height:
+                        # Clicking a window brings it to the front
+                        self.windows.remove(window)
+                        self.windows.append(window)
+                        window.focus = target
+                        self._select_all = False
+                        self._event("click", f"{window.application}: {target}")
+                        return
+            self._event("click", self.position)
+
+    def _type(self, text: str) -> None:
+        window = self.focused
+        if window is None:
+            self._warn(f"typed {text!r} with no window open")
+            return
+        key = window.focus or ""
+        if self._select_all:
+            window.buffers[key] = ""
+            self._select_all = False
+        window.buffers[key] = window.buffers.get(key, "") + text
+
+    def write(self, text: str, interval: float = 0.0) -> None:
+        with self._lock:
+            self._type(text)
+            self._event("write", text)
+            self.clock += interval * len(text)
+
+    def paste(self, text: str) -> None:
+        with self._lock:
+            self._type(text)
+            self._event("paste", text)
+            self.clock += TEXT_PASTE_RESTORE_DELAY
+
+    def press(self, key: str, presses: int = 1) -> None:
+        with self._lock:
+            key = key.lower()
+            for _ in range(presses):
+                window = self.focused
+                if key in ("enter", "return"):
+                    self._type("\n")
+                elif key == "backspace" and window is not None:
+                    field = window.focus or ""
+                    window.buffers[field] = "" if self._select_all else window.buffers.get(field, "")[:-1]
+                    self._select_all = False
+                elif key == "tab" and window is not None and window.targets:
+                    # Moves the focus to the next target, in layout order
+                    targets = list(window.targets)
+                    index = targets.index(window.focus) + 1 if window.focus in targets else 0
+                    window.focus = targets[index % len(targets)]
+                self._event("press", key)
+
+    def hotkey(self, keys: List[str]) -> None:
+        with self._lock:
+            keys = [key.lower() for key in keys]
+            self._event("hotkey", "+".join(keys))
+            if not (len(keys) == 2 and keys[0] in _MODIFIERS):
+                return
+            window = self.focused
+            if keys[1] == "v":
+                self._type(self.clipboard)
+            elif keys[1] == "a":
+                self._select_all = True
+            elif keys[1] == "c" and window is not None:
+                self.clipboard = window.buffers.get(window.focus or "", "")
+            elif keys[1] == "l" and window is not None and "address bar" in window.targets:
+                window.focus = "address bar"
+                self._select_all = True
+            elif keys[1] == "q" and window is not None:
+                self.windows.remove(window)
+                self._event("quit", window.application)
+
+    # --- Applications and time ---
+
+    def launch(self, application_name: str) -> None:
+        with self._lock:
+            window = self._window(application_name)
+            if window is not None:
+                # Opening a running application activates it
+                self.windows.remove(window)
+                self.windows.append(window)
+                self._event("activate", window.application)
+                return
+            name, spec = self._applications.get(application_name.lower(), (application_name, {}))
+            targets = {target.lower(): tuple(rect) for target, rect in spec.get("targets", {}).items()}
+            focus = spec.get("focus")
+            window = SimulatedWindow(name, self.clock + spec.get("launch_seconds", 0.0), targets, focus.lower() if focus else None)
+            self.windows.append(window)
+            self._event("launch", name)
+
+    def is_process_running(self, process_name: str) -> bool:
+        # Like pgrep -i -f: a case-insensitive substring match
+        name = process_name.lower()
+        with self._lock:
+            if self._window(process_name) is not None:
+                return True
+            return any(name in window.application.lower() for window in self.windows)
+
+    def monotonic(self) -> float:
+        return self.clock
+
+    def sleep(self, seconds: float) -> None:
+        with self._lock:
+            self.clock += max(0.0, seconds)
+
+
+def create_backend(name: str = EXECUTOR_BACKEND) -> ExecutorBackend:
+    """
+    Creates an executor backend by name: "pyautogui" or "simulated" (with
+    SIMULATED_LAYOUT_PATH and SIMULATED_SCREEN_PATH).
+
+    Raises:
+        ValueError: If the name is unknown.
+    """
+    if name == "pyautogui":
+        return PyAutoGUIBackend()
+    if name == "simulated":
+        return SimulatedBackend.from_files(SIMULATED_LAYOUT_PATH, SIMULATED_SCREEN_PATH)
+    raise ValueError(f"Unknown executor backend: {name}")
+
+
+_backend: Optional[ExecutorBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> ExecutorBackend:
+    """Returns the process-wide executor backend (EXECUTOR_BACKEND unless set_backend() was called)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+        return _backend
+
+
+def set_backend(backend: ExecutorBackend) -> ExecutorBackend:
+    """Makes the executor drive `backend`, e.g. a SimulatedBackend for a dry run."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+    return backend
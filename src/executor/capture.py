@@ -0,0 +1,265 @@
+# src/executor/capture.py
+
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..config import CAPTURE_TILE_SIZE, CAPTURE_DIFF_THRESHOLD
+from ..utils.tracing import span
+from .backends import get_backend
+from .vision import FramePyramid, Match, TemplateMatcher, to_gray
+
+Region = Tuple[int, int, int, int]  # x, y, width, height in frame pixels
+
+
+def region_checksum(frame: np.ndarray, region: Region) -> int:
+    """
+    Returns a cheap checksum of a frame region. The region is shrunk to 16x8
+    and quantized first, so antialiasing noise does not change it while a
+    different control in the same place does.
+    """
+    x, y, width, height = region
+    patch = frame[max(0, y) : y + height, max(0, x) : x + width]
+    if patch.size == 0:
+        return 0
+    small = cv2.resize(patch, (16, 8), interpolation=cv2.INTER_AREA) >> 4
+    return zlib.crc32(small.tobytes())
+
+
+def tile_changes(
+    previous: np.ndarray,
+    current: np.ndarray,
+    tile_size: int = CAPTURE_TILE_SIZE,
+    diff_threshold: int = CAPTURE_DIFF_THRESHOLD,
+) -> np.ndarray:
+    """
+    Returns a boolean grid with one entry per square tile of the current
+    frame, True where any pixel differs by more than the threshold. Every
+    tile counts as changed if the frame size changed.
+    """
+    if previous is None or previous.shape != current.shape:
+        rows = -(-current.shape[0] // tile_size)
+        cols = -(-current.shape[1] // tile_size)
+        return np.ones((rows, cols), dtype=bool)
+    diff = np.abs(current.astype(np.int16) - previous.astype(np.int16)) > diff_threshold
+    t = tile_size
+    pad_y, pad_x = -diff.shape[0] % t, -diff.shape[1] % t
+    if pad_y or pad_x:
+        diff = np.pad(diff, ((0, pad_y), (0, pad_x)))
+    rows, cols = diff.shape[0] // t, diff.shape[1] // t
+    return diff.reshape(rows, t, cols, t).any(axis=(1, 3))
+
+
+def _grab_screen() -> np.ndarray:
+    return to_gray(get_backend().screenshot())
+
+
+class ScreenCapture:
+    """
+    Shares one screen capture per execution step between all lookups and
+    tracks which tiles of the screen changed since the previous capture.
+
+    Match results are cached per target and reused until a tile under the
+    match (or, for targets that were not found, any tile) changes.
+    """
+
+    def __init__(
+        self,
+        grab: Optional[Callable[[], np.ndarray]] = None,
+        tile_size: int = CAPTURE_TILE_SIZE,
+        diff_threshold: int = CAPTURE_DIFF_THRESHOLD,
+    ):
+        self._grab = grab or _grab_screen
+        self.tile_size = tile_size
+        self.diff_threshold = diff_threshold
+        self.step = 0
+        self.captures = 0
+        self._frame_step = -1
+        self._frame: Optional[FramePyramid] = None
+        self._dirty: Optional[np.ndarray] = None
+        self._matches: Dict[str, Optional[Match]] = {}
+        self._expected: Dict[str, Tuple[Match, int]] = {}
+        self._lock = threading.RLock()
+
+    def begin_step(self) -> None:
+        """Marks the start of a new execution step; the next frame() captures the screen again."""
+        with self._lock:
+            self.step += 1
+
+    def _tile_changes(self, previous: np.ndarray, current: np.ndarray) -> np.ndarray:
+        return tile_changes(previous, current, self.tile_size, self.diff_threshold)
+
+    def frame(self) -> FramePyramid:
+        """Returns the frame of the current step, capturing it on first use."""
+        with self._lock:
+            if self._frame_step != self.step or self._frame is None:
+                with span("capture") as traced:
+                    current = FramePyramid(self._grab())
+                    self.captures += 1
+                    if self._frame is None:
+                        self._dirty = None
+                        self._matches.clear()
+                    else:
+                        self._dirty = self._tile_changes(self._frame.base, current.base)
+                        self._invalidate_matches()
+                        traced.set("changed_tiles", int(self._dirty.sum()))
+                    self._frame = current
+                    self._frame_step = self.step
+            return self._frame
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """Width and height of the current frame in pixels."""
+        height, width = self.frame().base.shape
+        return width, height
+
+    def dirty_tiles(self) -> Optional[np.ndarray]:
+        """Boolean grid of tiles that changed with the last capture (None after the first one)."""
+        with self._lock:
+            return self._dirty
+
+    def _tiles(self, region: Region) -> Tuple[slice, slice]:
+        x, y, width, height = region
+        t = self.tile_size
+        return (
+            slice(max(0, y // t), max(0, -(-(y + height) // t))),
+            slice(max(0, x // t), max(0, -(-(x + width) // t))),
+        )
+
+    def has_changed(self, region: Optional[Region] = None) -> bool:
+        """
+        Returns whether the region (or the whole screen) changed between the
+        previous and the current capture.
+        """
+        with self._lock:
+            self.frame()
+            if self._dirty is None:
+                return True
+            if region is None:
+                return bool(self._dirty.any())
+            rows, cols = self._tiles(region)
+            return bool(self._dirty[rows, cols].any())
+
+    def _invalidate_matches(self) -> None:
+        if self._dirty is None or not self._dirty.any():
+            return
+        for target, match in list(self._matches.items()):
+            if match is None or self._dirty[self._tiles(match[:4])].any():
+                del self._matches[target]
+
+    def wait_until_stable(
+        self,
+        timeout: float = 5.0,
+        interval: float = 0.1,
+        region: Optional[Region] = None,
+        stable_frames: int = 2,
+    ) -> bool:
+        """
+        Captures the screen until the region (or the whole screen) stops
+        changing for `stable_frames` consecutive captures.
+
+        Returns:
+            bool: True if the screen became stable before the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        stable = 0
+        while True:
+            self.begin_step()
+            stable = 0 if self.has_changed(region) else stable + 1
+            if stable >= stable_frames:
+                return True
+            if time.monotonic() + interval > deadline:
+                return False
+            time.sleep(interval)
+
+    def locate(self, target: str, matcher: TemplateMatcher) -> Optional[Match]:
+        """
+        Locates a target on the current frame, reusing the previous result if
+        the screen under it has not changed, or an expected location if the
+        screen there still looks the same.
+        """
+        target = target.lower()
+        with self._lock:
+            frame = self.frame()
+            with span("locate", target=target) as traced:
+                if target in self._matches:
+                    traced.set("cache", "hit")
+                    return self._matches[target]
+                expected = self._expected.pop(target, None)
+                if expected is not None and region_checksum(frame.base, expected[0][:4]) == expected[1]:
+                    traced.set("cache", "expected")
+                    match = expected[0]
+                else:
+                    traced.set("cache", "miss")
+                    match = matcher.locate(target, frame)
+                traced.set("found", match is not None)
+                self._matches[target] = match
+                return match
+
+    def locate_text(self, text: str, index) -> Optional[Match]:
+        """
+        Locates visible text on the current frame using an OCR index (see
+        src.executor.ocr), reusing the previous result while the screen under
+        it has not changed.
+        """
+        key = "text:" + text.lower()
+        with self._lock:
+            frame = self.frame()
+            with span("locate_text", target=text.lower()) as traced:
+                if key in self._matches:
+                    traced.set("cache", "hit")
+                    return self._matches[key]
+                traced.set("cache", "miss")
+                traced.set("tiles_read", index.update(frame.base))
+                match = index.find(text)
+                traced.set("found", match is not None)
+                self._matches[key] = match
+                return match
+
+    def expect(self, target: str, match: Match, checksum: int) -> None:
+        """
+        Tells the next locate() of a target where it was seen before (e.g. in a
+        recorded macro). The location is used without template matching if the
+        checksum of the region still agrees; otherwise the target is matched as usual.
+        """
+        with self._lock:
+            self._expected[target.lower()] = (Match(*match), checksum)
+
+    def snapshot(self, target: str) -> Optional[Tuple[Match, int]]:
+        """
+        Returns the cached match of a target on the current frame and the
+        checksum of its region, without capturing the screen again.
+        """
+        target = target.lower()
+        with self._lock:
+            match = self._matches.get(target)
+            if match is None or self._frame is None:
+                return None
+            return match, region_checksum(self._frame.base, match[:4])
+
+    def forget(self, target: Optional[str] = None) -> None:
+        """Drops cached match results for a target, or all of them."""
+        with self._lock:
+            if target is None:
+                self._matches.clear()
+                self._expected.clear()
+            else:
+                self._matches.pop(target.lower(), None)
+                self._expected.pop(target.lower(), None)
+
+
+_capture: Optional[ScreenCapture] = None
+_capture_lock = threading.Lock()
+
+
+def get_capture() -> ScreenCapture:
+    """Returns the process-wide screen capture service."""
+    global _capture
+    with _capture_lock:
+        if _capture is None:
+            _capture = ScreenCapture()
+        return _capture
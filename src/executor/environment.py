@@ -1,14 +1,79 @@
 # src/executor/environment.py
 
-import pyautogui
-import time
 import logging
-import os
+
+from ..config import OCR_ENABLED, VISION_POOL_ENABLED, WAIT_DEFAULT_TIMEOUT, WAIT_POLL_INTERVAL, WAIT_POLL_MAX_INTERVAL
+from .backends import get_backend
+from .capture import get_capture
+from .ocr import get_ocr_index
+from .vision import get_matcher, screen_scale
+from .vision_pool import get_vision_pool
+
+
+def get_locator():
+    """
+    Returns what matches templates: the vision worker pool, or the in-process
+    matcher when the pool is disabled. Both offer has_target() and locate().
+    """
+    return get_vision_pool() if VISION_POOL_ENABLED else get_matcher()
+
+
+def can_locate(target_description):
+    """
+    Returns whether a target can be looked up: it is mapped to a template
+    image, or it can be searched for as text on the screen (or the executor
+    backend finds it itself).
+    """
+    if get_backend().resolves(target_description):
+        return True
+    if get_locator().has_target(target_description) or OCR_ENABLED:
+        return True
+    logging.error("No image mapping found for '%s'", target_description)
+    return False
+
+
+def locate_target(target_description, capture=None):
+    """
+    Locates a target on the current frame: by its template image if it has
+    one, otherwise by its text (OCR).
+
+    Returns:
+        Match: The target in screenshot pixel coordinates, or None if not found.
+    """
+    # The frame is shared by every lookup in this step and matches are
+    # reused while the screen under them is unchanged
+    capture = capture or get_capture()
+    matcher = get_locator()
+    if matcher.has_target(target_description):
+        return capture.locate(target_description, matcher)
+    return capture.locate_text(target_description, get_ocr_index())
+
+
+def find_target(target_description, capture=None):
+    """
+    Finds where to click a target: the center of its match on the screen, or
+    the location the executor backend knows (e.g. a simulated layout).
+
+    Returns:
+        tuple: (x, y) in mouse coordinates, or None if the target is not visible.
+    """
+    backend = get_backend()
+    if backend.resolves(target_description):
+        return backend.find_target(target_description)
+    capture = capture or get_capture()
+    match = locate_target(target_description, capture)
+    if not match:
+        return None
+    # Screenshots are in physical pixels, mouse coordinates are logical
+    scale = screen_scale(capture.size[0], backend.size()[0])
+    x, y = match.center
+    return round(x / scale), round(y / scale)
 
 
 def click_on_target(target_description):
     """
-    Locates the target on the screen using image recognition and performs a click action.
+    Locates the target on the screen using image recognition (or, for targets
+    without a template image, text recognition) and performs a click action.
 
     Args:
         target_description (str): Description of the target to click.
@@ -16,31 +81,126 @@ def click_on_target(target_description):
     Returns:
         bool: True if the click was successful, False otherwise.
     """
-    logging.info(f"Attempting to click on '{target_description}'")
-
-    # Map target descriptions to image file names
-    target_image_map = {
-        "address bar": "address_bar.png",
-        # Add more mappings as needed
-    }
+    logging.info("Attempting to click on '%s'", target_description)
 
-    image_filename = target_image_map.get(target_description.lower())
-    if not image_filename:
-        logging.error(f"No image mapping found for '{target_description}'")
+    if not can_locate(target_description):
         return False
 
-    # Adjust the image path according to your project structure
-    image_path = os.path.join("images", image_filename)
     try:
-        location = pyautogui.locateCenterOnScreen(image_path, confidence=0.8)
+        location = find_target(target_description)
         if location:
-            pyautogui.moveTo(location)
-            pyautogui.click()
-            logging.info(f"Clicked on '{target_description}' at {location}")
+            backend = get_backend()
+            backend.move_to(*location)
+            backend.click()
+            logging.info("Clicked on '%s' at %s", target_description, location)
             return True
         else:
-            logging.error(f"Could not locate '{target_description}' on the screen.")
+            logging.error("Could not locate '%s' on the screen.", target_description)
             return False
     except Exception as e:
-        logging.error(f"Failed to click on '{target_description}': {e}")
+        logging.error("Failed to click on '%s': %s", target_description, e)
         return False
+
+
+def poll_until(predicate, timeout=WAIT_DEFAULT_TIMEOUT, interval=WAIT_POLL_INTERVAL, max_interval=WAIT_POLL_MAX_INTERVAL):
+    """
+    Calls the predicate until it returns True or the timeout expires. The
+    polling interval starts small and grows, so that conditions that hold
+    quickly are noticed quickly without busy-waiting on slow ones. Time is
+    measured on the executor backend's clock.
+
+    Args:
+        predicate (callable): The condition to wait for.
+        timeout (float): Maximum number of seconds to wait.
+        interval (float): Initial polling interval in seconds.
+        max_interval (float): Upper bound of the polling interval.
+
+    Returns:
+        bool: True if the condition held before the timeout, False otherwise.
+    """
+    clock = get_backend()
+    deadline = clock.monotonic() + timeout
+    while True:
+        if predicate():
+            return True
+        remaining = deadline - clock.monotonic()
+        if remaining <= 0:
+            return False
+        clock.sleep(min(interval, remaining))
+        interval = min(interval * 1.5, max_interval)
+
+
+def wait_for_target(target_description, timeout=WAIT_DEFAULT_TIMEOUT):
+    """
+    Waits until the target is visible on the screen.
+
+    Args:
+        target_description (str): Description of the target to wait for.
+        timeout (float): Maximum number of seconds to wait.
+
+    Returns:
+        bool: True if the target appeared before the timeout, False otherwise.
+    """
+    if not can_locate(target_description):
+        return False
+    capture = get_capture()
+
+    def target_visible():
+        capture.begin_step()
+        return find_target(target_description, capture) is not None
+
+    if poll_until(target_visible, timeout):
+        return True
+    logging.error("'%s' did not appear within %s seconds.", target_description, timeout)
+    return False
+
+
+def wait_for_screen_stable(timeout=WAIT_DEFAULT_TIMEOUT):
+    """
+    Waits until the screen stops changing (e.g. an application finished loading).
+
+    Args:
+        timeout (float): Maximum number of seconds to wait.
+
+    Returns:
+        bool: True if the screen became stable before the timeout, False otherwise.
+    """
+    backend = get_backend()
+    if backend.simulated:
+        stable = backend.wait_until_stable(timeout)
+    else:
+        stable = get_capture().wait_until_stable(timeout=timeout, interval=WAIT_POLL_INTERVAL)
+    if stable:
+        return True
+    logging.error("Screen did not become stable within %s seconds.", timeout)
+    return False
+
+
+def is_process_running(process_name):
+    """
+    Checks whether a process with the given name is running.
+
+    Args:
+        process_name (str): The process or application name.
+
+    Returns:
+        bool: True if a matching process is running.
+    """
+    return get_backend().is_process_running(process_name)
+
+
+def wait_for_process(process_name, timeout=WAIT_DEFAULT_TIMEOUT):
+    """
+    Waits until a process with the given name is running.
+
+    Args:
+        process_name (str): The process or application name.
+        timeout (float): Maximum number of seconds to wait.
+
+    Returns:
+        bool: True if the process started before the timeout, False otherwise.
+    """
+    if poll_until(lambda: is_process_running(process_name), timeout):
+        return True
+    logging.error("Process '%s' did not start within %s seconds.", process_name, timeout)
+    return False
@@ -1,10 +1,16 @@
 # mouse_keyboard.py
 
-import pyautogui
-import subprocess
-import time
-import os
-import sys
+from ..config import (
+    TEXT_ENTRY_MODE,
+    TEXT_ENTRY_APP_MODES,
+    TEXT_ENTRY_INTERVAL,
+)
+from .backends import get_backend
+from .text_entry import choose_text_entry_mode
+
+# Name of the application opened last, used to pick per-application settings.
+# This is not focus tracking: switching windows by other means is not seen.
+_last_opened_application = None
 
 
 def open_application(application_name):
@@ -14,16 +20,15 @@ def open_application(application_name):
     Args:
         application_name (str): The name of the application to open.
     """
+    global _last_opened_application
     print(f"Opening application: {application_name}")
-    if sys.platform == "darwin":
-        # macOS command to open an application
-        subprocess.Popen(["open", "-a", application_name])
-    elif sys.platform == "win32":
-        # Windows command to open an application
-        os.startfile(application_name)
-    else:
-        # Linux command to open an application
-        subprocess.Popen([application_name])
+    _last_opened_application = application_name
+    get_backend().launch(application_name)
+
+
+def last_opened_application():
+    """Returns the name of the application opened last, or None."""
+    return _last_opened_application
 
 
 def click_on_coordinates(x, y):
@@ -34,28 +39,73 @@ def click_on_coordinates(x, y):
         x (int): X-coordinate.
         y (int): Y-coordinate.
     """
-    pyautogui.moveTo(x, y)
-    pyautogui.click()
+    backend = get_backend()
+    backend.move_to(x, y)
+    backend.click()
 
 
-def type_text(text):
+def paste_text(text):
+    """
+    Enters the text by pasting it from the clipboard, restoring the previous
+    clipboard contents afterwards. Line breaks are pressed as Enter between
+    the pasted lines, so that they submit as they would when typed.
+
+    Args:
+        text (str): The text to paste.
+    """
+    backend = get_backend()
+    for i, line in enumerate(text.split("\n")):
+        if i:
+            backend.press("enter")
+        if line:
+            backend.paste(line)
+
+
+def type_text(text, mode=None, application_name=None):
     """
     Types the specified text.
 
     Args:
         text (str): The text to type.
+        mode (str, optional): "paste", "burst", "paced" or "adaptive". Defaults to the
+            mode configured for the application, or TEXT_ENTRY_MODE.
+        application_name (str, optional): The application receiving the text. Defaults
+            to the application opened last.
     """
-    pyautogui.write(text, interval=0.05)
+    if mode is None:
+        application_name = application_name or _last_opened_application or ""
+        mode = TEXT_ENTRY_APP_MODES.get(application_name.lower(), TEXT_ENTRY_MODE)
+    if mode == "adaptive":
+        mode = choose_text_entry_mode(text)
+    if mode == "paste":
+        paste_text(text)
+    elif mode == "burst":
+        get_backend().write(text, interval=0)
+    else:
+        # "paced" for applications that drop keystrokes typed too quickly
+        get_backend().write(text, interval=TEXT_ENTRY_INTERVAL)
 
 
-def press_key(key):
+def press_key(key, presses=1):
     """
     Presses a specific key.
 
     Args:
         key (str): The key to press.
+        presses (int): How many times to press it.
+    """
+    get_backend().press(key, presses)
+
+
+def hotkey(keys):
+    """
+    Presses a key combination, e.g. ["command", "l"]: holds the keys down in
+    order, then releases them in reverse order.
+
+    Args:
+        keys (list): The keys of the combination.
     """
-    pyautogui.press(key)
+    get_backend().hotkey(keys)
 
 
 def wait_seconds(duration):
@@ -65,4 +115,4 @@ def wait_seconds(duration):
     Args:
         duration (int): Number of seconds to wait.
     """
-    time.sleep(duration)
+    get_backend().wait(duration)
@@ -0,0 +1,258 @@
+# src/executor/ocr.py
+
+import logging
+import re
+import threading
+from difflib import SequenceMatcher
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from ..config import (
+    CAPTURE_TILE_SIZE,
+    CAPTURE_DIFF_THRESHOLD,
+    OCR_TILE_WIDTH,
+    OCR_TILE_HEIGHT,
+    OCR_TILE_OVERLAP,
+    OCR_MIN_CONFIDENCE,
+    OCR_MIN_SIMILARITY,
+    OCR_TESSERACT_CONFIG,
+    VISION_POOL_ENABLED,
+)
+from .capture import Region, tile_changes
+from .vision import Match
+from .vision_pool import get_vision_pool
+
+_EDGE_PUNCTUATION = re.compile(r"^\W+|\W+$")
+
+
+class OCRWord(NamedTuple):
+    """A recognized word, in frame pixel coordinates."""
+
+    text: str
+    x: int
+    y: int
+    width: int
+    height: int
+    confidence: float
+    line: Tuple[int, int, int, int]  # tile, block, paragraph and line number
+
+
+# A recognizer turns a grayscale tile into (text, x, y, width, height, confidence,
+# block, paragraph, line) tuples in tile coordinates. It runs in the vision
+# pool's worker processes, so it must be a module-level function.
+Recognizer = Callable[[np.ndarray, str], List[tuple]]
+
+
+def tesseract_words(tile: np.ndarray, config: str = OCR_TESSERACT_CONFIG) -> List[tuple]:
+    """Recognizes the words on a tile with Tesseract."""
+    import pytesseract
+
+    data = pytesseract.image_to_data(tile, config=config, output_type=pytesseract.Output.DICT)
+    words = []
+    for i, text in enumerate(data["text"]):
+        text = text.strip()
+        if text:
+            words.append(
+                (
+                    text,
+                    data["left"][i],
+                    data["top"][i],
+                    data["width"][i],
+                    data["height"][i],
+                    float(data["conf"][i]),
+                    data["block_num"][i],
+                    data["par_num"][i],
+                    data["line_num"][i],
+                )
+            )
+    return words
+
+
+def normalize_text(text: str) -> str:
+    """Case-folds text and strips punctuation around each word."""
+    words = (_EDGE_PUNCTUATION.sub("", word) for word in text.casefold().split())
+    return " ".join(word for word in words if word)
+
+
+class OCRIndex:
+    """
+    Word and bounding box index of the screen, maintained incrementally.
+
+    The frame is split into overlapping tiles. On each update only the tiles
+    whose pixels changed since they were last read are recognized again,
+    spread over the worker processes of a VisionPool, which reads them from
+    the frame it already shares for template matching. A word belongs to the tile that
+    contains its center, so words cut by one tile's edge are read whole by its
+    neighbour.
+
+    Args:
+        recognize (callable, optional): Tile recognizer (defaults to Tesseract).
+        tile_width (int): Width of a tile, without overlap.
+        tile_height (int): Height of a tile, without overlap.
+        overlap (int): Pixels each tile extends into its neighbours.
+        pool (VisionPool, optional): Worker processes to read tiles in. Without
+            one, tiles are read in this process.
+        min_confidence (float): Words recognized with a lower confidence are ignored.
+    """
+
+    def __init__(
+        self,
+        recognize: Optional[Recognizer] = None,
+        tile_width: int = OCR_TILE_WIDTH,
+        tile_height: int = OCR_TILE_HEIGHT,
+        overlap: int = OCR_TILE_OVERLAP,
+        pool=None,
+        min_confidence: float = OCR_MIN_CONFIDENCE,
+        config: str = OCR_TESSERACT_CONFIG,
+    ):
+        self.recognize = recognize or tesseract_words
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.overlap = overlap
+        self.pool = pool
+        self.min_confidence = min_confidence
+        self.config = config
+        self.tiles_read = 0
+        self._frame: Optional[np.ndarray] = None
+        self._words: Dict[int, List[OCRWord]] = {}
+        self._stale: Set[int] = set()
+        self._lock = threading.RLock()
+
+    def _tiles(self, width: int, height: int) -> List[Region]:
+        return [
+            (x, y, min(self.tile_width, width - x), min(self.tile_height, height - y))
+            for y in range(0, height, self.tile_height)
+            for x in range(0, width, self.tile_width)
+        ]
+
+    def _extended(self, tile: Region, width: int, height: int) -> Region:
+        x, y, w, h = tile
+        x0, y0 = max(0, x - self.overlap), max(0, y - self.overlap)
+        x1, y1 = min(width, x + w + self.overlap), min(height, y + h + self.overlap)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def _changed_tiles(self, frame: np.ndarray, tiles: List[Region]) -> List[int]:
+        height, width = frame.shape
+        if self._frame is None or self._frame.shape != frame.shape:
+            self._words.clear()
+            return list(range(len(tiles)))
+        t = CAPTURE_TILE_SIZE
+        dirty = tile_changes(self._frame, frame, t, CAPTURE_DIFF_THRESHOLD)
+        changed = []
+        for index, tile in enumerate(tiles):
+            x, y, w, h = self._extended(tile, width, height)
+            if index in self._stale or dirty[y // t : -(-(y + h) // t), x // t : -(-(x + w) // t)].any():
+                changed.append(index)
+        return changed
+
+    def update(self, frame: np.ndarray) -> int:
+        """
+        Brings the index up to date with a grayscale frame.
+
+        Returns:
+            int: The number of tiles that were read again.
+        """
+        with self._lock:
+            height, width = frame.shape
+            tiles = self._tiles(width, height)
+            changed = self._changed_tiles(frame, tiles)
+            if not changed:
+                return 0
+            regions = [self._extended(tiles[index], width, height) for index in changed]
+            try:
+                if len(regions) > 1 and self.pool is not None:
+                    futures = self.pool.map_regions(self.recognize, frame, regions, self.config)
+                    results = [future.result() for future in futures]
+                else:
+                    results = [
+                        self.recognize(np.ascontiguousarray(frame[y : y + h, x : x + w]), self.config)
+                        for x, y, w, h in regions
+                    ]
+            except Exception as e:
+                # Keep the last known words, and read these tiles again next time
+                logging.error("OCR failed: %s", e)
+                self._stale.update(changed)
+                self._frame = frame
+                return 0
+            for index, region, words in zip(changed, regions, results):
+                self._words[index] = self._place(index, tiles[index], region, words)
+            self._stale.difference_update(changed)
+            self._frame = frame
+            self.tiles_read += len(changed)
+            return len(changed)
+
+    def _place(self, index: int, tile: Region, region: Region, words: List[tuple]) -> List[OCRWord]:
+        tx, ty, tw, th = tile
+        placed = []
+        for text, x, y, w, h, confidence, block, paragraph, line in words:
+            if confidence < self.min_confidence:
+                continue
+            x, y = region[0] + x, region[1] + y
+            center_x, center_y = x + w // 2, y + h // 2
+            if tx <= center_x < tx + tw and ty <= center_y < ty + th:
+                placed.append(OCRWord(text, x, y, w, h, confidence, (index, block, paragraph, line)))
+        return placed
+
+    def words(self) -> List[OCRWord]:
+        """Returns all indexed words in reading order."""
+        with self._lock:
+            words = [word for index in sorted(self._words) for word in self._words[index]]
+        return words
+
+    def _lines(self) -> List[List[OCRWord]]:
+        lines: Dict[Tuple[int, int, int, int], List[OCRWord]] = {}
+        for word in self.words():
+            lines.setdefault(word.line, []).append(word)
+        return [sorted(line, key=lambda word: word.x) for line in lines.values()]
+
+    def find(self, query: str, min_similarity: float = OCR_MIN_SIMILARITY) -> Optional[Match]:
+        """
+        Finds the words on screen that best match the query, e.g. "Submit" or
+        "Sign in". Matching ignores case and surrounding punctuation, and
+        tolerates OCR errors down to `min_similarity`.
+
+        Returns:
+            Match: The bounding box of the matched words, scored by similarity, or None.
+        """
+        query = normalize_text(query)
+        if not query:
+            return None
+        size = len(query.split())
+        best: Optional[Tuple[float, float, List[OCRWord]]] = None
+        for line in self._lines():
+            texts = [normalize_text(word.text) for word in line]
+            for start in range(max(1, len(line) - size + 1)):
+                window = line[start : start + size]
+                matcher = SequenceMatcher(None, query, " ".join(texts[start : start + size]), autojunk=False)
+                if matcher.real_quick_ratio() < min_similarity or matcher.quick_ratio() < min_similarity:
+                    continue
+                similarity = matcher.ratio()
+                confidence = min(word.confidence for word in window)
+                if similarity >= min_similarity and (best is None or (similarity, confidence) > best[:2]):
+                    best = (similarity, confidence, window)
+        if best is None:
+            return None
+        similarity, _, window = best
+        x0 = min(word.x for word in window)
+        y0 = min(word.y for word in window)
+        x1 = max(word.x + word.width for word in window)
+        y1 = max(word.y + word.height for word in window)
+        return Match(x0, y0, x1 - x0, y1 - y0, similarity)
+
+
+
+_ocr_index: Optional[OCRIndex] = None
+_ocr_index_lock = threading.Lock()
+
+
+def get_ocr_index() -> OCRIndex:
+    """Returns the process-wide OCR index, reading tiles in the vision pool if it is enabled."""
+    global _ocr_index
+    with _ocr_index_lock:
+        if _ocr_index is None:
+            if VISION_POOL_ENABLED:
+                _ocr_index = OCRIndex(pool=get_vision_pool())
+            else:
+                _ocr_index = OCRIndex()
+        return _ocr_index
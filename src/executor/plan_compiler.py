@@ -0,0 +1,225 @@
+# plan_compiler.py
+
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from src.plugins import ParameterSpec, PluginRegistry, plugin_registry
+from ..utils.error_handler import handle_error
+from ..utils.tracing import span
+from .capture import get_capture
+
+_NUMBER_WITH_UNIT = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*([a-z]*)\.?\s*$", re.IGNORECASE)
+# Units accepted after a number, with their factor (durations are in seconds)
+_UNIT_FACTORS = {
+    "": 1,
+    "ms": 0.001, "millisecond": 0.001, "milliseconds": 0.001,
+    "s": 1, "sec": 1, "secs": 1, "second": 1, "seconds": 1,
+    "m": 60, "min": 60, "mins": 60, "minute": 60, "minutes": 60,
+    "h": 3600, "hr": 3600, "hrs": 3600, "hour": 3600, "hours": 3600,
+    "time": 1, "times": 1, "x": 1,
+}
+
+
+class PlanValidationError(ValueError):
+    """Raised when a plan contains actions that cannot be executed."""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("Invalid plan: " + "; ".join(errors))
+        self.errors = errors
+
+
+class CompiledAction:
+    """
+    A validated action with coerced parameters, bound to the handler that executes it.
+    """
+
+    __slots__ = ("index", "action_type", "parameters", "handler")
+
+    def __init__(
+        self,
+        index: int,
+        action_type: str,
+        parameters: Dict[str, Any],
+        handler: Callable[[Dict[str, Any]], bool],
+    ):
+        self.index = index
+        self.action_type = action_type
+        self.parameters = parameters
+        self.handler = handler
+
+    def run(self) -> bool:
+        """Executes the action. Returns True if successful."""
+        # Each action may change the screen, so lookups need a fresh frame
+        get_capture().begin_step()
+        with span("execute_action", action_type=self.action_type) as current:
+            try:
+                success = bool(self.handler(self.parameters))
+            except Exception as e:
+                handle_error(e)
+                success = False
+            current.set("success", success)
+            return success
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"action_type": self.action_type, "parameters": dict(self.parameters)}
+
+    def __repr__(self) -> str:
+        return f"CompiledAction({self.index}, {self.action_type!r}, {self.parameters!r})"
+
+
+class CompiledPlan:
+    """An ordered list of compiled actions."""
+
+    __slots__ = ("actions",)
+
+    def __init__(self, actions: List[CompiledAction]):
+        self.actions = actions
+
+    def __iter__(self) -> Iterator[CompiledAction]:
+        return iter(self.actions)
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def __getitem__(self, index: int) -> CompiledAction:
+        return self.actions[index]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [action.to_dict() for action in self.actions]
+
+
+def coerce_parameter(value: Any, spec: ParameterSpec) -> Any:
+    """
+    Converts a parameter value to the type of its spec, e.g. "2 seconds" to 2.0
+    or "500 ms" to 0.5 for a float parameter (durations are in seconds).
+
+    Raises:
+        ValueError: If the value cannot be converted.
+    """
+    if spec.type is float or spec.type is int:
+        if isinstance(value, bool):
+            raise ValueError(f"expected a number, got {value!r}")
+        if isinstance(value, str):
+            match = _NUMBER_WITH_UNIT.match(value)
+            unit = match.group(2).lower() if match else None
+            if unit not in _UNIT_FACTORS:
+                raise ValueError(f"expected a number, got {value!r}")
+            value = float(match.group(1)) * _UNIT_FACTORS[unit]
+        value = spec.type(float(value)) if spec.type is int else float(value)
+    elif spec.type is str:
+        if isinstance(value, (dict, list)):
+            raise ValueError(f"expected a string, got {value!r}")
+        value = str(value)
+    elif not isinstance(value, spec.type):
+        value = spec.type(value)
+    if spec.minimum is not None and value < spec.minimum:
+        raise ValueError(f"expected at least {spec.minimum:g}, got {value!r}")
+    if spec.choices is not None and value not in spec.choices:
+        raise ValueError(f"expected one of {', '.join(map(str, spec.choices))}, got {value!r}")
+    return value
+
+
+def _validate_parameters(
+    action_type: str, parameters: Dict[str, Any], schema: Dict[str, ParameterSpec], errors: List[str], where: str
+) -> Dict[str, Any]:
+    validated = {}
+    for name, spec in schema.items():
+        value = parameters.get(name)
+        for alias in spec.aliases:
+            if value is None:
+                value = parameters.get(alias)
+        if value is None or (value == "" and spec.required):
+            if spec.required:
+                errors.append(f"{where}: missing required parameter '{name}' for '{action_type}'")
+            elif spec.default is not None:
+                validated[name] = spec.default
+            continue
+        try:
+            validated[name] = coerce_parameter(value, spec)
+        except (TypeError, ValueError) as e:
+            errors.append(f"{where}: invalid parameter '{name}' for '{action_type}': {e}")
+    return validated
+
+
+def _compile(
+    action: Any, index: int, registry: PluginRegistry, errors: List[str]
+) -> Optional[CompiledAction]:
+    where = f"action {index + 1}"
+    if not isinstance(action, dict):
+        errors.append(f"{where}: expected an object, got {action!r}")
+        return None
+    action_type = action.get("action_type")
+    if not isinstance(action_type, str) or not action_type:
+        errors.append(f"{where}: missing 'action_type'")
+        return None
+    parameters = action.get("parameters") or {}
+    if not isinstance(parameters, dict):
+        errors.append(f"{where}: 'parameters' must be an object")
+        return None
+    try:
+        plugin = registry.get_action_plugin(action_type)
+    except ValueError:
+        errors.append(f"{where}: unknown action type '{action_type}'")
+        return None
+    schema = plugin.parameter_schema(action_type)
+    if schema is not None:
+        error_count = len(errors)
+        parameters = _validate_parameters(action_type, parameters, schema, errors, where)
+        if len(errors) > error_count:
+            return None
+    return CompiledAction(index, action_type, parameters, plugin.get_handler(action_type))
+
+
+def compile_action(
+    action: Dict[str, Any], index: int = 0, registry: PluginRegistry = plugin_registry
+) -> CompiledAction:
+    """
+    Validates and compiles a single action.
+
+    Raises:
+        PlanValidationError: If the action cannot be executed.
+    """
+    errors: List[str] = []
+    compiled = _compile(action, index, registry, errors)
+    if errors:
+        raise PlanValidationError(errors)
+    return compiled
+
+
+def compile_plan(
+    actions: Iterable[Dict[str, Any]], registry: PluginRegistry = plugin_registry
+) -> CompiledPlan:
+    """
+    Validates a whole plan up front and compiles it into actions bound to their handlers.
+
+    Args:
+        actions (Iterable[dict]): The atomic actions returned by the NLU.
+        registry (PluginRegistry): Registry used to resolve action plugins.
+
+    Returns:
+        CompiledPlan: The compiled plan.
+
+    Raises:
+        PlanValidationError: Listing every problem found in the plan.
+    """
+    if actions is None:
+        raise PlanValidationError(["the plan is empty"])
+    errors: List[str] = []
+    compiled = [_compile(action, index, registry, errors) for index, action in enumerate(actions)]
+    if errors:
+        raise PlanValidationError(errors)
+    if not compiled:
+        raise PlanValidationError(["the plan is empty"])
+    return CompiledPlan(compiled)
+
+
+def compile_stream(
+    actions: Iterable[Dict[str, Any]], registry: PluginRegistry = plugin_registry
+) -> Iterator[CompiledAction]:
+    """
+    Compiles actions one by one as they arrive from a streamed plan, so that
+    execution can start before the plan is complete. Raises PlanValidationError
+    at the first invalid action.
+    """
+    for index, action in enumerate(actions):
+        yield compile_action(action, index, registry)
@@ -0,0 +1,386 @@
+# plan_optimizer.py
+
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.plugins import PluginRegistry, plugin_registry
+from ..config import (
+    PLAN_OPTIMIZER_RULES,
+    PLAN_OPTIMIZER_BROWSERS,
+    PLAN_COST_ACTION_OVERHEAD,
+    PLAN_COST_LOOKUP,
+    PLAN_COST_OPEN_APPLICATION,
+    PLAN_COST_CONDITION_WAIT,
+    PLAN_COST_KEY_PRESS,
+    TEXT_ENTRY_MODE,
+    TEXT_ENTRY_INTERVAL,
+    TEXT_PASTE_RESTORE_DELAY,
+)
+from .plan_compiler import CompiledAction, CompiledPlan, compile_action
+from .text_entry import choose_text_entry_mode
+
+Action = Dict[str, Any]
+
+# pyautogui names for the modifier spellings models use
+_KEY_NAMES = {"cmd": "command", "control": "ctrl", "opt": "option", "return": "enter"}
+
+
+class PlanRule:
+    """
+    A peephole rewrite rule. Rules see actions as dicts with validated
+    parameters, as returned by CompiledAction.to_dict().
+
+    `exact` rules produce a plan that does exactly what the original did with
+    the default action plugin; inexact rules rely on assumptions about the
+    applications (e.g. that a browser focuses its address bar) and are only
+    applied when listed in PLAN_OPTIMIZER_RULES.
+    """
+
+    name = ""
+    exact = True
+
+    def rewrite(self, action: Action) -> Optional[List[Action]]:
+        """Returns the actions replacing `action`, or None to keep it."""
+        return None
+
+    def merge(self, previous: Action, action: Action) -> Optional[List[Action]]:
+        """
+        Returns at most one action replacing `previous` followed by `action`,
+        or None if they cannot be combined.
+        """
+        return None
+
+    def holds(self, action: Action) -> bool:
+        """
+        Whether a streamed plan should hold `action` back until the next
+        action arrives, because the two might be merged.
+        """
+        return False
+
+
+plan_rules: Dict[str, PlanRule] = {}
+
+
+def register_plan_rule(rule: PlanRule) -> PlanRule:
+    """Makes a rule available by name to PLAN_OPTIMIZER_RULES and optimize_plan."""
+    plan_rules[rule.name] = rule
+    return rule
+
+
+def get_plan_rules(names: Optional[Sequence[str]] = None) -> List[PlanRule]:
+    """
+    Returns the rules with the given names, or the configured ones.
+
+    Raises:
+        ValueError: If a rule is not registered.
+    """
+    rules = []
+    for name in PLAN_OPTIMIZER_RULES if names is None else names:
+        if name not in plan_rules:
+            raise ValueError(f"Unknown plan rule: {name}")
+        rules.append(plan_rules[name])
+    return rules
+
+
+def _is(action: Action, action_type: str) -> bool:
+    return action["action_type"] == action_type
+
+
+class MergeWaits(PlanRule):
+    """Sums back-to-back waits and drops waits that do not wait at all."""
+
+    name = "merge_waits"
+
+    def rewrite(self, action):
+        if _is(action, "wait") and action["parameters"].get("duration", 1) <= 0:
+            return []
+        return None
+
+    def merge(self, previous, action):
+        if _is(previous, "wait") and _is(action, "wait"):
+            duration = previous["parameters"].get("duration", 1) + action["parameters"].get("duration", 1)
+            return [{"action_type": "wait", "parameters": {"duration": duration}}]
+        return None
+
+    # Streamed waits run straight away, while the model is still generating
+
+
+class MergeTypeText(PlanRule):
+    """
+    Joins consecutive type_text fragments entered the same way and drops
+    empty ones. Fragments whose mode is picked from the text ("adaptive", or
+    no mode when TEXT_ENTRY_MODE may be adaptive) are only joined when the
+    joined text would be entered the same way as both fragments.
+    """
+
+    name = "merge_type_text"
+
+    def rewrite(self, action):
+        if _is(action, "type_text") and not action["parameters"].get("text"):
+            return []
+        return None
+
+    def merge(self, previous, action):
+        if not (_is(previous, "type_text") and _is(action, "type_text")):
+            return None
+        first, second = previous["parameters"], action["parameters"]
+        mode = first.get("mode")
+        if mode != second.get("mode"):
+            return None
+        text = first.get("text", "") + second.get("text", "")
+        if mode in (None, "adaptive"):
+            chosen = choose_text_entry_mode(text)
+            if choose_text_entry_mode(first.get("text", "")) != chosen or choose_text_entry_mode(second.get("text", "")) != chosen:
+                return None
+        parameters = {"text": text}
+        if mode is not None:
+            parameters["mode"] = mode
+        return [{"action_type": "type_text", "parameters": parameters}]
+
+    def holds(self, action):
+        return _is(action, "type_text")
+
+
+class MergeKeyPresses(PlanRule):
+    """Turns repeated presses of the same key into one press_key with `presses`."""
+
+    name = "merge_key_presses"
+
+    def merge(self, previous, action):
+        if _is(previous, "press_key") and _is(action, "press_key"):
+            key = previous["parameters"].get("key", "enter")
+            if key == action["parameters"].get("key", "enter"):
+                presses = previous["parameters"].get("presses", 1) + action["parameters"].get("presses", 1)
+                return [{"action_type": "press_key", "parameters": {"key": key, "presses": presses}}]
+        return None
+
+    def holds(self, action):
+        return _is(action, "press_key")
+
+
+class ComboKeysToHotkey(PlanRule):
+    """
+    Turns press_key of a key combination ("cmd+l"), which pyautogui cannot
+    press, into a hotkey. Inexact: the original plan would not press anything.
+    """
+
+    name = "combo_keys_to_hotkey"
+    exact = False
+
+    def rewrite(self, action):
+        if _is(action, "press_key") and "+" in action["parameters"].get("key", ""):
+            keys = [key.strip().lower() for key in action["parameters"]["key"].split("+") if key.strip()]
+            keys = "+".join(_KEY_NAMES.get(key, key) for key in keys)
+            return [{"action_type": "hotkey", "parameters": {"keys": keys}}] * action["parameters"].get("presses", 1)
+        return None
+
+
+class SkipAddressBarClick(PlanRule):
+    """
+    Drops a click on the address bar right after opening a browser, which
+    focuses it already. Inexact: relies on the browser's behaviour.
+    """
+
+    name = "skip_address_bar_click"
+    exact = False
+
+    def merge(self, previous, action):
+        if (
+            _is(previous, "open_application")
+            and previous["parameters"].get("application_name", "").lower() in PLAN_OPTIMIZER_BROWSERS
+            and _is(action, "click")
+            and "address bar" in action["parameters"].get("target", "").lower()
+        ):
+            return [previous]
+        return None
+
+    def holds(self, action):
+        return _is(action, "open_application")
+
+
+for _rule in (MergeWaits(), MergeTypeText(), MergeKeyPresses(), ComboKeysToHotkey(), SkipAddressBarClick()):
+    register_plan_rule(_rule)
+
+
+def _rewrite(action: Action, rules: List[PlanRule], applied: Dict[str, int]) -> List[Action]:
+    for rule in rules:
+        replacement = rule.rewrite(action)
+        if replacement is not None:
+            applied[rule.name] = applied.get(rule.name, 0) + 1
+            return [result for new in replacement for result in _rewrite(new, rules, applied)]
+    return [action]
+
+
+def _merge(previous: Action, action: Action, rules: List[PlanRule], applied: Dict[str, int]) -> Optional[List[Action]]:
+    for rule in rules:
+        merged = rule.merge(previous, action)
+        if merged is not None:
+            # Merges must shrink the plan, so that optimizing always terminates
+            assert len(merged) < 2, f"{rule.name} did not merge"
+            applied[rule.name] = applied.get(rule.name, 0) + 1
+            return merged
+    return None
+
+
+def optimize_actions(
+    actions: Iterable[Action], rules: Optional[List[PlanRule]] = None
+) -> Tuple[List[Action], Dict[str, int]]:
+    """
+    Applies the rules to a list of actions.
+
+    Returns:
+        tuple: The optimized actions and how often each rule was applied.
+    """
+    rules = get_plan_rules() if rules is None else rules
+    applied: Dict[str, int] = {}
+    optimized: List[Action] = []
+    for original in actions:
+        for action in _rewrite(original, rules, applied):
+            while optimized:
+                merged = _merge(optimized[-1], action, rules, applied)
+                if merged is None:
+                    break
+                optimized.pop()
+                if not merged:
+                    action = None
+                    break
+                action = merged[0]
+            if action is not None:
+                optimized.append(action)
+    return optimized, applied
+
+
+class PlanCost(NamedTuple):
+    """Estimated cost of running a plan."""
+
+    actions: int
+    seconds: float
+    lookups: int
+
+
+def _action_cost(action: Action) -> Tuple[float, int]:
+    action_type, parameters = action["action_type"], action["parameters"]
+    seconds, lookups = PLAN_COST_ACTION_OVERHEAD, 0
+    if action_type == "wait":
+        seconds += parameters.get("duration", 1)
+    elif action_type == "click":
+        lookups = 1
+    elif action_type == "wait_for_target":
+        seconds += PLAN_COST_CONDITION_WAIT
+        lookups = 1
+    elif action_type in ("wait_for_screen_stable", "wait_for_process"):
+        seconds += PLAN_COST_CONDITION_WAIT
+    elif action_type == "open_application":
+        seconds += PLAN_COST_OPEN_APPLICATION
+    elif action_type == "type_text":
+        text = parameters.get("text", "")
+        mode = parameters.get("mode") or TEXT_ENTRY_MODE
+        if mode == "adaptive":
+            mode = choose_text_entry_mode(text)
+        if mode == "paste":
+            # One paste per line, with Enter pressed between the lines
+            seconds += (text.count("\n") + 1) * TEXT_PASTE_RESTORE_DELAY + text.count("\n") * PLAN_COST_KEY_PRESS
+        elif mode == "paced":
+            seconds += len(text) * TEXT_ENTRY_INTERVAL
+        else:
+            seconds += len(text) * PLAN_COST_KEY_PRESS
+    elif action_type == "press_key":
+        seconds += parameters.get("presses", 1) * PLAN_COST_KEY_PRESS
+    elif action_type == "hotkey":
+        seconds += len(parameters.get("keys", "").split("+")) * PLAN_COST_KEY_PRESS
+    return seconds + lookups * PLAN_COST_LOOKUP, lookups
+
+
+def estimate_cost(actions: Iterable[Action]) -> PlanCost:
+    """
+    Estimates how long a plan takes to run and how many screen lookups it
+    needs, from the PLAN_COST_* settings.
+    """
+    count, seconds, lookups = 0, 0.0, 0
+    for action in actions:
+        action_seconds, action_lookups = _action_cost(action)
+        count += 1
+        seconds += action_seconds
+        lookups += action_lookups
+    return PlanCost(count, round(seconds, 3), lookups)
+
+
+class CostReport(NamedTuple):
+    """Estimated cost of a plan before and after optimizing it."""
+
+    before: PlanCost
+    after: PlanCost
+    applied: Dict[str, int]
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.applied)
+
+    def format(self) -> str:
+        rules = ", ".join(f"{name} x{count}" for name, count in sorted(self.applied.items())) or "no rules applied"
+        return (
+            f"{self.before.actions} -> {self.after.actions} actions, "
+            f"~{self.before.seconds:.1f}s -> ~{self.after.seconds:.1f}s, "
+            f"{self.before.lookups} -> {self.after.lookups} screen lookups ({rules})"
+        )
+
+
+def optimize_plan(
+    plan: CompiledPlan, rules: Optional[List[PlanRule]] = None, registry: PluginRegistry = plugin_registry
+) -> Tuple[CompiledPlan, CostReport]:
+    """
+    Removes waste from a compiled plan: merged waits, text fragments and key
+    presses, and whatever else the rules find.
+
+    Args:
+        plan (CompiledPlan): The validated plan.
+        rules (list, optional): The rules to apply. Defaults to PLAN_OPTIMIZER_RULES.
+        registry (PluginRegistry): Registry used to compile the rewritten actions.
+
+    Returns:
+        tuple: The optimized plan (the same plan if no rule applied) and the cost report.
+    """
+    original = plan.to_dicts()
+    optimized, applied = optimize_actions(original, rules)
+    before = estimate_cost(original)
+    if not applied:
+        return plan, CostReport(before, before, applied)
+    report = CostReport(before, estimate_cost(optimized), applied)
+    logging.info("Plan optimized: %s", report.format())
+    return CompiledPlan([compile_action(action, index, registry) for index, action in enumerate(optimized)]), report
+
+
+def optimize_stream(
+    actions: Iterable[CompiledAction], rules: Optional[List[PlanRule]] = None, registry: PluginRegistry = plugin_registry
+) -> Iterator[CompiledAction]:
+    """
+    Optimizes a streamed plan as it arrives. Only actions that a rule might
+    merge with the next one are held back until that one arrives; everything
+    else runs as soon as it is compiled.
+    """
+    rules = get_plan_rules() if rules is None else rules
+    applied: Dict[str, int] = {}
+    held: Optional[Action] = None
+    index = 0
+    for compiled in actions:
+        for action in _rewrite(compiled.to_dict(), rules, applied):
+            if held is not None:
+                merged = _merge(held, action, rules, applied)
+                if merged is None:
+                    yield compile_action(held, index, registry)
+                    index += 1
+                else:
+                    # The result may merge with the next action in turn
+                    action = merged[0] if merged else None
+                held = None
+            if action is None:
+                continue
+            if any(rule.holds(action) for rule in rules):
+                held = action
+            else:
+                yield compile_action(action, index, registry)
+                index += 1
+    if held is not None:
+        yield compile_action(held, index, registry)
+    if applied:
+        logging.info("Streamed plan optimized: %s", ", ".join(f"{name} x{count}" for name, count in sorted(applied.items())))
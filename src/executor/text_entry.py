@@ -0,0 +1,21 @@
+# text_entry.py
+
+from ..config import TEXT_PASTE_MIN_LENGTH
+
+
+def choose_text_entry_mode(text):
+    """
+    Picks a text entry mode for the text: long, multi-line or non-ASCII text
+    (which pyautogui cannot type) is pasted, everything else is typed in a burst.
+    Multi-line text is pasted a line at a time, with Enter pressed between the
+    lines (see mouse_keyboard.paste_text).
+
+    Args:
+        text (str): The text to enter.
+
+    Returns:
+        str: "paste" or "burst".
+    """
+    if len(text) >= TEXT_PASTE_MIN_LENGTH or "\n" in text or not text.isascii():
+        return "paste"
+    return "burst"
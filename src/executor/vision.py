@@ -0,0 +1,248 @@
+# src/executor/vision.py
+
+import logging
+import os
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from ..config import (
+    IMAGES_DIR,
+    TARGET_IMAGE_MAP,
+    MATCH_CONFIDENCE,
+    MATCH_PYRAMID_LEVELS,
+    MATCH_TEMPLATE_SCALES,
+    MATCH_ROI_MARGIN,
+)
+
+
+class Match(NamedTuple):
+    """A located target, in screenshot pixel coordinates."""
+
+    x: int
+    y: int
+    width: int
+    height: int
+    score: float
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        return self.x + self.width // 2, self.y + self.height // 2
+
+
+def to_gray(image) -> np.ndarray:
+    """
+    Converts a PIL image or an RGB/RGBA/grayscale array to a grayscale uint8 array.
+    """
+    array = np.asarray(image)
+    if array.ndim == 2:
+        return array if array.dtype == np.uint8 else array.astype(np.uint8)
+    if array.shape[2] == 4:
+        return cv2.cvtColor(array, cv2.COLOR_RGBA2GRAY)
+    return cv2.cvtColor(array, cv2.COLOR_RGB2GRAY)
+
+
+class FramePyramid:
+    """
+    A grayscale frame with lazily built downscaled levels (level n is 1/2**n of
+    the original size), shared by all lookups against the same frame.
+    """
+
+    def __init__(self, frame):
+        self.levels: List[np.ndarray] = [to_gray(frame)]
+
+    @property
+    def base(self) -> np.ndarray:
+        return self.levels[0]
+
+    def level(self, n: int) -> np.ndarray:
+        while len(self.levels) <= n:
+            self.levels.append(cv2.pyrDown(self.levels[-1]))
+        return self.levels[n]
+
+
+def _best_match(image: np.ndarray, template: np.ndarray) -> Tuple[float, Tuple[int, int]]:
+    if image.shape[0] < template.shape[0] or image.shape[1] < template.shape[1]:
+        return -1.0, (0, 0)
+    result = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+    _, score, _, location = cv2.minMaxLoc(result)
+    return float(score), location
+
+
+class TemplateMatcher:
+    """
+    Locates UI targets on screen frames by template matching.
+
+    Templates are loaded once, converted to grayscale and kept in memory at
+    every configured scale (for HiDPI displays). Lookups first try a region of
+    interest around the target's last known location, then run a coarse search
+    on a downscaled copy of the frame and refine the best candidate at full
+    resolution.
+    """
+
+    def __init__(
+        self,
+        images_dir: str = IMAGES_DIR,
+        target_image_map: Optional[Dict[str, str]] = None,
+        confidence: float = MATCH_CONFIDENCE,
+        pyramid_levels: int = MATCH_PYRAMID_LEVELS,
+        scales: Sequence[float] = MATCH_TEMPLATE_SCALES,
+        roi_margin: int = MATCH_ROI_MARGIN,
+        min_template_size: int = 12,
+    ):
+        self.images_dir = images_dir
+        self.target_image_map = dict(TARGET_IMAGE_MAP if target_image_map is None else target_image_map)
+        self.confidence = confidence
+        self.pyramid_levels = pyramid_levels
+        self.scales = tuple(scales)
+        self.roi_margin = roi_margin
+        self.min_template_size = min_template_size
+        self.last_locations: Dict[str, Match] = {}
+        # target -> one pyramid (list of halved levels) per template scale
+        self._templates: Dict[str, List[List[np.ndarray]]] = {}
+        self._lock = threading.Lock()
+
+    def has_target(self, target: str) -> bool:
+        return target.lower() in self.target_image_map
+
+    def add_template(self, target: str, image) -> None:
+        """Registers an in-memory template (PIL image or array) for a target."""
+        target = target.lower()
+        gray = to_gray(image)
+        templates = []
+        for scale in self.scales:
+            if scale == 1.0:
+                template = gray
+            else:
+                size = (max(1, round(gray.shape[1] * scale)), max(1, round(gray.shape[0] * scale)))
+                template = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+            # Downscale the same way as the frame so that coarse levels line up
+            levels = [template]
+            while (
+                len(levels) <= self.pyramid_levels
+                and min(levels[-1].shape) // 2 >= self.min_template_size
+            ):
+                levels.append(cv2.pyrDown(levels[-1]))
+            templates.append(levels)
+        with self._lock:
+            self.target_image_map.setdefault(target, target)
+            self._templates[target] = templates
+            self.last_locations.pop(target, None)
+
+    def templates(self, target: str) -> List[List[np.ndarray]]:
+        """
+        Returns the cached grayscale template pyramids of a target (one per
+        scale), loading them on first use.
+        """
+        target = target.lower()
+        templates = self._templates.get(target)
+        if templates is None:
+            image_filename = self.target_image_map.get(target)
+            if not image_filename:
+                raise KeyError(f"No image mapping found for '{target}'")
+            image_path = os.path.join(self.images_dir, image_filename)
+            image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                raise FileNotFoundError(f"Could not read template image '{image_path}'")
+            self.add_template(target, image)
+            templates = self._templates[target]
+        return templates
+
+    def preload(self) -> None:
+        """Loads every mapped template into the cache."""
+        for target in list(self.target_image_map):
+            try:
+                self.templates(target)
+            except (KeyError, FileNotFoundError) as e:
+                logging.warning("Skipping template for '%s': %s", target, e)
+
+    def _search_roi(self, frame: np.ndarray, template: np.ndarray, hint: Match) -> Optional[Match]:
+        height, width = template.shape
+        x0 = max(0, hint.x - self.roi_margin)
+        y0 = max(0, hint.y - self.roi_margin)
+        x1 = min(frame.shape[1], hint.x + hint.width + self.roi_margin)
+        y1 = min(frame.shape[0], hint.y + hint.height + self.roi_margin)
+        score, (x, y) = _best_match(frame[y0:y1, x0:x1], template)
+        if score >= self.confidence:
+            return Match(x0 + x, y0 + y, width, height, score)
+        return None
+
+    def _search_pyramid(self, pyramid: FramePyramid, levels: List[np.ndarray]) -> Optional[Match]:
+        template = levels[0]
+        height, width = template.shape
+        level = len(levels) - 1
+        frame = pyramid.base
+        if level == 0:
+            score, (x, y) = _best_match(frame, template)
+            return Match(x, y, width, height, score) if score >= self.confidence else None
+
+        factor = 2 ** level
+        # Downscaling blurs detail, so accept weaker coarse candidates and let
+        # the full resolution pass decide.
+        score, (x, y) = _best_match(pyramid.level(level), levels[level])
+        if score < self.confidence - 0.15:
+            return None
+        pad = 2 * factor
+        x0, y0 = max(0, x * factor - pad), max(0, y * factor - pad)
+        x1 = min(frame.shape[1], x * factor + width + pad)
+        y1 = min(frame.shape[0], y * factor + height + pad)
+        score, (rx, ry) = _best_match(frame[y0:y1, x0:x1], template)
+        if score >= self.confidence:
+            return Match(x0 + rx, y0 + ry, width, height, score)
+        return None
+
+    def locate(self, target: str, frame) -> Optional[Match]:
+        """
+        Locates a target on a frame.
+
+        Args:
+            target (str): Description of the target (a key of the image map).
+            frame: A FramePyramid, PIL image or array of the screen.
+
+        Returns:
+            Match: The best match in frame pixel coordinates, or None if not found.
+        """
+        target = target.lower()
+        pyramid = frame if isinstance(frame, FramePyramid) else FramePyramid(frame)
+        templates = self.templates(target)
+
+        hint = self.last_locations.get(target)
+        if hint is not None:
+            for levels in templates:
+                if levels[0].shape == (hint.height, hint.width):
+                    match = self._search_roi(pyramid.base, levels[0], hint)
+                    if match:
+                        self.last_locations[target] = match
+                        return match
+
+        best = None
+        for levels in templates:
+            match = self._search_pyramid(pyramid, levels)
+            if match and (best is None or match.score > best.score):
+                best = match
+        if best is not None:
+            self.last_locations[target] = best
+        return best
+
+
+def screen_scale(frame_width: int, screen_width: int) -> float:
+    """
+    Returns the ratio between screenshot pixels and the logical coordinates
+    used for mouse movement (2.0 on a Retina display).
+    """
+    return frame_width / screen_width if screen_width else 1.0
+
+
+_matcher: Optional[TemplateMatcher] = None
+_matcher_lock = threading.Lock()
+
+
+def get_matcher() -> TemplateMatcher:
+    """Returns the process-wide template matcher."""
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            _matcher = TemplateMatcher()
+        return _matcher
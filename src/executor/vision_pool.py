@@ -0,0 +1,318 @@
+# src/executor/vision_pool.py
+
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import (
+    IMAGES_DIR,
+    MATCH_CONFIDENCE,
+    MATCH_PYRAMID_LEVELS,
+    MATCH_TEMPLATE_SCALES,
+    MATCH_ROI_MARGIN,
+    VISION_WORKERS,
+    VISION_MIN_BAND_HEIGHT,
+)
+from .vision import FramePyramid, Match, TemplateMatcher, to_gray
+
+# A frame published to the workers: shared memory segment name and array shape
+FrameHandle = Tuple[str, Tuple[int, ...]]
+
+# --- Worker process state ---
+_worker_matcher: Optional[TemplateMatcher] = None
+_worker_segments: Dict[str, shared_memory.SharedMemory] = {}
+_worker_untracks = False
+
+
+def _init_worker(settings: Dict[str, Any], templates: List[Tuple[str, np.ndarray]], untrack: bool) -> None:
+    global _worker_matcher, _worker_untracks
+    _worker_untracks = untrack
+    _worker_matcher = TemplateMatcher(**settings)
+    for target, image in templates:
+        _worker_matcher.add_template(target, image)
+    # Keep every template hot, so no search waits for disk
+    _worker_matcher.preload()
+
+
+def attach_frame(handle: FrameHandle) -> np.ndarray:
+    """
+    Returns a read-only view of a frame published with VisionPool.share(),
+    attaching to its shared memory segment on first use in this process.
+    """
+    name, shape = handle
+    segment = _worker_segments.get(name)
+    if segment is None:
+        for old in list(_worker_segments):
+            try:
+                _worker_segments.pop(old).close()
+            except BufferError:
+                pass  # Still viewed by a running search; freed with the process
+        segment = shared_memory.SharedMemory(name=name)
+        if _worker_untracks:
+            # The publishing process owns the segment; do not let this
+            # process's own resource tracker unlink it on exit
+            resource_tracker.unregister(segment._name, "shared_memory")
+        _worker_segments[name] = segment
+    frame = np.ndarray(shape, dtype=np.uint8, buffer=segment.buf)
+    frame.flags.writeable = False
+    return frame
+
+
+def _search_region(handle: FrameHandle, target: str, top: int, bottom: int) -> Optional[Match]:
+    frame = attach_frame(handle)
+    pyramid = FramePyramid(frame[top:bottom])
+    best = None
+    for levels in _worker_matcher.templates(target):
+        match = _worker_matcher._search_pyramid(pyramid, levels)
+        if match and (best is None or match.score > best.score):
+            best = match
+    return best._replace(y=best.y + top) if best else None
+
+
+def _search_hint(handle: FrameHandle, target: str, hint: Match) -> Optional[Match]:
+    frame = attach_frame(handle)
+    for levels in _worker_matcher.templates(target):
+        if levels[0].shape == (hint.height, hint.width):
+            match = _worker_matcher._search_roi(frame, levels[0], hint)
+            if match:
+                return match
+    return None
+
+
+def _call_on_frame(func: Callable, handle: FrameHandle, region: Tuple[int, int, int, int], *args) -> Any:
+    x, y, width, height = region
+    return func(np.ascontiguousarray(attach_frame(handle)[y : y + height, x : x + width]), *args)
+
+
+# --- Client ---
+class VisionPool:
+    """
+    Runs screen searches in worker processes, so that matching never holds the
+    GIL of the process driving the UI and uses every core.
+
+    Each worker keeps its own hot template cache. Frames are published once
+    per capture through shared memory and read by the workers without
+    copying. A search for one target is split into horizontal bands, one per
+    worker; searches for several targets run at the same time. It offers the
+    same has_target()/locate() interface as TemplateMatcher, so it can be used
+    wherever a matcher is expected.
+
+    Args:
+        workers (int, optional): Worker processes (defaults to the number of CPU cores).
+        min_band_height (int): Bands are never smaller than this many pixels.
+        Remaining arguments are those of TemplateMatcher.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = VISION_WORKERS,
+        min_band_height: int = VISION_MIN_BAND_HEIGHT,
+        images_dir: str = IMAGES_DIR,
+        target_image_map: Optional[Dict[str, str]] = None,
+        confidence: float = MATCH_CONFIDENCE,
+        pyramid_levels: int = MATCH_PYRAMID_LEVELS,
+        scales: Iterable[float] = MATCH_TEMPLATE_SCALES,
+        roi_margin: int = MATCH_ROI_MARGIN,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_band_height = min_band_height
+        # The local matcher knows the targets, template sizes and last locations
+        self.matcher = TemplateMatcher(
+            images_dir, target_image_map, confidence, pyramid_levels, tuple(scales), roi_margin
+        )
+        self._settings = {
+            "images_dir": images_dir,
+            "target_image_map": dict(self.matcher.target_image_map),
+            "confidence": confidence,
+            "pyramid_levels": pyramid_levels,
+            "scales": tuple(scales),
+            "roi_margin": roi_margin,
+        }
+        self._templates: List[Tuple[str, np.ndarray]] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Published frames, newest last. The previous one is kept until the
+        # next publish, so searches still queued for it can attach.
+        self._segments: List[shared_memory.SharedMemory] = []
+        self._source: Optional[np.ndarray] = None
+        self._handle: Optional[FrameHandle] = None
+        self._lock = threading.RLock()
+
+    @property
+    def last_locations(self) -> Dict[str, Match]:
+        return self.matcher.last_locations
+
+    def has_target(self, target: str) -> bool:
+        return self.matcher.has_target(target)
+
+    def add_template(self, target: str, image) -> None:
+        """Registers an in-memory template; workers are restarted to pick it up."""
+        gray = to_gray(image)
+        with self._lock:
+            self.matcher.add_template(target, gray)
+            self._templates.append((target.lower(), gray))
+            self._settings["target_image_map"] = dict(self.matcher.target_image_map)
+            self._shutdown_executor()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """The worker pool, started on first use."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    # Forked workers share the resource tracker of this process
+                    initargs=(self._settings, self._templates, multiprocessing.get_start_method() != "fork"),
+                )
+            return self._executor
+
+    def share(self, frame) -> FrameHandle:
+        """
+        Publishes a frame (array or FramePyramid) to the workers. The same
+        frame object is only copied into shared memory once.
+        """
+        array = frame.base if isinstance(frame, FramePyramid) else to_gray(frame)
+        with self._lock:
+            if self._source is not array:
+                segment = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                np.ndarray(array.shape, dtype=np.uint8, buffer=segment.buf)[...] = array
+                self._segments.append(segment)
+                self._release_segments(keep=2)
+                self._source, self._handle = array, (segment.name, array.shape)
+            return self._handle
+
+    def _bands(self, height: int, template_height: int) -> List[Tuple[int, int]]:
+        count = max(1, min(self.workers, height // max(self.min_band_height, 2 * template_height)))
+        band = -(-height // count)
+        # Band starts are aligned to the coarsest pyramid level
+        step = 2 ** self.matcher.pyramid_levels
+        band = -(-band // step) * step
+        # Bands overlap by a template height, so no position is missed
+        return [(top, min(height, top + band + template_height - 1)) for top in range(0, height, band)]
+
+    def submit(self, target: str, frame) -> Future:
+        """
+        Starts looking for a target on a frame.
+
+        Returns:
+            Future: Resolves to the best Match, or None.
+        """
+        target = target.lower()
+        templates = self.matcher.templates(target)  # Raises early for unknown targets
+        handle = self.share(frame)
+        height = handle[1][0]
+        hint = self.matcher.last_locations.get(target)
+        result: Future = Future()
+        executor = self.executor
+
+        def finish(match: Optional[Match]) -> None:
+            if match is not None:
+                self.matcher.last_locations[target] = match
+            result.set_result(match)
+
+        def search_bands() -> None:
+            template_height = max(levels[0].shape[0] for levels in templates)
+            futures = [
+                executor.submit(_search_region, handle, target, top, bottom)
+                for top, bottom in self._bands(height, template_height)
+            ]
+            pending = [len(futures)]
+            lock = threading.Lock()
+
+            def band_done(_) -> None:
+                with lock:
+                    pending[0] -= 1
+                    if pending[0]:
+                        return
+                try:
+                    matches = [future.result() for future in futures]
+                except Exception as e:
+                    result.set_exception(e)
+                    return
+                found = [match for match in matches if match is not None]
+                finish(max(found, key=lambda match: match.score) if found else None)
+
+            for future in futures:
+                future.add_done_callback(band_done)
+
+        if hint is None:
+            search_bands()
+            return result
+
+        def hint_done(future: Future) -> None:
+            try:
+                match = future.result()
+            except Exception as e:
+                result.set_exception(e)
+                return
+            if match is not None:
+                finish(match)
+            else:
+                search_bands()
+
+        executor.submit(_search_hint, handle, target, hint).add_done_callback(hint_done)
+        return result
+
+    def locate(self, target: str, frame) -> Optional[Match]:
+        """
+        Locates a target on a frame (see TemplateMatcher.locate).
+
+        Returns:
+            Match: The best match in frame pixel coordinates, or None if not found.
+        """
+        return self.submit(target, frame).result()
+
+    def locate_many(self, targets: Iterable[str], frame) -> Dict[str, Optional[Match]]:
+        """Locates several targets on the same frame in parallel."""
+        futures = {target: self.submit(target, frame) for target in targets}
+        return {target: future.result() for target, future in futures.items()}
+
+    def map_regions(self, func: Callable, frame, regions: List[Tuple[int, int, int, int]], *args) -> List[Future]:
+        """
+        Runs func(region_pixels, *args) in the workers for each region of a
+        frame, reading the pixels from shared memory. func must be a
+        module-level function.
+        """
+        handle = self.share(frame)
+        return [self.executor.submit(_call_on_frame, func, handle, region, *args) for region in regions]
+
+    def _release_segments(self, keep: int = 0) -> None:
+        while len(self._segments) > keep:
+            segment = self._segments.pop(0)
+            segment.close()
+            segment.unlink()
+        if not self._segments:
+            self._source, self._handle = None, None
+
+    def _shutdown_executor(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def close(self) -> None:
+        """Stops the workers and frees the shared frame."""
+        with self._lock:
+            self._shutdown_executor()
+            self._release_segments()
+
+
+_vision_pool: Optional[VisionPool] = None
+_vision_pool_lock = threading.Lock()
+
+
+def get_vision_pool() -> VisionPool:
+    """Returns the process-wide vision worker pool."""
+    global _vision_pool
+    with _vision_pool_lock:
+        if _vision_pool is None:
+            _vision_pool = VisionPool()
+            atexit.register(_vision_pool.close)
+            logging.info("Vision pool using %s worker processes", _vision_pool.workers)
+        return _vision_pool
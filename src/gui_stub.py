@@ -1,74 +1,139 @@
-import streamlit as st
-from src.nlu.interpreter import interpret_command, decompose_task
-from src.executor.action_mapper import execute_action
+from collections import deque
+
 import logging
-import io
-import sys
+import streamlit as st
+from src.client import DaemonClient
+from src.config import GUI_LOG_LINES, GUI_POLL_INTERVAL, GUI_USE_DAEMON
+from src.gui_worker import DONE, GuiWorker, RemoteWorker
+from src.utils.logger import new_correlation_id, setup_logger
 
 st.set_page_config(page_title="Natural Language Automation System", layout="centered")
 st.title("Natural Language Automation System (GUI)")
 
-# Capture logs for display
-class StreamToLogger(io.StringIO):
-    def __init__(self):
-        super().__init__()
-        self.contents = ""
-    def write(self, s):
-        self.contents += s
-        super().write(s)
-    def getvalue(self):
-        return self.contents
-
-def run_with_log_capture(func, *args, **kwargs):
-    log_capture = StreamToLogger()
-    old_stdout, old_stderr = sys.stdout, sys.stderr
-    sys.stdout, sys.stderr = log_capture, log_capture
-    try:
-        result = func(*args, **kwargs)
-    finally:
-        sys.stdout, sys.stderr = old_stdout, old_stderr
-    return result, log_capture.getvalue()
-
-# Session state for command, plan, approval, feedback, and logs
-if 'command' not in st.session_state:
-    st.session_state.command = ''
-if 'interpretation' not in st.session_state:
-    st.session_state.interpretation = None
-if 'atomic_actions' not in st.session_state:
-    st.session_state.atomic_actions = None
-if 'approved' not in st.session_state:
-    st.session_state.approved = False
-if 'feedback' not in st.session_state:
-    st.session_state.feedback = ''
-if 'execution_log' not in st.session_state:
-    st.session_state.execution_log = ''
-if 'execution_status' not in st.session_state:
-    st.session_state.execution_status = ''
+
+@st.cache_resource
+def get_worker():
+    """
+    Set up once per server process instead of on every rerun. With the
+    automation daemon running (python -m src.daemon), planning and execution
+    happen there; otherwise logging, the templates (and vision workers), and
+    the background planner and executor are set up here.
+    """
+    setup_logger()
+    client = DaemonClient()
+    if GUI_USE_DAEMON and client.available():
+        logging.info("Using the automation daemon at %s", client.url)
+        return RemoteWorker(client)
+    import src.executor.action_mapper  # noqa: F401  Registers the default action plugin
+    from src.executor.environment import get_locator
+
+    get_locator()
+    worker = GuiWorker()
+    worker.attach()
+    return worker
+
+
+worker = get_worker()
+
+# Session state for command, plan, approval, feedback, background work and logs
+defaults = {
+    "command": "",
+    "correlation_id": None,
+    "planning": None,
+    "interpretation": None,
+    "atomic_actions": None,
+    "compiled_plan": None,
+    "optimization": None,
+    "plan_errors": None,
+    "approved": False,
+    "feedback": "",
+    "run": None,
+    "log_sequence": 0,
+    "run_polled": False,
+}
+for key, value in defaults.items():
+    if key not in st.session_state:
+        st.session_state[key] = value
+if "log_lines" not in st.session_state:
+    st.session_state.log_lines = deque(maxlen=GUI_LOG_LINES)
+
+
+def busy() -> bool:
+    run = st.session_state.run
+    return st.session_state.planning is not None or (run is not None and run.active)
+
+
+def store_plan(preview) -> None:
+    # The whole plan was validated (and optimized) before the user can approve it
+    st.session_state.interpretation = preview["interpretation"]
+    st.session_state.atomic_actions = preview["actions"]
+    st.session_state.compiled_plan = preview["compiled"]
+    st.session_state.plan_errors = preview["errors"] or None
+    st.session_state.optimization = preview["optimization"]
+
+
+def activity_panel() -> None:
+    """Planning status, execution progress and the log of the current command; refreshed while busy."""
+    planning = st.session_state.planning
+    if planning is not None:
+        if planning.done():
+            st.session_state.planning = None
+            try:
+                store_plan(planning.result())
+            except Exception as e:
+                st.session_state.plan_errors = [f"Planning failed: {e}"]
+            st.rerun()  # Shows the plan and stops refreshing
+        st.info("Planning...")
+
+    run = st.session_state.run
+    if run is not None:
+        st.subheader("Execution Status")
+        total = len(run.actions)
+        st.progress(run.completed / total if total else 1.0, text=f"{run.completed}/{total} actions, {run.state}")
+        st.dataframe(run.rows(), hide_index=True)
+        if run.active:
+            if st.button("Cancel", help="Skip the remaining actions; the running one finishes first"):
+                run.cancel()
+        elif run.error:
+            st.error(run.error)
+        elif run.state == DONE:
+            st.success("All actions executed.")
+        else:
+            st.warning("Execution cancelled.")
+
+    # Only fetch the lines logged since the last refresh
+    lines, st.session_state.log_sequence = worker.log.lines_since(
+        st.session_state.log_sequence, st.session_state.correlation_id
+    )
+    st.session_state.log_lines.extend(lines)
+    if st.session_state.log_lines:
+        st.subheader("Execution Log")
+        st.code("\n".join(st.session_state.log_lines))
+
+    if run is not None and not run.active and st.session_state.run_polled:
+        st.session_state.run_polled = False
+        st.rerun()  # Stops refreshing
+    st.session_state.run_polled = run is not None and run.active
+
 
 st.write("Enter a natural language command to automate your MacBook:")
 command = st.text_input("Command", value=st.session_state.command, key="command_input")
 
-if st.button("Interpret & Preview Plan"):
+if st.button("Interpret & Preview Plan", disabled=busy()):
     st.session_state.command = command
+    st.session_state.correlation_id = new_correlation_id()
     st.session_state.approved = False
-    st.session_state.feedback = ''
-    st.session_state.execution_log = ''
-    st.session_state.execution_status = ''
-    interpretation, log = run_with_log_capture(interpret_command, command)
-    st.session_state.interpretation = interpretation
+    st.session_state.feedback = ""
+    st.session_state.interpretation = None
     st.session_state.atomic_actions = None
-    if interpretation:
-        if not interpretation.get("needs_decomposition", False):
-            action = interpretation.get("action")
-            if action:
-                st.session_state.atomic_actions = [action]
-        else:
-            task_description = interpretation.get("intent", "")
-            if task_description:
-                atomic_actions, log2 = run_with_log_capture(decompose_task, task_description)
-                st.session_state.atomic_actions = atomic_actions
-                log += log2
-    st.session_state.execution_log = log
+    st.session_state.compiled_plan = None
+    st.session_state.optimization = None
+    st.session_state.plan_errors = None
+    st.session_state.run = None
+    st.session_state.log_lines.clear()
+    # Interpretation and decomposition come back from a single model call,
+    # made in the background so the page stays responsive
+    st.session_state.planning = worker.preview(command, st.session_state.correlation_id)
 
 if st.session_state.interpretation:
     st.subheader("Interpreted Intent")
@@ -76,29 +141,21 @@ if st.session_state.interpretation:
     if st.session_state.atomic_actions:
         st.subheader("Action Plan (Dry-Run)")
         st.json(st.session_state.atomic_actions)
+        if st.session_state.optimization:
+            st.caption(f"Optimized: {st.session_state.optimization}")
+        if st.session_state.plan_errors:
+            st.error("The plan cannot be executed:\n\n" + "\n".join(f"- {error}" for error in st.session_state.plan_errors))
         st.info("Review the action plan below. You can provide feedback or corrections before execution.")
         st.session_state.feedback = st.text_area("Feedback / Corrections (optional)", value=st.session_state.feedback, key="feedback_box")
-        if not st.session_state.approved:
+        if not st.session_state.approved and st.session_state.compiled_plan:
             if st.button("Approve and Execute Plan"):
                 st.session_state.approved = True
-                st.session_state.execution_status = "Running..."
-                log = ""
-                for action in st.session_state.atomic_actions:
-                    success, action_log = run_with_log_capture(execute_action, action)
-                    log += action_log
-                    if not success:
-                        st.session_state.execution_status = f"Failed to execute action: {action}"
-                        break
-                else:
-                    st.session_state.execution_status = "All actions executed."
-                st.session_state.execution_log = log
+                # Runs on the background executor; progress is shown below
+                st.session_state.run = worker.execute(st.session_state.compiled_plan, st.session_state.correlation_id)
     else:
         st.warning("No atomic actions found. Please check your command or try again.")
+elif st.session_state.plan_errors:
+    st.error("\n".join(st.session_state.plan_errors))
 
-if st.session_state.execution_status:
-    st.subheader("Execution Status")
-    st.write(st.session_state.execution_status)
-
-if st.session_state.execution_log:
-    st.subheader("Execution Log")
-    st.code(st.session_state.execution_log) 
\ No newline at end of file
+# Only this part of the page reruns while planning or execution is in progress
+st.fragment(activity_panel, run_every=GUI_POLL_INTERVAL if busy() else None)()
@@ -0,0 +1,373 @@
+# gui_worker.py
+
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.client import FINISHED, DaemonClient, DaemonError
+from src.config import GUI_LOG_LINES, GUI_POLL_INTERVAL, RECOVERY_ENABLED
+from src.nlu.interpreter import plan_command
+from src.recovery import ExecutionCheckpoint, FailureContext, capture_failure, replan_and_compile, run_with_recovery
+from src.session import preview_plan
+from src.utils.logger import CorrelationFilter, correlation_scope, new_correlation_id
+
+# Action states shown in the GUI
+PENDING, RUNNING, DONE, FAILED, SKIPPED, CANCELLED = "pending", "running", "done", "failed", "skipped", "cancelled"
+
+
+class RingBufferLogHandler(logging.Handler):
+    """
+    Keeps the last `capacity` formatted log lines in memory, each with a
+    sequence number, so that a page can fetch only the lines it has not shown
+    yet. Memory stays bounded however long the session runs.
+
+    Args:
+        capacity (int): Number of lines kept.
+    """
+
+    def __init__(self, capacity: int = GUI_LOG_LINES, level: int = logging.INFO):
+        super().__init__(level)
+        self.setFormatter(logging.Formatter("%(asctime)s %(levelname)s: %(message)s", "%H:%M:%S"))
+        self.addFilter(CorrelationFilter())
+        self._lines: deque = deque(maxlen=capacity)
+        self._sequence = 0
+        self._buffer_lock = threading.Lock()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self._buffer_lock:
+            self._sequence += 1
+            self._lines.append((self._sequence, record.correlation_id, line))
+
+    def lines_since(self, sequence: int, correlation_id: Optional[str] = None) -> Tuple[List[str], int]:
+        """
+        Returns the lines logged after `sequence` (optionally only those of one
+        command), and the sequence number to pass next time. Lines that have
+        already dropped out of the buffer are skipped.
+        """
+        with self._buffer_lock:
+            last = self._sequence
+            if sequence >= last:
+                return [], last
+            # The newest lines are at the end; only look at the ones not seen yet
+            entries = list(islice(reversed(self._lines), last - sequence))
+        entries.reverse()
+        lines = [line for _, owner, line in entries if correlation_id is None or owner == correlation_id]
+        return lines, last
+
+
+def _record_failure(action: Dict[str, Any], checkpoint: ExecutionCheckpoint) -> FailureContext:
+    # Without replanning, the screen at the failure is not needed
+    return FailureContext(action, len(checkpoint.completed), len(checkpoint.failures) + 1)
+
+
+class PlanRun:
+    """
+    Progress of one plan executing in the background. Read by the page while
+    the worker thread updates it. Actions replanned after a failure are
+    appended to `actions`; `checkpoint` is set once the run has finished.
+    """
+
+    def __init__(self, actions: List[Any], correlation_id: str, command: Optional[str] = None):
+        self.actions = actions
+        self.correlation_id = correlation_id
+        self.command = command
+        self.checkpoint: Optional[ExecutionCheckpoint] = None
+        self.statuses: List[str] = [PENDING] * len(actions)
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def completed(self) -> int:
+        return sum(status in (DONE, FAILED, SKIPPED) for status in self.statuses)
+
+    @property
+    def active(self) -> bool:
+        return not self._done.is_set()
+
+    def cancel(self) -> None:
+        """Skips the actions that have not started; the running one finishes first."""
+        self._cancel.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """One row per action for display: number, status, type and parameters (as JSON)."""
+        rows = []
+        for index, (action, status) in enumerate(zip(self.actions, self.statuses)):
+            action = action.to_dict()
+            rows.append(
+                {
+                    "#": index + 1,
+                    "status": status,
+                    "action_type": action.get("action_type"),
+                    "parameters": json.dumps(action.get("parameters", {})),
+                }
+            )
+        return rows
+
+
+class GuiWorker:
+    """
+    Runs the GUI's slow work off the Streamlit script thread: planning on a
+    small thread pool and plan execution on one background thread, in
+    submission order (there is only one keyboard and mouse). Log records of
+    both are kept in a ring buffer the page tails.
+
+    Args:
+        planner (callable): Command -> plan dict. Defaults to plan_command.
+        log_lines (int): Capacity of the log ring buffer.
+        replan (callable, optional): Replans the rest of a run given its command
+            after an action failed (see run_with_recovery). None stops at the first failure.
+    """
+
+    def __init__(
+        self,
+        planner=plan_command,
+        log_lines: int = GUI_LOG_LINES,
+        replan=replan_and_compile if RECOVERY_ENABLED else None,
+    ):
+        self.planner = planner
+        self.replan = replan
+        self.log = RingBufferLogHandler(log_lines)
+        self._planning = ThreadPoolExecutor(max_workers=2, thread_name_prefix="gui-planner")
+        self._runs: "queue.Queue[Optional[PlanRun]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._execute_runs, name="gui-executor", daemon=True)
+        self._thread.start()
+
+    def attach(self, logger: Optional[logging.Logger] = None) -> None:
+        """Starts capturing the records of `logger` (the root logger by default)."""
+        logger = logger or logging.getLogger("")
+        if self.log not in logger.handlers:
+            logger.addHandler(self.log)
+
+    def detach(self, logger: Optional[logging.Logger] = None) -> None:
+        (logger or logging.getLogger("")).removeHandler(self.log)
+
+    def plan(self, command: str, correlation_id: Optional[str] = None) -> Future:
+        """Plans a command in the background. The future resolves to the plan dict (or None)."""
+        correlation_id = correlation_id or new_correlation_id()
+        return self._planning.submit(self._plan, command, correlation_id)
+
+    def _plan(self, command: str, correlation_id: str) -> Optional[Dict[str, Any]]:
+        with correlation_scope(correlation_id):
+            logging.info("Planning: %s", command)
+            return self.planner(command)
+
+    def preview(self, command: str, correlation_id: Optional[str] = None) -> Future:
+        """Plans a command in the background. The future resolves to its preview_plan result."""
+        correlation_id = correlation_id or new_correlation_id()
+        return self._planning.submit(self._preview, command, correlation_id)
+
+    def _preview(self, command: str, correlation_id: str) -> Dict[str, Any]:
+        plan = self._plan(command, correlation_id)
+        with correlation_scope(correlation_id):
+            return preview_plan(plan)
+
+    def execute(self, actions: Iterable[Any], correlation_id: Optional[str] = None, command: Optional[str] = None) -> PlanRun:
+        """
+        Queues compiled actions for execution and returns their PlanRun right
+        away. Actions run once every previously queued run has finished. Given
+        the command they carry out, the rest of the run is replanned when an
+        action fails; otherwise the run stops there.
+        """
+        run = PlanRun(list(actions), correlation_id or new_correlation_id(), command)
+        self._runs.put(run)
+        return run
+
+    def _execute_runs(self) -> None:
+        while True:
+            run = self._runs.get()
+            if run is None:
+                return
+            with correlation_scope(run.correlation_id):
+                self._execute(run)
+
+    def _execute(self, run: PlanRun) -> None:
+        run.started = time.perf_counter()
+        run.state = RUNNING
+        replan = self.replan if run.command else None
+
+        def tracked(actions: List[Any], first: int) -> Iterator[Any]:
+            for index, action in enumerate(actions, first):
+                run.statuses[index] = RUNNING
+                yield action
+
+        def on_action(action: Any, success: bool) -> None:
+            run.statuses[run.statuses.index(RUNNING)] = DONE if success else FAILED
+
+        def replan_rest(command: str, completed: List[Dict[str, Any]], failure: FailureContext) -> Optional[Iterator[Any]]:
+            actions = replan(command, completed, failure)
+            if not actions:
+                return None
+            actions = list(actions)
+            first = len(run.actions)
+            # The rest of the failed plan never runs
+            run.statuses = [SKIPPED if status == PENDING else status for status in run.statuses] + [PENDING] * len(actions)
+            run.actions = run.actions + actions
+            return tracked(actions, first)
+
+        try:
+            run.checkpoint = checkpoint = run_with_recovery(
+                run.command or "",
+                tracked(run.actions, 0),
+                replan=replan_rest if replan is not None else None,
+                on_action=on_action,
+                should_stop=run._cancel.is_set,
+                capture=capture_failure if replan is not None else _record_failure,
+            )
+            if checkpoint.cancelled:
+                run.state = CANCELLED
+                logging.info("Execution cancelled before action %d", checkpoint.executed + 1)
+            elif checkpoint.finished:
+                run.state = DONE
+            else:
+                run.state = FAILED
+                run.error = f"Failed to execute action: {checkpoint.failures[-1].action}"
+        except Exception as e:
+            logging.exception("Execution failed")
+            run.state = FAILED
+            run.error = str(e)
+        finally:
+            # An action handed out when the run was cancelled never ran
+            after = {PENDING: SKIPPED, RUNNING: SKIPPED if run.state == CANCELLED else FAILED}
+            run.statuses = [after.get(status, status) for status in run.statuses]
+            run.finished = time.perf_counter()
+            run._done.set()
+
+    def close(self) -> None:
+        """Stops the worker after the queued runs and releases the log handler."""
+        self._runs.put(None)
+        self._planning.shutdown(wait=False, cancel_futures=True)
+        self.detach()
+
+
+class RemoteLog:
+    """Tails the daemon's log buffer, like RingBufferLogHandler.lines_since."""
+
+    def __init__(self, client: DaemonClient):
+        self.client = client
+
+    def lines_since(self, sequence: int, correlation_id: Optional[str] = None) -> Tuple[List[str], int]:
+        try:
+            logs = self.client.logs(sequence, correlation_id)
+        except DaemonError:
+            return [], sequence
+        return logs["lines"], logs["sequence"]
+
+
+class RemoteRun:
+    """
+    A plan running on the daemon, read like a PlanRun. The status is fetched
+    again when it is older than half the GUI's refresh interval.
+    """
+
+    def __init__(self, client: DaemonClient, status: Dict[str, Any], actions: List[Dict[str, Any]]):
+        self.client = client
+        self.correlation_id = status["id"]
+        self._status = status
+        self._actions = actions
+        self._fetched = time.perf_counter()
+
+    def _current(self) -> Dict[str, Any]:
+        if self._status["state"] not in FINISHED and time.perf_counter() - self._fetched > GUI_POLL_INTERVAL / 2:
+            try:
+                self._status = self.client.status(self.correlation_id)
+            except DaemonError as e:
+                self._status = dict(self._status, state=FAILED, error=str(e))
+            self._fetched = time.perf_counter()
+        return self._status
+
+    @property
+    def actions(self) -> List[Dict[str, Any]]:
+        return self._current().get("actions", self._actions)
+
+    @property
+    def statuses(self) -> List[str]:
+        return self._current().get("statuses", [PENDING] * len(self._actions))
+
+    @property
+    def state(self) -> str:
+        return self._current()["state"]
+
+    @property
+    def error(self) -> Optional[str]:
+        return self._current().get("error")
+
+    @property
+    def completed(self) -> int:
+        return sum(status in (DONE, FAILED, SKIPPED) for status in self.statuses)
+
+    @property
+    def active(self) -> bool:
+        return self.state not in FINISHED
+
+    def cancel(self) -> None:
+        self._status = self.client.cancel(self.correlation_id)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        self._status = self.client.status(self.correlation_id, wait=timeout)
+        self._fetched = time.perf_counter()
+        return not self.active
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return [
+            {"#": index + 1, "status": status, "action_type": action.get("action_type"), "parameters": json.dumps(action.get("parameters", {}))}
+            for index, (action, status) in enumerate(zip(self.actions, self.statuses))
+        ]
+
+
+class RemoteWorker:
+    """
+    Same interface as GuiWorker, but planning and execution happen in the
+    automation daemon (src/daemon.py), which keeps the model and the
+    templates warm and runs the commands of all its clients in order.
+
+    Args:
+        client (DaemonClient): Connection to the daemon.
+    """
+
+    def __init__(self, client: DaemonClient):
+        self.client = client
+        self.log = RemoteLog(client)
+        self._planning = ThreadPoolExecutor(max_workers=2, thread_name_prefix="gui-planner")
+        self._commands: Dict[str, str] = {}
+
+    def attach(self, logger: Optional[logging.Logger] = None) -> None:
+        """Log records are captured by the daemon."""
+
+    def preview(self, command: str, correlation_id: Optional[str] = None) -> Future:
+        """Plans a command on the daemon. The future resolves to its preview, with the actions to approve as "compiled"."""
+        correlation_id = correlation_id or new_correlation_id()
+        self._commands[correlation_id] = command
+        return self._planning.submit(self._preview, command, correlation_id)
+
+    def _preview(self, command: str, correlation_id: str) -> Dict[str, Any]:
+        preview = self.client.plan(command, correlation_id)
+        preview["compiled"] = None if preview["errors"] else preview["actions"]
+        return preview
+
+    def execute(self, actions: Iterable[Dict[str, Any]], correlation_id: Optional[str] = None) -> RemoteRun:
+        """Queues the approved actions on the daemon and returns their RemoteRun right away."""
+        correlation_id = correlation_id or new_correlation_id()
+        actions = list(actions)
+        status = self.client.submit(self._commands.pop(correlation_id, ""), actions, correlation_id)
+        return RemoteRun(self.client, status, actions)
+
+    def close(self) -> None:
+        self._planning.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,285 @@
+# macros.py
+
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import MACROS_PATH
+from src.executor.capture import ScreenCapture, get_capture
+from src.executor.plan_compiler import compile_plan
+from src.executor.vision import Match
+from src.nlu.plan_cache import normalize_command
+from src.plugins import PluginRegistry, plugin_registry
+
+_FIELD = re.compile(r"\{(\w+)\}")
+
+# Stored click resolution: x, y, width, height, score, region checksum
+ClickRecord = Tuple[int, int, int, int, float, int]
+
+
+def _template_pattern(template: str) -> "re.Pattern":
+    pattern, position = "", 0
+    for field in _FIELD.finditer(template):
+        pattern += re.escape(template[position : field.start()]) + f"(?P<{field.group(1)}>.+?)"
+        position = field.end()
+    pattern += re.escape(template[position:])
+    return re.compile(f"^{pattern}$", re.IGNORECASE)
+
+
+def parameterize(value: str, values: Dict[str, str]) -> str:
+    """
+    Turns a recorded string into a format template by replacing the example
+    values with their placeholders, e.g. "penguins" with "{query}".
+    """
+    value = value.replace("{", "{{").replace("}", "}}")
+    for name, example in sorted(values.items(), key=lambda item: -len(item[1])):
+        if example:
+            value = re.sub(
+                rf"(?<!\w){re.escape(example)}(?!\w)", "{" + name + "}", value, flags=re.IGNORECASE
+            )
+    return value
+
+
+class Macro:
+    """
+    A recorded, parameterized action list, replayed without planning.
+
+    Args:
+        template (str): Command template, e.g. "search chrome for {query}". It
+            is also the name of the macro.
+        actions (list): Atomic actions whose string parameters are format templates.
+        clicks (dict): Click resolutions recorded for action indices.
+    """
+
+    __slots__ = ("template", "actions", "clicks", "_pattern")
+
+    def __init__(self, template: str, actions: List[Dict[str, Any]], clicks: Optional[Dict[int, ClickRecord]] = None):
+        self.template = normalize_command(template)
+        self.actions = actions
+        self.clicks = dict(clicks or {})
+        self._pattern = _template_pattern(self.template)
+
+    @property
+    def fields(self) -> List[str]:
+        return _FIELD.findall(self.template)
+
+    def match(self, command: str) -> Optional[Dict[str, str]]:
+        """Returns the placeholder values if the command fits the template, else None."""
+        found = self._pattern.match(normalize_command(command))
+        return found.groupdict() if found else None
+
+    def instantiate(self, values: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Returns the action list with the placeholders filled in."""
+        actions = []
+        for action in self.actions:
+            parameters = {
+                name: value.format_map(values) if isinstance(value, str) else value
+                for name, value in action.get("parameters", {}).items()
+            }
+            actions.append({"action_type": action["action_type"], "parameters": parameters})
+        return actions
+
+    def to_json(self) -> Dict[str, Any]:
+        # Compact form: [action_type, parameters] pairs and click lists keyed by index
+        return {
+            "actions": [[action["action_type"], action.get("parameters", {})] for action in self.actions],
+            "clicks": {str(index): list(click) for index, click in self.clicks.items()},
+        }
+
+    @classmethod
+    def from_json(cls, template: str, data: Dict[str, Any]) -> "Macro":
+        actions = [{"action_type": action_type, "parameters": parameters} for action_type, parameters in data["actions"]]
+        clicks = {int(index): tuple(click) for index, click in data.get("clicks", {}).items()}
+        return cls(template, actions, clicks)
+
+
+class MacroLibrary:
+    """Named macros, stored together in one JSON file."""
+
+    def __init__(self, path: str = MACROS_PATH):
+        self.path = path
+        self._macros: Optional[Dict[str, Macro]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Macro]:
+        if self._macros is None:
+            self._macros = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    for template, macro in data.items():
+                        self._macros[template] = Macro.from_json(template, macro)
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    logging.error("Could not load macros from '%s': %s", self.path, e)
+        return self._macros
+
+    def save(self) -> None:
+        with self._lock:
+            data = {template: macro.to_json() for template, macro in self._load().items()}
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(temporary, self.path)
+
+    def add(self, macro: Macro) -> None:
+        with self._lock:
+            self._load()[macro.template] = macro
+        self.save()
+
+    def remove(self, template: str) -> bool:
+        with self._lock:
+            removed = self._load().pop(normalize_command(template), None) is not None
+        if removed:
+            self.save()
+        return removed
+
+    def templates(self) -> List[str]:
+        with self._lock:
+            return sorted(self._load())
+
+    def match(self, command: str) -> Optional[Tuple[Macro, Dict[str, str]]]:
+        """
+        Finds the macro whose template fits the command. Templates with fewer
+        placeholders (more literal text) win.
+        """
+        with self._lock:
+            macros = sorted(self._load().values(), key=lambda macro: (len(macro.fields), -len(macro.template)))
+        for macro in macros:
+            values = macro.match(command)
+            if values is not None:
+                return macro, values
+        return None
+
+
+class MacroRecorder:
+    """
+    Records the actions of successfully executed commands, together with the
+    screen location each click resolved to.
+
+    Usage:
+        recorder.begin_command(command)
+        for action in plan:
+            recorder.record(action, action.run())
+        recorder.end_command()
+        macro = recorder.build()
+    """
+
+    def __init__(self, template: str, capture: Optional[ScreenCapture] = None):
+        self.template = normalize_command(template)
+        self.capture = capture
+        self.commands: List[str] = []
+        self.actions: List[Dict[str, Any]] = []
+        self.clicks: Dict[int, ClickRecord] = {}
+        self._command = ""
+        self._pending: List[Tuple[Dict[str, Any], Optional[ClickRecord]]] = []
+        self._failed = False
+
+    def begin_command(self, command: str) -> None:
+        self._command = command
+        self._pending = []
+        self._failed = False
+
+    def record(self, action: Any, success: bool) -> None:
+        """Records an executed action (a CompiledAction or an action dict)."""
+        if not success:
+            self._failed = True
+            return
+        action = action.to_dict() if hasattr(action, "to_dict") else action
+        click = None
+        if action["action_type"] == "click":
+            # Must run before the next action captures a new frame
+            snapshot = (self.capture or get_capture()).snapshot(action["parameters"].get("target", ""))
+            if snapshot is not None:
+                match, checksum = snapshot
+                click = (*match[:4], round(float(match.score), 3), checksum)
+        self._pending.append((action, click))
+
+    def end_command(self) -> bool:
+        """Keeps the command's actions if they all succeeded. Returns whether they were kept."""
+        if self._failed or not self._pending:
+            return False
+        self.commands.append(self._command)
+        for action, click in self._pending:
+            if click is not None:
+                self.clicks[len(self.actions)] = click
+            self.actions.append(action)
+        self._pending = []
+        return True
+
+    def build(self) -> Macro:
+        """
+        Builds the macro. Example values of the template's placeholders are
+        taken from the first recorded command that fits the template.
+        """
+        macro = Macro(self.template, [], self.clicks)
+        values: Dict[str, str] = {}
+        for command in self.commands:
+            values = macro.match(command) or {}
+            if values:
+                break
+        for action in self.actions:
+            parameters = {
+                name: parameterize(value, values) if isinstance(value, str) else value
+                for name, value in action.get("parameters", {}).items()
+            }
+            macro.actions.append({"action_type": action["action_type"], "parameters": parameters})
+        return macro
+
+
+def play_macro(
+    macro: Macro,
+    values: Dict[str, str],
+    registry: PluginRegistry = plugin_registry,
+    capture: Optional[ScreenCapture] = None,
+) -> bool:
+    """
+    Replays a macro without planning. Recorded click locations are reused when
+    the screen there still looks the same; otherwise the target is located
+    again and the macro is updated with the new location.
+
+    Args:
+        macro (Macro): The macro to replay.
+        values (dict): Values of the template placeholders.
+        registry (PluginRegistry): Registry used to resolve action plugins.
+        capture (ScreenCapture, optional): Capture service (defaults to the shared one).
+
+    Returns:
+        bool: True if every action succeeded.
+
+    Raises:
+        PlanValidationError: If the filled-in actions are not valid.
+    """
+    capture = capture or get_capture()
+    plan = compile_plan(macro.instantiate(values), registry)
+    for index, action in enumerate(plan):
+        target = action.parameters.get("target") if action.action_type == "click" else None
+        click = macro.clicks.get(index)
+        if target and click:
+            capture.expect(target, Match(*click[:5]), click[5])
+        logging.info("Replaying action: %s", action)
+        if not action.run():
+            logging.error("Macro '%s' failed at action %s: %s", macro.template, index + 1, action.to_dict())
+            return False
+        if target:
+            snapshot = capture.snapshot(target)
+            if snapshot is not None:
+                match, checksum = snapshot
+                macro.clicks[index] = (*match[:4], round(float(match.score), 3), checksum)
+    return True
+
+
+_library: Optional[MacroLibrary] = None
+_library_lock = threading.Lock()
+
+
+def get_macro_library() -> MacroLibrary:
+    """Returns the process-wide macro library."""
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = MacroLibrary()
+        return _library
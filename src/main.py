@@ -1,72 +1,183 @@
 # main.py
 
+import argparse
+import asyncio
+import json
 import sys
-import logging
-from typing import Optional, Dict, Any
 
 # Import NLU and Action Mapper (now plugin-based)
-from src.nlu.interpreter import interpret_command, decompose_task
-from src.executor.action_mapper import execute_action
-from src.utils.logger import setup_logger
+from src.client import DaemonClient, main as run_client
+from src.config import CLI_USE_DAEMON, LLAMA_STREAM, LOG_JSON, PLAN_OPTIMIZER_ENABLED, PROFILE_TRACE_PATH, SIMULATED_LAYOUT_PATH, SIMULATED_SCREEN_PATH
+from src.nlu.interpreter import forget_plan, plan_command, remember_successful_plan, stream_plan_command
+from src.nlu.json_repair import get_parse_stats
+import src.executor.action_mapper  # Registers the default action plugin
+from src.executor.backends import SimulatedBackend, get_backend, set_backend
+from src.executor.plan_compiler import PlanValidationError, compile_plan, compile_stream
+from src.executor.plan_optimizer import optimize_plan, optimize_stream
+from src.utils.logger import set_correlation_id, setup_logger
 from src.utils.error_handler import handle_error
+from src.utils.tracing import get_tracer
+from src.recovery import run_with_recovery
+from src.session import CommandResult, SessionEngine, read_lines
+from src.macros import MacroRecorder, get_macro_library, play_macro
+from src.plugins import plugin_registry
 
-def main() -> None:
+MACRO_HELP = """Macro commands:
+  :record <template>   Record the next commands as a macro, e.g. ':record search chrome for {query}'
+  :save                Save the recording
+  :cancel              Discard the recording
+  :macros              List saved macros
+  :forget <template>   Delete a macro
+
+Plan cache:
+  :forget-plan <command>  Plan the command again instead of reusing a cached or remembered plan"""
+
+
+def handle_macro_command(command: str, recorder):
+    """
+    Handles a ':' macro command typed at the prompt.
+
+    Returns:
+        MacroRecorder: The active recorder after the command, or None.
+    """
+    macros = get_macro_library()
+    name, _, argument = command[1:].strip().partition(" ")
+    argument = argument.strip()
+    if name == "record" and argument:
+        print(f"Recording macro '{argument}'. Enter commands, then ':save'.")
+        return MacroRecorder(argument)
+    if name == "save" and recorder is not None:
+        if not recorder.actions:
+            print("Nothing was recorded.")
+            return recorder
+        macro = recorder.build()
+        macros.add(macro)
+        print(f"Saved macro '{macro.template}' with {len(macro.actions)} action(s).")
+        return None
+    if name == "cancel":
+        print("Recording discarded.")
+        return None
+    if name == "macros":
+        for template in macros.templates():
+            print(f"  {template}")
+        return recorder
+    if name == "forget-plan" and argument:
+        removed = forget_plan(argument)
+        print(f"Removed {removed} cached plan(s)." if removed else f"No cached plan for '{argument}'.")
+        return recorder
+    if name == "forget" and argument:
+        print("Macro deleted." if macros.remove(argument) else f"No macro named '{argument}'.")
+        return recorder
+    print(MACRO_HELP)
+    return recorder
+
+
+def report_simulation() -> None:
+    """Prints what a dry run did to the simulated desktop, and the warnings of the last command."""
+    backend = get_backend()
+    state = backend.state()
+    print(f"[dry run] {state['clock']:.1f}s simulated, focused: {state['focused'] or 'nothing'}")
+    for window in state["windows"]:
+        for target, text in window["text"].items():
+            print(f"[dry run]   {window['application']} / {target or 'window'}: {text!r}")
+    for warning in state["warnings"]:
+        print(f"[dry run]   warning: {warning}")
+    backend.warnings.clear()
+
+
+def main(dry_run: bool = False) -> None:
     """
     Main entry point for the Natural Language Automation System.
     Handles user input, command interpretation, task decomposition, and action execution.
-    TODO: Add GUI, dry-run mode, feedback loop, and advanced planning/preview.
+    TODO: Let the user approve the plan before it runs, as the web GUI does.
+
+    Args:
+        dry_run (bool): The executor drives a simulated desktop (see --dry-run);
+            plans are not remembered.
     """
-    print("Welcome to the Natural Language Automation System")
-    print("Type 'exit' to quit.\n")
+    print("Welcome to the Natural Language Automation System" + (" (dry run)" if dry_run else ""))
+    print("Type 'exit' to quit, ':help' for macros and the plan cache.\n")
 
+    recorder = None
     while True:
         try:
             user_command = input("Enter a command: ")
             if user_command.lower() in ["exit", "quit"]:
                 print("Goodbye!")
                 break
-
-            # Step 1: Interpret the command (via plugin)
-            interpretation: Optional[Dict[str, Any]] = interpret_command(user_command)
-            if not interpretation:
-                print("Failed to interpret the command.")
+            if user_command.startswith(":"):
+                recorder = handle_macro_command(user_command, recorder)
                 continue
+            # Tags everything logged for this command
+            set_correlation_id()
 
-            logging.info(f"Interpretation: {interpretation}")
-
-            # TODO: Add action plan visualization (print or display the plan before execution)
-            # TODO: Add dry-run/preview mode (ask user to approve the plan before execution)
-            # TODO: Add user feedback/correction step (let user edit the plan)
-
-            if not interpretation.get("needs_decomposition", False):
-                action = interpretation.get("action")
-                if action:
-                    atomic_actions = [action]
+            # Recorded macros replay without planning or (if the screen has not
+            # moved) template matching
+            found = get_macro_library().match(user_command) if recorder is None else None
+            if found:
+                macro, values = found
+                if play_macro(macro, values):
+                    if not dry_run:
+                        get_macro_library().save()  # Keeps refreshed click locations
+                    print(f"Replayed macro '{macro.template}'.")
                 else:
-                    print("No action provided for immediate execution.")
-                    continue
+                    print(f"Macro '{macro.template}' failed.")
+                continue
+
+            # Step 1 + 2: Interpret and decompose the command in one call (via plugin).
+            # When streaming, actions are validated and run as they arrive, while
+            # the model is still generating the rest; otherwise the whole plan is
+            # validated before the first action runs. Either way, the plan is
+            # optimized on the way (merged waits, text fragments, key presses).
+            # TODO: Show the plan and ask the user to approve (or edit) it before
+            # execution; --dry-run and the web GUI's preview cover rehearsing it
+            if LLAMA_STREAM:
+                atomic_actions = compile_stream(stream_plan_command(user_command))
+                if PLAN_OPTIMIZER_ENABLED:
+                    atomic_actions = optimize_stream(atomic_actions)
             else:
-                # Step 2: Decompose the task (via plugin)
-                task_description = interpretation.get("intent", "")
-                if not task_description:
-                    print("No task description found.")
-                    continue
-                atomic_actions = decompose_task(task_description)
-                if not atomic_actions:
-                    print("Failed to decompose the task.")
+                plan = plan_command(user_command)
+                if not plan:
+                    print("Failed to interpret the command.")
                     continue
+                atomic_actions = compile_plan(plan.get("actions"))
+                if PLAN_OPTIMIZER_ENABLED:
+                    atomic_actions, _ = optimize_plan(atomic_actions)
 
-            # Step 3: Process each atomic action (via plugin)
-            for action in atomic_actions:
-                logging.info(f"Processing action: {action}")
-                # TODO: Add undo/rollback and error recovery here
-                success = execute_action(action)
-                if not success:
-                    print(f"Failed to execute action: {action}")
-                    # TODO: Add error recovery, user feedback, and undo/rollback
-                    continue
-            print("All actions executed.")
+            # Step 3: Process each atomic action (via plugin). When one fails,
+            # only the rest of the plan is replanned and execution resumes
+            # after the actions that already succeeded.
+            # TODO: Add undo/rollback
+            if recorder is not None:
+                recorder.begin_command(user_command)
+            checkpoint = run_with_recovery(
+                user_command, atomic_actions, on_action=recorder.record if recorder is not None else None
+            )
+            if not checkpoint.executed:
+                print("Failed to interpret the command.")
+                continue
+            for failure in checkpoint.failures:
+                print(f"Failed to execute action: {failure.action}")
+            if recorder is not None and not recorder.end_command():
+                print("Not recorded: some actions failed.")
+            if not dry_run and (checkpoint.replans or not checkpoint.finished):
+                # The cached plan did not work as planned; plan the command afresh next time
+                forget_plan(user_command)
+            if checkpoint.finished:
+                if checkpoint.replans:
+                    print(f"Recovered by replanning the remaining actions ({checkpoint.replans} replan(s)).")
+                if not dry_run:
+                    # Lets similar commands reuse the actions that worked without a model call
+                    remember_successful_plan(user_command, checkpoint.completed)
+                print("All actions executed.")
+            else:
+                print(f"Stopped after {len(checkpoint.completed)} successful action(s).")
+            if dry_run:
+                report_simulation()
 
+        except PlanValidationError as e:
+            print(f"Plan rejected before execution: {e}")
+            continue
         except KeyboardInterrupt:
             print("\nInterrupted by user. Exiting.")
             break
@@ -74,6 +185,117 @@ def main() -> None:
             handle_error(e)
             continue
 
+def running_daemon():
+    """
+    Returns a client of the automation daemon if it is running and
+    CLI_USE_DAEMON is set, else None. The daemon drives the same keyboard and
+    mouse, so commands go to its queue rather than running here alongside it.
+    """
+    if not CLI_USE_DAEMON:
+        return None
+    client = DaemonClient()
+    return client if client.available() else None
+
+
+def report_result(result: CommandResult) -> None:
+    if result.error:
+        print(f"[{result.command}] {result.error}")
+    if result.executed:
+        print(f"[{result.command}] Executed {result.executed} action(s).")
+
+
+def report_profile(path: str) -> None:
+    """Prints the per-stage latency summary and writes the Chrome trace of the session."""
+    tracer = get_tracer()
+    print("\n" + tracer.summary_table())
+    print(f"\nModel responses: {json.dumps(get_parse_stats().summary())}")
+    tracer.export_chrome_trace(path)
+    print(f"\nTrace written to {path} (open it in chrome://tracing or https://ui.perfetto.dev)")
+
+
+async def run_pipeline(dry_run: bool = False) -> None:
+    """
+    Pipelined REPL: commands are queued as they are typed, planned concurrently
+    and executed strictly in order, so the next command is planned while the
+    current one runs.
+    """
+    print("Welcome to the Natural Language Automation System (pipelined)")
+    print("Commands run in the order they are entered. Type 'exit' to quit.\n")
+
+    engine = SessionEngine(
+        on_result=report_result,
+        learn=None if dry_run else remember_successful_plan,
+        forget=None if dry_run else forget_plan,
+    )
+    engine.start()
+    try:
+        async for user_command in read_lines("Enter a command: "):
+            if user_command.lower() in ["exit", "quit"]:
+                break
+            if user_command.strip():
+                engine.submit(user_command)
+        # Finish whatever is still queued before leaving
+        await engine.drain()
+        print("Goodbye!")
+    finally:
+        await engine.stop()
+
+
 if __name__ == "__main__":
-    setup_logger()
-    main()
+    parser = argparse.ArgumentParser(description="Natural Language Automation System")
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Plan queued commands while earlier ones are still executing",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=PROFILE_TRACE_PATH,
+        metavar="TRACE_FILE",
+        help=f"Time each stage; on exit print a summary and write a Chrome trace (default: {PROFILE_TRACE_PATH})",
+    )
+    parser.add_argument(
+        "--log-json",
+        action="store_true",
+        default=LOG_JSON,
+        help="Write the log file as JSON lines, with a correlation ID per command",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Plan and execute against a simulated desktop instead of the real one",
+    )
+    parser.add_argument("--layout", default=SIMULATED_LAYOUT_PATH, help="Layout JSON of the simulated desktop (with --dry-run)")
+    parser.add_argument("--screen", default=SIMULATED_SCREEN_PATH, help="Screenshot to find targets on (with --dry-run)")
+    parser.add_argument("--clear-cache", action="store_true", help="Remove every cached plan before starting")
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="Plan and execute in this process even if the automation daemon is running",
+    )
+    args = parser.parse_args()
+    setup_logger(json_lines=args.log_json)
+    if args.clear_cache and plugin_registry.plan_cache is not None:
+        print(f"Removed {plugin_registry.plan_cache.invalidate()} cached plan(s).")
+    # Dry runs and profiles are about this process, so they never use the daemon.
+    # The daemon runs approved plans without replanning or macros.
+    client = None if args.dry_run or args.profile or args.no_daemon else running_daemon()
+    if client is not None:
+        print(f"The automation daemon is running at {client.url}; sending commands to it (--no-daemon to run them here).")
+        sys.exit(run_client(["--url", client.url]))
+    if args.dry_run:
+        set_backend(SimulatedBackend.from_files(args.layout, args.screen))
+    if args.profile:
+        get_tracer().enabled = True
+    try:
+        if args.pipeline:
+            try:
+                asyncio.run(run_pipeline(args.dry_run))
+            except KeyboardInterrupt:
+                print("\nInterrupted by user. Pending commands were cancelled.")
+        else:
+            main(args.dry_run)
+    finally:
+        if args.profile:
+            report_profile(args.profile)
@@ -0,0 +1,267 @@
+# fast_path.py
+
+import os
+import re
+import sys
+from functools import lru_cache
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, Pattern, Tuple
+
+from src.config import FAST_PATH_APPLICATIONS
+from src.plugins import LLMPlugin, plugin_registry
+from ..utils.tracing import current_span
+
+# Commands containing any of these are compound and are left to the model
+_COMPOUND = re.compile(r"\b(?:and|then|after|before|while|until)\b|[,;]", re.IGNORECASE)
+
+APPLICATION_ALIASES = {
+    "chrome": "Google Chrome",
+    "google chrome": "Google Chrome",
+    "vscode": "Visual Studio Code",
+    "vs code": "Visual Studio Code",
+    "terminal": "Terminal",
+    "calculator": "Calculator",
+    "safari": "Safari",
+    "finder": "Finder",
+    "notes": "Notes",
+    "mail": "Mail",
+}
+
+KEY_ALIASES = {
+    "return": "enter",
+    "esc": "escape",
+    "spacebar": "space",
+    "page up": "pageup",
+    "page down": "pagedown",
+    "del": "delete",
+    "up arrow": "up",
+    "down arrow": "down",
+    "left arrow": "left",
+    "right arrow": "right",
+    "cmd": "command",
+}
+
+KEYS = {
+    "enter", "tab", "space", "escape", "backspace", "delete", "up", "down", "left", "right",
+    "home", "end", "pageup", "pagedown", "command", "ctrl", "shift", "alt", "option", "capslock",
+}
+KEYS.update(f"f{n}" for n in range(1, 13))
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+
+_UNIT_SECONDS = {"ms": 0.001, "millisecond": 0.001, "milliseconds": 0.001}
+
+
+def _action(action_type: str, intent: str, **parameters: Any) -> Dict[str, Any]:
+    return {
+        "intent": intent,
+        "needs_decomposition": False,
+        "action": {"action_type": action_type, "parameters": parameters},
+    }
+
+
+# Where macOS keeps installed applications (Name.app)
+_APPLICATION_DIRECTORIES = ("/Applications", "/System/Applications", "/System/Applications/Utilities", "~/Applications")
+
+
+@lru_cache(maxsize=1)
+def known_applications() -> Dict[str, str]:
+    """
+    Returns the applications the fast path may open, by lowercase name: the
+    aliases, FAST_PATH_APPLICATIONS and, on macOS, the installed applications.
+    Anything else ("open youtube", "open my downloads") is left to the model.
+    """
+    names = {name.lower(): name for name in FAST_PATH_APPLICATIONS}
+    if sys.platform == "darwin":
+        for directory in _APPLICATION_DIRECTORIES:
+            try:
+                entries = os.listdir(os.path.expanduser(directory))
+            except OSError:
+                continue
+            names.update((entry[:-4].lower(), entry[:-4]) for entry in entries if entry.endswith(".app"))
+    names.update((name.lower(), name) for name in APPLICATION_ALIASES.values())
+    names.update(APPLICATION_ALIASES)
+    return names
+
+
+def _open(match) -> Optional[Dict[str, Any]]:
+    name = known_applications().get(" ".join(match.group("name").lower().split()))
+    if name is None:
+        return None
+    return _action("open_application", f"Open the {name} application", application_name=name)
+
+
+def _press(match) -> Optional[Dict[str, Any]]:
+    key = " ".join(match.group("key").lower().split())
+    key = KEY_ALIASES.get(key, key)
+    if key not in KEYS and not (len(key) == 1 and key.isalnum()):
+        return None
+    return _action("press_key", f"Press the {key} key", key=key)
+
+
+def _wait(match) -> Optional[Dict[str, Any]]:
+    amount = match.group("amount").lower()
+    duration = NUMBER_WORDS.get(amount)
+    if duration is None:
+        duration = float(amount)
+        if duration.is_integer():
+            duration = int(duration)
+    unit = (match.group("unit") or "").lower()
+    if unit in _UNIT_SECONDS:
+        duration = duration * _UNIT_SECONDS[unit]
+    elif unit.startswith("min"):
+        duration = duration * 60
+    return _action("wait", f"Wait for {duration} seconds", duration=duration)
+
+
+def _type(match) -> Optional[Dict[str, Any]]:
+    text = match.group("quoted")
+    if text is None:
+        text = match.group("squoted")
+    if text is None:
+        # Typed verbatim, including trailing punctuation
+        text = match.group("text").strip()
+        if _COMPOUND.search(text):
+            return None
+    return _action("type_text", f"Type '{text}'", text=text)
+
+
+def _click(match) -> Optional[Dict[str, Any]]:
+    target = match.group("target").strip().lower()
+    if _COMPOUND.search(target):
+        return None
+    return _action("click", f"Click on the {target}", target=target)
+
+
+_TRAILING = r"\s*[.!]?\s*$"
+
+# Rules are grouped by leading verb so that a command is only tested against
+# the patterns that can possibly match it.
+RULES: Dict[str, List[Tuple[Pattern, Callable]]] = {}
+
+
+def add_rule(verbs: List[str], pattern: str, build: Callable) -> None:
+    """
+    Registers a fast path rule.
+
+    Args:
+        verbs (list): Leading words (lowercase) of commands the rule applies to.
+        pattern (str): Regular expression matched against the whole command.
+        build (callable): Turns the match into an interpretation, or returns None to fall through.
+    """
+    compiled = re.compile(pattern + _TRAILING, re.IGNORECASE)
+    for verb in verbs:
+        RULES.setdefault(verb, []).append((compiled, build))
+
+
+add_rule(
+    ["open", "launch"],
+    r"(?:open|launch)\s+(?:the\s+)?(?:app\s+|application\s+)?(?P<name>[\w .+-]+?)(?:\s+app|\s+application)?",
+    _open,
+)
+add_rule(
+    ["press", "hit", "tap"],
+    r"(?:press|hit|tap)\s+(?:the\s+)?(?P<key>[\w ]+?)(?:\s+key|\s+button)?",
+    _press,
+)
+add_rule(
+    ["wait", "pause", "sleep"],
+    r"(?:wait|pause|sleep)\s+(?:for\s+)?(?P<amount>\d+(?:\.\d+)?|an?|one|two|three|four|five|six|seven|eight|nine|ten)"
+    r"\s*(?P<unit>ms|milliseconds?|s|secs?|seconds?|mins?|minutes?)?",
+    _wait,
+)
+add_rule(
+    ["type"],
+    r"type\s+(?:in\s+)?(?:\"(?P<quoted>[^\"]*)\"|'(?P<squoted>[^']*)'|(?P<text>.+))",
+    _type,
+)
+add_rule(
+    ["click"],
+    r"click\s+(?:on\s+)?(?:the\s+)?(?P<target>[\w ]+?)",
+    _click,
+)
+
+
+def match_command(user_command: str) -> Optional[Dict[str, Any]]:
+    """
+    Matches a command against the fast path rules.
+
+    Args:
+        user_command (str): The user's command.
+
+    Returns:
+        dict: An interpretation in the same format as the LLM's, or None if no rule matches.
+    """
+    command = user_command.strip()
+    verb = command.split(None, 1)[0].lower() if command else ""
+    for pattern, build in RULES.get(verb, ()):
+        match = pattern.match(command)
+        if match:
+            interpretation = build(match)
+            if interpretation is not None:
+                return interpretation
+    return None
+
+
+class RuleBasedLLMPlugin(LLMPlugin):
+    """
+    LLM plugin that handles simple one-step commands with local rules and
+    falls through to the next registered LLM plugin for everything else.
+    """
+
+    def __init__(self, fallback: Optional[LLMPlugin] = None):
+        self.fallback = fallback
+
+    def cache_namespace(self) -> Optional[str]:
+        # Matching is cheaper than a cache lookup
+        return None
+
+    def _fallback(self) -> LLMPlugin:
+        return self.fallback or plugin_registry.get_next_llm_plugin(self)
+
+    def _match(self, command: str) -> Optional[Dict[str, Any]]:
+        interpretation = match_command(command)
+        if interpretation is not None:
+            current_span().set("source", "fast_path")
+        return interpretation
+
+    def interpret_command(self, user_command: str) -> Optional[Dict[str, Any]]:
+        interpretation = self._match(user_command)
+        if interpretation is not None:
+            return interpretation
+        return self._fallback().interpret_command(user_command)
+
+    def decompose_task(self, task_description: str) -> Optional[List[Dict[str, Any]]]:
+        interpretation = self._match(task_description)
+        if interpretation is not None:
+            return [interpretation["action"]]
+        return self._fallback().decompose_task(task_description)
+
+    def stream_decompose_task(self, task_description: str) -> Iterator[Dict[str, Any]]:
+        interpretation = self._match(task_description)
+        if interpretation is not None:
+            yield interpretation["action"]
+            return
+        yield from self._fallback().stream_decompose_task(task_description)
+
+    def plan_command(self, user_command: str) -> Optional[Dict[str, Any]]:
+        interpretation = self._match(user_command)
+        if interpretation is not None:
+            return {**interpretation, "actions": [interpretation["action"]]}
+        return self._fallback().plan_command(user_command)
+
+    def replan_suffix(
+        self, user_command: str, completed: List[Dict[str, Any]], failure: Dict[str, Any]
+    ) -> Optional[List[Dict[str, Any]]]:
+        return self._fallback().replan_suffix(user_command, completed, failure)
+
+    def stream_plan_command(
+        self, user_command: str
+    ) -> Generator[Dict[str, Any], None, Optional[Dict[str, Any]]]:
+        interpretation = self._match(user_command)
+        if interpretation is not None:
+            yield interpretation["action"]
+            return {**interpretation, "actions": [interpretation["action"]]}
+        return (yield from self._fallback().stream_plan_command(user_command))
@@ -1,34 +1,146 @@
 import requests
 import json
-from ..config import LLAMA_API_URL, LLAMA_MODEL_NAME
+import logging
+import hashlib
+import time
+from functools import lru_cache
+from ..config import (
+    LLAMA_MODEL_NAME,
+    LLAMA_STREAM,
+    LLAMA_FUSED_PLANNING,
+    LLAMA_SCHEMA_FORMAT,
+    LLAMA_KEEP_ALIVE,
+    FAST_PATH_ENABLED,
+    SIMILARITY_ENABLED,
+    PLAN_CACHE_ENABLED,
+    PLAN_CACHE_PATH,
+    PLAN_CACHE_MAX_ENTRIES,
+    PLAN_CACHE_TTL_SECONDS,
+)
 from src.plugins import LLMPlugin, plugin_registry
-from typing import Any, Dict, List, Optional
-
-
-def llama3(messages: List[Dict[str, Any]]) -> Optional[str]:
+from .fast_path import RuleBasedLLMPlugin
+from .json_repair import parse_json
+from .plan_cache import PlanCache
+from .response_schema import response_schema
+from .similarity_index import SimilarityIndex, SimilarityLLMPlugin
+from .stream_parser import IncrementalJSONArrayParser
+from .transport import get_transport
+from ..utils.tracing import current_span, span, traced_iter
+from typing import Any, Dict, Generator, Iterator, List, Optional
+
+
+def llama3(messages: List[Dict[str, Any]], format: Optional[Dict[str, Any]] = None) -> Optional[str]:
     """
     Sends a prompt with separated roles to the Llama 3 API and returns the response text.
+    With `format`, a JSON schema, the model can only generate JSON matching it.
     """
     data = {
         "model": LLAMA_MODEL_NAME,
         "messages": messages,
         "stream": False,
     }
+    if format is not None:
+        data["format"] = format
+    if LLAMA_KEEP_ALIVE is not None:
+        data["keep_alive"] = LLAMA_KEEP_ALIVE
 
-    headers = {"Content-Type": "application/json"}
-
+    current_span().set("source", "model")
     try:
-        response = requests.post(LLAMA_API_URL, headers=headers, json=data)
-        response.raise_for_status()
-        return response.json()["message"]["content"].strip()
+        with span("llama3.http", model=LLAMA_MODEL_NAME, stream=False) as http:
+            response = get_transport().post_chat(data)
+            http.set("eval_count", response.get("eval_count"))
+        return response["message"]["content"].strip()
     except requests.RequestException as e:
-        print(f"Error communicating with Llama API: {e}")
+        logging.error("Error communicating with Llama API: %s", e)
         return None
     except (KeyError, IndexError) as e:
-        print(f"Error parsing Llama API response: {e}")
+        logging.error("Error parsing Llama API response: %s", e)
         return None
 
 
+def llama3_stream(messages: List[Dict[str, Any]], format: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """
+    Sends a prompt to the Llama 3 API in streaming mode and yields the response
+    text chunk by chunk as the model generates it (constrained by `format`, as in llama3()).
+    """
+    data = {
+        "model": LLAMA_MODEL_NAME,
+        "messages": messages,
+        "stream": True,
+    }
+    if format is not None:
+        data["format"] = format
+    if LLAMA_KEEP_ALIVE is not None:
+        data["keep_alive"] = LLAMA_KEEP_ALIVE
+
+    current_span().set("source", "model")
+    # Not the current span: the consumer runs its own work between chunks
+    http = span("llama3.http", model=LLAMA_MODEL_NAME, stream=True, track="llama3.http")
+    start = time.perf_counter()
+    first_token = True
+    try:
+        # Ollama streams one JSON object per line
+        for chunk in get_transport().stream_chat(data):
+            content = chunk.get("message", {}).get("content", "")
+            if content:
+                if first_token:
+                    http.set("first_token_ms", round((time.perf_counter() - start) * 1000, 3))
+                    first_token = False
+                yield content
+            if chunk.get("done"):
+                http.set("eval_count", chunk.get("eval_count"))
+                break
+    except requests.RequestException as e:
+        http.set("error", type(e).__name__)
+        logging.error("Error communicating with Llama API: %s", e)
+    except json.JSONDecodeError as e:
+        http.set("error", type(e).__name__)
+        logging.error("Error parsing Llama API response: %s", e)
+    finally:
+        http.end()
+
+
+def warm_up_model() -> bool:
+    """
+    Loads the model ahead of the first command: Ollama loads it for a chat
+    request without messages, and keeps it loaded for LLAMA_KEEP_ALIVE.
+
+    Returns:
+        bool: True if the model is loaded.
+    """
+    data = {"model": LLAMA_MODEL_NAME, "messages": [], "stream": False}
+    if LLAMA_KEEP_ALIVE is not None:
+        data["keep_alive"] = LLAMA_KEEP_ALIVE
+    try:
+        with span("llama3.warm_up", model=LLAMA_MODEL_NAME):
+            get_transport().post_chat(data)
+        return True
+    except requests.RequestException as e:
+        logging.warning("Could not load the model: %s", e)
+        return False
+
+
+def parse_actions(response_text: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Parses a JSON array of actions from the response text, repairing it
+    locally (see json_repair) if the model added text around the array, left
+    trailing commas or stopped early.
+    """
+    return parse_json(response_text, list)
+
+
+# Shared by the decomposition and planning prompts
+WAIT_INSTRUCTIONS = """
+**Waiting:**
+- Do not pad plans with fixed "wait" actions. Wait for the condition the next action depends on instead:
+  - "wait_for_process" with {"process_name": "..."} until an application has started,
+  - "wait_for_target" with {"target": "..."} until a UI element is visible on the screen,
+  - "wait_for_screen_stable" with {} until the screen stops changing (e.g. a page finished loading).
+- Each of them accepts an optional "timeout" in seconds (default 10).
+- Use "wait" with {"duration": seconds} only when there is no condition to wait for.
+"""
+
+
 def create_initial_prompt(user_command: str) -> List[Dict[str, Any]]:
     """
     Creates a list of messages for the user's command with separated system and user roles.
@@ -87,9 +199,9 @@ You are an AI assistant that decomposes tasks into atomic actions for automation
 Decompose the following task into a sequence of atomic actions.
 
 For each action, provide a JSON object with the following keys:
-- "action_type": a string representing the type of action (e.g., "open_application", "click", "type_text", "press_key")
+- "action_type": a string representing the type of action (e.g., "open_application", "click", "type_text", "press_key", "hotkey", "wait_for_target")
 - "parameters": a dictionary of parameters needed for the action
-
+{WAIT_INSTRUCTIONS}
 **Important Instructions:**
 - **Respond with only a JSON array of actions.**
 - **Do not include any text or explanations before or after the JSON array.**
@@ -103,7 +215,7 @@ Task: Open Chrome and search for penguins.
 Response:
 [
     {{"action_type": "open_application", "parameters": {{"application_name": "Chrome"}}}},
-    {{"action_type": "wait", "parameters": {{"duration": 2}}}},
+    {{"action_type": "wait_for_target", "parameters": {{"target": "address bar"}}}},
     {{"action_type": "click", "parameters": {{"target": "address bar"}}}},
     {{"action_type": "type_text", "parameters": {{"text": "penguins"}}}},
     {{"action_type": "press_key", "parameters": {{"key": "enter"}}}}
@@ -116,45 +228,241 @@ Task: {task_description}
     return messages
 
 
+def create_plan_prompt(user_command: str) -> List[Dict[str, Any]]:
+    """
+    Creates a list of messages that asks for the interpretation of the command
+    and its full list of atomic actions in a single response.
+    """
+    messages = [
+        {
+            "role": "system",
+            "content": """
+You are an AI assistant that interprets user commands for automation and plans them as atomic actions.
+For the given command, provide an intent description, indicate if task decomposition is needed and
+list the sequence of atomic actions that carries out the command.
+
+Each action is a JSON object with the following keys:
+- "action_type": a string representing the type of action (e.g., "open_application", "click", "type_text", "press_key", "hotkey", "wait_for_target")
+- "parameters": a dictionary of parameters needed for the action
+""" + WAIT_INSTRUCTIONS + """
+If the command is simple and can be executed directly, set "needs_decomposition" to false, provide the
+action in "action" and repeat it as the only element of "actions". Otherwise set "action" to null.
+
+**Important Instructions:**
+- **Respond with only a JSON object in the following format, with "actions" as the last key.**
+- **Do not include any text or explanations before or after the JSON object.**
+- **Do not include code blocks, markdown, or any formatting.**
+- **Ensure the JSON is properly formatted without any trailing commas or syntax errors.**
+
+{
+    "intent": "brief description of the intent",
+    "needs_decomposition": true or false,
+    "action": {
+        "action_type": "string",
+        "parameters": { ... }
+    } or null,
+    "actions": [ ... ]
+}
+
+Examples:
+
+User Command: "Open Calculator"
+
+Response:
+{
+    "intent": "Open the Calculator application",
+    "needs_decomposition": false,
+    "action": {"action_type": "open_application", "parameters": {"application_name": "Calculator"}},
+    "actions": [
+        {"action_type": "open_application", "parameters": {"application_name": "Calculator"}}
+    ]
+}
+
+User Command: "Open Chrome and search for penguins"
+
+Response:
+{
+    "intent": "Open the Google Chrome browser and search for 'penguins'",
+    "needs_decomposition": true,
+    "action": null,
+    "actions": [
+        {"action_type": "open_application", "parameters": {"application_name": "Chrome"}},
+        {"action_type": "wait_for_target", "parameters": {"target": "address bar"}},
+        {"action_type": "click", "parameters": {"target": "address bar"}},
+        {"action_type": "type_text", "parameters": {"text": "penguins"}},
+        {"action_type": "press_key", "parameters": {"key": "enter"}}
+    ]
+}
+""",
+        },
+        {"role": "user", "content": user_command},
+    ]
+    return messages
+
+
+def create_replan_prompt(
+    user_command: str, completed: List[Dict[str, Any]], failure: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """
+    Creates a list of messages that asks only for the actions that remain
+    after an action of the command's plan failed, given the actions that
+    already succeeded and the state of the screen at the failure.
+    """
+    state = [f"- Failed action: {json.dumps(failure.get('action'))}"]
+    if failure.get("application"):
+        state.append(f"- Active application: {failure['application']}")
+    if failure.get("target_visible") is not None:
+        state.append(f"- The failed action's target is {'visible' if failure['target_visible'] else 'not visible'} on the screen now")
+    if failure.get("attempt"):
+        state.append(f"- Recovery attempt: {failure['attempt']}")
+    messages = [
+        {
+            "role": "system",
+            "content": f"""
+You are an AI assistant that recovers automation plans that failed part-way through.
+
+The user's command was being carried out as a sequence of atomic actions. The completed actions below
+succeeded and have already changed the screen; do not repeat them. The next action failed.
+Plan only the actions that remain to finish the command from here, and reach the goal of the failed
+action in a way that is more likely to work (e.g. wait for its target first, or use a keyboard
+shortcut instead of a click).
+
+For each action, provide a JSON object with the following keys:
+- "action_type": a string representing the type of action (e.g., "open_application", "click", "type_text", "press_key", "hotkey", "wait_for_target")
+- "parameters": a dictionary of parameters needed for the action
+{WAIT_INSTRUCTIONS}
+**Important Instructions:**
+- **Respond with only a JSON array of the remaining actions.**
+- **Respond with an empty array if the command cannot be completed.**
+- **Do not include any text or explanations before or after the JSON array.**
+- **Ensure the JSON is properly formatted without any trailing commas or syntax errors.**
+
+Completed actions:
+{json.dumps(completed)}
+
+State at the failure:
+""" + "\n".join(state) + "\n",
+        },
+        {"role": "user", "content": user_command},
+    ]
+    return messages
+
+
+def parse_plan(response_text: str) -> Optional[Dict[str, Any]]:
+    """
+    Parses a fused interpretation + plan response, repairing it locally if
+    needed. Fills in "actions" from "action" when the model left it out for a
+    single-step command.
+    """
+    plan = parse_json(response_text, dict)
+    if plan is None:
+        return None
+    if not plan.get("actions") and plan.get("action"):
+        plan["actions"] = [plan["action"]]
+    return plan
+
+
+def response_format(kind: str) -> Optional[Dict[str, Any]]:
+    """Returns the JSON schema responses of this kind must follow, if schema-constrained output is enabled."""
+    return response_schema(kind) if LLAMA_SCHEMA_FORMAT else None
+
+
+def prompt_template_hash() -> str:
+    """
+    Returns a short hash of the prompt templates and the response schema, so
+    that cached plans are not reused after the prompts, the registered action
+    types or their parameters change.
+    """
+    return _prompt_template_hash(tuple(id(plugin) for plugin in plugin_registry.action_plugins))
+
+
+@lru_cache(maxsize=8)
+def _prompt_template_hash(action_plugins: tuple) -> str:
+    templates = [
+        create_initial_prompt("{user_command}"),
+        create_decomposition_prompt("{task_description}"),
+        create_plan_prompt("{user_command}"),
+        response_schema("plan"),
+    ]
+    return hashlib.sha256(json.dumps(templates).encode("utf-8")).hexdigest()[:16]
+
+
 class DefaultLLMPlugin(LLMPlugin):
+    def cache_namespace(self) -> Optional[str]:
+        return f"{LLAMA_MODEL_NAME}:{prompt_template_hash()}"
+
     def interpret_command(self, user_command: str) -> Optional[Dict[str, Any]]:
         messages = create_initial_prompt(user_command)
-        response_text = llama3(messages)
+        response_text = llama3(messages, format=response_format("interpretation"))
         if response_text:
-            try:
-                parsed_response = json.loads(response_text)
-                return parsed_response
-            except json.JSONDecodeError as e:
-                print(f"Error parsing JSON response: {e}")
-                print(f"Response Text:\n{response_text}")
-                return None
+            return parse_json(response_text, dict)
         else:
             return None
 
     def decompose_task(self, task_description: str) -> Optional[List[Dict[str, Any]]]:
         messages = create_decomposition_prompt(task_description)
-        response_text = llama3(messages)
+        response_text = llama3(messages, format=response_format("decomposition"))
+        if response_text:
+            return parse_actions(response_text)
+        else:
+            return None
+
+    def stream_decompose_task(self, task_description: str) -> Iterator[Dict[str, Any]]:
+        messages = create_decomposition_prompt(task_description)
+        parser = IncrementalJSONArrayParser()
+        chunks = []
+        yielded = False
+        for chunk in llama3_stream(messages, format=response_format("decomposition")):
+            chunks.append(chunk)
+            for action in parser.feed(chunk):
+                yielded = True
+                yield action
+        # Parsed in full as well, for the parse statistics
+        actions = parse_actions("".join(chunks)) if chunks else None
+        if not yielded:
+            # Nothing could be parsed incrementally; use the repaired whole response.
+            yield from actions or []
+
+    def plan_command(self, user_command: str) -> Optional[Dict[str, Any]]:
+        if not LLAMA_FUSED_PLANNING:
+            return super().plan_command(user_command)
+        response_text = llama3(create_plan_prompt(user_command), format=response_format("plan"))
         if response_text:
-            response_text = response_text.strip()
-            try:
-                actions = json.loads(response_text)
-                return actions
-            except json.JSONDecodeError:
-                json_start = response_text.find("[")
-                json_end = response_text.rfind("]")
-                if json_start != -1 and json_end != -1 and json_start < json_end:
-                    json_str = response_text[json_start : json_end + 1]
-                    try:
-                        actions = json.loads(json_str)
-                        return actions
-                    except json.JSONDecodeError as e:
-                        print(f"Error parsing extracted JSON: {e}")
-                        print(f"Extracted JSON Text:\n{json_str}")
-                        return None
-                else:
-                    print("Could not find JSON array in the response.")
-                    print(f"Response Text:\n{response_text}")
-                    return None
+            return parse_plan(response_text)
+        else:
+            return None
+
+    def stream_plan_command(
+        self, user_command: str
+    ) -> Generator[Dict[str, Any], None, Optional[Dict[str, Any]]]:
+        if not LLAMA_FUSED_PLANNING:
+            return (yield from super().stream_plan_command(user_command))
+        parser = IncrementalJSONArrayParser(key="actions")
+        chunks = []
+        actions = []
+        for chunk in llama3_stream(create_plan_prompt(user_command), format=response_format("plan")):
+            chunks.append(chunk)
+            for action in parser.feed(chunk):
+                actions.append(action)
+                yield action
+        plan = parse_plan("".join(chunks)) if chunks else None
+        if not actions and plan:
+            # Nothing could be parsed incrementally; use the whole response.
+            actions = plan.get("actions") or []
+            yield from actions
+        if not actions:
+            return None
+        if plan is None:
+            plan = {"intent": user_command, "needs_decomposition": len(actions) > 1, "action": None}
+        return {**plan, "actions": actions}
+
+    def replan_suffix(
+        self, user_command: str, completed: List[Dict[str, Any]], failure: Dict[str, Any]
+    ) -> Optional[List[Dict[str, Any]]]:
+        messages = create_replan_prompt(user_command, completed, failure)
+        response_text = llama3(messages, format=response_format("decomposition"))
+        if response_text:
+            return parse_actions(response_text)
         else:
             return None
 
@@ -163,15 +471,117 @@ class DefaultLLMPlugin(LLMPlugin):
 default_llm_plugin = DefaultLLMPlugin()
 plugin_registry.register_llm_plugin(default_llm_plugin)
 
+# Reuse plans of similar commands that ran before, falling through otherwise
+similarity_index = SimilarityIndex() if SIMILARITY_ENABLED else None
+if similarity_index is not None:
+    plugin_registry.register_llm_plugin(SimilarityLLMPlugin(similarity_index), first=True)
+
+# Match simple commands locally, falling through to the model otherwise
+if FAST_PATH_ENABLED:
+    plugin_registry.register_llm_plugin(RuleBasedLLMPlugin(), first=True)
+
+# Cache plans on disk in front of whichever LLM plugin is active
+if PLAN_CACHE_ENABLED:
+    plugin_registry.set_plan_cache(
+        PlanCache(
+            PLAN_CACHE_PATH,
+            max_entries=PLAN_CACHE_MAX_ENTRIES,
+            ttl_seconds=PLAN_CACHE_TTL_SECONDS,
+        )
+    )
+
 
 def interpret_command(user_command: str) -> Optional[Dict[str, Any]]:
     plugin = plugin_registry.get_llm_plugin()
-    return plugin.interpret_command(user_command)
+    with span("interpret_command"):
+        return plugin.interpret_command(user_command)
 
 
 def decompose_task(task_description: str) -> Optional[List[Dict[str, Any]]]:
     plugin = plugin_registry.get_llm_plugin()
-    return plugin.decompose_task(task_description)
+    with span("decompose_task"):
+        return plugin.decompose_task(task_description)
+
+
+def plan_command(user_command: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the interpretation of the command together with its full list of
+    atomic actions under "actions", in a single model call where possible.
+    """
+    plugin = plugin_registry.get_llm_plugin()
+    with span("plan_command"):
+        return plugin.plan_command(user_command)
+
+
+def stream_plan_command(user_command: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the atomic actions for a command as soon as each one has been
+    generated. Falls back to a blocking plan when streaming is disabled.
+    """
+    plugin = plugin_registry.get_llm_plugin()
+    if LLAMA_STREAM:
+        return traced_iter("stream_plan_command", plugin.stream_plan_command(user_command))
+    plan = plan_command(user_command)
+    return iter(plan["actions"] if plan else [])
+
+
+def stream_decompose_task(task_description: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the atomic actions for a task as soon as each one has been generated.
+    Falls back to a regular blocking decomposition when streaming is disabled.
+    """
+    plugin = plugin_registry.get_llm_plugin()
+    if LLAMA_STREAM:
+        return traced_iter("stream_decompose_task", plugin.stream_decompose_task(task_description))
+    return iter(decompose_task(task_description) or [])
+
+
+def replan_suffix(
+    user_command: str, completed: List[Dict[str, Any]], failure: Dict[str, Any]
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Asks for the actions that remain after a failed action, given the actions
+    of the command that already succeeded. Never answered from the plan cache,
+    since the answer depends on the state of the screen.
+    """
+    plugin = plugin_registry.get_llm_plugin()
+    with span("replan_suffix"):
+        return plugin.replan_suffix(user_command, completed, failure)
+
+
+def remember_successful_plan(user_command: str, actions: List[Dict[str, Any]]) -> None:
+    """
+    Adds the plan of a command whose actions all executed successfully to the
+    similarity index, so that similar commands can reuse it without a model call.
+    """
+    if similarity_index is not None and actions:
+        similarity_index.add(user_command, actions)
+
+
+def forget_plan(user_command: str) -> int:
+    """
+    Drops the cached plan of a command (and the cached decomposition of its
+    intent) and the remembered plan it was served from, so that the next run
+    plans it again, e.g. after it failed.
+
+    Returns:
+        int: The number of removed cache and similarity index entries.
+    """
+    removed = 0
+    if similarity_index is not None:
+        # The command's own entry, and the similar command's whose plan it reused
+        served = similarity_index.source(user_command)
+        removed += similarity_index.remove(user_command)
+        if served is not None:
+            removed += similarity_index.remove(served)
+    cache = plugin_registry.plan_cache
+    if cache is None:
+        return removed
+    interpretation = cache.get("interpret", default_llm_plugin.cache_namespace(), user_command)
+    removed += cache.invalidate(user_command)
+    if isinstance(interpretation, dict) and interpretation.get("intent"):
+        removed += cache.invalidate(interpretation["intent"])
+    return removed
 
 
 def parse_actions_from_response(response_text):
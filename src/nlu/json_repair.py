@@ -0,0 +1,225 @@
+# json_repair.py
+
+import json
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.tracing import current_span
+
+_FENCE = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)(?:```|$)", re.DOTALL)
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONRepairError(ValueError):
+    """Raised when a response cannot be turned into JSON, even after repairs."""
+
+
+class ParseStats:
+    """
+    Counts how model responses were parsed: cleanly, after local repairs, or
+    not at all, and how often each kind of repair was needed.
+    """
+
+    def __init__(self):
+        self.clean = 0
+        self.repaired = 0
+        self.failed = 0
+        self.repairs: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str, repairs: List[str] = ()) -> None:
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            for repair in repairs:
+                self.repairs[repair] = self.repairs.get(repair, 0) + 1
+
+    @property
+    def total(self) -> int:
+        return self.clean + self.repaired + self.failed
+
+    def summary(self) -> Dict[str, Any]:
+        """Returns the counts and success rates, e.g. for the batch or profile report."""
+        with self._lock:
+            total = self.clean + self.repaired + self.failed
+            return {
+                "responses": total,
+                "clean": self.clean,
+                "repaired": self.repaired,
+                "failed": self.failed,
+                "success_rate": round((self.clean + self.repaired) / total, 4) if total else None,
+                "clean_rate": round(self.clean / total, 4) if total else None,
+                "repairs": dict(sorted(self.repairs.items())),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.clean = self.repaired = self.failed = 0
+            self.repairs.clear()
+
+
+parse_stats = ParseStats()
+
+
+def get_parse_stats() -> ParseStats:
+    return parse_stats
+
+
+def _strip_fences(text: str) -> str:
+    match = _FENCE.search(text)
+    return match.group(1) if match else text
+
+
+def _scan(text: str) -> Tuple[str, int, List[str], bool, List[Tuple[int, List[str]]]]:
+    """
+    Walks the first JSON value in `text`, dropping trailing commas. Returns
+    the value's text, how much of `text` it took up, the brackets still open
+    at the end, whether a trailing comma was dropped, and the points where the
+    value could be cut if it is truncated (after each complete element, with
+    the brackets open there).
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    cut_points: List[Tuple[int, List[str]]] = []
+    in_string = escape = dropped_comma = False
+    pending_comma = False
+    for index, char in enumerate(text):
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char in " \t\r\n":
+            if not pending_comma:
+                out.append(char)
+            continue
+        if pending_comma:
+            pending_comma = False
+            if char in "]}":
+                dropped_comma = True
+            else:
+                out.append(",")
+        if char == ",":
+            pending_comma = True
+            # Everything up to here is complete
+            cut_points.append((len(out), list(stack)))
+            continue
+        out.append(char)
+        if char == '"':
+            in_string = True
+        elif char in "[{":
+            stack.append(char)
+        elif char in "]}":
+            if stack:
+                stack.pop()
+            if not stack:
+                return "".join(out), index + 1, [], dropped_comma, []
+            cut_points.append((len(out), list(stack)))
+    return "".join(out), len(text), stack, dropped_comma, cut_points
+
+
+def _close(text: str, stack: List[str]) -> str:
+    return text + "".join(_CLOSERS[bracket] for bracket in reversed(stack))
+
+
+def _keeps_elements_whole(stack: List[str]) -> bool:
+    # Closing the outer value and arrays only drops what is missing; closing a
+    # nested object would invent a complete action out of a partial one
+    return all(bracket == "[" for bracket in stack[1:])
+
+
+def _loads(text: str, repairs: List[str]) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        # Models often put raw newlines or tabs inside strings
+        value = json.loads(text, strict=False)
+        repairs.append("control_characters")
+        return value
+
+
+def repair_json(text: str, expect: type = dict) -> Tuple[Any, List[str]]:
+    """
+    Parses a model response as JSON, repairing the usual defects locally
+    instead of asking the model again: code fences, prose before or after the
+    value, trailing commas, and output cut off mid-value (the incomplete last
+    element is dropped and the open brackets are closed).
+
+    Args:
+        text (str): The response text.
+        expect (type): dict or list; the kind of value to look for.
+
+    Returns:
+        tuple: The parsed value and the names of the repairs that were needed.
+
+    Raises:
+        JSONRepairError: If no JSON value of the expected kind can be recovered.
+    """
+    try:
+        value = json.loads(text)
+        if isinstance(value, expect):
+            return value, []
+    except json.JSONDecodeError:
+        pass
+
+    repairs = []
+    unfenced = _strip_fences(text)
+    if unfenced is not text:
+        repairs.append("code_fence")
+    opener = "{" if expect is dict else "["
+    start = unfenced.find(opener)
+    if start == -1:
+        raise JSONRepairError(f"No JSON {expect.__name__} in the response")
+    if unfenced[:start].strip():
+        repairs.append("leading_text")
+
+    body, consumed, open_brackets, dropped_comma, cut_points = _scan(unfenced[start:])
+    if dropped_comma:
+        repairs.append("trailing_comma")
+    if not open_brackets:
+        if unfenced[start + consumed :].strip():
+            repairs.append("trailing_text")
+        try:
+            return _loads(body, repairs), repairs
+        except json.JSONDecodeError as e:
+            raise JSONRepairError(f"Invalid JSON after repairs {repairs}: {e}") from e
+
+    # Truncated: close what is open, or else cut back to the last complete element
+    repairs.append("truncated")
+    for end, stack in [(len(body), open_brackets)] + list(reversed(cut_points)):
+        if not _keeps_elements_whole(stack):
+            continue
+        candidate = body[:end].rstrip().rstrip(",")
+        try:
+            value = _loads(_close(candidate, stack), repairs)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, expect):
+            return value, repairs
+    raise JSONRepairError("Truncated JSON could not be closed")
+
+
+def parse_json(text: str, expect: type = dict) -> Optional[Any]:
+    """
+    Like repair_json, but returns None on failure. Records the outcome in the
+    parse statistics and on the current span (as "parse").
+    """
+    try:
+        value, repairs = repair_json(text, expect)
+    except JSONRepairError as e:
+        parse_stats.record("failed")
+        current_span().set("parse", "failed")
+        logging.error("Could not parse the model response: %s", e)
+        logging.debug("Response Text:\n%s", text)
+        return None
+    outcome = "repaired" if repairs else "clean"
+    parse_stats.record(outcome, repairs)
+    current_span().set("parse", outcome)
+    if repairs:
+        current_span().set("repairs", ",".join(repairs))
+    return value
@@ -0,0 +1,282 @@
+# plan_cache.py
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional
+
+from src.plugins import LLMPlugin
+from ..utils.tracing import current_span
+
+
+def normalize_command(command: str) -> str:
+    """
+    Normalizes a command for use as a cache key.
+
+    Whitespace is collapsed and trailing sentence punctuation is dropped. Case
+    is preserved because it can matter for the generated plan (e.g. the text
+    passed to a 'type_text' action).
+
+    Args:
+        command (str): The raw command or task description.
+
+    Returns:
+        str: The normalized command.
+    """
+    return " ".join(command.split()).rstrip(".!?").strip()
+
+
+class PlanCache:
+    """
+    Disk-backed (SQLite) cache of LLM interpretation and decomposition results.
+
+    Entries are keyed by the normalized command, the kind of call and the
+    plugin's cache namespace (model name + prompt template hash for the
+    default plugin). Entries expire after `ttl_seconds` and the least recently
+    used entries are evicted once `max_entries` is exceeded.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1000, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wrappers: Dict[int, "CachedLLMPlugin"] = {}
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily so that importing the NLU module does not touch the disk.
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS plans (
+                    key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    command TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS plans_last_used ON plans (last_used)")
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def _key(kind: str, namespace: str, command: str) -> str:
+        raw = "\0".join([namespace, kind, normalize_command(command)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, kind: str, namespace: str, command: str) -> Optional[Any]:
+        """
+        Looks up a cached result.
+
+        Args:
+            kind (str): The kind of call (e.g. "interpret" or "decompose").
+            namespace (str): The plugin's cache namespace.
+            command (str): The command or task description.
+
+        Returns:
+            The cached result, or None on a miss.
+        """
+        key = self._key(kind, namespace, command)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT payload, created_at FROM plans WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM plans WHERE key = ?", (key,))
+                conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                current_span().set("cache", "miss")
+                return None
+            conn.execute(
+                "UPDATE plans SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            conn.commit()
+            self.hits += 1
+        current_span().set("cache", "hit")
+        current_span().set("source", "cache")
+        return json.loads(row[0])
+
+    def put(self, kind: str, namespace: str, command: str, value: Any) -> None:
+        """
+        Stores a result and evicts the least recently used entries if needed.
+
+        Args:
+            kind (str): The kind of call (e.g. "interpret" or "decompose").
+            namespace (str): The plugin's cache namespace.
+            command (str): The command or task description.
+            value: A JSON-serializable result.
+        """
+        key = self._key(kind, namespace, command)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO plans
+                    (key, namespace, kind, command, payload, created_at, last_used, hits)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+                """,
+                (key, namespace, kind, normalize_command(command), json.dumps(value), now, now),
+            )
+            conn.execute(
+                """
+                DELETE FROM plans WHERE key IN (
+                    SELECT key FROM plans ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            conn.commit()
+
+    def fetch(self, kind: str, namespace: str, command: str, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the cached result for the command, computing and storing it on a miss.
+        Empty results (None or an empty list) are never cached.
+        """
+        cached = self.get(kind, namespace, command)
+        if cached is not None:
+            logging.debug("Plan cache hit (%s): %s", kind, command)
+            return cached
+        value = compute()
+        if value:
+            self.put(kind, namespace, command, value)
+        return value
+
+    def invalidate(self, command: Optional[str] = None, namespace: Optional[str] = None) -> int:
+        """
+        Removes cached entries. With no arguments the whole cache is cleared.
+
+        Args:
+            command (str, optional): Only remove entries for this command.
+            namespace (str, optional): Only remove entries in this namespace.
+
+        Returns:
+            int: The number of removed entries.
+        """
+        clauses, params = [], []
+        if command is not None:
+            clauses.append("command = ?")
+            params.append(normalize_command(command))
+        if namespace is not None:
+            clauses.append("namespace = ?")
+            params.append(namespace)
+        query = "DELETE FROM plans"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self._lock:
+            conn = self._connection()
+            removed = conn.execute(query, params).rowcount
+            conn.commit()
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit/miss counters of this process and the number of stored entries."""
+        with self._lock:
+            size = self._connection().execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": size}
+
+    def wrap(self, plugin: LLMPlugin) -> LLMPlugin:
+        """
+        Returns a view of the plugin whose results go through this cache.
+        Plugins without a cache namespace are returned unchanged.
+        """
+        if plugin.cache_namespace() is None:
+            return plugin
+        wrapper = self._wrappers.get(id(plugin))
+        if wrapper is None or wrapper.plugin is not plugin:
+            wrapper = CachedLLMPlugin(plugin, self)
+            self._wrappers[id(plugin)] = wrapper
+        return wrapper
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class CachedLLMPlugin(LLMPlugin):
+    """
+    LLM plugin that answers from a PlanCache and delegates misses to the wrapped plugin.
+    """
+
+    def __init__(self, plugin: LLMPlugin, cache: PlanCache):
+        self.plugin = plugin
+        self.cache = cache
+
+    def cache_namespace(self) -> Optional[str]:
+        return self.plugin.cache_namespace()
+
+    def interpret_command(self, user_command: str) -> Optional[Dict[str, Any]]:
+        return self.cache.fetch(
+            "interpret",
+            self.cache_namespace(),
+            user_command,
+            lambda: self.plugin.interpret_command(user_command),
+        )
+
+    def decompose_task(self, task_description: str) -> Optional[List[Dict[str, Any]]]:
+        return self.cache.fetch(
+            "decompose",
+            self.cache_namespace(),
+            task_description,
+            lambda: self.plugin.decompose_task(task_description),
+        )
+
+    def stream_decompose_task(self, task_description: str) -> Iterator[Dict[str, Any]]:
+        namespace = self.cache_namespace()
+        cached = self.cache.get("decompose", namespace, task_description)
+        if cached is not None:
+            yield from cached
+            return
+        actions = []
+        for action in self.plugin.stream_decompose_task(task_description):
+            actions.append(action)
+            yield action
+        # Only reached when the consumer read the whole stream
+        if actions:
+            self.cache.put("decompose", namespace, task_description, actions)
+
+    def plan_command(self, user_command: str) -> Optional[Dict[str, Any]]:
+        return self.cache.fetch(
+            "plan",
+            self.cache_namespace(),
+            user_command,
+            lambda: self.plugin.plan_command(user_command),
+        )
+
+    def stream_plan_command(
+        self, user_command: str
+    ) -> Generator[Dict[str, Any], None, Optional[Dict[str, Any]]]:
+        namespace = self.cache_namespace()
+        cached = self.cache.get("plan", namespace, user_command)
+        if cached is not None:
+            yield from cached.get("actions", [])
+            return cached
+        plan = yield from self.plugin.stream_plan_command(user_command)
+        # Only reached when the consumer read the whole stream
+        if plan:
+            self.cache.put("plan", namespace, user_command, plan)
+        return plan
+
+    def replan_suffix(
+        self, user_command: str, completed: List[Dict[str, Any]], failure: Dict[str, Any]
+    ) -> Optional[List[Dict[str, Any]]]:
+        # Depends on the state of the screen, so it is never cached
+        return self.plugin.replan_suffix(user_command, completed, failure)
@@ -0,0 +1,98 @@
+# response_schema.py
+
+from typing import Any, Dict, Optional
+
+from src.plugins import ParameterSpec, PluginRegistry, plugin_registry
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+
+# Any action, for plugins that cannot list their action types
+_ANY_ACTION = {
+    "type": "object",
+    "properties": {"action_type": {"type": "string"}, "parameters": {"type": "object"}},
+    "required": ["action_type", "parameters"],
+}
+
+_schemas: Dict[Any, Dict[str, Any]] = {}
+
+
+def parameter_schema(specs: Optional[Dict[str, ParameterSpec]]) -> Dict[str, Any]:
+    """Returns the JSON schema of an action's parameters object."""
+    if specs is None:
+        return {"type": "object"}
+    properties = {}
+    for name, spec in specs.items():
+        prop: Dict[str, Any] = {"type": _JSON_TYPES.get(spec.type, "string")}
+        if spec.choices:
+            prop["enum"] = list(spec.choices)
+        if spec.minimum is not None:
+            prop["minimum"] = spec.minimum
+        properties[name] = prop
+    schema: Dict[str, Any] = {"type": "object", "properties": properties}
+    required = [name for name, spec in specs.items() if spec.required]
+    if required:
+        schema["required"] = required
+    return schema
+
+
+def action_schema(registry: PluginRegistry = plugin_registry) -> Dict[str, Any]:
+    """
+    Returns the JSON schema of one action: one alternative per action type of
+    the registered action plugins, with that type's parameter schema.
+    """
+    alternatives = []
+    for plugin in registry.action_plugins:
+        action_types = plugin.action_types()
+        if not action_types:
+            return _ANY_ACTION
+        for action_type in action_types:
+            alternatives.append(
+                {
+                    "type": "object",
+                    "properties": {
+                        "action_type": {"enum": [action_type]},
+                        "parameters": parameter_schema(plugin.parameter_schema(action_type)),
+                    },
+                    "required": ["action_type", "parameters"],
+                }
+            )
+    if not alternatives:
+        return _ANY_ACTION
+    return {"anyOf": alternatives}
+
+
+def response_schema(kind: str, registry: PluginRegistry = plugin_registry) -> Dict[str, Any]:
+    """
+    Returns the JSON schema of a model response, for Ollama's `format` option,
+    which then only lets the model generate JSON that matches it.
+
+    Args:
+        kind (str): "plan" (fused interpretation and actions), "interpretation"
+            or "decomposition" (a plain array of actions).
+        registry (PluginRegistry): Where the action types and their parameters come from.
+
+    Returns:
+        dict: The JSON schema. Schemas are built once per set of registered action plugins.
+    """
+    key = (kind, tuple(id(plugin) for plugin in registry.action_plugins))
+    schema = _schemas.get(key)
+    if schema is not None:
+        return schema
+    action = action_schema(registry)
+    if kind == "decomposition":
+        schema = {"type": "array", "items": action}
+    else:
+        properties = {
+            "intent": {"type": "string"},
+            "needs_decomposition": {"type": "boolean"},
+            "action": {"anyOf": [action, {"type": "null"}]},
+        }
+        required = ["intent", "needs_decomposition", "action"]
+        if kind == "plan":
+            properties["actions"] = {"type": "array", "items": action}
+            required.append("actions")
+        elif kind != "interpretation":
+            raise ValueError(f"Unknown response kind: {kind}")
+        schema = {"type": "object", "properties": properties, "required": required}
+    _schemas[key] = schema
+    return schema
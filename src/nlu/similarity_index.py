@@ -0,0 +1,487 @@
+# similarity_index.py
+
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from array import array
+from difflib import SequenceMatcher
+from typing import Any, Dict, Generator, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from src.plugins import LLMPlugin, plugin_registry
+from ..config import (
+    SIMILARITY_INDEX_PATH,
+    SIMILARITY_THRESHOLD,
+    SIMILARITY_TOP_K,
+    SIMILARITY_DIMENSIONS,
+    SIMILARITY_CANDIDATE_BUDGET,
+)
+from .plan_cache import normalize_command
+from ..utils.tracing import current_span
+
+_WORD = re.compile(r"\w+(?:['@.:/-]\w+)*")
+
+# Words that may differ between paraphrases without changing the plan
+FILLER_WORDS = frozenset(
+    "a an the and then to for in on of at with about into onto from up please me my i can you "
+    "could would go do some".split()
+)
+
+
+class SimilarMatch(NamedTuple):
+    score: float
+    command: str
+    actions: List[Dict[str, Any]]
+
+
+def ngram_features(text: str, dimensions: int = SIMILARITY_DIMENSIONS, n: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hashes the character n-grams and words of a text into a sparse, L2
+    normalized vector.
+
+    Returns:
+        tuple: (sorted bucket indices as int32, weights as float32)
+    """
+    text = " ".join(normalize_command(text).lower().split())
+    padded = f" {text} "
+    counts: Dict[int, float] = {}
+    grams = [padded[i : i + n] for i in range(max(1, len(padded) - n + 1))]
+    grams += ["w:" + word for word in _WORD.findall(text)]
+    for gram in grams:
+        bucket = zlib.crc32(gram.encode("utf-8")) % dimensions
+        counts[bucket] = counts.get(bucket, 0.0) + 1.0
+    buckets = np.fromiter(sorted(counts), dtype=np.int32, count=len(counts))
+    weights = np.fromiter((counts[b] for b in buckets.tolist()), dtype=np.float32, count=len(counts))
+    norm = float(np.linalg.norm(weights))
+    if norm:
+        weights /= norm
+    return buckets, weights
+
+
+def _words(text: str) -> List[Tuple[str, int, int]]:
+    return [(m.group(0).lower(), m.start(), m.end()) for m in _WORD.finditer(text)]
+
+
+def _find_span(haystack: List[str], needle: List[str]) -> Optional[Tuple[int, int]]:
+    for start in range(len(haystack) - len(needle) + 1):
+        if haystack[start : start + len(needle)] == needle:
+            return start, start + len(needle)
+    return None
+
+
+def _strip_fillers(start: int, end: int, words: List[str]) -> Tuple[int, int]:
+    while start < end and words[start] in FILLER_WORDS:
+        start += 1
+    while end > start and words[end - 1] in FILLER_WORDS:
+        end -= 1
+    return start, end
+
+
+def _neighbours(words: List[str], start: int, end: int) -> Tuple[Optional[str], Optional[str]]:
+    before = next((word for word in reversed(words[:start]) if word not in FILLER_WORDS), None)
+    after = next((word for word in words[end:] if word not in FILLER_WORDS), None)
+    return before, after
+
+
+def _same_neighbour(old_words: List[str], old_span: Tuple[int, int], new_words: List[str], new_span: Tuple[int, int]) -> bool:
+    old_before, old_after = _neighbours(old_words, *old_span)
+    new_before, new_after = _neighbours(new_words, *new_span)
+    return (old_before is not None and old_before == new_before) or (old_after is not None and old_after == new_after)
+
+
+_REJECT = object()
+
+
+def _match_case(replacement: str, original: str, value: str) -> str:
+    # Keep the case convention the plan applied to the command's words, e.g. "chrome" -> "Chrome"
+    for convert in (str.title, str.capitalize, str.upper, str.lower):
+        if value != original and value == convert(original):
+            return convert(replacement)
+    return replacement
+
+
+def adapt_plan(stored_command: str, actions: List[Dict[str, Any]], command: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Adapts the plan of a similar, previously executed command to a new command
+    by swapping slot values: parameter values that were taken verbatim from the
+    stored command (e.g. the search text) are replaced by the words in the same
+    position of the new command.
+
+    The plan is rejected (None) if a slot cannot be aligned, or if the new
+    command contains words that neither the stored command nor a swapped slot
+    accounts for, since the stored plan would then ignore part of the request.
+
+    Args:
+        stored_command (str): The command the plan was made for.
+        actions (list): The stored plan.
+        command (str): The new command.
+
+    Returns:
+        list: The adapted plan, or None.
+    """
+    old = _words(stored_command)
+    new = _words(command)
+    old_words = [word for word, _, _ in old]
+    new_words = [word for word, _, _ in new]
+    known = set(old_words)
+    unknown = [i for i, word in enumerate(new_words) if word not in known and word not in FILLER_WORDS]
+
+    # Slots: parameter values taken verbatim from the stored command but missing from the new one
+    slots = {}
+    for action in actions:
+        for value in (action.get("parameters") or {}).values():
+            if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                continue
+            if isinstance(value, str):
+                text = value
+            else:
+                text = str(int(value)) if float(value).is_integer() else str(value)
+            words = [word for word, _, _ in _words(text)]
+            span = _find_span(old_words, words) if words else None
+            if span is not None and _find_span(new_words, words) is None:
+                slots[span] = None
+
+    if len(slots) == 1:
+        # A single changed slot takes the new words that are not context of the
+        # stored command, wherever the paraphrase moved them, as long as they are
+        # contiguous and keep a neighbour of the old slot (e.g. "search <slot>")
+        span = next(iter(slots))
+        context = set(old_words[: span[0]] + old_words[span[1] :])
+        run = [i for i, word in enumerate(new_words) if word not in context and word not in FILLER_WORDS]
+        if run and all(
+            i in run or (new_words[i] in FILLER_WORDS and new_words[i] not in context)
+            for i in range(run[0], run[-1] + 1)
+        ) and _same_neighbour(old_words, span, new_words, (run[0], run[-1] + 1)):
+            slots[span] = (run[0], run[-1] + 1)
+    elif slots:
+        opcodes = SequenceMatcher(None, old_words, new_words, autojunk=False).get_opcodes()
+        for span in slots:
+            for tag, i1, i2, j1, j2 in opcodes:
+                if tag == "replace" and i1 <= span[0] and span[1] <= i2 and _strip_fillers(i1, i2, old_words) == span:
+                    j1, j2 = _strip_fillers(j1, j2, new_words)
+                    if j1 < j2:
+                        slots[span] = (j1, j2)
+                    break
+    if any(position is None for position in slots.values()):
+        return None
+    consumed = {i for j1, j2 in slots.values() for i in range(j1, j2)}
+    if any(i not in consumed for i in unknown):
+        # The stored plan would ignore part of the new command
+        return None
+
+    def swap(value: Any) -> Any:
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            return value
+        numeric = not isinstance(value, str)
+        text = (str(int(value)) if float(value).is_integer() else str(value)) if numeric else value
+        located = _words(text)
+        span = _find_span(old_words, [word for word, _, _ in located]) if located else None
+        if span not in slots:
+            return value
+        j1, j2 = slots[span]
+        replacement = command[new[j1][1] : new[j2 - 1][2]]
+        if not numeric:
+            # Only the words are swapped; text around them (e.g. a trailing "\n" that submits) stays
+            start, end = located[0][1], located[-1][2]
+            original = stored_command[old[span[0]][1] : old[span[1] - 1][2]]
+            return text[:start] + _match_case(replacement, original, text[start:end]) + text[end:]
+        try:
+            number = float(replacement)
+        except ValueError:
+            return _REJECT
+        return int(number) if isinstance(value, int) and number.is_integer() else number
+
+    adapted = []
+    for action in actions:
+        parameters = {}
+        for name, value in (action.get("parameters") or {}).items():
+            swapped = swap(value)
+            if swapped is _REJECT:
+                return None
+            parameters[name] = swapped
+        adapted.append({"action_type": action.get("action_type"), "parameters": parameters})
+    return adapted
+
+
+class SimilarityIndex:
+    """
+    In-memory index of executed commands and their plans for near-duplicate
+    lookup, using cosine similarity of hashed character n-gram vectors.
+
+    Vectors are sparse and kept in an inverted index (bucket -> entry ids), so
+    a lookup only touches the entries sharing n-grams with the query. The
+    rarest n-grams of the query are used to collect candidates (up to
+    `candidate_budget` postings); candidates are then scored exactly.
+
+    Removed entries stay in the inverted index but are skipped; the file gets
+    a tombstone line and drops them when it is compacted on load.
+
+    Args:
+        path (str, optional): JSON lines file the entries are appended to and loaded from.
+        dimensions (int): Number of hash buckets.
+        candidate_budget (int): Maximum number of postings scanned per lookup.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = SIMILARITY_INDEX_PATH,
+        dimensions: int = SIMILARITY_DIMENSIONS,
+        candidate_budget: int = SIMILARITY_CANDIDATE_BUDGET,
+    ):
+        self.path = path
+        self.dimensions = dimensions
+        self.candidate_budget = candidate_budget
+        self.commands: List[str] = []
+        # None for removed entries
+        self.plans: List[Optional[List[Dict[str, Any]]]] = []
+        self._vectors: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._ids: Dict[str, int] = {}
+        self._postings: Dict[int, array] = {}
+        self._posting_weights: Dict[int, array] = {}
+        self._query = np.zeros(dimensions, dtype=np.float32)
+        self._loaded = path is None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._ids)
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        lines = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if entry.get("removed"):
+                        self._remove(entry["command"])
+                    else:
+                        self._add(entry["command"], entry["actions"])
+                    lines += 1
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    continue
+        if lines > 2 * len(self._ids):
+            self._rewrite()
+
+    def _rewrite(self) -> None:
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            for command, actions in zip(self.commands, self.plans):
+                if actions is None:
+                    continue
+                f.write(json.dumps({"command": command, "actions": actions}) + "\n")
+        os.replace(temporary, self.path)
+
+    def _add(self, command: str, actions: List[Dict[str, Any]]) -> None:
+        key = normalize_command(command).lower()
+        entry = self._ids.get(key)
+        if entry is not None:
+            self.plans[entry] = actions  # Same command: keep the latest plan
+            return
+        entry = len(self.commands)
+        buckets, weights = ngram_features(command, self.dimensions)
+        self._ids[key] = entry
+        self.commands.append(command)
+        self.plans.append(actions)
+        self._vectors.append((buckets, weights))
+        for bucket, weight in zip(buckets.tolist(), weights.tolist()):
+            if bucket not in self._postings:
+                self._postings[bucket] = array("i")
+                self._posting_weights[bucket] = array("f")
+            self._postings[bucket].append(entry)
+            self._posting_weights[bucket].append(weight)
+
+    def _remove(self, command: str) -> bool:
+        entry = self._ids.pop(normalize_command(command).lower(), None)
+        if entry is None:
+            return False
+        self.plans[entry] = None
+        return True
+
+    def add(self, command: str, actions: List[Dict[str, Any]]) -> None:
+        """Adds (or updates) the plan of a command that executed successfully."""
+        if not actions:
+            return
+        with self._lock:
+            self._load()
+            self._add(command, actions)
+            if self.path:
+                try:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps({"command": command, "actions": actions}) + "\n")
+                except OSError as e:
+                    logging.error("Could not save similarity index entry: %s", e)
+
+    def remove(self, command: str) -> int:
+        """
+        Removes the plan of a command, e.g. after it failed, so that neither
+        the command nor its paraphrases reuse it.
+
+        Returns:
+            int: 1 if the command was in the index, else 0.
+        """
+        with self._lock:
+            self._load()
+            if not self._remove(command):
+                return 0
+            if self.path:
+                try:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps({"command": command, "removed": True}) + "\n")
+                except OSError as e:
+                    logging.error("Could not save similarity index removal: %s", e)
+            return 1
+
+    def search(self, command: str, k: int = SIMILARITY_TOP_K) -> List[SimilarMatch]:
+        """
+        Returns the k most similar stored commands, most similar first.
+        """
+        with self._lock:
+            self._load()
+            if not self._ids:
+                return []
+            buckets, weights = ngram_features(command, self.dimensions)
+            # Rarest n-grams first: they are the most selective and the cheapest
+            known = sorted(
+                (len(self._postings[b]), b, w) for b, w in zip(buckets.tolist(), weights.tolist()) if b in self._postings
+            )
+            ids, contributions, scanned = [], [], 0
+            for length, bucket, weight in known:
+                if ids and scanned + length > self.candidate_budget:
+                    break
+                scanned += length
+                ids.append(np.frombuffer(self._postings[bucket], dtype=np.int32))
+                contributions.append(np.frombuffer(self._posting_weights[bucket], dtype=np.float32) * weight)
+            if not ids:
+                return []
+            # Sums per entry over the scanned postings only, independent of the index size
+            candidates, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+            partial = np.bincount(inverse, weights=np.concatenate(contributions))
+            if len(candidates) > 8 * k:
+                candidates = candidates[np.argpartition(partial, -8 * k)[-8 * k :]]
+
+            # Exact cosine for the candidates, using a dense copy of the query
+            self._query[buckets] = weights
+            try:
+                scored = []
+                for entry in candidates.tolist():
+                    if self.plans[entry] is None:
+                        continue
+                    entry_buckets, entry_weights = self._vectors[entry]
+                    scored.append((float(self._query[entry_buckets] @ entry_weights), entry))
+            finally:
+                self._query[buckets] = 0.0
+            scored.sort(reverse=True)
+            return [SimilarMatch(score, self.commands[entry], self.plans[entry]) for score, entry in scored[:k]]
+
+    def lookup(
+        self, command: str, threshold: float = SIMILARITY_THRESHOLD, k: int = SIMILARITY_TOP_K
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns the plan of the most similar stored command above the
+        threshold, adapted to the new command, or None.
+        """
+        found = self._best(command, threshold, k)
+        if found is None:
+            return None
+        match, actions = found
+        logging.info("Reusing plan of '%s' (similarity %.2f)", match.command, match.score)
+        return actions
+
+    def source(self, command: str, threshold: float = SIMILARITY_THRESHOLD, k: int = SIMILARITY_TOP_K) -> Optional[str]:
+        """Returns the stored command whose plan lookup() reuses for the command, or None."""
+        found = self._best(command, threshold, k)
+        return found[0].command if found is not None else None
+
+    def _best(self, command: str, threshold: float, k: int) -> Optional[Tuple[SimilarMatch, List[Dict[str, Any]]]]:
+        for match in self.search(command, k):
+            if match.score < threshold:
+                break
+            actions = adapt_plan(match.command, match.actions, command)
+            if actions:
+                return match, actions
+        return None
+
+
+class SimilarityLLMPlugin(LLMPlugin):
+    """
+    LLM plugin that reuses the plans of similar, previously executed commands
+    and falls through to the next registered LLM plugin for everything else.
+    """
+
+    def __init__(self, index: SimilarityIndex, threshold: float = SIMILARITY_THRESHOLD, fallback: Optional[LLMPlugin] = None):
+        self.index = index
+        self.threshold = threshold
+        self.fallback = fallback
+
+    def cache_namespace(self) -> Optional[str]:
+        # Lookups are cheaper than the plan cache and depend on the index contents
+        return None
+
+    def _fallback(self) -> LLMPlugin:
+        return self.fallback or plugin_registry.get_next_llm_plugin(self)
+
+    def _lookup(self, command: str) -> Optional[List[Dict[str, Any]]]:
+        actions = self.index.lookup(command, self.threshold)
+        if actions:
+            current_span().set("source", "similarity")
+        return actions
+
+    def _plan(self, command: str) -> Optional[Dict[str, Any]]:
+        actions = self._lookup(command)
+        if not actions:
+            return None
+        return {
+            "intent": command,
+            "needs_decomposition": len(actions) > 1,
+            "action": actions[0] if len(actions) == 1 else None,
+            "actions": actions,
+        }
+
+    def interpret_command(self, user_command: str) -> Optional[Dict[str, Any]]:
+        plan = self._plan(user_command)
+        if plan is not None:
+            return {key: value for key, value in plan.items() if key != "actions"}
+        return self._fallback().interpret_command(user_command)
+
+    def decompose_task(self, task_description: str) -> Optional[List[Dict[str, Any]]]:
+        actions = self._lookup(task_description)
+        if actions:
+            return actions
+        return self._fallback().decompose_task(task_description)
+
+    def stream_decompose_task(self, task_description: str) -> Iterator[Dict[str, Any]]:
+        actions = self._lookup(task_description)
+        if actions:
+            yield from actions
+            return
+        yield from self._fallback().stream_decompose_task(task_description)
+
+    def plan_command(self, user_command: str) -> Optional[Dict[str, Any]]:
+        plan = self._plan(user_command)
+        if plan is not None:
+            return plan
+        return self._fallback().plan_command(user_command)
+
+    def replan_suffix(
+        self, user_command: str, completed: List[Dict[str, Any]], failure: Dict[str, Any]
+    ) -> Optional[List[Dict[str, Any]]]:
+        return self._fallback().replan_suffix(user_command, completed, failure)
+
+    def stream_plan_command(
+        self, user_command: str
+    ) -> Generator[Dict[str, Any], None, Optional[Dict[str, Any]]]:
+        plan = self._plan(user_command)
+        if plan is not None:
+            yield from plan["actions"]
+            return plan
+        return (yield from self._fallback().stream_plan_command(user_command))
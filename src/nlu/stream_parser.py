@@ -0,0 +1,112 @@
+# stream_parser.py
+
+import json
+import logging
+from typing import Any, Iterable, Iterator, List, Optional
+
+
+class IncrementalJSONArrayParser:
+    """
+    Incrementally parses a JSON array that arrives in arbitrary text chunks and
+    returns each object element as soon as its closing brace has been received.
+
+    By default the first top-level array in the text is parsed, so any prose the
+    model emits before the array is skipped. With `key`, the array stored under
+    that key of the top-level object is parsed instead.
+    """
+
+    def __init__(self, key: Optional[str] = None):
+        self.key = key
+        self.done = False
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._element_start: Optional[int] = None
+
+    def _is_target_array(self) -> bool:
+        if self.key is None:
+            return not self._stack
+        return self._stack == ["{"] and self._current_key == self.key
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Feeds the next chunk of text.
+
+        Args:
+            chunk (str): The next piece of the response.
+
+        Returns:
+            list: The objects completed by this chunk, in order.
+        """
+        completed = []
+        if self.done:
+            return completed
+        self._buffer += chunk
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._array_depth is None:
+                        self._last_string = buffer[self._string_start + 1 : i]
+            elif char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ":" and self._array_depth is None:
+                self._current_key = self._last_string
+            elif char in "[{":
+                if self._array_depth is None and char == "[" and self._is_target_array():
+                    self._stack.append(char)
+                    self._array_depth = len(self._stack)
+                else:
+                    if len(self._stack) == self._array_depth and char == "{":
+                        self._element_start = i
+                    self._stack.append(char)
+            elif char in "]}":
+                if self._stack:
+                    self._stack.pop()
+                if self._array_depth is not None:
+                    if len(self._stack) < self._array_depth:
+                        self.done = True
+                        break
+                    if len(self._stack) == self._array_depth and self._element_start is not None:
+                        element_text = buffer[self._element_start : i + 1]
+                        self._element_start = None
+                        try:
+                            completed.append(json.loads(element_text))
+                        except json.JSONDecodeError as e:
+                            logging.warning("Skipping malformed streamed element: %s", e)
+                        # Drop everything that has been consumed.
+                        buffer = buffer[i + 1 :]
+                        i = -1
+            i += 1
+        self._buffer = buffer
+        self._pos = i
+        return completed
+
+
+def iter_json_array(chunks: Iterable[str], key: Optional[str] = None) -> Iterator[Any]:
+    """
+    Yields the objects of a JSON array from an iterable of text chunks as soon as each one is complete.
+
+    Args:
+        chunks (Iterable[str]): The streamed response text.
+        key (str, optional): Parse the array under this key of the top-level object.
+    """
+    parser = IncrementalJSONArrayParser(key=key)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.done:
+            break
@@ -0,0 +1,243 @@
+# transport.py
+
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..config import (
+    LLAMA_API_URL,
+    LLAMA_CONNECT_TIMEOUT,
+    LLAMA_READ_TIMEOUT,
+    LLAMA_MAX_RETRIES,
+    LLAMA_RETRY_BACKOFF,
+    LLAMA_RETRY_BACKOFF_MAX,
+    LLAMA_MAX_IN_FLIGHT,
+    LLAMA_POOL_SIZE,
+)
+
+
+class LatencyStats:
+    """
+    Per-call latency metrics of a transport. Keeps counters plus a window of
+    the most recent samples for percentiles.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.errors += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self._samples.append(seconds)
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def percentile(self, p: float) -> float:
+        """Returns the p-th percentile (0-100) of the recent samples, in seconds."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        index = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "mean": self.total_seconds / self.calls if self.calls else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max_seconds,
+        }
+
+
+class LLMTransport:
+    """
+    Pooled HTTP transport for the Llama (Ollama) chat API.
+
+    Keeps connections alive through a shared requests.Session, applies connect
+    and read timeouts, retries 5xx responses and connection errors with jittered
+    exponential backoff and bounds the number of requests in flight.
+    """
+
+    def __init__(
+        self,
+        url: str = LLAMA_API_URL,
+        connect_timeout: float = LLAMA_CONNECT_TIMEOUT,
+        read_timeout: float = LLAMA_READ_TIMEOUT,
+        max_retries: int = LLAMA_MAX_RETRIES,
+        backoff: float = LLAMA_RETRY_BACKOFF,
+        backoff_max: float = LLAMA_RETRY_BACKOFF_MAX,
+        max_in_flight: int = LLAMA_MAX_IN_FLIGHT,
+        pool_size: int = LLAMA_POOL_SIZE,
+    ):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.stats = LatencyStats()
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # "Full jitter" backoff, so that many sessions do not retry in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff * (2 ** attempt)))
+
+    def _send(self, data: Dict[str, Any], stream: bool) -> requests.Response:
+        """Sends the request, retrying 5xx responses and connection errors."""
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(self.url, json=data, timeout=self.timeout, stream=stream)
+                if response.status_code < 500 or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                response.close()
+                logging.warning("Llama API returned %s, retrying", response.status_code)
+            except requests.ConnectionError as e:
+                if attempt >= self.max_retries:
+                    raise
+                logging.warning("Connection to Llama API failed (%s), retrying", e)
+            self.stats.record_retry()
+            time.sleep(self._backoff_delay(attempt))
+            attempt += 1
+
+    def post_chat(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Sends a non-streaming chat request.
+
+        Args:
+            data (dict): The request body.
+
+        Returns:
+            dict: The decoded JSON response.
+
+        Raises:
+            requests.RequestException: If the request failed after all retries.
+        """
+        start = time.perf_counter()
+        ok = False
+        with self._slots:
+            try:
+                response = self._send(data, stream=False)
+                result = response.json()
+                ok = True
+                return result
+            finally:
+                self.stats.record(time.perf_counter() - start, ok)
+
+    def stream_chat(self, data: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Sends a streaming chat request and yields each decoded JSON line.
+        Only the initial request is retried; a stream that breaks midway raises.
+
+        The in-flight slot is held until the stream ends or is closed, since
+        the server keeps generating until then; close a stream that is no
+        longer needed (e.g. before replanning) to free it. The time the
+        consumer spends between lines is left out of the latency. Closing the
+        stream early is not an error.
+        """
+        start = time.perf_counter()
+        consumer_seconds = 0.0
+        ok = False
+        with self._slots:
+            try:
+                with self._send(data, stream=True) as response:
+                    for line in response.iter_lines():
+                        if line:
+                            yielded = time.perf_counter()
+                            yield json.loads(line)
+                            consumer_seconds += time.perf_counter() - yielded
+                ok = True
+            except GeneratorExit:
+                # The consumer stopped reading, e.g. after a failed action
+                ok = True
+                raise
+            finally:
+                self.stats.record(time.perf_counter() - start - consumer_seconds, ok)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncLLMTransport:
+    """
+    asyncio flavour of LLMTransport.
+
+    Requests run on worker threads over the same pooled session, so the event
+    loop never blocks, and an asyncio.Semaphore bounds the requests in flight
+    per event loop.
+    """
+
+    def __init__(self, transport: Optional[LLMTransport] = None, max_in_flight: int = LLAMA_MAX_IN_FLIGHT):
+        self.transport = transport or LLMTransport(max_in_flight=max_in_flight)
+        self.max_in_flight = max_in_flight
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def stats(self) -> LatencyStats:
+        return self.transport.stats
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        return self._slots
+
+    async def post_chat(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        async with self._semaphore():
+            return await asyncio.to_thread(self.transport.post_chat, data)
+
+    async def stream_chat(self, data: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        async with self._semaphore():
+            chunks = self.transport.stream_chat(data)
+            done = object()
+            try:
+                while True:
+                    chunk = await asyncio.to_thread(next, chunks, done)
+                    if chunk is done:
+                        break
+                    yield chunk
+            finally:
+                chunks.close()
+
+
+_default_transport: Optional[LLMTransport] = None
+_default_transport_lock = threading.Lock()
+
+
+def get_transport() -> LLMTransport:
+    """Returns the process-wide transport configured from src/config.py."""
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = LLMTransport()
+        return _default_transport
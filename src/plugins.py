@@ -1,5 +1,16 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Generator, Iterator, List, NamedTuple, Optional, Tuple
+
+# --- Action parameter schemas ---
+class ParameterSpec(NamedTuple):
+    """Describes one parameter of an action type, for validating plans before execution."""
+    type: type = str
+    required: bool = False
+    default: Any = None
+    choices: Optional[Tuple[Any, ...]] = None
+    aliases: Tuple[str, ...] = ()
+    # Smallest allowed value of a number, e.g. 0 for durations and timeouts
+    minimum: Optional[float] = None
 
 # --- Action Plugin Interface ---
 class ActionPlugin(ABC):
@@ -13,6 +24,25 @@ class ActionPlugin(ABC):
         """Execute the action. Return True if successful."""
         pass
 
+    def action_types(self) -> List[str]:
+        """Return the action types this plugin handles, if it can enumerate them."""
+        return []
+
+    def parameter_schema(self, action_type: str) -> Optional[Dict[str, ParameterSpec]]:
+        """
+        Return the parameter specs of an action type, or None if the plugin
+        does not describe its parameters (they are then passed through as is).
+        """
+        return None
+
+    def get_handler(self, action_type: str) -> Callable[[Dict[str, Any]], bool]:
+        """
+        Return a callable that executes an action of this type given its
+        (validated) parameters. Plugins can override this to skip the dispatch
+        in execute().
+        """
+        return lambda parameters: self.execute({"action_type": action_type, "parameters": parameters})
+
 # --- LLM Plugin Interface ---
 class LLMPlugin(ABC):
     @abstractmethod
@@ -23,17 +53,95 @@ class LLMPlugin(ABC):
     def decompose_task(self, task_description: str) -> List[Dict[str, Any]]:
         pass
 
+    def stream_decompose_task(self, task_description: str) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the atomic actions one by one as they become available. Plugins
+        that can stream their output should override this; by default the
+        result of decompose_task is yielded.
+        """
+        yield from self.decompose_task(task_description) or []
+
+    def plan_command(self, user_command: str) -> Optional[Dict[str, Any]]:
+        """
+        Interpret the command and return its full plan: the interpretation
+        ("intent", "needs_decomposition", "action") plus an "actions" list.
+        Plugins that can do this in a single model call should override it;
+        by default it calls interpret_command and then decompose_task.
+        """
+        interpretation = self.interpret_command(user_command)
+        if not interpretation:
+            return None
+        if not interpretation.get("needs_decomposition", False):
+            action = interpretation.get("action")
+            actions = [action] if action else []
+        else:
+            task_description = interpretation.get("intent", "")
+            actions = self.decompose_task(task_description) if task_description else None
+        if not actions:
+            return None
+        return {**interpretation, "actions": actions}
+
+    def stream_plan_command(
+        self, user_command: str
+    ) -> Generator[Dict[str, Any], None, Optional[Dict[str, Any]]]:
+        """
+        Like plan_command, but yield the actions one by one as they become
+        available. The generator returns the full plan when it is exhausted.
+        """
+        interpretation = self.interpret_command(user_command)
+        if not interpretation:
+            return None
+        if not interpretation.get("needs_decomposition", False):
+            action = interpretation.get("action")
+            if not action:
+                return None
+            yield action
+            return {**interpretation, "actions": [action]}
+        task_description = interpretation.get("intent", "")
+        if not task_description:
+            return None
+        actions = []
+        for action in self.stream_decompose_task(task_description):
+            actions.append(action)
+            yield action
+        return {**interpretation, "actions": actions} if actions else None
+
+    def replan_suffix(
+        self, user_command: str, completed: List[Dict[str, Any]], failure: Dict[str, Any]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Plan only the actions that remain after an action failed, given the
+        actions that already succeeded ("completed") and the context of the
+        failure (the failed "action", the active "application", whether its
+        target is visible, ...). Return None if the plugin cannot replan; by
+        default plugins cannot.
+        """
+        return None
+
+    def cache_namespace(self) -> Optional[str]:
+        """
+        Return the namespace under which this plugin's results may be cached,
+        or None to disable plan caching for it. The namespace should change
+        whenever the plugin's output for the same command could change
+        (e.g. a different model or prompt).
+        """
+        return type(self).__qualname__
+
 # --- Plugin Registry ---
 class PluginRegistry:
     def __init__(self):
         self.action_plugins: List[ActionPlugin] = []
         self.llm_plugins: List[LLMPlugin] = []
+        self.plan_cache = None
 
     def register_action_plugin(self, plugin: ActionPlugin):
         self.action_plugins.append(plugin)
 
-    def register_llm_plugin(self, plugin: LLMPlugin):
-        self.llm_plugins.append(plugin)
+    def register_llm_plugin(self, plugin: LLMPlugin, first: bool = False):
+        if first:
+            self.llm_plugins.insert(0, plugin)
+        else:
+            self.llm_plugins.append(plugin)
 
     def get_action_plugin(self, action_type: str) -> ActionPlugin:
         for plugin in self.action_plugins:
@@ -41,10 +149,27 @@ class PluginRegistry:
                 return plugin
         raise ValueError(f"No plugin found for action type: {action_type}")
 
+    def set_plan_cache(self, plan_cache) -> None:
+        """Put a plan cache (see src.nlu.plan_cache) in front of every LLM plugin."""
+        self.plan_cache = plan_cache
+
+    def _llm_plugin_at(self, index: int) -> LLMPlugin:
+        plugin = self.llm_plugins[index]
+        if self.plan_cache is not None:
+            return self.plan_cache.wrap(plugin)
+        return plugin
+
     def get_llm_plugin(self) -> LLMPlugin:
         if self.llm_plugins:
-            return self.llm_plugins[0]  # For now, just return the first
+            return self._llm_plugin_at(0)
         raise ValueError("No LLM plugin registered.")
 
+    def get_next_llm_plugin(self, plugin: LLMPlugin) -> LLMPlugin:
+        """Return the LLM plugin registered after the given one, for plugins that fall through."""
+        for index, registered in enumerate(self.llm_plugins[:-1]):
+            if registered is plugin:
+                return self._llm_plugin_at(index + 1)
+        raise ValueError(f"No LLM plugin registered after {type(plugin).__name__}.")
+
 # Global registry instance
 plugin_registry = PluginRegistry() 
\ No newline at end of file
@@ -0,0 +1,229 @@
+# recovery.py
+
+"""
+Resumable plan execution.
+
+Actions run one at a time against a checkpoint of the actions that have
+succeeded. When one fails, the screen and the context at that point are
+captured and the model is asked only for the actions that remain, given the
+completed ones. Execution then resumes from the checkpoint, at most
+RECOVERY_MAX_REPLANS times per command, instead of rerunning the command
+(and its model calls and completed actions) from the start.
+
+Usage:
+    checkpoint = run_with_recovery(command, compile_plan(actions))
+    checkpoint.finished   # True if the command completed, possibly after replanning
+    checkpoint.completed  # The actions that succeeded, in order
+"""
+
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import cv2
+import numpy as np
+
+from src.config import PLAN_OPTIMIZER_ENABLED, RECOVERY_ENABLED, RECOVERY_MAX_REPLANS, RECOVERY_SNAPSHOT_DIR
+from src.executor.capture import get_capture
+from src.executor.environment import find_target
+from src.executor.mouse_keyboard import last_opened_application
+from src.executor.plan_compiler import CompiledPlan, PlanValidationError, compile_plan
+from src.executor.plan_optimizer import optimize_plan
+from src.nlu.interpreter import replan_suffix
+from src.plugins import PluginRegistry, plugin_registry
+from src.utils.logger import get_correlation_id
+
+
+@dataclass
+class FailureContext:
+    """The state at the point where an action failed, for replanning and diagnosis."""
+
+    action: Dict[str, Any]
+    # Number of actions of the command that had succeeded before it
+    completed: int
+    # Which failure of the command this is, starting at 1
+    attempt: int
+    # The application opened last
+    application: Optional[str] = None
+    # Whether the failed action's target is on the screen now (None if it has no target)
+    target_visible: Optional[bool] = None
+    screenshot: Optional[np.ndarray] = field(default=None, repr=False)
+    snapshot_path: Optional[str] = None
+    time: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The context without the screenshot, as passed to LLMPlugin.replan_suffix."""
+        return {
+            "action": self.action,
+            "completed": self.completed,
+            "attempt": self.attempt,
+            "application": self.application,
+            "target_visible": self.target_visible,
+            "snapshot_path": self.snapshot_path,
+            "time": self.time,
+        }
+
+
+@dataclass
+class ExecutionCheckpoint:
+    """Execution state of one command: the actions that succeeded, the failures and the replans."""
+
+    command: str
+    completed: List[Dict[str, Any]] = field(default_factory=list)
+    failures: List[FailureContext] = field(default_factory=list)
+    replans: int = 0
+    # Actions run, including the failed ones
+    executed: int = 0
+    finished: bool = False
+    cancelled: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "command": self.command,
+            "completed": self.completed,
+            "failures": [failure.to_dict() for failure in self.failures],
+            "replans": self.replans,
+            "executed": self.executed,
+            "finished": self.finished,
+            "cancelled": self.cancelled,
+        }
+
+
+def save_snapshot(failure: FailureContext, checkpoint: ExecutionCheckpoint, directory: str) -> None:
+    """Writes the screenshot and the checkpoint at a failure to the directory."""
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, f"{get_correlation_id()}-{failure.attempt}")
+    if failure.screenshot is not None and cv2.imwrite(stem + ".png", failure.screenshot):
+        failure.snapshot_path = stem + ".png"
+    with open(stem + ".json", "w", encoding="utf-8") as f:
+        json.dump(checkpoint.to_dict(), f, indent=2)
+
+
+def capture_failure(action: Dict[str, Any], checkpoint: ExecutionCheckpoint) -> FailureContext:
+    """
+    Captures the screen and the context after an action failed. Failing to
+    capture the screen does not stop recovery; the context is just less complete.
+
+    Args:
+        action (dict): The failed action.
+        checkpoint (ExecutionCheckpoint): The execution state of the command.
+
+    Returns:
+        FailureContext: The captured context.
+    """
+    failure = FailureContext(action, len(checkpoint.completed), len(checkpoint.failures) + 1, last_opened_application())
+    capture = get_capture()
+    try:
+        capture.begin_step()
+        failure.screenshot = capture.frame().base
+    except Exception as e:
+        logging.warning("Could not capture the screen at the failure: %s", e)
+        return failure
+    target = action.get("parameters", {}).get("target")
+    if target:
+        try:
+            failure.target_visible = find_target(target, capture) is not None
+        except Exception as e:
+            logging.warning("Could not look for '%s' at the failure: %s", target, e)
+    return failure
+
+
+def replan_and_compile(
+    command: str, completed: List[Dict[str, Any]], failure: FailureContext, registry: PluginRegistry = plugin_registry
+) -> Optional[CompiledPlan]:
+    """
+    Asks the LLM plugin for the actions that remain after a failure, then
+    validates and optimizes them like a new plan.
+
+    Returns:
+        CompiledPlan: The remaining actions, or None if the plugin found no way to finish.
+
+    Raises:
+        PlanValidationError: If the remaining actions cannot be executed.
+    """
+    actions = replan_suffix(command, completed, failure.to_dict())
+    if not actions:
+        return None
+    compiled = compile_plan(actions, registry)
+    if PLAN_OPTIMIZER_ENABLED:
+        compiled, _ = optimize_plan(compiled, registry=registry)
+    return compiled
+
+
+def run_with_recovery(
+    command: str,
+    actions: Iterable[Any],
+    replan: Optional[Callable[[str, List[Dict[str, Any]], FailureContext], Optional[Iterable[Any]]]] = (
+        replan_and_compile if RECOVERY_ENABLED else None
+    ),
+    max_replans: int = RECOVERY_MAX_REPLANS,
+    on_action: Optional[Callable[[Any, bool], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    capture: Callable[[Dict[str, Any], ExecutionCheckpoint], FailureContext] = capture_failure,
+) -> ExecutionCheckpoint:
+    """
+    Runs a command's actions until one fails, then replans the rest and
+    resumes, until the command is finished or the replan budget is spent.
+    The actions after a failed one never run, since they depend on it.
+
+    Args:
+        command (str): The command the actions carry out.
+        actions (Iterable): Compiled actions (objects with run() and to_dict()),
+            e.g. a CompiledPlan or a compiled stream.
+        replan (callable, optional): (command, completed actions, FailureContext)
+            -> the remaining actions, or None. Without it, execution stops at the first failure.
+        max_replans (int): Maximum number of replans for the command.
+        on_action (callable, optional): Called with each action and whether it succeeded.
+        should_stop (callable, optional): Checked before each action; stops the command when it returns True.
+        capture (callable): Captures the FailureContext of a failed action.
+
+    Returns:
+        ExecutionCheckpoint: The final execution state.
+    """
+    checkpoint = ExecutionCheckpoint(command)
+    while True:
+        for action in actions:
+            if should_stop is not None and should_stop():
+                checkpoint.cancelled = True
+                return checkpoint
+            logging.info("Processing action: %s", action)
+            success = action.run()
+            checkpoint.executed += 1
+            if on_action is not None:
+                on_action(action, success)
+            if not success:
+                failed = action.to_dict()
+                break
+            checkpoint.completed.append(action.to_dict())
+        else:
+            checkpoint.finished = True
+            return checkpoint
+        if hasattr(actions, "close"):
+            actions.close()  # Stops generating the rest of a streamed plan
+
+        failure = capture(failed, checkpoint)
+        checkpoint.failures.append(failure)
+        if RECOVERY_SNAPSHOT_DIR:
+            try:
+                save_snapshot(failure, checkpoint, RECOVERY_SNAPSHOT_DIR)
+            except OSError as e:
+                logging.warning("Could not save the failure snapshot: %s", e)
+        logging.warning("Action failed after %d completed action(s): %s", failure.completed, failed)
+        if replan is None or checkpoint.replans >= max_replans:
+            return checkpoint
+        checkpoint.replans += 1
+        try:
+            actions = replan(command, list(checkpoint.completed), failure)
+        except PlanValidationError as e:
+            logging.warning("Replanned actions rejected: %s", e)
+            return checkpoint
+        except Exception as e:
+            logging.error("Replanning failed: %s", e)
+            return checkpoint
+        if not actions:
+            logging.warning("No way to finish the command was found after the failure.")
+            return checkpoint
+        logging.info("Resuming with replanned actions (replan %d of %d)", checkpoint.replans, max_replans)
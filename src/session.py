@@ -0,0 +1,316 @@
+# session.py
+
+import asyncio
+import contextvars
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+from src.config import LLAMA_MAX_IN_FLIGHT, PLAN_OPTIMIZER_ENABLED, RECOVERY_ENABLED
+from src.executor.plan_compiler import CompiledPlan, PlanValidationError, compile_plan
+from src.executor.plan_optimizer import optimize_plan
+from src.nlu.interpreter import plan_command
+from src.plugins import PluginRegistry, plugin_registry
+from src.recovery import replan_and_compile, run_with_recovery
+from src.utils.logger import correlation_scope, new_correlation_id
+
+
+@dataclass
+class CommandResult:
+    """Outcome of one command run through the session engine."""
+
+    command: str
+    plan: Optional[List[Dict[str, Any]]] = None
+    success: bool = False
+    executed: int = 0
+    # Times the rest of the plan was replanned after a failed action
+    replans: int = 0
+    error: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    # Tags the log records of this command
+    correlation_id: str = field(default_factory=new_correlation_id)
+
+
+def run_in_daemon_thread(func: Callable, *args) -> "asyncio.Future":
+    """
+    Runs a blocking function on a daemon thread and returns an awaitable for
+    its result. Unlike asyncio.to_thread, a call that is still blocked (e.g. on
+    a slow model) never delays interpreter shutdown after Ctrl-C. Like it, the
+    function runs in a copy of the caller's context (e.g. its correlation ID).
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(result=None, error=None):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def worker():
+        try:
+            result = func(*args)
+        except BaseException as e:
+            outcome = {"error": e}
+        else:
+            outcome = {"result": result}
+        try:
+            loop.call_soon_threadsafe(lambda: resolve(**outcome))
+        except RuntimeError:
+            pass  # The event loop is already closed
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(worker,), daemon=True).start()
+    return future
+
+
+def plan_and_compile(command: str) -> Optional[CompiledPlan]:
+    """
+    Plans a command, validates the whole plan before anything runs and
+    optimizes it (if PLAN_OPTIMIZER_ENABLED).
+
+    Returns:
+        CompiledPlan: The compiled plan, or None if the command was not understood.
+
+    Raises:
+        PlanValidationError: If the plan contains actions that cannot be executed.
+    """
+    plan = plan_command(command)
+    if not plan:
+        return None
+    compiled = compile_plan(plan.get("actions"))
+    if PLAN_OPTIMIZER_ENABLED:
+        compiled, _ = optimize_plan(compiled)
+    return compiled
+
+
+def preview_plan(plan: Optional[Dict[str, Any]], registry: PluginRegistry = plugin_registry) -> Dict[str, Any]:
+    """
+    Prepares a plan for review before it runs: validates and optimizes it.
+
+    Args:
+        plan (dict): The plan returned by plan_command, or None.
+        registry (PluginRegistry): Registry used to compile the actions.
+
+    Returns:
+        dict: "interpretation" (the plan without its actions), "actions" (as
+        they will run), "compiled" (the CompiledPlan, or None if it cannot
+        run), "errors" and "optimization" (the optimizer's report, if it
+        changed anything).
+    """
+    preview: Dict[str, Any] = {"interpretation": None, "actions": None, "compiled": None, "errors": [], "optimization": None}
+    if not plan:
+        preview["errors"] = ["Failed to interpret the command."]
+        return preview
+    preview["interpretation"] = {key: value for key, value in plan.items() if key != "actions"}
+    preview["actions"] = plan.get("actions")
+    try:
+        compiled = compile_plan(preview["actions"], registry)
+    except PlanValidationError as e:
+        preview["errors"] = e.errors
+        return preview
+    if PLAN_OPTIMIZER_ENABLED:
+        compiled, report = optimize_plan(compiled, registry=registry)
+        if report.changed:
+            preview["actions"] = compiled.to_dicts()
+            preview["optimization"] = report.format()
+    preview["compiled"] = compiled
+    return preview
+
+
+class SessionEngine:
+    """
+    Plans queued commands concurrently and executes them strictly in order.
+
+    Planning (interpretation, decomposition and compilation) of up to
+    `max_concurrent_plans` commands runs on worker threads while the previous
+    commands are still executing. Execution happens one action at a time on a
+    single worker, in submission order, since there is only one keyboard and
+    mouse.
+
+    Args:
+        planner (callable): Turns a command into an iterable of compiled actions
+            (objects with run() and to_dict()). Raises or returns a falsy value on failure.
+            Defaults to plan_and_compile.
+        max_concurrent_plans (int): Maximum number of commands planned at once.
+        on_result (callable, optional): Called with each CommandResult, in order.
+        execute (bool): If False, commands are only planned (plan-only mode).
+        learn (callable, optional): Called with the command and its plan after
+            all of its actions executed successfully.
+        replan (callable, optional): Replans the rest of a command after a
+            failed action (see src.recovery.run_with_recovery). Without it, a
+            command stops at its first failed action.
+        forget (callable, optional): Called with the command when its plan
+            failed or had to be replanned, e.g. to drop it from the plan cache.
+    """
+
+    def __init__(
+        self,
+        planner: Callable[[str], Optional[Iterable[Any]]] = plan_and_compile,
+        max_concurrent_plans: int = LLAMA_MAX_IN_FLIGHT,
+        on_result: Optional[Callable[[CommandResult], None]] = None,
+        execute: bool = True,
+        learn: Optional[Callable[[str, List[Dict[str, Any]]], None]] = None,
+        replan: Optional[Callable] = replan_and_compile if RECOVERY_ENABLED else None,
+        forget: Optional[Callable[[str], Any]] = None,
+    ):
+        self.planner = planner
+        self.max_concurrent_plans = max_concurrent_plans
+        self.on_result = on_result
+        self.execute = execute
+        self.learn = learn
+        self.replan = replan
+        self.forget = forget
+        self._planning_slots: Optional[asyncio.Semaphore] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor_task: Optional[asyncio.Task] = None
+        self._planning_tasks: set = set()
+        self._cancelled = threading.Event()
+
+    def start(self) -> None:
+        """Starts the executor. Must be called from a running event loop."""
+        self._planning_slots = asyncio.Semaphore(self.max_concurrent_plans)
+        self._queue = asyncio.Queue()
+        self._cancelled.clear()
+        self._executor_task = asyncio.create_task(self._execute_in_order())
+
+    def submit(self, command: str) -> "asyncio.Future":
+        """
+        Queues a command. Planning starts immediately (within the concurrency
+        limit); execution starts once all previously submitted commands are done.
+
+        Returns:
+            asyncio.Future: Resolves to the CommandResult of the command.
+        """
+        if self._queue is None:
+            raise RuntimeError("SessionEngine.start() has not been called.")
+        result = CommandResult(command)
+        with correlation_scope(result.correlation_id):
+            planning = asyncio.create_task(self._plan(result))
+        self._planning_tasks.add(planning)
+        planning.add_done_callback(self._planning_tasks.discard)
+        done = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((result, planning, done))
+        return done
+
+    async def _plan(self, result: CommandResult) -> Optional[List[Any]]:
+        async with self._planning_slots:
+            start = time.perf_counter()
+            try:
+                actions = await run_in_daemon_thread(lambda: list(self.planner(result.command) or []))
+            except PlanValidationError as e:
+                result.error = f"Plan rejected before execution: {e}"
+                actions = None
+            except Exception as e:
+                result.error = f"Planning failed: {e}"
+                actions = None
+            result.timings["plan"] = time.perf_counter() - start
+        if not actions and result.error is None:
+            result.error = "Failed to interpret the command."
+        if actions:
+            result.plan = [action.to_dict() for action in actions]
+        return actions or None
+
+    def _run_actions(self, result: CommandResult, actions: List[Any]) -> None:
+        # Like the serial REPL, the rest of a command is replanned after a failed action
+        checkpoint = run_with_recovery(result.command, actions, replan=self.replan, should_stop=self._cancelled.is_set)
+        result.executed = len(checkpoint.completed)
+        result.replans = checkpoint.replans
+        if checkpoint.cancelled:
+            result.error = "Cancelled."
+            return
+        if self.forget is not None and (checkpoint.replans or not checkpoint.finished):
+            self.forget(result.command)
+        if checkpoint.finished and checkpoint.replans:
+            # The actions that actually ran, for the results and for learning
+            result.plan = checkpoint.completed
+        result.success = checkpoint.finished
+        if checkpoint.failures and not checkpoint.finished:
+            result.error = "; ".join(f"Failed to execute action: {failure.action}" for failure in checkpoint.failures)
+
+    async def _execute_in_order(self) -> None:
+        while True:
+            result, planning, done = await self._queue.get()
+            try:
+                actions = await planning
+                if actions and not self.execute:
+                    result.success = True
+                elif actions:
+                    start = time.perf_counter()
+                    with correlation_scope(result.correlation_id):
+                        await run_in_daemon_thread(self._run_actions, result, actions)
+                    result.timings["execute"] = time.perf_counter() - start
+                    if result.success and self.learn is not None:
+                        self.learn(result.command, result.plan)
+            except asyncio.CancelledError:
+                result.error = "Cancelled."
+                if not done.done():
+                    done.set_result(result)
+                raise
+            except Exception as e:
+                result.error = str(e)
+            if self.on_result is not None:
+                self.on_result(result)
+            if not done.done():
+                done.set_result(result)
+            self._queue.task_done()
+
+    async def drain(self) -> None:
+        """Waits until every submitted command has been planned and executed."""
+        await self._queue.join()
+
+    async def stop(self) -> None:
+        """
+        Cancels pending planning and execution. The action that is currently
+        running finishes, the remaining ones are skipped.
+        """
+        self._cancelled.set()
+        for task in list(self._planning_tasks):
+            task.cancel()
+        if self._executor_task is not None:
+            self._executor_task.cancel()
+            try:
+                await self._executor_task
+            except asyncio.CancelledError:
+                pass
+            self._executor_task = None
+        while self._queue is not None and not self._queue.empty():
+            result, _, done = self._queue.get_nowait()
+            result.error = "Cancelled."
+            if not done.done():
+                done.set_result(result)
+
+
+async def read_lines(prompt: str = "") -> AsyncIterator[str]:
+    """
+    Reads lines from standard input without blocking the event loop. The
+    reader is a daemon thread, so Ctrl-C does not wait for the next line.
+    """
+    loop = asyncio.get_running_loop()
+    lines: asyncio.Queue = asyncio.Queue()
+    wanted = threading.Semaphore(0)
+
+    def reader():
+        while True:
+            wanted.acquire()
+            try:
+                line = input(prompt)
+            except EOFError:
+                line = None
+            try:
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+            except RuntimeError:
+                return  # The event loop is already closed
+            if line is None:
+                return
+
+    threading.Thread(target=reader, daemon=True).start()
+    while True:
+        wanted.release()
+        line = await lines.get()
+        if line is None:
+            return
+        yield line
@@ -0,0 +1,130 @@
+import pytest
+
+from src.executor import backends
+from src.executor.action_mapper import execute_action
+from src.executor.backends import SimulatedBackend, set_backend
+from src.executor.plan_compiler import compile_plan
+
+LAYOUT = {
+    "applications": {
+        "Google Chrome": {
+            "aliases": ["chrome"],
+            "launch_seconds": 1.0,
+            "focus": "address bar",
+            "targets": {"address bar": [100, 50, 800, 30], "search box": [300, 400, 600, 40]},
+        },
+    },
+    "targets": {"dock": [0, 1040, 1920, 40]},
+}
+
+
+@pytest.fixture
+def simulate():
+    previous = backends._backend
+
+    def install(layout=None, screen=None):
+        return set_backend(SimulatedBackend(layout, screen))
+
+    yield install
+    backends._backend = previous
+
+
+def action(action_type, **parameters):
+    return {"action_type": action_type, "parameters": parameters}
+
+
+def run(actions):
+    return [execute_action(a) for a in actions]
+
+
+def test_plan_runs_against_the_layout_on_a_virtual_clock(simulate):
+    desktop = simulate(LAYOUT)
+    results = run([
+        action("open_application", application_name="chrome"),
+        action("wait_for_target", target="address bar", timeout=5),
+        action("click", target="address bar"),
+        action("type_text", text="penguins"),
+        action("press_key", key="enter"),
+    ])
+    assert results == [True] * 5
+    assert desktop.text("address bar", "Google Chrome") == "penguins\n"
+    # The window took a second to open, which did not take a second here
+    assert 1.0 <= desktop.clock < 2.0
+    assert desktop.state()["focused"] == "Google Chrome"
+
+
+def test_clicks_before_the_window_is_ready_fail(simulate):
+    desktop = simulate(LAYOUT)
+    assert run([action("open_application", application_name="Google Chrome"), action("click", target="address bar")]) == [True, False]
+    assert not execute_action(action("click", target="no such button"))
+    execute_action(action("type_text", text="lost"))
+    assert desktop.warnings == ["typed 'lost' with no window open"]
+    assert execute_action(action("wait_for_screen_stable", timeout=5))
+    assert execute_action(action("click", target="address bar"))
+
+
+def test_focus_selection_and_tab(simulate):
+    desktop = simulate(LAYOUT)
+    desktop.launch("Google Chrome")
+    desktop.sleep(1)
+    run([
+        action("type_text", text="old"),
+        action("hotkey", keys="ctrl+a"),
+        action("type_text", text="new"),
+        action("press_key", key="tab", presses=3),
+        action("type_text", text="kittens"),
+    ])
+    assert desktop.text("address bar") == "new"
+    assert desktop.text("search box") == "kittens"
+
+
+def test_permissive_without_a_layout(simulate):
+    desktop = simulate()
+    assert run([
+        action("open_application", application_name="Notes"),
+        action("wait_for_process", process_name="notes", timeout=1),
+        action("click", target="title"),
+        action("type_text", text="a"),
+        action("click", target="body"),
+        action("type_text", text="b"),
+    ]) == [True] * 6
+    assert desktop.text("title") == "a" and desktop.text("body") == "b"
+
+
+def test_long_plans_run_without_waiting(simulate):
+    desktop = simulate()
+    actions = [action("open_application", application_name="Notes")]
+    for i in range(500):
+        actions += [action("type_text", text=f"line {i}"), action("press_key", key="enter"), action("wait", duration=0.5)]
+    compiled = compile_plan(actions)
+    assert all(step.run() for step in compiled)
+    assert desktop.clock >= 250
+    assert desktop.text().count("\n") == 500
+
+
+def test_wait_for_target_times_out_until_the_window_is_ready(simulate):
+    desktop = simulate(LAYOUT)
+    desktop.launch("Google Chrome")
+    assert not execute_action(action("wait_for_target", target="address bar", timeout=0.5))
+    assert 0.5 <= desktop.clock < 1.0
+    assert execute_action(action("wait_for_target", target="address bar", timeout=5))
+    assert 1.0 <= desktop.clock < 1.5
+
+
+def test_wait_for_screen_stable_times_out_while_a_window_opens(simulate):
+    desktop = simulate(LAYOUT)
+    desktop.launch("Google Chrome")
+    assert not execute_action(action("wait_for_screen_stable", timeout=0.25))
+    assert desktop.clock == 0.25
+    assert execute_action(action("wait_for_screen_stable", timeout=5))
+    assert desktop.clock == 1.0
+
+
+def test_wait_for_process_times_out_until_the_application_runs(simulate):
+    desktop = simulate(LAYOUT)
+    assert not execute_action(action("wait_for_process", process_name="chrome", timeout=2))
+    assert desktop.clock >= 2
+    desktop.launch("Google Chrome")
+    started = desktop.clock
+    assert execute_action(action("wait_for_process", process_name="chrome", timeout=2))
+    assert desktop.clock == started
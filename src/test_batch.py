@@ -0,0 +1,79 @@
+import asyncio
+import io
+import json
+
+from src.batch import ResultWriter, load_checkpoint, read_commands, run_batch
+
+
+class FakeAction:
+    def __init__(self, log, name):
+        self.log = log
+        self.name = name
+
+    def run(self):
+        self.log.append(self.name)
+        return True
+
+    def to_dict(self):
+        return {"action_type": "fake", "parameters": {"name": self.name}}
+
+
+def test_read_commands_accepts_objects_strings_and_plain_text():
+    lines = [
+        '{"id": "a", "command": "Open Chrome"}\n',
+        '"Press enter"\n',
+        "\n",
+        "# a comment\n",
+        "wait 2 seconds\n",
+        '{"command": ""}\n',
+    ]
+    assert list(read_commands(lines)) == [("a", "Open Chrome"), ("2", "Press enter"), ("5", "wait 2 seconds")]
+
+
+def test_batch_writes_results_in_order_and_resumes(tmp_path):
+    log = []
+    output = tmp_path / "results.jsonl"
+    items = [(str(i), f"command {i}") for i in range(5)]
+
+    def planner(command):
+        return [FakeAction(log, command)]
+
+    # Simulate a crash after two results, the second one truncated mid-write
+    first = json.dumps({"id": "0", "command": "command 0", "success": True})
+    output.write_text(first + "\n" + '{"id": "1", "comm')
+
+    done = load_checkpoint(str(output))
+    assert done == {"0"}
+
+    with open(output, "a") as f:
+        f.write("\n")
+        stats = asyncio.run(run_batch(items, ResultWriter(f), planner=planner, done=done))
+
+    assert log == ["command 1", "command 2", "command 3", "command 4"]
+    assert stats.completed == 4 and stats.succeeded == 4 and stats.skipped == 1
+    records = [json.loads(line) for line in output.read_text().splitlines()[2:]]
+    assert [record["id"] for record in records] == ["1", "2", "3", "4"]
+    assert records[0]["plan"] == [{"action_type": "fake", "parameters": {"name": "command 1"}}]
+    assert set(records[0]["timings"]) == {"plan", "execute"}
+    assert load_checkpoint(str(output)) == {"0", "1", "2", "3", "4"}
+
+
+def test_plan_only_does_not_execute():
+    log = []
+    stream = io.StringIO()
+    stats = asyncio.run(
+        run_batch(
+            [("1", "open notepad"), ("2", "gibberish")],
+            ResultWriter(stream, sync=False),
+            planner=lambda command: [FakeAction(log, command)] if command != "gibberish" else None,
+            plan_only=True,
+        )
+    )
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert log == []
+    assert records[0]["success"] and records[0]["plan"] and "execute" not in records[0]["timings"]
+    assert not records[1]["success"] and records[1]["error"] == "Failed to interpret the command."
+    summary = stats.summary()
+    assert summary["completed"] == 2 and summary["failed"] == 1
+    assert "plan" in summary["mean_stage_seconds"]
@@ -0,0 +1,52 @@
+import json
+
+from benchmarks.harness import compare
+from benchmarks.mock_ollama import MockOllama, PlanResponder, tokenize
+from src.nlu import transport
+from src.nlu.interpreter import default_llm_plugin
+from src.nlu.transport import LLMTransport
+
+SEARCH_PLAN = [
+    {"action_type": "open_application", "parameters": {"application_name": "Chrome"}},
+    {"action_type": "type_text", "parameters": {"text": "penguins"}},
+]
+
+
+def test_tokenize_round_trips():
+    text = json.dumps(SEARCH_PLAN)
+    tokens = tokenize(text)
+    assert "".join(tokens) == text
+    assert len(tokens) > len(text) // 5
+
+
+def test_mock_answers_blocking_and_streamed_plans(monkeypatch):
+    responder = PlanResponder({"Open Chrome and search penguins": SEARCH_PLAN})
+    with MockOllama(tokens_per_second=0, chunk_tokens=3, responder=responder) as mock:
+        monkeypatch.setattr(transport, "_default_transport", LLMTransport(url=mock.url, max_retries=0))
+        plan = default_llm_plugin.plan_command("open chrome and search penguins")
+        assert plan["actions"] == SEARCH_PLAN and plan["needs_decomposition"]
+        assert list(default_llm_plugin.stream_plan_command("open chrome and search penguins")) == SEARCH_PLAN
+        # Decomposition prompts are answered with a plain array
+        assert default_llm_plugin.decompose_task("open chrome and search penguins") == SEARCH_PLAN
+        assert [request["stream"] for request in mock.requests] == [False, True, False]
+
+
+def test_mock_error_status(monkeypatch):
+    with MockOllama(status=503) as mock:
+        monkeypatch.setattr(transport, "_default_transport", LLMTransport(url=mock.url, max_retries=0))
+        assert default_llm_plugin.plan_command("open chrome") is None
+
+
+def test_compare_flags_regressions_in_the_bad_direction():
+    baseline = {"planning.blocking_ms.p50": 100.0, "executor.actions_per_second": 200.0, "e2e.failures": 0}
+    assert compare({"planning.blocking_ms.p50": 50.0, "executor.actions_per_second": 400.0}, baseline, 0.25) == []
+    regressions = compare(
+        {"planning.blocking_ms.p50": 130.0, "executor.actions_per_second": 140.0, "e2e.failures": 1}, baseline, 0.25
+    )
+    assert [regression.split(":")[0] for regression in regressions] == [
+        "e2e.failures",
+        "executor.actions_per_second",
+        "planning.blocking_ms.p50",
+    ]
+    # Small latencies may grow by a few milliseconds of timer noise
+    assert compare({"locate.warm_ms.p50": 2.0}, {"locate.warm_ms.p50": 0.5}, 0.25) == []
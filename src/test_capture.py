@@ -0,0 +1,70 @@
+import numpy as np
+
+from src.executor.capture import ScreenCapture
+from src.executor.vision import TemplateMatcher
+from src.test_vision import make_screen
+
+
+class FakeScreen:
+    def __init__(self, frame):
+        self.frame = frame
+        self.grabs = 0
+
+    def grab(self):
+        self.grabs += 1
+        return self.frame.copy()
+
+
+def test_capture_shares_frame_within_step_and_tracks_dirty_tiles():
+    screen = FakeScreen(np.zeros((256, 256), dtype=np.uint8))
+    capture = ScreenCapture(grab=screen.grab, tile_size=64)
+    capture.frame()
+    capture.frame()
+    assert screen.grabs == 1
+    assert capture.has_changed()  # nothing to compare the first frame to
+
+    capture.begin_step()
+    assert not capture.has_changed()
+    screen.frame[70:80, 140:150] = 255
+    capture.begin_step()
+    assert capture.has_changed()
+    assert capture.has_changed((128, 64, 64, 64))
+    assert not capture.has_changed((0, 0, 64, 256))
+    assert capture.dirty_tiles().sum() == 1
+    assert screen.grabs == 3
+
+
+def test_capture_reuses_matches_for_unchanged_regions():
+    frame, template = make_screen()
+    frame[100:148, 200:360] = template
+    screen = FakeScreen(frame)
+    capture = ScreenCapture(grab=screen.grab)
+    matcher = TemplateMatcher(target_image_map={})
+    matcher.add_template("button", template)
+    calls = []
+    locate = matcher.locate
+    matcher.locate = lambda target, frame: calls.append(target) or locate(target, frame)
+
+    assert capture.locate("button", matcher)[:2] == (200, 100)
+    screen.frame[900:950, 1400:1500] = 0  # elsewhere
+    capture.begin_step()
+    assert capture.locate("button", matcher)[:2] == (200, 100)
+    assert len(calls) == 1
+
+    screen.frame[100:148, 200:360] = 0  # under the match
+    capture.begin_step()
+    assert capture.locate("Button", matcher) is None
+    assert len(calls) == 2
+
+
+def test_wait_until_stable():
+    frames = iter(range(3))
+
+    def grab():
+        value = next(frames, 3)
+        return np.full((128, 128), value * 50, dtype=np.uint8)
+
+    capture = ScreenCapture(grab=grab)
+    assert capture.wait_until_stable(timeout=1, interval=0)
+    changing = ScreenCapture(grab=lambda: np.random.default_rng().integers(0, 256, (64, 64), dtype=np.uint8))
+    assert not changing.wait_until_stable(timeout=0.05, interval=0.01)
@@ -0,0 +1,202 @@
+import http.client
+import logging
+import threading
+
+import pytest
+
+from src.plugins import ActionPlugin, ParameterSpec, PluginRegistry
+from src.client import DaemonClient, DaemonError, refuse_local_command
+from src.daemon import AutomationDaemon, load_token
+from src.executor.plan_compiler import compile_plan
+from src.gui_worker import GuiWorker, RemoteWorker
+
+
+class RecordingActionPlugin(ActionPlugin):
+    SCHEMAS = {
+        "type_text": {"text": ParameterSpec(str, default="")},
+        "wait": {"duration": ParameterSpec(float, default=1)},
+        "fail": {},
+    }
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def can_handle(self, action_type):
+        return action_type in self.SCHEMAS
+
+    def execute(self, action):
+        self.gate.wait(5)
+        self.calls.append(action)
+        return action["action_type"] != "fail"
+
+    def parameter_schema(self, action_type):
+        return self.SCHEMAS[action_type]
+
+
+PLANS = {
+    "greet": [
+        {"action_type": "type_text", "parameters": {"text": "hello "}},
+        {"action_type": "type_text", "parameters": {"text": "world"}},
+    ],
+    "pause": [{"action_type": "wait", "parameters": {"duration": 0}}, {"action_type": "type_text", "parameters": {"text": "x"}}],
+    "break": [{"action_type": "fail", "parameters": {}}, {"action_type": "type_text", "parameters": {"text": "never"}}],
+    "flaky": [{"action_type": "fail", "parameters": {}}, {"action_type": "type_text", "parameters": {"text": "never"}}],
+}
+
+
+@pytest.fixture
+def daemon():
+    plugin = RecordingActionPlugin()
+    registry = PluginRegistry()
+    registry.register_action_plugin(plugin)
+    learned, forgotten = [], []
+
+    def replan(command, completed, failure):
+        if command != "flaky":
+            return None
+        return compile_plan([{"action_type": "type_text", "parameters": {"text": "recovered"}}], registry)
+
+    worker = GuiWorker(
+        planner=lambda command: {"intent": command, "actions": PLANS.get(command)} if command in PLANS else None,
+        replan=replan,
+    )
+    daemon = AutomationDaemon(
+        port=0,
+        worker=worker,
+        registry=registry,
+        learn=lambda command, actions: learned.append((command, actions)),
+        forget=forgotten.append,
+        token="secret",
+    )
+    daemon.plugin, daemon.learned, daemon.forgotten = plugin, learned, forgotten
+    root = logging.getLogger("")
+    previous_level = root.level
+    root.setLevel(logging.INFO)
+    daemon.start()
+    yield daemon
+    daemon.stop()
+    root.setLevel(previous_level)
+
+
+def test_commands_from_several_clients_run_in_order(daemon):
+    daemon.plugin.gate.clear()
+    first, second = DaemonClient(daemon.url, token=daemon.token), DaemonClient(daemon.url, token=daemon.token)
+    greet = first.submit("greet")
+    pause = second.submit("pause")
+    assert first.health()["pending"] == 2
+    daemon.plugin.gate.set()
+    greet = first.status(greet["id"], wait=5)
+    pause = second.status(pause["id"], wait=5)
+    assert greet["state"] == pause["state"] == "done"
+    # Optimized before it ran: the two fragments were typed at once
+    assert greet["actions"] == [{"action_type": "type_text", "parameters": {"text": "hello world"}}]
+    assert [call["parameters"]["text"] for call in daemon.plugin.calls] == ["hello world", "x"]
+    assert [command for command, _ in daemon.learned] == ["greet", "pause"]
+    lines = first.logs(0, greet["id"])["lines"]
+    assert any("Planning: greet" in line for line in lines)
+    assert not any("Planning: pause" in line for line in lines)
+
+
+def test_failures_are_reported(daemon):
+    client = DaemonClient(daemon.url, token=daemon.token)
+    broken = client.status(client.submit("break")["id"], wait=5)
+    assert broken["state"] == "failed" and broken["statuses"] == ["failed", "skipped"]
+    unknown = client.status(client.submit("what")["id"], wait=5)
+    assert unknown == {"id": unknown["id"], "command": "what", "state": "failed", "error": "Failed to interpret the command."}
+    with pytest.raises(DaemonError, match="404"):
+        client.status("no-such-command")
+    with pytest.raises(DaemonError, match="400"):
+        client.submit("  ")
+    assert daemon.learned == []
+    assert daemon.forgotten == ["break"]
+
+
+def test_gui_previews_and_approves_through_the_daemon(daemon):
+    worker = RemoteWorker(DaemonClient(daemon.url, token=daemon.token))
+    try:
+        preview = worker.preview("greet").result(5)
+        assert preview["errors"] == [] and "merge_type_text x1" in preview["optimization"]
+        assert preview["compiled"] == [{"action_type": "type_text", "parameters": {"text": "hello world"}}]
+        assert daemon.plugin.calls == []
+        run = worker.execute(preview["compiled"], preview["id"])
+        assert run.wait(5) and run.state == "done" and run.completed == 1
+        assert run.rows()[0]["status"] == "done"
+    finally:
+        worker.close()
+    assert [command for command, _ in daemon.learned] == ["greet"]
+
+
+def test_ids_of_unfinished_commands_are_not_reused(daemon):
+    client = DaemonClient(daemon.url, token=daemon.token)
+    daemon.plugin.gate.clear()
+    first = client.submit("greet", correlation_id="job-1")
+    with pytest.raises(DaemonError, match="409"):
+        client.submit("pause", correlation_id="job-1")
+    daemon.plugin.gate.set()
+    assert client.status(first["id"], wait=5)["state"] == "done"
+    # A finished command's id can be run again
+    assert client.status(client.submit("pause", correlation_id="job-1")["id"], wait=5)["state"] == "done"
+    assert [call["parameters"]["text"] for call in daemon.plugin.calls] == ["hello world", "x"]
+
+
+def test_only_listens_on_loopback_addresses():
+    with pytest.raises(ValueError, match="loopback"):
+        AutomationDaemon(host="0.0.0.0", port=0)
+
+
+
+def test_failed_commands_are_replanned_and_forgotten(daemon):
+    client = DaemonClient(daemon.url, token=daemon.token)
+    flaky = client.status(client.submit("flaky")["id"], wait=5)
+    assert flaky["state"] == "done"
+    assert flaky["statuses"] == ["failed", "skipped", "done"]
+    assert [call["action_type"] for call in daemon.plugin.calls] == ["fail", "type_text"]
+    # The plan needed a replan, so it is planned afresh next time; the actions that worked are learned
+    assert daemon.forgotten == ["flaky"]
+    assert daemon.learned == [("flaky", [{"action_type": "type_text", "parameters": {"text": "recovered"}}])]
+
+    # An approved plan is not replanned
+    approved = client.submit("flaky", PLANS["flaky"])
+    assert client.status(approved["id"], wait=5)["state"] == "failed"
+    assert daemon.forgotten == ["flaky", "flaky"]
+
+
+def post(daemon, headers, body=b'{"command": "greet"}'):
+    host, port = daemon._server.server_address[:2]
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    try:
+        connection.request("POST", "/commands", body, headers)
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+def test_requests_from_web_pages_and_without_the_token_are_refused(daemon):
+    token = {"Authorization": "Bearer secret"}
+    json_body = {"Content-Type": "application/json"}
+    # A "simple" cross-site request a web page can send without a preflight
+    assert post(daemon, {"Content-Type": "text/plain", "Origin": "http://evil.example", **token}) == 403
+    assert post(daemon, {"Content-Type": "text/plain", **token}) == 415
+    # DNS rebinding: the page's own host name, resolved to 127.0.0.1
+    assert post(daemon, {"Host": "evil.example:8765", **json_body, **token}) == 403
+    assert post(daemon, json_body) == 401
+    assert post(daemon, {**json_body, "Authorization": "Bearer wrong"}) == 401
+    assert not DaemonClient(daemon.url, token="wrong").available()
+    assert daemon.pending() == 0 and daemon.plugin.calls == []
+    assert post(daemon, {**json_body, **token}) == 202
+
+
+def test_token_file_is_private(tmp_path):
+    path = tmp_path / "daemon" / "token"
+    token = load_token(str(path))
+    assert path.read_text() == token and len(token) >= 32
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert load_token(str(path)) == token
+
+
+def test_client_does_not_send_repl_commands_to_the_daemon(capsys):
+    assert refuse_local_command(":forget-plan open calculator")
+    assert "python -m src.main --no-daemon" in capsys.readouterr().out
+    assert not refuse_local_command("open calculator")
@@ -0,0 +1,80 @@
+import pytest
+
+from src.plugins import LLMPlugin, PluginRegistry
+from src.nlu import fast_path
+from src.nlu.fast_path import RuleBasedLLMPlugin, match_command
+
+
+@pytest.mark.parametrize(
+    "command, action",
+    [
+        ("Open Calculator.", {"action_type": "open_application", "parameters": {"application_name": "Calculator"}}),
+        ("launch chrome", {"action_type": "open_application", "parameters": {"application_name": "Google Chrome"}}),
+        ("press enter", {"action_type": "press_key", "parameters": {"key": "enter"}}),
+        ("Hit the return key", {"action_type": "press_key", "parameters": {"key": "enter"}}),
+        ("wait 2 seconds", {"action_type": "wait", "parameters": {"duration": 2}}),
+        ("pause for 500 ms", {"action_type": "wait", "parameters": {"duration": 0.5}}),
+        ("type hello", {"action_type": "type_text", "parameters": {"text": "hello"}}),
+        ("type Hello!", {"action_type": "type_text", "parameters": {"text": "Hello!"}}),
+        ("type hello world.", {"action_type": "type_text", "parameters": {"text": "hello world."}}),
+        ('type "hi".', {"action_type": "type_text", "parameters": {"text": "hi"}}),
+        ('type "hello, world and more"', {"action_type": "type_text", "parameters": {"text": "hello, world and more"}}),
+        ("click on the address bar", {"action_type": "click", "parameters": {"target": "address bar"}}),
+    ],
+)
+def test_fast_path_matches_simple_commands(command, action):
+    interpretation = match_command(command)
+    assert interpretation["needs_decomposition"] is False
+    assert interpretation["action"] == action
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "Open Chrome and search for penguins",
+        "open google.com",
+        "open youtube",
+        "open a new tab",
+        "type hello then press enter",
+        "press the big red button",
+        "Send an email to Alice about the meeting tomorrow.",
+        "",
+    ],
+)
+def test_fast_path_falls_through(command):
+    assert match_command(command) is None
+
+
+def test_open_allows_configured_applications(monkeypatch):
+    monkeypatch.setattr(fast_path, "FAST_PATH_APPLICATIONS", ("Xcode",))
+    fast_path.known_applications.cache_clear()
+    try:
+        assert match_command("open xcode")["action"]["parameters"] == {"application_name": "Xcode"}
+    finally:
+        monkeypatch.undo()
+        fast_path.known_applications.cache_clear()
+    assert match_command("open xcode") is None
+
+
+class RecordingLLMPlugin(LLMPlugin):
+    def __init__(self):
+        self.commands = []
+
+    def interpret_command(self, user_command):
+        self.commands.append(user_command)
+        return {"intent": user_command, "needs_decomposition": True, "action": None}
+
+    def decompose_task(self, task_description):
+        return []
+
+
+def test_rule_based_plugin_falls_through_to_next_plugin():
+    registry = PluginRegistry()
+    model = RecordingLLMPlugin()
+    registry.register_llm_plugin(model)
+    rules = RuleBasedLLMPlugin(fallback=registry.llm_plugins[-1])
+    registry.register_llm_plugin(rules, first=True)
+    assert registry.get_next_llm_plugin(rules) is model
+    assert registry.get_llm_plugin().interpret_command("press tab")["action"]["parameters"] == {"key": "tab"}
+    registry.get_llm_plugin().interpret_command("Open Chrome and search for penguins")
+    assert model.commands == ["Open Chrome and search for penguins"]
@@ -0,0 +1,79 @@
+import logging
+import threading
+
+from src.gui_worker import CANCELLED, DONE, FAILED, SKIPPED, GuiWorker, RingBufferLogHandler
+
+
+class FakeAction:
+    def __init__(self, name, succeed=True, gate=None):
+        self.name = name
+        self.succeed = succeed
+        self.gate = gate
+        self.ran = False
+        self.started = threading.Event()
+
+    def run(self):
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.ran = True
+        logging.info("ran %s", self.name)
+        return self.succeed
+
+    def to_dict(self):
+        return {"action_type": "wait", "parameters": {"name": self.name}}
+
+
+def make_record(message):
+    return logging.LogRecord("root", logging.INFO, __file__, 0, message, None, None)
+
+
+def test_ring_buffer_is_bounded_and_tails_incrementally():
+    handler = RingBufferLogHandler(capacity=3)
+    for number in range(5):
+        handler.handle(make_record(f"line {number}"))
+    lines, sequence = handler.lines_since(0)
+    assert [line.split(": ", 1)[1] for line in lines] == ["line 2", "line 3", "line 4"]
+    assert handler.lines_since(sequence) == ([], 5)
+    handler.handle(make_record("line 5"))
+    lines, sequence = handler.lines_since(sequence)
+    assert len(lines) == 1 and lines[0].endswith("line 5") and sequence == 6
+
+
+def test_runs_execute_in_order_with_progress_and_logs():
+    worker = GuiWorker(planner=lambda command: {"actions": []})
+    worker.attach()
+    previous_level = logging.getLogger("").level
+    logging.getLogger("").setLevel(logging.INFO)
+    try:
+        assert worker.plan("open calculator", "cmd-1").result(5) == {"actions": []}
+        first = worker.execute([FakeAction("a"), FakeAction("b")], "cmd-1")
+        second = worker.execute([FakeAction("c", succeed=False), FakeAction("d")], "cmd-2")
+        assert first.wait(5) and second.wait(5)
+    finally:
+        logging.getLogger("").setLevel(previous_level)
+        worker.close()
+    assert first.state == DONE and first.statuses == [DONE, DONE] and first.completed == 2
+    assert second.state == FAILED and second.statuses == [FAILED, SKIPPED]
+    assert "'name': 'c'" in second.error
+    lines, _ = worker.log.lines_since(0, "cmd-1")
+    assert [line.split(": ", 1)[1] for line in lines if "ran" in line] == ["ran a", "ran b"]
+    assert any("Planning: open calculator" in line for line in lines)
+
+
+def test_cancel_skips_the_remaining_actions():
+    gate = threading.Event()
+    worker = GuiWorker()
+    try:
+        actions = [FakeAction("slow", gate=gate), FakeAction("next"), FakeAction("last")]
+        run = worker.execute(actions)
+        assert actions[0].started.wait(5)
+        run.cancel()
+        gate.set()
+        assert run.wait(5)
+    finally:
+        worker.close()
+    assert run.state == CANCELLED
+    assert [action.ran for action in actions] == [True, False, False]
+    assert run.statuses == [DONE, SKIPPED, SKIPPED] and not run.active
+    assert run.rows()[0] == {"#": 1, "status": DONE, "action_type": "wait", "parameters": '{"name": "slow"}'}
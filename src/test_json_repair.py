@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from benchmarks.mock_ollama import MockOllama
+from src.nlu import transport
+from src.nlu.interpreter import default_llm_plugin
+from src.nlu.json_repair import JSONRepairError, ParseStats, get_parse_stats, parse_json, repair_json
+from src.nlu.response_schema import response_schema
+from src.plugins import ActionPlugin, ParameterSpec, PluginRegistry
+
+CLICK = {"action_type": "click", "parameters": {"target": "address bar"}}
+TYPE = {"action_type": "type_text", "parameters": {"text": "penguins"}}
+
+
+@pytest.mark.parametrize(
+    "text, repairs",
+    [
+        (json.dumps([CLICK, TYPE]), []),
+        ("```json\n" + json.dumps([CLICK, TYPE]) + "\n```", ["code_fence"]),
+        ("Here is the plan:\n" + json.dumps([CLICK, TYPE]) + "\nLet me know!", ["leading_text", "trailing_text"]),
+        (json.dumps([CLICK, TYPE])[:-1] + ",\n]", ["trailing_comma"]),
+        # Cut off inside the third action: it is dropped, not guessed
+        (json.dumps([CLICK, TYPE])[:-1] + ', {"action_type": "press_key", "parameters": {"ke', ["truncated"]),
+    ],
+)
+def test_repairs_actions(text, repairs):
+    assert repair_json(text, list) == ([CLICK, TYPE], repairs)
+
+
+def test_repairs_truncated_plan_and_keeps_strings_intact():
+    plan = {"intent": "search, then [open]", "needs_decomposition": True, "action": None, "actions": [CLICK, TYPE]}
+    text = json.dumps(plan)
+    repaired, repairs = repair_json(text[: text.index("penguins") + 3], dict)
+    assert repairs == ["truncated"]
+    assert repaired == {**plan, "actions": [CLICK]}
+    assert repair_json('{"intent": "line\nbreak",}', dict) == (
+        {"intent": "line\nbreak"},
+        ["trailing_comma", "control_characters"],
+    )
+    with pytest.raises(JSONRepairError):
+        repair_json("I cannot help with that.", dict)
+
+
+def test_parse_stats(monkeypatch):
+    stats = ParseStats()
+    monkeypatch.setattr("src.nlu.json_repair.parse_stats", stats)
+    assert parse_json(json.dumps([CLICK]), list) == [CLICK]
+    assert parse_json("```\n[" + json.dumps(CLICK) + ",]```", list) == [CLICK]
+    assert parse_json("no json here", list) is None
+    summary = stats.summary()
+    assert (summary["clean"], summary["repaired"], summary["failed"]) == (1, 1, 1)
+    assert summary["success_rate"] == round(2 / 3, 4)
+    assert summary["repairs"] == {"code_fence": 1, "trailing_comma": 1}
+
+
+class FakeActions(ActionPlugin):
+    def can_handle(self, action_type):
+        return action_type in ("click", "type_text")
+
+    def execute(self, action):
+        return True
+
+    def action_types(self):
+        return ["click", "type_text"]
+
+    def parameter_schema(self, action_type):
+        if action_type == "click":
+            return {"target": ParameterSpec(str, required=True)}
+        return {"text": ParameterSpec(str), "mode": ParameterSpec(str, choices=("paste", "burst"))}
+
+
+def test_response_schema_follows_the_action_plugins():
+    registry = PluginRegistry()
+    registry.register_action_plugin(FakeActions())
+    plan = response_schema("plan", registry)
+    assert plan["required"] == ["intent", "needs_decomposition", "action", "actions"]
+    click, type_text = plan["properties"]["actions"]["items"]["anyOf"]
+    assert click["properties"]["action_type"] == {"enum": ["click"]}
+    assert click["properties"]["parameters"]["required"] == ["target"]
+    assert type_text["properties"]["parameters"]["properties"]["mode"] == {"type": "string", "enum": ["paste", "burst"]}
+    assert response_schema("decomposition", registry)["items"] == plan["properties"]["actions"]["items"]
+    assert response_schema("plan", registry) is plan
+    # Without action plugins, any action is allowed
+    any_action = response_schema("decomposition", PluginRegistry())["items"]
+    assert any_action["properties"]["action_type"] == {"type": "string"}
+
+
+def test_model_requests_carry_the_schema_and_sloppy_responses_are_repaired(monkeypatch):
+    plan = {"intent": "search", "needs_decomposition": True, "action": None, "actions": [CLICK, TYPE]}
+    sloppy = "```json\n" + json.dumps(plan)[:-2] + ",]}\n```"
+    get_parse_stats().reset()
+    with MockOllama(responder=lambda request: sloppy) as mock:
+        monkeypatch.setattr(transport, "_default_transport", transport.LLMTransport(url=mock.url, max_retries=0))
+        assert default_llm_plugin.plan_command("search penguins")["actions"] == [CLICK, TYPE]
+        assert list(default_llm_plugin.stream_plan_command("search penguins")) == [CLICK, TYPE]
+    assert all(request["format"]["type"] == "object" for request in mock.requests)
+    assert get_parse_stats().summary()["repairs"] == {"code_fence": 2, "trailing_comma": 2}
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import logging
+
+from src.session import run_in_daemon_thread
+from src.utils.logger import correlation_scope, get_correlation_id, setup_logger, shutdown_logger
+
+
+def read_json_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_json_lines_carry_the_correlation_id_across_threads(tmp_path):
+    path = tmp_path / "app.log"
+    setup_logger(json_lines=True, filename=str(path), console_level="CRITICAL")
+
+    async def run():
+        with correlation_scope("cmd-1"):
+            await run_in_daemon_thread(lambda: logging.info("Processing action: %s", {"key": "enter"}))
+        logging.warning("Outside")
+
+    try:
+        asyncio.run(run())
+    finally:
+        shutdown_logger()
+    entries = [entry for entry in read_json_lines(path) if entry["logger"] == "root"]
+    assert [(entry["correlation_id"], entry["message"]) for entry in entries] == [
+        ("cmd-1", "Processing action: {'key': 'enter'}"),
+        ("-", "Outside"),
+    ]
+    assert entries[0]["level"] == "INFO"
+    assert get_correlation_id() == "-"
+
+
+def test_disabled_levels_are_not_formatted(tmp_path):
+    class Counted:
+        calls = 0
+
+        def __str__(self):
+            Counted.calls += 1
+            return f"state {Counted.calls}"
+
+    path = tmp_path / "app.log"
+    setup_logger(filename=str(path), level="INFO", console_level="CRITICAL")
+    try:
+        value = Counted()
+        logging.debug("Not logged: %s", value)
+        assert Counted.calls == 0
+        with correlation_scope("abc"):
+            logging.info("Logged: %s", value)
+    finally:
+        shutdown_logger()
+    assert Counted.calls >= 1
+    assert "INFO - [abc] Logged: state " in path.read_text(encoding="utf-8")
+
+
+def test_log_file_is_rotated(tmp_path, monkeypatch):
+    from src.utils import logger
+
+    monkeypatch.setattr(logger, "LOG_MAX_BYTES", 2000)
+    monkeypatch.setattr(logger, "LOG_BACKUP_COUNT", 2)
+    path = tmp_path / "app.log"
+    setup_logger(filename=str(path), console_level="CRITICAL")
+    try:
+        for number in range(200):
+            logging.info("Line %d of a long log", number)
+    finally:
+        shutdown_logger()
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert files == ["app.log", "app.log.1", "app.log.2"]
+    assert all(p.stat().st_size <= 2000 for p in tmp_path.iterdir())
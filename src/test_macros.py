@@ -0,0 +1,127 @@
+import pytest
+
+import src.executor.capture as capture_module
+from src.executor.capture import ScreenCapture
+from src.executor.vision import TemplateMatcher
+from src.macros import Macro, MacroLibrary, MacroRecorder, parameterize, play_macro
+from src.plugins import ActionPlugin, ParameterSpec, PluginRegistry
+from src.test_capture import FakeScreen
+from src.test_vision import make_screen
+
+
+class FakeDesktopPlugin(ActionPlugin):
+    SCHEMAS = {
+        "open_application": {"application_name": ParameterSpec(str, required=True)},
+        "click": {"target": ParameterSpec(str, required=True)},
+        "type_text": {"text": ParameterSpec(str, default="")},
+    }
+
+    def __init__(self, capture, matcher):
+        self.capture = capture
+        self.matcher = matcher
+        self.calls = []
+
+    def can_handle(self, action_type):
+        return action_type in self.SCHEMAS
+
+    def parameter_schema(self, action_type):
+        return self.SCHEMAS[action_type]
+
+    def execute(self, action):
+        parameters = action["parameters"]
+        if action["action_type"] == "click":
+            match = self.capture.locate(parameters["target"], self.matcher)
+            if match is None:
+                return False
+            self.calls.append(("click", match.center))
+            return True
+        self.calls.append((action["action_type"], next(iter(parameters.values()))))
+        return True
+
+
+@pytest.fixture
+def desktop(monkeypatch):
+    frame, template = make_screen()
+    frame[100:148, 200:360] = template
+    screen = FakeScreen(frame)
+    capture = ScreenCapture(grab=screen.grab)
+    monkeypatch.setattr(capture_module, "_capture", capture)
+    matcher = TemplateMatcher(target_image_map={})
+    matcher.add_template("address bar", template)
+    lookups = []
+    locate = matcher.locate
+    matcher.locate = lambda target, frame: lookups.append(target) or locate(target, frame)
+    plugin = FakeDesktopPlugin(capture, matcher)
+    registry = PluginRegistry()
+    registry.register_action_plugin(plugin)
+    return screen, template, capture, plugin, registry, lookups
+
+
+ACTIONS = [
+    {"action_type": "open_application", "parameters": {"application_name": "Chrome"}},
+    {"action_type": "click", "parameters": {"target": "address bar"}},
+    {"action_type": "type_text", "parameters": {"text": "penguins {literal}"}},
+]
+
+
+def record(registry, capture):
+    recorder = MacroRecorder("Search Chrome for {query}", capture)
+    recorder.begin_command("search chrome for penguins.")
+    for action in ACTIONS:
+        plugin = registry.get_action_plugin(action["action_type"])
+        capture.begin_step()
+        recorder.record(action, plugin.execute(action))
+    assert recorder.end_command()
+    return recorder.build()
+
+
+def test_parameterize_replaces_whole_words_and_escapes_braces():
+    assert parameterize("penguins and {x}", {"query": "penguins"}) == "{query} and {{x}}"
+    assert parameterize("penguinsss", {"query": "penguins"}) == "penguinsss"
+
+
+def test_recorded_macro_replays_without_matching(desktop, tmp_path):
+    screen, template, capture, plugin, registry, lookups = desktop
+    macro = record(registry, capture)
+    assert macro.actions[2]["parameters"]["text"] == "{query} {{literal}}"
+    assert macro.clicks[1][:4] == (200, 100, 160, 48)
+
+    library = MacroLibrary(str(tmp_path / "macros.json"))
+    library.add(macro)
+    found, values = MacroLibrary(library.path).match("Search chrome for  cat videos!")
+    assert values == {"query": "cat videos"}
+
+    plugin.calls.clear()
+    lookups.clear()
+    assert play_macro(found, values, registry, capture)
+    assert plugin.calls == [
+        ("open_application", "Chrome"),
+        ("click", (280, 124)),
+        ("type_text", "cat videos {literal}"),
+    ]
+    assert lookups == []
+
+
+def test_replay_falls_back_to_matching_when_ui_moved(desktop):
+    screen, template, capture, plugin, registry, lookups = desktop
+    macro = record(registry, capture)
+    fresh, _ = make_screen()
+    fresh[500:548, 700:860] = template
+    screen.frame = fresh
+
+    plugin.calls.clear()
+    lookups.clear()
+    assert play_macro(macro, {"query": "otters"}, registry, capture)
+    assert ("click", (780, 524)) in plugin.calls
+    assert lookups == ["address bar"]
+    assert macro.clicks[1][:2] == (700, 500)
+
+
+def test_failed_commands_are_not_recorded():
+    recorder = MacroRecorder("open {app}")
+    recorder.begin_command("open notepad")
+    recorder.record(ACTIONS[0], True)
+    recorder.record(ACTIONS[2], False)
+    assert not recorder.end_command()
+    assert recorder.actions == []
+    assert Macro("open {app}", []).match("close notepad") is None
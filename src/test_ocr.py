@@ -0,0 +1,90 @@
+import numpy as np
+
+from src.executor.capture import ScreenCapture
+from src.executor.ocr import OCRIndex, normalize_text
+from src.executor.vision_pool import VisionPool
+from src.test_capture import FakeScreen
+
+# Each word is drawn as a block of a distinct gray level, so the fake
+# recognizer can "read" it back from any tile that contains it
+WORDS = {50: "File", 60: "Edit", 70: "Sign", 80: "in", 90: "Submit!", 100: "Cancel", 110: "Subnit"}
+
+
+def fake_recognize(tile, config):
+    words = []
+    for value, text in WORDS.items():
+        ys, xs = np.nonzero(tile == value)
+        if len(xs):
+            x, y = int(xs.min()), int(ys.min())
+            line = 1 if text in ("Sign", "in") else value
+            words.append((text, x, y, int(xs.max()) - x + 1, int(ys.max()) - y + 1, 95.0, 1, 1, line))
+    return words
+
+
+def draw(frame, value, x, y, width=40, height=12):
+    frame[y : y + height, x : x + width] = value
+
+
+def make_desktop():
+    frame = np.zeros((400, 600), dtype=np.uint8)
+    draw(frame, 50, 10, 10)
+    draw(frame, 60, 60, 10)
+    draw(frame, 70, 250, 150)
+    draw(frame, 80, 295, 150, width=20)
+    draw(frame, 90, 180, 190)  # straddles the tile boundary at x=200
+    draw(frame, 100, 420, 320)
+    return frame
+
+
+def test_normalize_text():
+    assert normalize_text("  Submit!  (Now) ") == "submit now"
+
+
+def test_index_finds_words_and_phrases():
+    index = OCRIndex(fake_recognize, tile_width=200, tile_height=200, overlap=40)
+    assert index.update(make_desktop()) == 6
+    assert sorted(word.text for word in index.words()) == ["Cancel", "Edit", "File", "Sign", "Submit!", "in"]
+
+    submit = index.find("submit")
+    assert (submit.x, submit.y, submit.width, submit.height) == (180, 190, 40, 12)
+    assert submit.score == 1.0
+    sign_in = index.find("Sign in")
+    assert (sign_in.x, sign_in.width) == (250, 65)
+    assert index.find("Sumbit", min_similarity=0.6) is not None
+    assert index.find("Help") is None
+
+
+def test_index_reads_only_changed_tiles():
+    frame = make_desktop()
+    index = OCRIndex(fake_recognize, tile_width=200, tile_height=200, overlap=40)
+    index.update(frame)
+    assert index.update(frame.copy()) == 0
+
+    changed = frame.copy()
+    changed[320:332, 420:460] = 0
+    draw(changed, 110, 420, 320)  # "Cancel" becomes "Subnit" in the bottom right tile
+    # The change is also within the overlap of the bottom middle tile
+    assert index.update(changed) == 2
+    assert index.tiles_read == 8
+    assert index.find("cancel") is None
+    assert index.find("subnit").x == 420
+
+
+def test_index_reads_tiles_in_worker_processes():
+    pool = VisionPool(workers=2, target_image_map={})
+    index = OCRIndex(fake_recognize, tile_width=200, tile_height=200, overlap=40, pool=pool)
+    try:
+        assert index.update(make_desktop()) == 6
+        assert index.find("Edit").x == 60
+    finally:
+        pool.close()
+
+
+def test_capture_caches_text_lookups():
+    screen = FakeScreen(make_desktop())
+    capture = ScreenCapture(grab=screen.grab)
+    index = OCRIndex(fake_recognize, tile_width=200, tile_height=200, overlap=40)
+    assert capture.locate_text("File", index)[:2] == (10, 10)
+    capture.begin_step()
+    assert capture.locate_text("file", index)[:2] == (10, 10)
+    assert index.tiles_read == 6
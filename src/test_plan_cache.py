@@ -0,0 +1,110 @@
+import time
+
+from src.plugins import LLMPlugin, PluginRegistry
+from src.nlu.plan_cache import PlanCache, normalize_command
+
+
+class CountingLLMPlugin(LLMPlugin):
+    def __init__(self):
+        self.calls = 0
+
+    def interpret_command(self, user_command):
+        self.calls += 1
+        return {"intent": user_command, "needs_decomposition": True, "action": None}
+
+    def decompose_task(self, task_description):
+        self.calls += 1
+        return [{"action_type": "type_text", "parameters": {"text": task_description}}]
+
+
+def test_normalize_command():
+    assert normalize_command("  Open   Calculator. ") == "Open Calculator"
+
+
+def test_plan_cache_hits_and_misses(tmp_path):
+    cache = PlanCache(str(tmp_path / "plans.db"))
+    assert cache.get("decompose", "ns", "Open Calculator") is None
+    cache.put("decompose", "ns", "Open Calculator", [{"action_type": "wait"}])
+    assert cache.get("decompose", "ns", "Open  Calculator.") == [{"action_type": "wait"}]
+    assert cache.get("decompose", "other-model", "Open Calculator") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "entries": 1}
+
+
+def test_plan_cache_ttl_and_lru_eviction(tmp_path):
+    cache = PlanCache(str(tmp_path / "plans.db"), max_entries=2, ttl_seconds=0.05)
+    cache.put("interpret", "ns", "a", {"n": 1})
+    cache.put("interpret", "ns", "b", {"n": 2})
+    cache.get("interpret", "ns", "a")
+    cache.put("interpret", "ns", "c", {"n": 3})
+    assert cache.get("interpret", "ns", "b") is None  # least recently used
+    assert cache.get("interpret", "ns", "a") == {"n": 1}
+    time.sleep(0.1)
+    assert cache.get("interpret", "ns", "c") is None  # expired
+
+
+def test_plan_cache_invalidate(tmp_path):
+    cache = PlanCache(str(tmp_path / "plans.db"))
+    cache.put("interpret", "ns", "a", {"n": 1})
+    cache.put("decompose", "ns", "a", [1])
+    cache.put("interpret", "ns", "b", {"n": 2})
+    assert cache.invalidate(command="a") == 2
+    assert cache.invalidate() == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_registry_wraps_llm_plugin_with_cache(tmp_path):
+    registry = PluginRegistry()
+    plugin = CountingLLMPlugin()
+    registry.register_llm_plugin(plugin)
+    registry.set_plan_cache(PlanCache(str(tmp_path / "plans.db")))
+    for _ in range(3):
+        assert registry.get_llm_plugin().decompose_task("hello") == [
+            {"action_type": "type_text", "parameters": {"text": "hello"}}
+        ]
+    assert plugin.calls == 1
+
+
+def test_forget_plan_drops_the_command_and_its_intent(tmp_path, monkeypatch):
+    from src.nlu import interpreter
+
+    cache = PlanCache(str(tmp_path / "plans.db"))
+    monkeypatch.setattr(interpreter.plugin_registry, "plan_cache", cache)
+    namespace = interpreter.default_llm_plugin.cache_namespace()
+    cache.put("interpret", namespace, "search cats", {"intent": "Search the web for cats"})
+    cache.put("decompose", namespace, "Search the web for cats", [{"action_type": "wait"}])
+    cache.put("plan", namespace, "open notes", {"actions": []})
+    assert interpreter.forget_plan("search cats.") == 2
+    assert cache.stats()["entries"] == 1
+
+
+def test_forget_plan_drops_the_remembered_plan_and_its_source():
+    from src.nlu import interpreter
+
+    stale = [{"action_type": "click", "parameters": {"target": "old button"}}]
+    interpreter.remember_successful_plan("open notes and click old button", stale)
+    assert interpreter.similarity_index.lookup("open notes, then click old button") == stale
+    # A paraphrase that reused the plan failed: the plan it was served from goes
+    assert interpreter.forget_plan("open notes, then click old button") == 1
+    assert interpreter.similarity_index.lookup("open notes and click old button") is None
+
+
+def test_namespace_changes_with_the_registered_action_types(monkeypatch):
+    from src.nlu import interpreter
+    from src.plugins import ActionPlugin, ParameterSpec
+
+    class ExtraActionPlugin(ActionPlugin):
+        def can_handle(self, action_type):
+            return action_type == "scroll"
+
+        def execute(self, action):
+            return True
+
+        def action_types(self):
+            return ["scroll"]
+
+        def parameter_schema(self, action_type):
+            return {"amount": ParameterSpec(int, default=1)}
+
+    before = interpreter.default_llm_plugin.cache_namespace()
+    monkeypatch.setattr(interpreter.plugin_registry, "action_plugins", [*interpreter.plugin_registry.action_plugins, ExtraActionPlugin()])
+    assert interpreter.default_llm_plugin.cache_namespace() != before
@@ -0,0 +1,108 @@
+import pytest
+
+from src.plugins import ActionPlugin, ParameterSpec, PluginRegistry
+from src.executor.plan_compiler import PlanValidationError, coerce_parameter, compile_plan, compile_stream
+
+
+class RecordingActionPlugin(ActionPlugin):
+    SCHEMAS = {
+        "open_application": {"application_name": ParameterSpec(str, required=True)},
+        "wait": {"duration": ParameterSpec(float, default=1)},
+        "type_text": {"text": ParameterSpec(str, default=""), "mode": ParameterSpec(str, choices=("paste", "burst"))},
+    }
+
+    def __init__(self):
+        self.calls = []
+
+    def can_handle(self, action_type):
+        return action_type in self.SCHEMAS
+
+    def execute(self, action):
+        self.calls.append(action)
+        return True
+
+    def parameter_schema(self, action_type):
+        return self.SCHEMAS[action_type]
+
+
+@pytest.fixture
+def registry():
+    registry = PluginRegistry()
+    registry.register_action_plugin(RecordingActionPlugin())
+    return registry
+
+
+def test_compile_plan_coerces_and_binds_handlers(registry):
+    plan = compile_plan(
+        [
+            {"action_type": "open_application", "parameters": {"application_name": "Chrome"}},
+            {"action_type": "wait", "parameters": {"duration": "2 seconds"}},
+            {"action_type": "wait"},
+            {"action_type": "type_text", "parameters": {"text": 42, "extra": "dropped"}},
+        ],
+        registry,
+    )
+    assert plan.to_dicts() == [
+        {"action_type": "open_application", "parameters": {"application_name": "Chrome"}},
+        {"action_type": "wait", "parameters": {"duration": 2.0}},
+        {"action_type": "wait", "parameters": {"duration": 1}},
+        {"action_type": "type_text", "parameters": {"text": "42"}},
+    ]
+    assert all(action.run() for action in plan)
+    assert registry.action_plugins[0].calls[1] == {"action_type": "wait", "parameters": {"duration": 2.0}}
+
+
+def test_durations_are_converted_to_seconds():
+    duration = ParameterSpec(float)
+    assert [coerce_parameter(value, duration) for value in ("500 ms", "2 minutes", "1.5s", "3", 4)] == [0.5, 120.0, 1.5, 3.0, 4.0]
+    assert coerce_parameter("3 times", ParameterSpec(int)) == 3
+    for value in ("2 fortnights", "about 3 seconds", "5 seconds or so"):
+        with pytest.raises(ValueError):
+            coerce_parameter(value, duration)
+
+
+def test_negative_durations_and_timeouts_are_rejected_before_execution():
+    import src.executor.action_mapper  # noqa: F401  Registers the default action plugin
+
+    assert coerce_parameter("0 s", ParameterSpec(float, minimum=0)) == 0.0
+    with pytest.raises(ValueError, match="at least 0"):
+        coerce_parameter("-2s", ParameterSpec(float, minimum=0))
+    with pytest.raises(PlanValidationError) as info:
+        compile_plan(
+            [
+                {"action_type": "wait", "parameters": {"duration": "-2s"}},
+                {"action_type": "wait_for_target", "parameters": {"target": "ok button", "timeout": -5}},
+                {"action_type": "press_key", "parameters": {"key": "tab", "presses": 0}},
+            ]
+        )
+    assert len(info.value.errors) == 3
+
+
+def test_compile_plan_reports_every_problem_up_front(registry):
+    with pytest.raises(PlanValidationError) as info:
+        compile_plan(
+            [
+                {"action_type": "open_application", "parameters": {}},
+                {"action_type": "teleport", "parameters": {}},
+                {"action_type": "wait", "parameters": {"duration": "soon"}},
+                {"action_type": "type_text", "parameters": {"mode": "shout"}},
+                "press enter",
+            ],
+            registry,
+        )
+    assert len(info.value.errors) == 5
+    assert "missing required parameter 'application_name'" in info.value.errors[0]
+    assert "unknown action type 'teleport'" in info.value.errors[1]
+    assert not registry.action_plugins[0].calls
+
+    with pytest.raises(PlanValidationError):
+        compile_plan([], registry)
+
+
+def test_compile_stream_stops_at_first_invalid_action(registry):
+    actions = compile_stream(
+        [{"action_type": "wait", "parameters": {"duration": 0}}, {"action_type": "teleport"}], registry
+    )
+    assert next(actions).parameters == {"duration": 0.0}
+    with pytest.raises(PlanValidationError):
+        next(actions)
@@ -0,0 +1,136 @@
+import pytest
+
+from src.plugins import ActionPlugin, ParameterSpec, PluginRegistry
+from src.executor.plan_compiler import compile_plan, compile_stream
+from src.executor.plan_optimizer import estimate_cost, get_plan_rules, optimize_actions, optimize_plan, optimize_stream
+
+
+class SchemaActionPlugin(ActionPlugin):
+    SCHEMAS = {
+        "open_application": {"application_name": ParameterSpec(str, required=True)},
+        "click": {"target": ParameterSpec(str, required=True)},
+        "type_text": {"text": ParameterSpec(str, default=""), "mode": ParameterSpec(str)},
+        "press_key": {"key": ParameterSpec(str, default="enter"), "presses": ParameterSpec(int, default=1)},
+        "hotkey": {"keys": ParameterSpec(str, required=True)},
+        "wait": {"duration": ParameterSpec(float, default=1)},
+    }
+
+    def can_handle(self, action_type):
+        return action_type in self.SCHEMAS
+
+    def execute(self, action):
+        return True
+
+    def parameter_schema(self, action_type):
+        return self.SCHEMAS[action_type]
+
+
+@pytest.fixture
+def registry():
+    registry = PluginRegistry()
+    registry.register_action_plugin(SchemaActionPlugin())
+    return registry
+
+
+def action(action_type, **parameters):
+    return {"action_type": action_type, "parameters": parameters}
+
+
+def test_default_rules_merge_waits_text_and_key_presses():
+    optimized, applied = optimize_actions(
+        [
+            action("wait", duration=1.0),
+            action("wait", duration=0.5),
+            action("wait", duration=0),
+            action("type_text", text="hello "),
+            action("type_text", text=""),
+            action("type_text", text="world"),
+            action("press_key", key="tab", presses=1),
+            action("press_key", key="tab", presses=2),
+            action("press_key", key="enter", presses=1),
+        ]
+    )
+    assert optimized == [
+        action("wait", duration=1.5),
+        action("type_text", text="hello world"),
+        action("press_key", key="tab", presses=3),
+        action("press_key", key="enter", presses=1),
+    ]
+    assert applied == {"merge_waits": 2, "merge_type_text": 2, "merge_key_presses": 1}
+
+
+def test_text_is_only_merged_when_entered_the_same_way():
+    # Each fragment would be typed, but together they are long enough to be pasted
+    fragments = [action("type_text", text="a" * 20), action("type_text", text="b" * 20)]
+    assert optimize_actions(fragments)[0] == fragments
+    # A fixed mode enters any text the same way
+    paced = [action("type_text", text="a" * 20, mode="paced"), action("type_text", text="b" * 20, mode="paced")]
+    assert optimize_actions(paced)[0] == [action("type_text", text="a" * 20 + "b" * 20, mode="paced")]
+    mixed = [action("type_text", text="a", mode="paste"), action("type_text", text="b", mode="burst")]
+    assert optimize_actions(mixed)[0] == mixed
+
+
+def test_inexact_rules_are_opt_in():
+    plan = [
+        action("open_application", application_name="Safari"),
+        action("click", target="address bar"),
+        action("press_key", key="cmd+l", presses=1),
+    ]
+    assert optimize_actions(plan)[0] == plan
+    optimized, _ = optimize_actions(plan, get_plan_rules(["skip_address_bar_click", "combo_keys_to_hotkey"]))
+    assert optimized == [action("open_application", application_name="Safari"), action("hotkey", keys="command+l")]
+
+
+def test_optimize_plan_recompiles_and_reports_cost(registry):
+    plan = compile_plan(
+        [
+            action("click", target="search box"),
+            action("wait", duration=1),
+            action("wait", duration=2),
+            action("type_text", text="cats"),
+        ],
+        registry,
+    )
+    optimized, report = optimize_plan(plan, registry=registry)
+    assert [compiled.index for compiled in optimized] == [0, 1, 2]
+    assert optimized.to_dicts()[1] == action("wait", duration=3.0)
+    assert (report.before.actions, report.after.actions) == (4, 3)
+    assert report.after.seconds < report.before.seconds
+    assert report.before.lookups == report.after.lookups == 1
+    assert "4 -> 3 actions" in report.format()
+
+    unchanged, report = optimize_plan(optimized, registry=registry)
+    assert unchanged is optimized and not report.changed
+
+
+def test_estimate_cost_counts_waits_and_lookups():
+    cost = estimate_cost([action("wait", duration=2), action("click", target="ok")])
+    assert cost.actions == 2 and cost.lookups == 1 and cost.seconds > 2
+
+
+def test_optimize_stream_matches_batch_and_does_not_hold_waits(registry):
+    plan = [
+        action("type_text", text="a"),
+        action("type_text", text="b"),
+        action("wait", duration=1),
+        action("press_key", key="tab"),
+        action("press_key", key="tab"),
+        action("click", target="ok"),
+    ]
+    pulled = []
+
+    def source():
+        for item in plan:
+            pulled.append(item)
+            yield item
+
+    stream = optimize_stream(compile_stream(source(), registry), registry=registry)
+    first = next(stream)
+    assert first.to_dict() == action("type_text", text="ab")
+    # The merged text is released as soon as the wait arrives, and the wait right away
+    assert len(pulled) == 3
+    assert next(stream).to_dict() == action("wait", duration=1.0)
+    assert len(pulled) == 3
+    rest = [compiled.to_dict() for compiled in stream]
+    assert rest == [action("press_key", key="tab", presses=2), action("click", target="ok")]
+    assert rest == optimize_actions(compile_plan(plan, registry).to_dicts())[0][2:]
@@ -1,13 +1,18 @@
+from benchmarks.mock_ollama import MockOllama
 from src.plugins import plugin_registry, ActionPlugin, LLMPlugin
+from src.nlu import transport
 from src.nlu.interpreter import interpret_command, decompose_task
 from src.executor.action_mapper import execute_action
 
-def test_llm_plugin():
+def test_llm_plugin(monkeypatch):
     plugin = plugin_registry.get_llm_plugin()
     assert isinstance(plugin, LLMPlugin)
-    # Test a simple command (mock or skip if no Llama API running)
-    # result = plugin.interpret_command("Open Calculator")
-    # assert result is not None
+    # Commands the fast path does not handle are answered by the mock Llama API
+    with MockOllama() as mock:
+        monkeypatch.setattr(transport, "_default_transport", transport.LLMTransport(url=mock.url, max_retries=0))
+        result = plugin.interpret_command("Open Calculator")
+        assert result is not None
+        assert decompose_task("Search for cat videos")
 
 def test_action_plugin():
     plugin = plugin_registry.get_action_plugin("open_application")
@@ -16,6 +21,10 @@ def test_action_plugin():
     # result = plugin.execute({"action_type": "wait", "parameters": {"duration": 0}})
     # assert result is True
 
+def test_wait_action_types_registered():
+    for action_type in ["wait", "wait_for_target", "wait_for_screen_stable", "wait_for_process"]:
+        assert isinstance(plugin_registry.get_action_plugin(action_type), ActionPlugin)
+
 def test_integration_stub():
     # This is a stub for future integration tests
     pass
@@ -42,8 +51,10 @@ def test_gui_feedback_approval_stub():
     pass
 
 if __name__ == "__main__":
-    test_llm_plugin()
+    import pytest
+    test_llm_plugin(pytest.MonkeyPatch())
     test_action_plugin()
+    test_wait_action_types_registered()
     test_integration_stub()
     test_gui_stub_import()
     test_dry_run_stub()
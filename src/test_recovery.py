@@ -0,0 +1,120 @@
+import json
+import threading
+
+import pytest
+
+from benchmarks.mock_ollama import MockOllama
+import src.executor.action_mapper  # noqa: F401  Registers the default action plugin
+from src import recovery
+from src.executor import backends
+from src.executor.backends import SimulatedBackend, set_backend
+from src.executor.plan_compiler import compile_plan, compile_stream
+from src.nlu import transport
+from src.nlu.interpreter import replan_suffix, stream_plan_command
+from src.recovery import replan_and_compile, run_with_recovery
+
+LAYOUT = {
+    "applications": {
+        "Google Chrome": {"aliases": ["chrome"], "launch_seconds": 1.0, "targets": {"address bar": [100, 50, 800, 30]}},
+    },
+}
+
+
+@pytest.fixture
+def desktop():
+    previous = backends._backend
+    yield set_backend(SimulatedBackend(LAYOUT))
+    backends._backend = previous
+
+
+def action(action_type, **parameters):
+    return {"action_type": action_type, "parameters": parameters}
+
+
+SEARCH = [
+    action("open_application", application_name="chrome"),
+    action("click", target="address bar"),
+    action("type_text", text="penguins"),
+    action("press_key", key="enter"),
+]
+
+
+def test_resumes_after_the_completed_actions(desktop, monkeypatch):
+    calls = []
+
+    def suffix(command, completed, failure):
+        calls.append((command, completed, failure))
+        return [action("wait_for_target", target="address bar"), *SEARCH[1:]]
+
+    monkeypatch.setattr(recovery, "replan_suffix", suffix)
+    checkpoint = run_with_recovery("search for penguins", compile_plan(SEARCH), replan=replan_and_compile)
+
+    assert checkpoint.finished and checkpoint.replans == 1
+    # Chrome was not opened again, and the text was typed once, after the window was ready
+    assert [a["action_type"] for a in checkpoint.completed] == ["open_application", "wait_for_target", "click", "type_text", "press_key"]
+    assert desktop.text("address bar", "chrome") == "penguins\n"
+    assert not desktop.warnings
+    command, completed, failure = calls[0]
+    assert command == "search for penguins" and completed == [SEARCH[0]]
+    assert failure["action"] == SEARCH[1] and failure["application"] == "chrome"
+    assert failure["completed"] == 1 and failure["target_visible"] is False
+
+
+def test_replans_are_bounded_and_failures_are_saved(desktop, monkeypatch, tmp_path):
+    monkeypatch.setattr(recovery, "RECOVERY_SNAPSHOT_DIR", str(tmp_path))
+    replans = []
+
+    def replan(command, completed, failure):
+        replans.append(failure.attempt)
+        return compile_plan([action("click", target="missing button")])
+
+    checkpoint = run_with_recovery("press the missing button", compile_plan(SEARCH[:2]), replan=replan, max_replans=2)
+
+    assert not checkpoint.finished
+    assert replans == [1, 2] and checkpoint.replans == 2 and len(checkpoint.failures) == 3
+    assert checkpoint.failures[-1].screenshot.shape == (1080, 1920)
+    saved = json.loads(sorted(tmp_path.glob("*.json"))[-1].read_text())
+    assert saved["completed"] == [SEARCH[0]] and len(saved["failures"]) == 3
+    assert len(list(tmp_path.glob("*.png"))) == 3
+
+
+def test_suffix_prompt_carries_the_checkpoint_and_is_not_cached(monkeypatch):
+    prompts = []
+
+    def responder(request):
+        prompts.append(request["messages"])
+        return json.dumps(SEARCH[1:])
+
+    with MockOllama(responder=responder) as mock:
+        monkeypatch.setattr(transport, "_default_transport", transport.LLMTransport(url=mock.url, max_retries=0))
+        failure = {"action": SEARCH[1], "application": "chrome", "target_visible": False, "attempt": 1}
+        for _ in range(2):
+            assert replan_suffix("Open Chrome and look up penguins", SEARCH[:1], failure) == SEARCH[1:]
+
+    assert len(prompts) == 2
+    system, user = prompts[0]
+    assert user["content"] == "Open Chrome and look up penguins"
+    assert json.dumps(SEARCH[:1]) in system["content"]
+    assert "Active application: chrome" in system["content"] and "not visible" in system["content"]
+
+
+def test_streamed_plan_is_closed_before_replanning(desktop, monkeypatch):
+    # One request at a time: replanning while the failed stream still held the slot would deadlock
+    def responder(request):
+        if request.get("stream", True):
+            return json.dumps({"intent": "search", "needs_decomposition": True, "action": None, "actions": SEARCH})
+        return json.dumps([action("wait_for_target", target="address bar"), *SEARCH[1:]])
+
+    with MockOllama(responder=responder) as mock:
+        llm = transport.LLMTransport(url=mock.url, max_retries=0, max_in_flight=1)
+        monkeypatch.setattr(transport, "_default_transport", llm)
+        checkpoints = []
+        actions = compile_stream(stream_plan_command("open chrome, then search penguins"))
+        thread = threading.Thread(target=lambda: checkpoints.append(run_with_recovery("search", actions, replan=replan_and_compile)), daemon=True)
+        thread.start()
+        thread.join(10)
+
+    assert not thread.is_alive()
+    assert checkpoints[0].finished and checkpoints[0].replans == 1
+    assert desktop.text("address bar", "chrome") == "penguins\n"
+    assert llm.stats.errors == 0
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+
+from src.executor.plan_compiler import PlanValidationError
+from src.session import SessionEngine
+
+
+class FakeAction:
+    def __init__(self, log, name, duration=0.0, ok=True):
+        self.log = log
+        self.name = name
+        self.duration = duration
+        self.ok = ok
+
+    def run(self):
+        time.sleep(self.duration)
+        self.log.append(self.name)
+        return self.ok
+
+    def to_dict(self):
+        return {"action_type": "fake", "parameters": {"name": self.name}}
+
+
+def run_session(planner, commands, **kwargs):
+    async def session():
+        engine = SessionEngine(planner, **kwargs)
+        engine.start()
+        futures = [engine.submit(command) for command in commands]
+        await engine.drain()
+        await engine.stop()
+        return [future.result() for future in futures]
+
+    return asyncio.run(session())
+
+
+def test_executes_in_submission_order_while_planning_overlaps():
+    log = []
+
+    def planner(command):
+        # Later commands plan faster, so they finish planning first
+        time.sleep(0.3 if command == "first" else 0.2)
+        return [FakeAction(log, f"{command}-{i}", duration=0.1) for i in range(2)]
+
+    start = time.perf_counter()
+    results = run_session(planner, ["first", "second", "third"])
+    elapsed = time.perf_counter() - start
+
+    assert log == ["first-0", "first-1", "second-0", "second-1", "third-0", "third-1"]
+    assert all(result.success and result.executed == 2 for result in results)
+    # Serial would be 0.7s of planning + 0.6s of execution; pipelined is about 0.3s + 0.6s
+    assert elapsed < 1.15
+    assert [action["parameters"]["name"] for action in results[0].plan] == ["first-0", "first-1"]
+    assert set(results[0].timings) == {"plan", "execute"}
+
+
+def test_planning_concurrency_is_bounded():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def planner(command):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return []
+
+    results = run_session(planner, [str(i) for i in range(6)], max_concurrent_plans=2)
+
+    assert peak[0] == 2
+    assert all(result.error == "Failed to interpret the command." for result in results)
+
+
+def test_planning_errors_do_not_stop_the_queue():
+    log = []
+
+    def planner(command):
+        if command == "bad":
+            raise PlanValidationError(["action 1: unknown action type 'fly'"])
+        if command == "broken":
+            raise RuntimeError("model unavailable")
+        return [FakeAction(log, command)]
+
+    results = run_session(planner, ["bad", "broken", "good"])
+
+    assert results[0].error.startswith("Plan rejected before execution")
+    assert results[1].error == "Planning failed: model unavailable"
+    assert results[2].success and log == ["good"]
+
+
+def test_failed_action_stops_the_command_without_a_replanner():
+    log = []
+    results = run_session(lambda command: [FakeAction(log, "a", ok=False), FakeAction(log, "b")], ["cmd"], replan=None)
+
+    assert log == ["a"]
+    assert not results[0].success
+    assert results[0].executed == 0
+    assert "Failed to execute action" in results[0].error
+
+
+def test_failed_action_resumes_with_the_replanned_rest():
+    log, learned = [], []
+
+    def replan(command, completed, failure):
+        assert [action["parameters"]["name"] for action in completed] == ["a"]
+        return [FakeAction(log, "c")]
+
+    planner = lambda command: [FakeAction(log, "a"), FakeAction(log, "b", ok=False), FakeAction(log, "never")]
+    forgotten = []
+    results = run_session(planner, ["cmd"], replan=replan, learn=lambda command, plan: learned.append(plan), forget=forgotten.append)
+
+    assert log == ["a", "b", "c"]
+    assert results[0].success and results[0].executed == 2 and results[0].replans == 1
+    assert learned == [[FakeAction(log, "a").to_dict(), FakeAction(log, "c").to_dict()]]
+    # The cached plan needed a replan, so it is planned afresh next time
+    assert forgotten == ["cmd"]
+
+
+def test_stop_cancels_pending_commands():
+    log = []
+
+    async def session():
+        engine = SessionEngine(lambda command: [FakeAction(log, command, duration=0.1)])
+        engine.start()
+        futures = [engine.submit(command) for command in ["one", "two", "three"]]
+        await asyncio.sleep(0.05)
+        await engine.stop()
+        return [future.result() for future in futures]
+
+    results = asyncio.run(session())
+
+    assert all(result.error == "Cancelled." for result in results[1:])
+    assert "three" not in log
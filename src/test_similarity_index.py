@@ -0,0 +1,117 @@
+from src.nlu.similarity_index import SimilarityIndex, SimilarityLLMPlugin, adapt_plan, ngram_features
+from src.plugins import LLMPlugin
+
+SEARCH_PLAN = [
+    {"action_type": "open_application", "parameters": {"application_name": "Chrome"}},
+    {"action_type": "click", "parameters": {"target": "address bar"}},
+    {"action_type": "type_text", "parameters": {"text": "penguins"}},
+    {"action_type": "press_key", "parameters": {"key": "enter"}},
+]
+
+
+def texts(actions):
+    return [next(iter(action["parameters"].values())) for action in actions]
+
+
+def test_ngram_features_are_normalized_and_case_insensitive():
+    buckets, weights = ngram_features("Open Chrome.")
+    same, _ = ngram_features("open   chrome")
+    assert (buckets == same).all()
+    assert abs(float(weights @ weights) - 1.0) < 1e-5
+
+
+def test_adapt_plan_swaps_slots_and_keeps_paraphrases():
+    assert adapt_plan("open chrome and search penguins", SEARCH_PLAN, "search for penguins in Chrome") == SEARCH_PLAN
+    swapped = adapt_plan("open chrome and search penguins", SEARCH_PLAN, "open firefox and search for cat videos")
+    assert texts(swapped) == ["Firefox", "address bar", "cat videos", "enter"]
+    wait = [{"action_type": "wait", "parameters": {"duration": 2}}]
+    assert adapt_plan("wait 2 seconds", wait, "wait 5 seconds") == [{"action_type": "wait", "parameters": {"duration": 5}}]
+
+
+def test_adapt_plan_keeps_text_around_the_swapped_words():
+    submit = [{"action_type": "type_text", "parameters": {"text": "penguins\n"}}]
+    assert texts(adapt_plan("open chrome and search penguins", submit, "open chrome and search cats")) == ["cats\n"]
+    greeting = [{"action_type": "type_text", "parameters": {"text": "Hello world."}}]
+    assert texts(adapt_plan("type hello world", greeting, "type goodbye moon")) == ["Goodbye moon."]
+
+
+def test_adapt_plan_rejects_unaccounted_words():
+    assert adapt_plan("open chrome and search penguins", SEARCH_PLAN, "open chrome and search penguins and email bob") is None
+    assert adapt_plan("open chrome and search penguins", SEARCH_PLAN, "search penguins") is None
+    wait = [{"action_type": "wait", "parameters": {"duration": 2}}]
+    assert adapt_plan("wait 2 seconds", wait, "wait five seconds") is None
+    typing = [{"action_type": "type_text", "parameters": {"text": "hello"}}]
+    assert adapt_plan("open notepad and type hello", typing, "open notepad and look up world") is None
+    # "and" belongs to the stored command, so it cannot be part of a swapped slot
+    safari = [{"action_type": "open_application", "parameters": {"application_name": "Safari"}}]
+    assert adapt_plan("open Safari and type otters", safari, "open Firefox and look up owls otters") is None
+
+
+def test_index_top_k_and_persistence(tmp_path):
+    path = str(tmp_path / "index.jsonl")
+    index = SimilarityIndex(path)
+    index.add("open chrome and search penguins", SEARCH_PLAN)
+    index.add("wait 2 seconds", [{"action_type": "wait", "parameters": {"duration": 2}}])
+    index.add("Open Chrome and search penguins", SEARCH_PLAN[:3])  # same command, newer plan
+
+    reloaded = SimilarityIndex(path)
+    assert len(reloaded) == 2
+    matches = reloaded.search("search for penguins in chrome", k=2)
+    assert matches[0].command == "open chrome and search penguins"
+    assert matches[0].score > matches[1].score
+    assert reloaded.lookup("open chrome and search otters") == SEARCH_PLAN[:2] + [
+        {"action_type": "type_text", "parameters": {"text": "otters"}}
+    ]
+    assert reloaded.lookup("take a screenshot") is None
+
+
+class CountingPlugin(LLMPlugin):
+    def __init__(self):
+        self.calls = 0
+
+    def interpret_command(self, user_command):
+        self.calls += 1
+        return {"intent": user_command, "needs_decomposition": False, "action": {"action_type": "wait", "parameters": {}}}
+
+    def decompose_task(self, task_description):
+        self.calls += 1
+        return [{"action_type": "wait", "parameters": {}}]
+
+
+def test_plugin_reuses_similar_plans_and_falls_through():
+    index = SimilarityIndex(path=None)
+    index.add("open chrome and search penguins", SEARCH_PLAN)
+    fallback = CountingPlugin()
+    plugin = SimilarityLLMPlugin(index, fallback=fallback)
+
+    plan = plugin.plan_command("Search for otters in Chrome")
+    assert texts(plan["actions"])[2] == "otters"
+    assert plan["needs_decomposition"]
+
+    generator = plugin.stream_plan_command("search for penguins in chrome")
+    assert len(list(generator)) == 4
+    assert fallback.calls == 0
+
+    assert plugin.plan_command("open calculator")["actions"] == [{"action_type": "wait", "parameters": {}}]
+    assert fallback.calls == 1
+
+
+def test_removed_plans_are_not_reused_and_are_compacted(tmp_path):
+    path = tmp_path / "index.jsonl"
+    index = SimilarityIndex(str(path))
+    index.add("open chrome and search penguins", SEARCH_PLAN)
+    index.add("wait 2 seconds", [{"action_type": "wait", "parameters": {"duration": 2}}])
+    assert index.remove("Open Chrome and search penguins.") == 1
+    assert index.remove("open chrome and search penguins") == 0
+    assert len(index) == 1
+    assert index.lookup("search for penguins in Chrome") is None
+
+    reloaded = SimilarityIndex(str(path))
+    assert len(reloaded) == 1 and reloaded.lookup("search for penguins in Chrome") is None
+    # Learned again after it worked
+    reloaded.add("open chrome and search penguins", SEARCH_PLAN)
+    assert reloaded.lookup("search for penguins in Chrome") == SEARCH_PLAN
+    reloaded.remove("open chrome and search penguins")
+    reloaded.remove("wait 2 seconds")
+    assert len(SimilarityIndex(str(path))) == 0
+    assert path.read_text() == ""
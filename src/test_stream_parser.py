@@ -0,0 +1,85 @@
+import json
+
+from src.nlu.stream_parser import IncrementalJSONArrayParser, iter_json_array
+
+ACTIONS = [
+    {"action_type": "open_application", "parameters": {"application_name": "Chrome"}},
+    {"action_type": "type_text", "parameters": {"text": "say \"hi\" [x] {y}"}},
+    {"action_type": "press_key", "parameters": {"key": "enter"}},
+]
+
+
+def test_parser_yields_each_object_as_it_closes():
+    text = json.dumps(ACTIONS)
+    parser = IncrementalJSONArrayParser()
+    seen = []
+    first_complete_at = None
+    for i, char in enumerate(text):
+        for action in parser.feed(char):
+            seen.append(action)
+            if first_complete_at is None:
+                first_complete_at = i
+    assert seen == ACTIONS
+    assert first_complete_at < len(text) // 2
+    assert parser.done
+
+
+def test_parser_skips_prose_around_the_array():
+    text = "Sure! Here is the plan:\n" + json.dumps(ACTIONS) + "\nLet me know."
+    chunks = [text[i : i + 7] for i in range(0, len(text), 7)]
+    assert list(iter_json_array(chunks)) == ACTIONS
+
+
+def test_parser_reads_array_under_key():
+    text = json.dumps({"intent": "x [not this]", "needs_decomposition": True, "actions": ACTIONS})
+    chunks = [text[i : i + 3] for i in range(0, len(text), 3)]
+    assert list(iter_json_array(chunks, key="actions")) == ACTIONS
+
+
+def test_default_plugin_streams_actions(monkeypatch):
+    from src.nlu import interpreter
+
+    text = json.dumps(ACTIONS)
+    monkeypatch.setattr(interpreter, "llama3_stream", lambda messages, format=None: iter([text[:40], text[40:]]))
+    assert list(interpreter.DefaultLLMPlugin().stream_decompose_task("task")) == ACTIONS
+
+    monkeypatch.setattr(interpreter, "llama3_stream", lambda messages, format=None: iter(["no json here"]))
+    assert list(interpreter.DefaultLLMPlugin().stream_decompose_task("task")) == []
+
+
+def test_default_plugin_fused_plan_uses_one_call(monkeypatch):
+    from src.nlu import interpreter
+
+    response = json.dumps(
+        {"intent": "Search", "needs_decomposition": True, "action": None, "actions": ACTIONS}
+    )
+    calls = []
+
+    def fake_llama3(messages, format=None):
+        calls.append(messages)
+        return response
+
+    monkeypatch.setattr(interpreter, "llama3", fake_llama3)
+    plan = interpreter.DefaultLLMPlugin().plan_command("Open Chrome and search")
+    assert plan["actions"] == ACTIONS and plan["intent"] == "Search"
+    assert len(calls) == 1
+
+    monkeypatch.setattr(
+        interpreter, "llama3_stream", lambda messages, format=None: iter([response[:50], response[50:]])
+    )
+    stream = interpreter.DefaultLLMPlugin().stream_plan_command("Open Chrome and search")
+    streamed = []
+    try:
+        while True:
+            streamed.append(next(stream))
+    except StopIteration as stop:
+        assert stop.value["intent"] == "Search"
+    assert streamed == ACTIONS
+
+
+def test_parse_plan_fills_actions_for_single_step():
+    from src.nlu.interpreter import parse_plan
+
+    action = ACTIONS[0]
+    plan = parse_plan("Here you go: " + json.dumps({"intent": "Open", "needs_decomposition": False, "action": action}))
+    assert plan["actions"] == [action]
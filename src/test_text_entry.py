@@ -0,0 +1,93 @@
+import pytest
+
+from src.executor import backends, mouse_keyboard
+from src.executor.backends import PyAutoGUIBackend, SimulatedBackend, set_backend
+from src.executor.text_entry import choose_text_entry_mode
+
+
+@pytest.fixture
+def desktop(monkeypatch):
+    monkeypatch.setattr(mouse_keyboard, "_last_opened_application", None)
+    previous = backends._backend
+    desktop = set_backend(SimulatedBackend())
+    desktop.launch("Notes")
+    yield desktop
+    backends._backend = previous
+
+
+@pytest.mark.parametrize(
+    "text, mode",
+    [
+        ("hello", "burst"),
+        ("x" * 32, "paste"),
+        ("first\nsecond", "paste"),
+        ("café", "paste"),
+    ],
+)
+def test_adaptive_mode_choice(text, mode):
+    assert choose_text_entry_mode(text) == mode
+
+
+def entries(desktop):
+    return [(name, detail) for _, name, detail in desktop.events if name in ("write", "paste", "press")]
+
+
+def test_per_application_modes_follow_the_application_opened_last(desktop, monkeypatch):
+    monkeypatch.setattr(mouse_keyboard, "TEXT_ENTRY_APP_MODES", {"terminal": "paste"})
+    mouse_keyboard.open_application("Notes")
+    mouse_keyboard.type_text("ls")
+    mouse_keyboard.open_application("Terminal")
+    assert mouse_keyboard.last_opened_application() == "Terminal"
+    mouse_keyboard.type_text("ls")
+    mouse_keyboard.type_text("pwd", application_name="Notes")
+    assert entries(desktop) == [("write", "ls"), ("paste", "ls"), ("write", "pwd")]
+
+
+def test_multi_line_text_is_pasted_with_enter_between_the_lines(desktop):
+    mouse_keyboard.type_text("first line\n\nlast line\n", mode="adaptive")
+    assert entries(desktop) == [
+        ("paste", "first line"),
+        ("press", "enter"),
+        ("press", "enter"),
+        ("paste", "last line"),
+        ("press", "enter"),
+    ]
+    assert desktop.text() == "first line\n\nlast line\n"
+
+
+class FakeClipboard:
+    class PyperclipException(Exception):
+        pass
+
+    def __init__(self, contents):
+        self.contents = contents
+        self.copied = []
+
+    def paste(self):
+        return self.contents
+
+    def copy(self, text):
+        self.copied.append(text)
+        self.contents = text
+
+
+class FakePyAutoGUI:
+    def __init__(self, clipboard):
+        self.clipboard = clipboard
+        self.pasted = []
+
+    def hotkey(self, *keys):
+        self.pasted.append(self.clipboard.contents)
+
+
+def test_paste_restores_the_clipboard(monkeypatch):
+    clipboard = FakeClipboard("copied earlier")
+    backend = PyAutoGUIBackend()
+    backend._pyperclip = clipboard
+    backend._pyautogui = FakePyAutoGUI(clipboard)
+    monkeypatch.setattr(backend, "wait", lambda seconds: None)
+
+    backend.paste("pasted")
+
+    assert backend.pyautogui.pasted == ["pasted"]
+    assert clipboard.contents == "copied earlier"
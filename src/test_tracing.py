@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from src.executor.capture import ScreenCapture
+from src.executor.vision import TemplateMatcher
+from src.test_capture import FakeScreen
+from src.test_vision import make_screen
+from src.utils.tracing import NULL_SPAN, Histogram, Tracer, current_span, get_tracer, span, traced_iter
+
+
+@pytest.fixture
+def tracer():
+    tracer = get_tracer()
+    tracer.reset()
+    tracer.enabled = True
+    yield tracer
+    tracer.enabled = False
+    tracer.reset()
+
+
+def test_histogram_percentiles_within_bucket_precision():
+    histogram = Histogram()
+    for value in range(1, 100_001):
+        histogram.record(value)
+    assert histogram.count == 100_000 and histogram.max == 100_000
+    for p in (50, 90, 99):
+        assert abs(histogram.percentile(p) - p * 1000) / (p * 1000) < 0.03
+    # 32 buckets per power of two, not one per value
+    assert len(histogram.counts) <= 32 * 17
+
+
+def test_disabled_tracer_hands_out_null_spans():
+    tracer = Tracer(enabled=False)
+    with tracer.span("plan_command", model="llama3") as current:
+        current.set("cache", "hit")
+    assert current is NULL_SPAN
+    assert tracer.histograms == {}
+
+
+def test_spans_nest_and_export_chrome_trace(tracer, tmp_path):
+    with span("plan_command") as outer:
+        current_span().set("cache", "miss")
+        with span("llama3.http", model="llama3"):
+            assert current_span().name == "llama3.http"
+        assert current_span() is outer
+    assert current_span() is NULL_SPAN
+    with pytest.raises(ValueError):
+        with span("execute_action", action_type="click"):
+            raise ValueError("boom")
+
+    assert set(tracer.histograms) == {
+        "plan_command",
+        "plan_command [cache=miss]",
+        "llama3.http",
+        "execute_action",
+        "execute_action [action_type=click]",
+    }
+    path = tmp_path / "trace.json"
+    tracer.export_chrome_trace(str(path))
+    events = [event for event in json.loads(path.read_text())["traceEvents"] if event["ph"] == "X"]
+    assert [event["name"] for event in events] == ["llama3.http", "plan_command", "execute_action"]
+    assert events[0]["args"] == {"model": "llama3"}
+    assert events[2]["args"]["error"] == "ValueError"
+    assert events[1]["ts"] <= events[0]["ts"] and events[1]["dur"] >= events[0]["dur"]
+    assert "execute_action [action_type=click]" in tracer.summary_table()
+
+
+def test_traced_iter_is_current_while_iterating(tracer):
+    def actions():
+        current_span().set("source", "model")
+        yield 1
+        yield 2
+
+    assert list(traced_iter("stream_plan_command", actions())) == [1, 2]
+    assert current_span() is NULL_SPAN
+    assert tracer.histograms["stream_plan_command [source=model]"].count == 1
+    event = tracer.chrome_trace()["traceEvents"][0]
+    assert event["args"]["items"] == 2 and event["tid"] < 0
+
+
+def test_capture_and_locate_spans(tracer):
+    screen, template = make_screen()
+    screen[100:148, 200:360] = template
+    matcher = TemplateMatcher(target_image_map={})
+    matcher.add_template("button", template)
+    capture = ScreenCapture(grab=FakeScreen(screen).grab)
+    capture.locate("button", matcher)
+    capture.locate("button", matcher)
+    assert tracer.histograms["capture"].count == 1
+    assert tracer.histograms["locate [cache=miss]"].count == 1
+    assert tracer.histograms["locate [cache=hit]"].count == 1
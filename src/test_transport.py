@@ -0,0 +1,164 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src.nlu.transport import AsyncLLMTransport, LLMTransport
+
+
+class ChatServer(ThreadingHTTPServer):
+    """Local stand-in for Ollama's /api/chat endpoint."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ChatHandler)
+        self.failures_left = 0
+        self.delay = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.clients = set()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/chat"
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.clients.add(self.client_address)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            fail = server.failures_left > 0
+            server.failures_left -= 1
+        try:
+            time.sleep(server.delay)
+            if fail:
+                self._send(503, b'{"error": "overloaded"}')
+            elif request.get("stream"):
+                lines = [
+                    {"message": {"content": word}, "done": False} for word in ["[", '{"a": 1}', "]"]
+                ] + [{"message": {"content": ""}, "done": True}]
+                self._send(200, b"".join(json.dumps(line).encode() + b"\n" for line in lines))
+            else:
+                self._send(200, json.dumps({"message": {"content": " ok "}, "done": True}).encode())
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+@pytest.fixture
+def server():
+    server = ChatServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_transport_reuses_connections(server):
+    transport = LLMTransport(url=server.url)
+    for _ in range(5):
+        assert transport.post_chat({"stream": False})["message"]["content"] == " ok "
+    assert len(server.clients) == 1
+    assert transport.stats.summary()["calls"] == 5
+
+
+def test_transport_retries_server_errors(server):
+    server.failures_left = 2
+    transport = LLMTransport(url=server.url, max_retries=2, backoff=0.01)
+    assert transport.post_chat({})["message"]["content"] == " ok "
+    assert transport.stats.retries == 2
+
+    server.failures_left = 3
+    with pytest.raises(requests.HTTPError):
+        transport.post_chat({})
+    assert transport.stats.errors == 1
+
+
+def test_transport_read_timeout(server):
+    server.delay = 1.0
+    transport = LLMTransport(url=server.url, read_timeout=0.1, max_retries=0)
+    start = time.perf_counter()
+    with pytest.raises(requests.Timeout):
+        transport.post_chat({})
+    assert time.perf_counter() - start < 0.9
+
+
+def test_transport_streams_lines(server):
+    transport = LLMTransport(url=server.url)
+    chunks = list(transport.stream_chat({"stream": True}))
+    assert "".join(chunk["message"]["content"] for chunk in chunks) == '[{"a": 1}]'
+
+
+def test_transport_bounds_in_flight_requests(server):
+    server.delay = 0.05
+    transport = LLMTransport(url=server.url, max_in_flight=2)
+    threads = [threading.Thread(target=transport.post_chat, args=({},)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.max_in_flight == 2
+
+
+def test_stream_holds_its_slot_until_it_is_closed(server):
+    transport = LLMTransport(url=server.url, max_in_flight=1)
+    chunks = transport.stream_chat({"stream": True})
+    next(chunks)
+    # The request is still open while the consumer works, so it still counts
+    result = []
+    thread = threading.Thread(target=lambda: result.append(transport.post_chat({})))
+    thread.start()
+    thread.join(0.2)
+    assert thread.is_alive() and not result
+    chunks.close()
+    thread.join(5)
+    assert result and result[0]["message"]["content"] == " ok "
+    assert server.max_in_flight == 1
+
+
+def test_closing_a_stream_early_is_not_an_error(server):
+    transport = LLMTransport(url=server.url, max_in_flight=1)
+    chunks = transport.stream_chat({"stream": True})
+    next(chunks)
+    chunks.close()
+    assert transport.stats.summary()["calls"] == 1 and transport.stats.errors == 0
+    # The slot was released
+    assert transport.post_chat({})["message"]["content"] == " ok "
+
+
+def test_async_transport(server):
+    server.delay = 0.05
+    transport = AsyncLLMTransport(LLMTransport(url=server.url), max_in_flight=3)
+
+    async def run():
+        results = await asyncio.gather(*[transport.post_chat({}) for _ in range(6)])
+        chunks = [chunk async for chunk in transport.stream_chat({"stream": True})]
+        return results, chunks
+
+    results, chunks = asyncio.run(run())
+    assert all(result["message"]["content"] == " ok " for result in results)
+    assert chunks[-1]["done"] is True
+    assert server.max_in_flight <= 3
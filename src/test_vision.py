@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+
+from src.executor.vision import FramePyramid, TemplateMatcher
+
+
+def make_screen(width=1600, height=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    screen = cv2.GaussianBlur(rng.integers(0, 256, (height, width), dtype=np.uint8), (0, 0), 3)
+    screen = cv2.normalize(screen, None, 0, 255, cv2.NORM_MINMAX)
+    template = cv2.GaussianBlur(rng.integers(0, 256, (48, 160), dtype=np.uint8), (0, 0), 3)
+    template = cv2.normalize(template, None, 0, 255, cv2.NORM_MINMAX)
+    return screen, template
+
+
+def test_matcher_locates_template_with_pyramid_search():
+    screen, template = make_screen()
+    screen[613:661, 901:1061] = template
+    matcher = TemplateMatcher(target_image_map={}, pyramid_levels=2)
+    matcher.add_template("address bar", template)
+    match = matcher.locate("address bar", screen)
+    assert (match.x, match.y) == (901, 613)
+    assert match.center == (981, 637)
+    assert match.score > 0.95
+
+
+def test_matcher_uses_last_location_and_follows_moves():
+    screen, template = make_screen()
+    screen[100:148, 200:360] = template
+    matcher = TemplateMatcher(target_image_map={})
+    matcher.add_template("button", template)
+    assert matcher.locate("button", screen)[:2] == (200, 100)
+
+    moved, _ = make_screen()
+    moved[120:168, 230:390] = template  # within the region of interest
+    assert matcher.locate("button", FramePyramid(moved))[:2] == (230, 120)
+
+    moved, _ = make_screen()
+    moved[800:848, 1300:1460] = template  # far away, found by the full search
+    assert matcher.locate("button", moved)[:2] == (1300, 800)
+
+
+def test_matcher_handles_hidpi_scale_and_misses():
+    screen, template = make_screen()
+    retina_template = cv2.resize(template, (320, 96), interpolation=cv2.INTER_CUBIC)
+    screen[300:348, 500:660] = template
+    matcher = TemplateMatcher(target_image_map={}, scales=(1.0, 0.5))
+    matcher.add_template("icon", retina_template)
+    match = matcher.locate("icon", screen)
+    assert abs(match.x - 500) <= 1 and abs(match.y - 300) <= 1
+
+    empty, _ = make_screen(seed=1)
+    assert matcher.locate("icon", empty) is None
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from src.executor.capture import ScreenCapture
+from src.executor.vision_pool import VisionPool
+from src.test_capture import FakeScreen
+from src.test_vision import make_screen
+
+
+@pytest.fixture
+def pool():
+    pool = VisionPool(workers=3, min_band_height=128, target_image_map={})
+    yield pool
+    pool.close()
+
+
+def test_bands_cover_the_frame_with_overlap(pool):
+    bands = pool._bands(1000, 48)
+    assert len(bands) == 3
+    assert bands[0][0] == 0 and bands[-1][1] == 1000
+    for (_, bottom), (top, _) in zip(bands, bands[1:]):
+        assert top % 4 == 0  # aligned to the coarsest pyramid level
+        assert bottom - top == 47
+
+
+def test_pool_finds_target_across_band_boundary(pool):
+    screen, template = make_screen()
+    screen[320:368, 700:860] = template  # straddles the first band boundary
+    pool.add_template("button", template)
+    match = pool.locate("button", screen)
+    assert (match.x, match.y) == (700, 320)
+    assert match.score > 0.95
+
+    moved, _ = make_screen()
+    moved[340:388, 720:880] = template  # found around the last location
+    assert pool.locate("button", moved)[:2] == (720, 340)
+
+
+def test_pool_locates_several_targets_in_parallel(pool):
+    screen, button = make_screen()
+    _, icon = make_screen(seed=1)
+    screen[50:98, 100:260] = button
+    screen[900:948, 1400:1560] = icon
+    pool.add_template("button", button)
+    pool.add_template("icon", icon)
+    matches = pool.locate_many(["button", "icon", "button"], screen)
+    assert matches["button"][:2] == (100, 50)
+    assert matches["icon"][:2] == (1400, 900)
+    with pytest.raises(KeyError):
+        pool.locate("missing", screen)
+
+
+def test_capture_shares_each_frame_once(pool):
+    screen, template = make_screen()
+    screen[600:648, 200:360] = template
+    pool.add_template("button", template)
+    capture = ScreenCapture(grab=FakeScreen(screen).grab)
+    assert capture.locate("button", pool)[:2] == (200, 600)
+    handle = pool._handle
+    pool.last_locations.clear()
+    capture.forget("button")
+    assert capture.locate("button", pool)[:2] == (200, 600)
+    assert pool._handle == handle
+    assert np.array_equal(np.ndarray(handle[1], dtype=np.uint8, buffer=pool._segments[-1].buf), screen)
@@ -1,6 +1,5 @@
 # error_handler.py
 
-import traceback
 import logging
 
 
@@ -11,7 +10,5 @@ def handle_error(e):
     Args:
         e (Exception): The exception object.
     """
-    error_message = f"An error occurred: {str(e)}"
-    logging.error(error_message)
+    logging.error("An error occurred: %s", e)
     logging.debug("Stack Trace:", exc_info=True)
-    print(error_message)
@@ -1,22 +1,159 @@
 # logger.py
 
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import logging.handlers
+import queue
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional
 
+from ..config import LOG_BACKUP_COUNT, LOG_CONSOLE_LEVEL, LOG_FILE, LOG_JSON, LOG_LEVEL, LOG_MAX_BYTES
 
-def setup_logger():
+# Correlation ID of the command being handled, attached to every log record
+_correlation_id: contextvars.ContextVar = contextvars.ContextVar("correlation_id", default="-")
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def get_correlation_id() -> str:
+    """Returns the correlation ID of the current command ("-" outside of a command)."""
+    return _correlation_id.get()
+
+
+def set_correlation_id(correlation_id: Optional[str] = None) -> str:
+    """
+    Sets the correlation ID for the rest of the current thread or task.
+
+    Args:
+        correlation_id (str, optional): The ID to use; a new one is generated if omitted.
+
+    Returns:
+        str: The correlation ID.
+    """
+    correlation_id = correlation_id or new_correlation_id()
+    _correlation_id.set(correlation_id)
+    return correlation_id
+
+
+@contextmanager
+def correlation_scope(correlation_id: Optional[str] = None) -> Iterator[str]:
+    """Tags the log records emitted inside the block with one correlation ID."""
+    token = _correlation_id.set(correlation_id or new_correlation_id())
+    try:
+        yield _correlation_id.get()
+    finally:
+        _correlation_id.reset(token)
+
+
+class CorrelationFilter(logging.Filter):
+    """Adds the correlation ID of the emitting thread or task to each record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = _correlation_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "correlation_id": getattr(record, "correlation_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread unformatted. Only the message itself
+    is merged on the caller thread, since its arguments may change later;
+    timestamps, tracebacks and file I/O are left to the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logger(
+    json_lines: bool = LOG_JSON,
+    filename: str = LOG_FILE,
+    level: str = LOG_LEVEL,
+    console_level: str = LOG_CONSOLE_LEVEL,
+) -> logging.handlers.QueueListener:
     """
     Sets up the logging configuration.
+
+    Records are put on a queue and written by a background thread, so logging
+    never blocks the caller on disk or console I/O. The log file is rotated
+    once it reaches LOG_MAX_BYTES. Calling this again replaces the previous setup.
+
+    Args:
+        json_lines (bool): Write the log file as JSON lines instead of plain text.
+        filename (str): Path of the log file.
+        level (str): Minimum level that is logged at all.
+        console_level (str): Minimum level that is also shown on the console.
+
+    Returns:
+        QueueListener: The listener writing the records (stopped at exit).
     """
-    logging.basicConfig(
-        level=logging.DEBUG,  # Set to DEBUG to capture all levels of logs
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        filename="app.log",  # Log file name
-        filemode="a",  # Append to the log file
+    global _listener, _queue_handler
+    shutdown_logger()
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
     )
+    if json_lines:
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(
+            logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s] %(message)s")
+        )
 
     # Create a console handler to output logs to the console
     console = logging.StreamHandler()
-    console.setLevel(logging.INFO)  # Adjust level as needed
-    formatter = logging.Formatter("%(levelname)s: %(message)s")
-    console.setFormatter(formatter)
-    logging.getLogger("").addHandler(console)
+    console.setLevel(console_level)
+    console.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = _LazyQueueHandler(log_queue)
+    _queue_handler.addFilter(CorrelationFilter())
+    root = logging.getLogger("")
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logger() -> None:
+    """Writes out the records that are still queued and closes the log file."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    logging.getLogger("").removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    _queue_handler = None
+
+
+atexit.register(shutdown_logger)
@@ -0,0 +1,309 @@
+# tracing.py
+
+import contextvars
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..config import TRACE_MAX_EVENTS, TRACE_SUMMARY_ATTRIBUTES
+
+# Precision of the histograms: each power of two is split into this many buckets (~3%)
+_SUB_BUCKETS = 32
+_SUB_BUCKET_BITS = 5
+
+
+class Histogram:
+    """
+    HDR-style latency histogram with log-linear buckets: constant relative
+    precision (about 3%) from a microsecond to hours, in a few hundred counters
+    at most, with O(1) recording.
+    """
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    @staticmethod
+    def _index(value: int) -> int:
+        shift = max(0, value.bit_length() - _SUB_BUCKET_BITS - 1)
+        return shift * _SUB_BUCKETS + (value >> shift)
+
+    @staticmethod
+    def _bounds(index: int) -> Tuple[int, int]:
+        if index < 2 * _SUB_BUCKETS:
+            return index, index
+        shift = index // _SUB_BUCKETS - 1
+        mantissa = index - shift * _SUB_BUCKETS
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, microseconds: int) -> None:
+        value = max(0, int(microseconds))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, p: float) -> float:
+        """Returns the p-th percentile (0-100) in microseconds."""
+        if not self.count:
+            return 0.0
+        rank = max(1, round(p / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = self._bounds(index)
+                return min(self.max, max(self.min, (low + high) / 2))
+        return float(self.max)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class Span:
+    """
+    A timed stage of the work, with attributes such as the model, the action
+    type or whether a cache was hit. Use as a context manager, or call end().
+    """
+
+    __slots__ = ("tracer", "name", "attributes", "start", "thread", "track", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any], track: Optional[str] = None):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.thread = threading.current_thread()
+        # Spans that overlap others on the same thread are shown on their own track
+        self.track = track
+        self.start = time.perf_counter_ns()
+        self._token = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        self.tracer._finish(self, time.perf_counter_ns())
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        _current_span.reset(self._token)
+        self.end()
+
+
+class _NullSpan:
+    """Stands in for a span while tracing is disabled; does nothing."""
+
+    __slots__ = ()
+    name = ""
+    attributes: Dict[str, Any] = {}
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=NULL_SPAN)
+
+
+class Tracer:
+    """
+    Collects spans into per-stage histograms, plus a bounded buffer of recent
+    spans for the Chrome trace export. Disabled tracers hand out a shared no-op
+    span, so instrumentation costs next to nothing when profiling is off.
+
+    Histograms are kept per span name and, for the attributes listed in
+    `summary_attributes`, per name and attribute value, e.g.
+    "execute_action [action_type=click]".
+
+    Args:
+        enabled (bool): Whether spans are recorded.
+        max_events (int): Spans kept for the trace export; older ones are dropped.
+        summary_attributes (tuple): Attributes that get their own histograms.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        max_events: int = TRACE_MAX_EVENTS,
+        summary_attributes: Tuple[str, ...] = TRACE_SUMMARY_ATTRIBUTES,
+    ):
+        self.enabled = enabled
+        self.summary_attributes = summary_attributes
+        self.histograms: Dict[str, Histogram] = {}
+        self._events: deque = deque(maxlen=max_events)
+        self._epoch = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def span(self, name: str, track: Optional[str] = None, **attributes) -> Span:
+        """
+        Starts a span. Used as a context manager it also becomes the current
+        span of this thread or task (see current_span()).
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attributes, track)
+
+    def _finish(self, span: Span, end: int) -> None:
+        duration = (end - span.start) // 1000
+        keys = [span.name]
+        for attribute in self.summary_attributes:
+            if attribute in span.attributes:
+                keys.append(f"{span.name} [{attribute}={span.attributes[attribute]}]")
+        with self._lock:
+            for key in keys:
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram()
+                histogram.record(duration)
+            self._events.append(
+                (
+                    span.name,
+                    (span.start - self._epoch) // 1000,
+                    duration,
+                    span.track or span.thread,
+                    dict(span.attributes),
+                )
+            )
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self._events.clear()
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """
+        Returns the recorded spans in the Chrome trace-event format, viewable
+        in chrome://tracing or https://ui.perfetto.dev.
+        """
+        with self._lock:
+            events = list(self._events)
+        trace: List[Dict[str, Any]] = []
+        threads: Dict[int, str] = {}
+        tracks: Dict[str, int] = {}
+        for name, start, duration, thread, attributes in events:
+            if isinstance(thread, str):
+                # Tracks get made-up (negative) thread ids
+                tid = tracks.setdefault(thread, -1 - len(tracks))
+                threads[tid] = thread
+            else:
+                tid = thread.native_id or thread.ident
+                threads[tid] = thread.name
+            trace.append(
+                {
+                    "name": name,
+                    "cat": name.split(".")[0],
+                    "ph": "X",
+                    "ts": start,
+                    "dur": duration,
+                    "pid": 1,
+                    "tid": tid,
+                    "args": {key: _jsonable(value) for key, value in attributes.items()},
+                }
+            )
+        for tid, thread_name in threads.items():
+            trace.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": thread_name}})
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def summary_table(self) -> str:
+        """Returns a table of count, total and latency percentiles (ms) per span."""
+        with self._lock:
+            rows = sorted(self.histograms.items())
+        if not rows:
+            return "No spans recorded."
+        width = max(len("span"), max(len(key) for key, _ in rows))
+        header = f"{'span':<{width}} {'count':>7} {'total':>10} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"
+        lines = [header, "-" * len(header)]
+        for key, histogram in rows:
+            values = [histogram.total, histogram.mean] + [histogram.percentile(p) for p in (50, 90, 99)]
+            values.append(histogram.max)
+            total, mean, p50, p90, p99, maximum = (value / 1000 for value in values)
+            lines.append(
+                f"{key:<{width}} {histogram.count:>7} {total:>10.1f} {mean:>9.2f} "
+                f"{p50:>9.2f} {p90:>9.2f} {p99:>9.2f} {maximum:>9.2f}"
+            )
+        return "\n".join(lines)
+
+
+def _jsonable(value: Any) -> Any:
+    return value if isinstance(value, (str, int, float, bool)) or value is None else str(value)
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Returns the process-wide tracer (disabled until profiling is turned on)."""
+    return _tracer
+
+
+def span(name: str, **attributes) -> Span:
+    """Starts a span on the process-wide tracer, e.g. `with span("locate", target=t):`."""
+    return _tracer.span(name, **attributes) if _tracer.enabled else NULL_SPAN
+
+
+def traced_iter(name: str, iterator: Iterator, **attributes) -> Iterator:
+    """
+    Wraps an iterator (e.g. a streamed plan) in a span that lasts from the first
+    to the last item, on its own track since the consumer's work interleaves
+    with it. While the iterator runs, the span is the current span. The span
+    records when the first item arrived and, as busy_ms, the time spent inside
+    the iterator.
+    """
+    if not _tracer.enabled:
+        yield from iterator
+        return
+    current = _tracer.span(name, track=name, **attributes)
+    busy = 0
+    items = 0
+    try:
+        while True:
+            token = _current_span.set(current)
+            start = time.perf_counter_ns()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                busy += time.perf_counter_ns() - start
+                _current_span.reset(token)
+            if not items:
+                current.set("first_item_ms", round((time.perf_counter_ns() - current.start) / 1e6, 3))
+            items += 1
+            yield item
+    finally:
+        current.set("items", items)
+        current.set("busy_ms", round(busy / 1e6, 3))
+        current.end()
+
+
+def current_span() -> Span:
+    """Returns the innermost active span, to add attributes to it (a no-op span if there is none)."""
+    return _current_span.get()